@@ -0,0 +1,198 @@
+import json
+import os
+import yaml
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Config", "Master")
+
+# Bump this when the schema changes, so that configs cached before then are
+# validated again
+cacheVersion = 1
+
+flag = (bool, int)
+number = (int, float)
+text = (str,)
+
+# The options in the config section that TWCManager itself reads, with the
+# types they may have, their defaults, and whether config.json must set
+# them. Options not listed here are left to the modules that read them.
+schema = {
+    "backgroundTaskLanes": (flag, True, False),
+    "captureFile": (text, None, False),
+    "debugLevel": (number, 1, False),
+    "debugOutputToFile": (flag, False, False),
+    "defaultVoltage": (number, 240, False),
+    "displayMilliseconds": (flag, False, False),
+    "emsMaxAge": (number, 300, False),
+    "emsPollDeadline": (number, 5, False),
+    "emsPushWindow": (number, 1, False),
+    "fakeMaster": (number, 1, True),
+    "greenEnergyAmpsOffset": (number, 0, False),
+    "logLevel": (number, None, False),
+    "maxAmpsAllowedFromGrid": (number, None, False),
+    "minAmpsPerTWC": (number, 12, True),
+    "moduleConnectTimeout": (number, 5, False),
+    "numberOfPhases": (number, 1, False),
+    "reactorMode": (flag, False, False),
+    "reactorPollInterval": (number, 0.1, False),
+    "realPowerFactorMaxAmps": (number, 1, False),
+    "realPowerFactorMinAmps": (number, 1, False),
+    "sessionRetentionDays": (number, 365, False),
+    "settingsBackend": (text, "json", False),
+    "settingsPath": (text, "/etc/twcmanager", True),
+    "settingsSaveWindow": (number, 10, False),
+    "subtractChargerLoad": (flag, False, False),
+    "treatGenerationAsGridDelivery": (flag, False, False),
+    "webhookMethod": (text, "POST", False),
+    "wiringMaxAmpsAllTWCs": (number, 6, True),
+    "wiringMaxAmpsPerTWC": (number, 6, True),
+}
+
+# Options that may only take certain values
+choices = {
+    "fakeMaster": (0, 1, 2),
+    "settingsBackend": ("json", "sqlite"),
+    "webhookMethod": ("GET", "POST"),
+}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+class ConfigSnapshot:
+    # A read-only copy of the config section, with each option in the schema
+    # as an attribute, so that code run often can read it without looking
+    # it up in nested dicts. Options config.json doesn't set have their
+    # default, flags are bools, and numbers aren't.
+    #
+    # config.json is only read at startup, so the snapshot is never out of
+    # date. The config dict is still passed to modules, which read their
+    # own sections from it.
+
+    __slots__ = tuple(schema)
+
+    def __init__(self, section):
+        for key, (types, default, required) in schema.items():
+            value = section.get(key, default)
+            if value is None:
+                value = default
+            elif types is flag:
+                value = bool(value)
+            elif isinstance(value, bool):
+                value = int(value)
+            object.__setattr__(self, key, value)
+
+    def __delattr__(self, key):
+        raise AttributeError("The config snapshot can't be changed")
+
+    def __repr__(self):
+        return "ConfigSnapshot(%s)" % (
+            ", ".join("%s=%r" % (key, getattr(self, key)) for key in self.__slots__)
+        )
+
+    def __setattr__(self, key, value):
+        raise AttributeError("The config snapshot can't be changed")
+
+
+def loadConfig(fileName, cacheFile=None):
+    # Returns the config in fileName, parsed and validated. If cacheFile is
+    # given, the result is written there, and read from there instead as
+    # long as fileName hasn't been changed since.
+    stat = os.stat(fileName)
+    key = [os.path.abspath(fileName), stat.st_mtime_ns, stat.st_size, cacheVersion]
+
+    if cacheFile:
+        try:
+            with open(cacheFile) as infile:
+                cached = json.load(infile)
+            if cached.get("key", None) == key:
+                return cached["config"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+
+    with open(fileName) as infile:
+        config = parseConfig(infile)
+    problems = validateConfig(config)
+    if problems:
+        raise ConfigError(
+            "Problems found in %s:\n  %s" % (fileName, "\n  ".join(problems))
+        )
+
+    if cacheFile:
+        writeCache(cacheFile, {"key": key, "config": config})
+    return config
+
+
+def parseConfig(lines):
+    # config.json may have comments, which are removed first. What's left is
+    # usually JSON, which is much quicker to parse than YAML, but trailing
+    # commas and the like are accepted by the YAML parser.
+    configtext = ""
+    for line in lines:
+        if line.lstrip().startswith("//") or line.lstrip().startswith("#"):
+            configtext += "\n"
+        else:
+            configtext += line.replace("\t", " ").split("#")[0]
+
+    try:
+        return json.loads(configtext)
+    except ValueError:
+        pass
+    try:
+        return yaml.safe_load(configtext)
+    except yaml.YAMLError as e:
+        raise ConfigError("Unable to parse the config file: %s" % (e))
+
+
+def validateConfig(config):
+    # Returns a list of the problems with config, which is empty if there
+    # are none
+    if not isinstance(config, dict) or not isinstance(config.get("config"), dict):
+        return ['There is no "config" section']
+
+    problems = []
+    section = config["config"]
+    for key, (types, default, required) in schema.items():
+        if key not in section or section[key] is None:
+            if required:
+                problems.append('"%s" must be set' % (key))
+            continue
+        value = section[key]
+        # bool is a subclass of int, but true isn't a number of amps. It is
+        # accepted where it is one of the choices, so "fakeMaster": true
+        # still means 1.
+        if not isinstance(value, types) or (
+            isinstance(value, bool) and types is not flag and key not in choices
+        ):
+            problems.append(
+                '"%s" should be %s, not %r'
+                % (key, "/".join(t.__name__ for t in types), value)
+            )
+        elif key in choices and value not in choices[key]:
+            problems.append(
+                '"%s" should be one of %s, not %r'
+                % (key, ", ".join(json.dumps(c) for c in choices[key]), value)
+            )
+    return problems
+
+
+def writeCache(cacheFile, cached):
+    # The cache is only an optimisation, so failing to write it, as when
+    # the config directory isn't writable, doesn't matter
+    tmpFile = cacheFile + ".tmp"
+    try:
+        # The cache holds everything config.json does, including passwords
+        # and API keys, so only we may read it, whatever the umask
+        if os.path.exists(tmpFile):
+            os.remove(tmpFile)
+        fd = os.open(tmpFile, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as outfile:
+            json.dump(cached, outfile)
+        os.replace(tmpFile, cacheFile)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug("Unable to cache the config in %s: %s" % (cacheFile, e))
+        try:
+            os.remove(tmpFile)
+        except OSError:
+            pass
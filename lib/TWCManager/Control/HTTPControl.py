@@ -342,6 +342,9 @@ def CreateHTTPHandlerClass(master):
                     "maxAmps": 0,
                     "reportedAmpsActual": 0,
                 }
+                heartbeatStats = {}
+                for bus in master.getBuses():
+                    heartbeatStats.update(bus.heartbeatScheduler.getStats())
                 for slaveTWC in master.getSlaveTWCs():
                     TWCID = "%02X%02X" % (slaveTWC.TWCID[0], slaveTWC.TWCID[1])
                     data[TWCID] = {
@@ -362,6 +365,11 @@ def CreateHTTPHandlerClass(master):
                         "TWCID": "%s" % TWCID,
                     }
 
+                    if slaveTWC.bus:
+                        data[TWCID]["bus"] = slaveTWC.bus.name
+                    if TWCID in heartbeatStats:
+                        data[TWCID]["heartbeat"] = heartbeatStats[TWCID]
+
                     if slaveTWC.lastChargingStart > 0:
                         data[TWCID]["chargeTime"] = str(
                             timedelta(
@@ -418,6 +426,66 @@ def CreateHTTPHandlerClass(master):
                 except BrokenPipeError:
                     self.debugLogAPI("Connection Error: Broken Pipe")
 
+            elif self.url.path == "/api/getTaskQueues":
+                data = master.getBackgroundTaskQueues()
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+
+                json_data = json.dumps(data)
+                try:
+                    self.wfile.write(json_data.encode("utf-8"))
+                except BrokenPipeError:
+                    self.debugLogAPI("Connection Error: Broken Pipe")
+
+            elif self.url.path == "/api/getTaskStats":
+                data = master.getBackgroundTaskStats()
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+
+                json_data = json.dumps(data)
+                try:
+                    self.wfile.write(json_data.encode("utf-8"))
+                except BrokenPipeError:
+                    self.debugLogAPI("Connection Error: Broken Pipe")
+
+            elif self.url.path == "/api/getEMSStats":
+                data = master.getEMSStats()
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+
+                json_data = json.dumps(data)
+                try:
+                    self.wfile.write(json_data.encode("utf-8"))
+                except BrokenPipeError:
+                    self.debugLogAPI("Connection Error: Broken Pipe")
+
+            elif self.url.path == "/api/getHTTPStats":
+                data = master.getHTTPStats()
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+
+                json_data = json.dumps(data)
+                try:
+                    self.wfile.write(json_data.encode("utf-8"))
+                except BrokenPipeError:
+                    self.debugLogAPI("Connection Error: Broken Pipe")
+
+            elif self.url.path == "/api/getSettingsStats":
+                data = master.getSettingsStats()
+                self.send_response(200)
+                self.send_header("Content-type", "application/json")
+                self.end_headers()
+
+                json_data = json.dumps(data)
+                try:
+                    self.wfile.write(json_data.encode("utf-8"))
+                except BrokenPipeError:
+                    self.debugLogAPI("Connection Error: Broken Pipe")
+
             elif self.url.path == "/api/getActivePolicyAction":
                 data = master.getModuleByName("Policy").getActivePolicyAction()
                 self.send_response(200)
@@ -439,32 +507,22 @@ def CreateHTTPHandlerClass(master):
                     minute=math.floor(startTime.minute / 5) * 5
                 )
 
-                source = (
-                    master.settings["history"] if "history" in master.settings else []
-                )
-                data = {
-                    k: v for k, v in source if datetime.fromisoformat(k) >= startTime
-                }
+                data = dict(master.getHistory(startTime, endTime))
 
                 avgCurrent = 0
                 for slave in master.getSlaveTWCs():
                     avgCurrent += slave.historyAvgAmps
-                data[endTime.isoformat(timespec="seconds")] = master.convertAmpsToWatts(
-                    avgCurrent
-                )
+                data[endTime.timestamp()] = master.convertAmpsToWatts(avgCurrent)
 
-                output = [
-                    {
-                        "timestamp": timestamp,
-                        "charger_power": data[timestamp] if timestamp in data else 0,
-                    }
-                    for timestamp in [
-                        (startTime + timedelta(minutes=5 * i)).isoformat(
-                            timespec="seconds"
-                        )
-                        for i in range(48 * 12)
-                    ]
-                ]
+                output = []
+                for i in range(48 * 12):
+                    timestamp = startTime + timedelta(minutes=5 * i)
+                    output.append(
+                        {
+                            "timestamp": timestamp.isoformat(timespec="seconds"),
+                            "charger_power": data.get(timestamp.timestamp(), 0),
+                        }
+                    )
 
                 self.send_response(200)
                 self.send_header("Content-type", "application/json")
@@ -514,7 +572,7 @@ def CreateHTTPHandlerClass(master):
                     master.settings["consumptionOffset"][name] = {}
                     master.settings["consumptionOffset"][name]["value"] = value
                     master.settings["consumptionOffset"][name]["unit"] = unit
-                    master.queue_background_task({"cmd": "saveSettings"})
+                    master.markSettingsDirty()
 
                     self.send_response(200)
                     self.send_header("Content-type", "application/json")
@@ -568,7 +626,7 @@ def CreateHTTPHandlerClass(master):
                 else:
                     master.setChargeNowAmps(rate)
                     master.setChargeNowTimeEnd(durn)
-                    master.queue_background_task({"cmd": "saveSettings"})
+                    master.markSettingsDirty()
                     master.getModuleByName("Policy").applyPolicyImmediately()
                     self.send_response(200)
                     self.send_header("Content-type", "application/json")
@@ -581,7 +639,7 @@ def CreateHTTPHandlerClass(master):
 
             elif self.url.path == "/api/cancelChargeNow":
                 master.resetChargeNowAmps()
-                master.queue_background_task({"cmd": "saveSettings"})
+                master.markSettingsDirty()
                 master.getModuleByName("Policy").applyPolicyImmediately()
                 self.send_response(200)
                 self.send_header("Content-type", "application/json")
@@ -622,7 +680,7 @@ def CreateHTTPHandlerClass(master):
                 if master.settings.get("consumptionOffset", None):
                     if offset_name in master.settings["consumptionOffset"]:
                         del master.settings["consumptionOffset"][offset_name]
-                        master.queue_background_task({"cmd": "saveSettings"})
+                        master.markSettingsDirty()
                         self.send_response(200)
                         self.send_header("Content-type", "application/json")
                         self.end_headers()
@@ -647,7 +705,7 @@ def CreateHTTPHandlerClass(master):
                     )
 
             elif self.url.path == "/api/saveSettings":
-                master.queue_background_task({"cmd": "saveSettings"})
+                master.markSettingsDirty()
                 self.send_response(204)
                 self.end_headers()
 
@@ -702,7 +760,7 @@ def CreateHTTPHandlerClass(master):
 
                 # Set the policy
                 policy_module.active_policy = policy_name
-                master.queue_background_task({"cmd": "saveSettings"})
+                master.markSettingsDirty()
                 policy_module.applyPolicyImmediately()
 
                 self.send_response(200)
@@ -806,7 +864,7 @@ def CreateHTTPHandlerClass(master):
                     and not self.checkForUnsafeCharactters(setting)
                     and not self.checkForUnsafeCharactters(value)
                 ):
-                    master.settings[setting] = value
+                    master.setSetting(setting, value)
                 self.send_response(204)
                 self.end_headers()
 
@@ -859,7 +917,7 @@ def CreateHTTPHandlerClass(master):
                     master.setScheduledAmpsDaysBitmap(weekDaysBitmap)
                 master.setScheduledAmpsBatterySize(batterySize)
                 master.setScheduledAmpsFlexStart(flexStart)
-                master.queue_background_task({"cmd": "saveSettings"})
+                master.markSettingsDirty()
                 self.send_response(202)
                 self.end_headers()
                 self.wfile.write("".encode("utf-8"))
@@ -883,7 +941,7 @@ def CreateHTTPHandlerClass(master):
                         if -90 <= lat <= 90 and -180 <= lon <= 180:
                             master.settings["homeLat"] = lat
                             master.settings["homeLon"] = lon
-                            master.queue_background_task({"cmd": "saveSettings"})
+                            master.markSettingsDirty()
                             self.send_response(204)
                             self.end_headers()
                             self.wfile.write("".encode("utf-8"))
@@ -921,7 +979,7 @@ def CreateHTTPHandlerClass(master):
                         return
 
                     master.settings["greenEnergyAmpsOffset"] = offset_val
-                    master.queue_background_task({"cmd": "saveSettings"})
+                    master.markSettingsDirty()
                     self.send_response(204)
                     self.end_headers()
                     self.wfile.write("".encode("utf-8"))
@@ -1323,7 +1381,7 @@ def CreateHTTPHandlerClass(master):
                     and group in master.settings["VehicleGroups"]
                 ):
                     del master.settings["VehicleGroups"][group]
-                    master.queue_background_task({"cmd": "saveSettings"})
+                    master.markSettingsDirty()
                     self.send_response(302)
                     self.send_header("Location", "/vehicles")
 
@@ -1459,7 +1517,7 @@ def CreateHTTPHandlerClass(master):
                             "Error removing vehicle %s from group %s" % (vin, group)
                         )
 
-                master.queue_background_task({"cmd": "saveSettings"})
+                master.markSettingsDirty()
 
                 master.queue_background_task(
                     {
@@ -1612,7 +1670,7 @@ def CreateHTTPHandlerClass(master):
                     )
 
             # Save Settings
-            master.queue_background_task({"cmd": "saveSettings"})
+            master.markSettingsDirty()
 
             # Redirect to the index page
             self.send_response(302)
@@ -1707,7 +1765,7 @@ def CreateHTTPHandlerClass(master):
             )
 
             # Save Settings
-            master.queue_background_task({"cmd": "saveSettings"})
+            master.markSettingsDirty()
 
             self.send_response(302)
             self.send_header("Location", "/")
@@ -1759,7 +1817,7 @@ def CreateHTTPHandlerClass(master):
                         master.settings[checkbox] = 0
 
             # Save Settings
-            master.queue_background_task({"cmd": "saveSettings"})
+            master.markSettingsDirty()
 
             # Redirect to the index page
             self.send_response(302)
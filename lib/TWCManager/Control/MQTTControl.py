@@ -120,7 +120,7 @@ class MQTTControl:
                     self.master.setChargeNowAmps(amps)
                     self.master.setChargeNowTimeEnd(seconds)
                     self.master.getModuleByName("Policy").applyPolicyImmediately()
-                    self.master.queue_background_task({"cmd": "saveSettings"})
+                    self.master.markSettingsDirty()
                 except ValueError as e:
                     logger.warning(
                         f"MQTT chargeNow command failed: invalid format - {str(e)}"
@@ -134,7 +134,7 @@ class MQTTControl:
             logger.log(logging.INFO3, "MQTT Message called chargeNowEnd")
             self.master.resetChargeNowAmps()
             self.master.getModuleByName("Policy").applyPolicyImmediately()
-            self.master.queue_background_task({"cmd": "saveSettings"})
+            self.master.markSettingsDirty()
 
         if message.topic == self.topicPrefix + "/control/stop":
             logger.log(logging.INFO3, "MQTT Message called Stop")
@@ -156,7 +156,7 @@ class MQTTControl:
                     return
                 self.master.setNonScheduledAmpsMax(amps)
                 self.master.getModuleByName("Policy").applyPolicyImmediately()
-                self.master.queue_background_task({"cmd": "saveSettings"})
+                self.master.markSettingsDirty()
             except ValueError as e:
                 logger.warning(
                     f"MQTT nonScheduledAmpsMax command failed: invalid value - {str(e)}"
@@ -177,7 +177,7 @@ class MQTTControl:
                     return
                 self.master.settings["nonScheduledAction"] = action
                 self.master.getModuleByName("Policy").applyPolicyImmediately()
-                self.master.queue_background_task({"cmd": "saveSettings"})
+                self.master.markSettingsDirty()
             except ValueError as e:
                 logger.warning(
                     f"MQTT nonScheduledAction command failed: invalid value - {str(e)}"
@@ -101,6 +101,8 @@ class DSMRreader:
             logger.warning(f"Loading JSON from message failed: {str(e)}")
 
         if message.topic == self.__topic:
+            values = (self.consumedW, self.consumedA, self.generatedW)
+
             self.consumedW = (
                 float(payload.get("electricity_currently_delivered", 0)) * 1000.0
             )
@@ -139,6 +141,11 @@ class DSMRreader:
                 logging.INFO3, f"Consumption Amps Value updated to {self.consumedA}A"
             )
 
+            # Have the amps offered worked out again from the new values,
+            # rather than waiting for the next green energy check
+            if (self.consumedW, self.consumedA, self.generatedW) != values:
+                self.master.markEMSValuesChanged("DSMRreader")
+
     def mqttSubscribe(self, client, userdata, mid, reason_codes, properties=None):
         logger.info("Subscribe operation completed with mid " + str(mid))
 
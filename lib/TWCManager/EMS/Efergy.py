@@ -9,6 +9,7 @@ logger = LoggerFactory.get_logger("Efergy", "EMS")
 class Efergy:
     import requests
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -28,6 +29,8 @@ class Efergy:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -46,6 +49,11 @@ class Efergy:
             self.master.releaseModule("lib.TWCManager.EMS", self.__class__.__name__)
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("Efergy EMS Module Disabled. Skipping getConsumption")
@@ -96,27 +104,26 @@ class Efergy:
 
         return self.getValue(url)
 
+    def fetch(self):
+        # Fetch values from Efergy. Returns False on failure.
+        meterData = self.getMeterData()
+
+        if meterData:
+            try:
+                self.consumedW = list(meterData[0]["data"][0].values())[0]
+            except (KeyError, TypeError) as e:
+                logger.log(
+                    logging.INFO4,
+                    "Exception during parsing Meter Data (Consumption)",
+                )
+                logger.debug(str(e))
+
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
+
+        return self.fetchFailed is not True
+
     def update(self):
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from Efergy.
-
-            meterData = self.getMeterData()
-
-            if meterData:
-                try:
-                    self.consumedW = list(meterData[0]["data"][0].values())[0]
-                except (KeyError, TypeError) as e:
-                    logger.log(
-                        logging.INFO4,
-                        "Exception during parsing Meter Data (Consumption)",
-                    )
-                    logger.debug(str(e))
-
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
-
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -12,6 +12,7 @@ class EmonCMS:
     import requests
 
     apiKey = None
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -32,6 +33,8 @@ class EmonCMS:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -56,6 +59,11 @@ class EmonCMS:
             self.master.releaseModule("lib.TWCManager.EMS", "EmonCMS")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("Module Disabled. Skipping getConsumption")
@@ -141,36 +149,36 @@ class EmonCMS:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
+    def fetch(self):
+        # Fetch values from EmonCMS. Returns False on failure.
+        feeds = []
+
+        if self.consumptionFeed:
+            feeds.append(self.consumptionFeed)
 
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from EmonCMS
-            feeds = []
+        if self.generationFeed:
+            feeds.append(self.generationFeed)
 
+        vals = self.getFeeds(feeds)
+        if vals:
             if self.consumptionFeed:
-                feeds.append(self.consumptionFeed)
+                self.consumedW = float(vals.pop())
+                logger.debug("getConsumption returns " + str(self.consumedW))
 
             if self.generationFeed:
-                feeds.append(self.generationFeed)
+                self.generatedW = float(vals.pop())
+                logger.debug("getGeneration returns " + str(self.generatedW))
 
-            vals = self.getFeeds(feeds)
-            if vals:
-                if self.consumptionFeed:
-                    self.consumedW = float(vals.pop())
-                    logger.debug("getConsumption returns " + str(self.consumedW))
+            self.lastFetch = int(time.time())
 
-                if self.generationFeed:
-                    self.generatedW = float(vals.pop())
-                    logger.debug("getGeneration returns " + str(self.generatedW))
+        return bool(vals)
 
-                self.lastFetch = int(time.time())
-
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
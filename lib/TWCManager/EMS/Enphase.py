@@ -10,6 +10,7 @@ class Enphase:
     import requests
 
     apiKey = None
+    cache = None
     # cacheTime is a bit higher than local EMS modules
     # because we're polling an external API
     cacheTime = 60
@@ -32,6 +33,8 @@ class Enphase:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -61,6 +64,11 @@ class Enphase:
         if self.serverIP and self.serverPort:
             self.cacheTime = 10
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("Enphase EMS Module Disabled. Skipping getConsumption")
@@ -131,42 +139,39 @@ class Enphase:
         else:
             return r.json()
 
-    def update(self):
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from Portal.
-
-            portalData = self.getPortalData()
-            if portalData:
-                try:
-                    # Determine if this is Local or Cloud API
-                    if self.apiKey and self.userID and self.systemID:
-                        self.generatedW = int(portalData["current_power"])
-                    elif self.serverIP and self.serverPort:
-                        # Check that production and consumption arrays have required elements
-                        if len(portalData.get("production", [])) > 1:
-                            self.generatedW = int(portalData["production"][1]["wNow"])
-                        if len(portalData.get("consumption", [])) > 0:
-                            self.consumedW = int(portalData["consumption"][0]["wNow"])
-                            self.voltage = int(
-                                portalData["consumption"][0]["rmsVoltage"]
-                            )
-                except (KeyError, TypeError, IndexError) as e:
-                    logger.log(
-                        logging.INFO4,
-                        "Exception during parsing Enphase data (current_power)",
-                    )
-                    logger.debug(e)
-            else:
+    def fetch(self):
+        # Fetch values from Portal. Returns False on failure.
+        portalData = self.getPortalData()
+        if portalData:
+            try:
+                # Determine if this is Local or Cloud API
+                if self.apiKey and self.userID and self.systemID:
+                    self.generatedW = int(portalData["current_power"])
+                elif self.serverIP and self.serverPort:
+                    # Check that production and consumption arrays have required elements
+                    if len(portalData.get("production", [])) > 1:
+                        self.generatedW = int(portalData["production"][1]["wNow"])
+                    if len(portalData.get("consumption", [])) > 0:
+                        self.consumedW = int(portalData["consumption"][0]["wNow"])
+                        self.voltage = int(portalData["consumption"][0]["rmsVoltage"])
+            except (KeyError, TypeError, IndexError) as e:
                 logger.log(
-                    logging.INFO4, "Enphase API result does not contain json content."
+                    logging.INFO4,
+                    "Exception during parsing Enphase data (current_power)",
                 )
-                self.fetchFailed = True
+                logger.debug(e)
+        else:
+            logger.log(
+                logging.INFO4, "Enphase API result does not contain json content."
+            )
+            self.fetchFailed = True
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+        return self.fetchFailed is not True
+
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -1,6 +1,5 @@
 # Fronius Datamanager Solar.API Integration (Inverter Web Interface)
 import logging
-import requests
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
@@ -8,6 +7,7 @@ logger = LoggerFactory.get_logger("Fronius", "EMS")
 
 
 class Fronius:
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -27,6 +27,8 @@ class Fronius:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -50,6 +52,11 @@ class Fronius:
             self.master.releaseModule("lib.TWCManager.EMS", "Fronius")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("Fronius EMS Module Disabled. Skipping getConsumption")
@@ -85,11 +92,9 @@ class Fronius:
 
     def getInverterValue(self, url):
         # Fetch the specified URL from the Fronius Inverter and return the data
-        self.fetchFailed = False
-
         try:
-            r = requests.get(url, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            r = self.requests.get(url, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4,
                 "Error connecting to Fronius Inverter to fetch sensor value",
@@ -108,56 +113,59 @@ class Fronius:
 
         return self.getInverterValue(url)
 
-    def update(self):
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from Fronius inverter.
-
-            con = 0
-            gen = 0
-            for inverter in self.serverIP:
-                inverterData = self.getInverterData(inverter)
-                if inverterData:
-                    try:
-                        if "UAC" in inverterData["Body"]["Data"]:
-                            self.voltage = inverterData["Body"]["Data"]["UAC"]["Value"]
-                    except (KeyError, TypeError) as e:
-                        logger.log(
-                            logging.INFO4,
-                            "Exception during parsing Inverter Data (UAC)",
-                        )
-                        logger.debug(e)
-
-                meterData = self.getMeterData(inverter)
-                if meterData:
-                    try:
-                        if "P_PV" in meterData["Body"]["Data"]["Site"]:
-                            gen += float(meterData["Body"]["Data"]["Site"]["P_PV"])
-                    except (KeyError, TypeError) as e:
-                        logger.log(
-                            logging.INFO4,
-                            "Exception during parsing Meter Data (Generation)",
-                        )
-                        logger.debug(e)
-
-                    try:
-                        if "P_Load" in meterData["Body"]["Data"]["Site"]:
-                            con += float(meterData["Body"]["Data"]["Site"]["P_Load"])
-                    except (KeyError, TypeError) as e:
-                        logger.log(
-                            logging.INFO4,
-                            "Exception during parsing Meter Data (Consumption)",
-                        )
-                        logger.debug(e)
-
-            # Update values
-            self.consumedW = con
-            self.generatedW = gen
-
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
-
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
+    def fetch(self):
+        # Fetch values from Fronius inverter. Returns False on failure.
+        self.fetchFailed = False
+        con = 0
+        gen = 0
+        for inverter in self.serverIP:
+            inverterData = self.getInverterData(inverter)
+            if inverterData:
+                try:
+                    if "UAC" in inverterData["Body"]["Data"]:
+                        self.voltage = inverterData["Body"]["Data"]["UAC"]["Value"]
+                except (KeyError, TypeError) as e:
+                    logger.log(
+                        logging.INFO4,
+                        "Exception during parsing Inverter Data (UAC)",
+                    )
+                    logger.debug(e)
+
+            meterData = self.getMeterData(inverter)
+            if meterData:
+                try:
+                    if "P_PV" in meterData["Body"]["Data"]["Site"]:
+                        gen += float(meterData["Body"]["Data"]["Site"]["P_PV"])
+                except (KeyError, TypeError) as e:
+                    logger.log(
+                        logging.INFO4,
+                        "Exception during parsing Meter Data (Generation)",
+                    )
+                    logger.debug(e)
+
+                try:
+                    if "P_Load" in meterData["Body"]["Data"]["Site"]:
+                        con += float(meterData["Body"]["Data"]["Site"]["P_Load"])
+                except (KeyError, TypeError) as e:
+                    logger.log(
+                        logging.INFO4,
+                        "Exception during parsing Meter Data (Consumption)",
+                    )
+                    logger.debug(e)
+
+        if self.fetchFailed:
+            # An inverter didn't answer, so the totals are missing its
+            # values. Keep the last ones, and leave the reading cache to
+            # retry after a backoff, rather than on every call.
             return False
+
+        # Update values and last fetch time
+        self.consumedW = con
+        self.generatedW = gen
+        self.lastFetch = int(time.time())
+
+        return True
+
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -13,6 +13,7 @@ class Growatt:
 
     import requests
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -56,6 +57,11 @@ class Growatt:
             self.master.releaseModule("lib.TWCManager.EMS", "Growatt")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):  # gets called by TWCManager.py
         if not self.status:
             logger.debug("EMS Module Disabled. Skipping getConsumption")
@@ -151,23 +157,23 @@ class Growatt:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
+    def fetch(self):
+        # Fetch values from Growatt. Returns False on failure.
         self.now = datetime.datetime.now().time()
+        self.fetchFailed = self.getGenerationValues() is False
 
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from Growatt.
-            self.getGenerationValues()
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        return self.fetchFailed is not True
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -12,6 +12,7 @@ class HASS:
     import requests
 
     apiKey = None
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -31,6 +32,8 @@ class HASS:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -53,6 +56,11 @@ class HASS:
             self.master.releaseModule("lib.TWCManager.EMS", "HASS")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("Module Disabled. Skipping getConsumption")
@@ -120,41 +128,40 @@ class HASS:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
-
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from HomeAssistant sensor.
-
-            if self.hassEntityConsumption:
-                apivalue = self.getAPIValue(self.hassEntityConsumption)
-                if self.fetchFailed is not True:
-                    logger.debug("getConsumption returns " + str(apivalue))
-                    self.consumedW = float(apivalue)
-                else:
-                    logger.debug("getConsumption fetch failed, using cached values")
-            else:
-                logger.debug("Consumption Entity Not Supplied. Not Querying")
-
-            if self.hassEntityGeneration:
-                apivalue = self.getAPIValue(self.hassEntityGeneration)
-                if self.fetchFailed is not True:
-                    logger.debug("getGeneration returns " + str(apivalue))
-                    self.generatedW = float(apivalue)
-                else:
-                    logger.debug("getGeneration fetch failed, using cached values")
+    def fetch(self):
+        # Fetch values from HomeAssistant sensor. Returns False on failure.
+        if self.hassEntityConsumption:
+            apivalue = self.getAPIValue(self.hassEntityConsumption)
+            if self.fetchFailed is not True:
+                logger.debug("getConsumption returns " + str(apivalue))
+                self.consumedW = float(apivalue)
             else:
-                logger.debug("Generation Entity Not Supplied. Not Querying")
+                logger.debug("getConsumption fetch failed, using cached values")
+        else:
+            logger.debug("Consumption Entity Not Supplied. Not Querying")
 
-            # Update last fetch time
+        if self.hassEntityGeneration:
+            apivalue = self.getAPIValue(self.hassEntityGeneration)
             if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
-
-            return True
+                logger.debug("getGeneration returns " + str(apivalue))
+                self.generatedW = float(apivalue)
+            else:
+                logger.debug("getGeneration fetch failed, using cached values")
         else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+            logger.debug("Generation Entity Not Supplied. Not Querying")
+
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
+
+        return self.fetchFailed is not True
+
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -35,6 +35,7 @@ class Kostal:
     TotalDCPower = 0  # address 0x64 (100)
     HomeFromGrid = 0  # address 0x6c (108)
     HomeFromPV = 0  # address 0x72 (114)
+    connected = False  # set once connectModule() has connected
 
     #
     # Constructor
@@ -63,6 +64,17 @@ class Kostal:
             self.master.releaseModule("lib.TWCManager.EMS", "Kostal")
             return None
 
+        # The inverter is connected to by connectModule(), in the background.
+        # Until then, the module is loaded but reports no power.
+        self.modbus = None
+
+    #
+    # Public Method
+    # Connect to the inverter, and read its details and first values.
+    # Run in the background at startup, so that an inverter which can't be
+    # reached doesn't hold up startup until the connection times out.
+    #
+    def connectModule(self):
         # try to open open the Modbus connection
         try:
             self.modbus = ModbusClient(
@@ -76,22 +88,23 @@ class Kostal:
                 "ERROR connecting to inverter. Please check your configuration!"
             )
             self.master.releaseModule("lib.TWCManager.EMS", "Kostal")
-        else:
-            # detected byte order (Little/Big Endian) by reading register 0x05
-            self.byteorder = ENDIAN_LITTLE
-            if self.modbus.read_holding_registers(5, 1)[0] == ENDIAN_BIG:
-                self.byteorder = ENDIAN_BIG
-
-            # get basic inverter info and output informations into log
-            inv_model = self.__readModbus(768, "String")
-            inv_class = self.__readModbus(800, "String")
-            inv_serial = self.__readModbus(559, "String")
-            logger.info(
-                inv_model + " " + inv_class + " (S/N: " + inv_serial + ") found."
-            )
+            return False
+
+        # detected byte order (Little/Big Endian) by reading register 0x05
+        self.byteorder = ENDIAN_LITTLE
+        if self.modbus.read_holding_registers(5, 1)[0] == ENDIAN_BIG:
+            self.byteorder = ENDIAN_BIG
+
+        # get basic inverter info and output informations into log
+        inv_model = self.__readModbus(768, "String")
+        inv_class = self.__readModbus(800, "String")
+        inv_serial = self.__readModbus(559, "String")
+        logger.info(inv_model + " " + inv_class + " (S/N: " + inv_serial + ") found.")
 
-            # module successfully loaded update all values
-            self.__update()
+        # module successfully loaded update all values
+        self.__update()
+        self.connected = True
+        return True
 
     #
     # Destructor
@@ -176,6 +189,10 @@ class Kostal:
     # deduct charger load - if car(s) charging
     #
     def getConsumption(self):
+        # no values until the inverter is connected
+        if not self.connected:
+            return 0
+
         # update value if neccessary
         self.__update()
 
@@ -189,6 +206,10 @@ class Kostal:
     # Return the generated power by the inverter
     #
     def getGeneration(self):
+        # no values until the inverter is connected
+        if not self.connected:
+            return 0
+
         # update value if neccessary
         self.__update()
 
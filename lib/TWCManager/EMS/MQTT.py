@@ -107,6 +107,8 @@ class MQTT:
             )
             return
 
+        values = (self.consumedW, self.generatedW)
+
         if message.topic == self.__topicConsumption:
             self.consumedW = value
             logger.log(logging.INFO3, f"MQTT EMS Consumption Value updated to {value}W")
@@ -115,6 +117,11 @@ class MQTT:
             self.generatedW = value
             logger.log(logging.INFO3, f"MQTT EMS Generation Value updated to {value}W")
 
+        # Have the amps offered worked out again from the new values, rather
+        # than waiting for the next green energy check
+        if (self.consumedW, self.generatedW) != values:
+            self.master.markEMSValuesChanged("MQTT")
+
     def mqttSubscribe(self, client, userdata, mid, reason_codes, properties=None):
         logger.info("Subscribe operation completed with mid " + str(mid))
 
@@ -1,5 +1,4 @@
 import logging
-import requests
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
@@ -11,6 +10,7 @@ class OpenHab:
     # Fetches Consumption and Generation details from OpenHab
 
     apiKey = None
+    cache = None
     cacheTime = 10  # in seconds
     config = None
     configConfig = None
@@ -29,6 +29,8 @@ class OpenHab:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -49,6 +51,11 @@ class OpenHab:
             self.master.releaseModule("lib.TWCManager.EMS", "OpenHab")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("OpenHab EMS Module Disabled. Skipping getConsumption")
@@ -88,15 +95,15 @@ class OpenHab:
 
         try:
             logger.debug("Fetching OpenHab EMS item value " + str(item))
-            httpResponse = requests.get(url, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            httpResponse = self.requests.get(url, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4, "Error connecting to OpenHab to fetch item values"
             )
             logger.debug(str(e))
             self.fetchFailed = True
             return False
-        except requests.exceptions.ReadTimeout as e:
+        except self.requests.exceptions.ReadTimeout as e:
             logger.log(
                 logging.INFO4, "Read Timeout occurred fetching OpenHab item value"
             )
@@ -122,45 +129,40 @@ class OpenHab:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
-
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from OpenHab item.
-
-            if self.consumptionItem:
-                apivalue = self.getAPIValue(self.consumptionItem)
-                if self.fetchFailed is not True:
-                    logger.debug("OpenHab getConsumption returns " + str(apivalue))
-                    self.consumedW = apivalue
-                else:
-                    logger.debug(
-                        "OpenHab getConsumption fetch failed, using cached values"
-                    )
-            else:
-                logger.debug("OpenHab Consumption Entity Not Supplied. Not Querying")
-
-            if self.generationItem:
-                apivalue = self.getAPIValue(self.generationItem)
-                if self.fetchFailed is not True:
-                    logger.debug("OpenHab getGeneration returns " + str(apivalue))
-                    self.generatedW = apivalue
-                else:
-                    logger.debug(
-                        "OpenHab getGeneration fetch failed, using cached values"
-                    )
+    def fetch(self):
+        # Fetch values from OpenHab item. Returns False on failure.
+        if self.consumptionItem:
+            apivalue = self.getAPIValue(self.consumptionItem)
+            if self.fetchFailed is not True:
+                logger.debug("OpenHab getConsumption returns " + str(apivalue))
+                self.consumedW = apivalue
             else:
-                logger.debug("OpenHab Generation Entity Not Supplied. Not Querying")
+                logger.debug("OpenHab getConsumption fetch failed, using cached values")
+        else:
+            logger.debug("OpenHab Consumption Entity Not Supplied. Not Querying")
 
-            # Update last fetch time
+        if self.generationItem:
+            apivalue = self.getAPIValue(self.generationItem)
             if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
-
-            return True
+                logger.debug("OpenHab getGeneration returns " + str(apivalue))
+                self.generatedW = apivalue
+            else:
+                logger.debug("OpenHab getGeneration fetch failed, using cached values")
         else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+            logger.debug("OpenHab Generation Entity Not Supplied. Not Querying")
+
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
+
+        return self.fetchFailed is not True
+
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
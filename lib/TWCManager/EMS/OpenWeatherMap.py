@@ -1,6 +1,5 @@
 # OpenWeatherMap,py module for TWCManager by GMerg
 import logging
-import requests
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
@@ -8,6 +7,7 @@ logger = LoggerFactory.get_logger("OpenWthr", "EMS")
 
 
 class OpenWeatherMap:
+    cache = None
     cacheTime = 60
     config = None
     configConfig = None
@@ -27,6 +27,8 @@ class OpenWeatherMap:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -50,6 +52,11 @@ class OpenWeatherMap:
             self.master.releaseModule("lib.TWCManager.EMS", "OpenWeatherMap")
             return None
 
+        # The forecast is fetched in the background, before it expires
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         # since this is not knowing our consumption!
         return 0
@@ -85,8 +92,8 @@ class OpenWeatherMap:
         self.fetchFailed = False
 
         try:
-            r = requests.get(url, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            r = self.requests.get(url, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4,
                 "Error connecting to OpenWeatherMap to fetch sensor value",
@@ -97,7 +104,7 @@ class OpenWeatherMap:
 
         try:
             r.raise_for_status()
-        except requests.exceptions.HTTPError as e:
+        except self.requests.exceptions.HTTPError as e:
             logger.log(
                 logging.INFO4,
                 "HTTP status "
@@ -123,17 +130,22 @@ class OpenWeatherMap:
 
         return bestjson
 
+    def fetch(self):
+        # Fetch the forecast from OpenWeatherMap. Returns False on failure.
+        tmp = self.getOpenWeatherMapData()
+        if not tmp or self.fetchFailed:
+            return False
+
+        # Update last fetch time
+        self.LastJson = tmp
+        self.lastFetch = int(time.time())
+        return True
+
     def update(self):
         month = int(time.strftime("%m"))
         dt = int(time.time())
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from OpenWeatherMap inverter.
-            tmp = self.getOpenWeatherMapData()
-            if tmp:
-                self.LastJson = tmp
-                # Update last fetch time
-                if self.fetchFailed is not True:
-                    self.lastFetch = int(time.time())
+        # Fetch the forecast if the cache has expired
+        self.cache.update()
 
         if self.LastJson:
             try:
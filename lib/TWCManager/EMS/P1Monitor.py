@@ -25,6 +25,8 @@ class P1Monitor:
     timeout = 10
 
     def __init__(self, master):
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.p1monData = {}
         self.configP1Mon = master.config.get("sources", {}).get("P1Monitor", {})
         self.serverIP = self.configP1Mon.get("serverIP", None)
@@ -11,6 +11,7 @@ class SmartMe:
 
     import requests
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -22,13 +23,14 @@ class SmartMe:
     master = None
     password = None
     serialNumber = None
-    session = None
     status = False
     timeout = 2
     username = None
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         self.configConfig = master.config.get("config", {})
         self.configSmartMe = master.config.get("sources", {}).get("SmartMe", {})
@@ -44,6 +46,11 @@ class SmartMe:
             self.master.releaseModule("lib.TWCManager.EMS", self.__class__.__name__)
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("EMS Module Disabled. Skipping getConsumption")
@@ -80,9 +87,12 @@ class SmartMe:
 
         try:
             logger.debug("Fetching SmartMe EMS sensor values")
-            self.session = self.requests.Session()
-            self.session.auth = (self.username, self.password)
-            httpResponse = self.session.get(url, headers=headers, timeout=self.timeout)
+            httpResponse = self.requests.get(
+                url,
+                auth=(self.username, self.password),
+                headers=headers,
+                timeout=self.timeout,
+            )
         except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4, "Error connecting to SmartMe to fetching sensor values"
@@ -120,22 +130,22 @@ class SmartMe:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
+    def fetch(self):
+        # Fetch values from SmartMe. Returns False on failure.
+        self.getGenerationValues()
 
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from SmartMe.
-            self.getGenerationValues()
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        return self.fetchFailed is not True
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -1,5 +1,4 @@
 import logging
-import requests
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
@@ -10,6 +9,7 @@ class SmartPi:
     # SmartPi EMS Module
     # Fetches Consumption and Generation details from SmartPi API
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -27,6 +27,8 @@ class SmartPi:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         self.configConfig = master.config.get("config", {})
         self.configSmartPi = master.config.get("sources", {}).get("SmartPi", {})
@@ -40,6 +42,11 @@ class SmartPi:
             self.master.releaseModule("lib.TWCManager.EMS", self.__class__.__name__)
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("EMS Module Disabled. Skipping getConsumption")
@@ -76,15 +83,15 @@ class SmartPi:
 
         try:
             logger.debug("Fetching SmartPi EMS sensor values")
-            httpResponse = requests.get(url, headers=headers, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            httpResponse = self.requests.get(url, headers=headers, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4, "Error connecting to SmartPi to fetch sensor values"
             )
             logger.debug(str(e))
             self.fetchFailed = True
             return False
-        except requests.exceptions.ReadTimeout as e:
+        except self.requests.exceptions.ReadTimeout as e:
             logger.log(
                 logging.INFO4, "Read Timeout occurred fetching SmartPi sensor values"
             )
@@ -135,22 +142,22 @@ class SmartPi:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
+    def fetch(self):
+        # Fetch values from SmartPi. Returns False on failure.
+        self.getGenerationValues()
 
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from SmartPi.
-            self.getGenerationValues()
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        return self.fetchFailed is not True
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
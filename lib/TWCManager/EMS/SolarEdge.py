@@ -11,6 +11,7 @@ class SolarEdge:
     import requests
 
     apiKey = None
+    cache = None
     # cacheTime is a bit higher than local EMS modules
     # because we're polling an external API, and the API has a limit of 300 requests per day
     cacheTime = 90
@@ -40,6 +41,8 @@ class SolarEdge:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -93,6 +96,11 @@ class SolarEdge:
             self.useModbusTCP = True
             self.cacheTime = 10
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("SolarEdge EMS Module Disabled. Skipping getConsumption")
@@ -356,25 +364,24 @@ class SolarEdge:
         self.fetchFailed = False
         inverter.disconnect()
 
-    def update(self):
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from Portal.
+    def fetch(self):
+        # Fetch values from Portal. Returns False on failure.
+        if self.useModbusTCP:
+            self.updateModbusTCP()
+        else:
+            self.updateCloudAPI()
 
-            if self.useModbusTCP:
-                self.updateModbusTCP()
-            else:
-                self.updateCloudAPI()
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
+        else:
+            if self.debugMode:
+                with open(self.debugFile, "a+") as file:
+                    file.write("fetchFailed is True\n")
+                file.close()
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
-            else:
-                if self.debugMode:
-                    with open(self.debugFile, "a+") as file:
-                        file.write("fetchFailed is True\n")
-                    file.close()
+        return self.fetchFailed is not True
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
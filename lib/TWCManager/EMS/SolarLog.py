@@ -11,6 +11,7 @@ class SolarLog:
 
     import requests
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -29,6 +30,8 @@ class SolarLog:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         self.configConfig = master.config.get("config", {})
         self.configSolarLog = master.config.get("sources", {}).get("SolarLog", {})
@@ -43,6 +46,11 @@ class SolarLog:
             self.master.releaseModule("lib.TWCManager.EMS", "SolarLog")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("SolarLog EMS Module Disabled. Skipping getConsumption")
@@ -185,25 +193,25 @@ class SolarLog:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
+    def fetch(self):
+        # Fetch values from SolarLog. Returns False on failure.
+        self.getConsumptionAndGenerationValues()
 
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from SolarLog.
-            self.getConsumptionAndGenerationValues()
+        if self.fetchFailed is not True:
+            self.getInverterValues()
 
-            if self.fetchFailed is not True:
-                self.getInverterValues()
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        return self.fetchFailed is not True
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
@@ -1,7 +1,6 @@
 # The Energy Detective (TED)
 import logging
 import re
-import requests
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
@@ -13,6 +12,7 @@ class TED:
     # Energy Detective (TED). It's a piece of hardware available
     # at http://www.theenergydetective.com
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -32,6 +32,8 @@ class TED:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = self.config["config"]
@@ -50,6 +52,11 @@ class TED:
             self.master.releaseModule("lib.TWCManager.EMS", "TED")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("TED EMS Module Disabled. Skipping getConsumption")
@@ -77,8 +84,8 @@ class TED:
         self.fetchFailed = False
 
         try:
-            r = requests.get(url, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            r = self.requests.get(url, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(logging.INFO4, "Error connecting to TED to fetch solar data")
             logger.debug(str(e))
             self.fetchFailed = True
@@ -87,29 +94,28 @@ class TED:
         r.raise_for_status()
         return r
 
-    def update(self):
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from HomeAssistant sensor.
+    def fetch(self):
+        # Fetch values from TED. Returns False on failure.
+        url = "http://" + self.serverIP + ":" + self.serverPort
+        url = url + "/history/export.csv?T=1&D=0&M=1&C=1"
 
-            url = "http://" + self.serverIP + ":" + self.serverPort
-            url = url + "/history/export.csv?T=1&D=0&M=1&C=1"
+        value = self.getTEDValue(url)
+        m = None
+        if value:
+            m = re.search(b"^Solar,[^,]+,-?([^, ]+),", value, re.MULTILINE)
+        else:
+            logger.log(logging.INFO5, "Failed to find value in response from TED")
+            self.fetchFailed = True
 
-            value = self.getTEDValue(url)
-            m = None
-            if value:
-                m = re.search(b"^Solar,[^,]+,-?([^, ]+),", value, re.MULTILINE)
-            else:
-                logger.log(logging.INFO5, "Failed to find value in response from TED")
-                self.fetchFailed = True
+        if m:
+            self.generatedW = int(float(m.group(1)) * 1000)
 
-            if m:
-                self.generatedW = int(float(m.group(1)) * 1000)
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        return self.fetchFailed is not True
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
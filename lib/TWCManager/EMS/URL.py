@@ -1,5 +1,4 @@
 import logging
-import requests
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
@@ -11,6 +10,7 @@ class URL:
     # Fetches Consumption and Generation details from URL
 
     apiKey = None
+    cache = None
     cacheTime = 10  # in seconds
     config = None
     configConfig = None
@@ -28,6 +28,8 @@ class URL:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
@@ -47,6 +49,11 @@ class URL:
             self.master.releaseModule("lib.TWCManager.EMS", "URL")
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("URL EMS Module Disabled. Skipping getConsumption")
@@ -78,13 +85,13 @@ class URL:
 
         try:
             logger.debug("Fetching URL EMS item value " + str(item))
-            httpResponse = requests.get(url, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            httpResponse = self.requests.get(url, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(logging.INFO4, "Error connecting to URL to fetch item values")
             logger.debug(str(e))
             self.fetchFailed = True
             return False
-        except requests.exceptions.ReadTimeout as e:
+        except self.requests.exceptions.ReadTimeout as e:
             logger.log(logging.INFO4, "Read Timeout occurred fetching URL item value")
             logger.debug(str(e))
             self.fetchFailed = True
@@ -108,41 +115,40 @@ class URL:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
-
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from URL item.
-
-            if self.consumptionItem:
-                apivalue = self.getAPIValue(self.consumptionItem)
-                if self.fetchFailed is not True:
-                    logger.debug("URL getConsumption returns " + str(apivalue))
-                    self.consumedW = apivalue
-                else:
-                    logger.debug("URL getConsumption fetch failed, using cached values")
-            else:
-                logger.debug("URL Consumption Entity Not Supplied. Not Querying")
-
-            if self.generationItem:
-                apivalue = self.getAPIValue(self.generationItem)
-                if self.fetchFailed is not True:
-                    logger.debug("URL getGeneration returns " + str(apivalue))
-                    self.generatedW = apivalue
-                else:
-                    logger.debug("URL getGeneration fetch failed, using cached values")
+    def fetch(self):
+        # Fetch values from URL item. Returns False on failure.
+        if self.consumptionItem:
+            apivalue = self.getAPIValue(self.consumptionItem)
+            if self.fetchFailed is not True:
+                logger.debug("URL getConsumption returns " + str(apivalue))
+                self.consumedW = apivalue
             else:
-                logger.debug("URL Generation Entity Not Supplied. Not Querying")
+                logger.debug("URL getConsumption fetch failed, using cached values")
+        else:
+            logger.debug("URL Consumption Entity Not Supplied. Not Querying")
 
-            # Update last fetch time
+        if self.generationItem:
+            apivalue = self.getAPIValue(self.generationItem)
             if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
-
-            return True
+                logger.debug("URL getGeneration returns " + str(apivalue))
+                self.generatedW = apivalue
+            else:
+                logger.debug("URL getGeneration fetch failed, using cached values")
         else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+            logger.debug("URL Generation Entity Not Supplied. Not Querying")
+
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
+
+        return self.fetchFailed is not True
+
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
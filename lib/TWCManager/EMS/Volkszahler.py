@@ -1,5 +1,4 @@
 import logging
-import requests
 import time
 import re
 from TWCManager.Logging.LoggerFactory import LoggerFactory
@@ -11,6 +10,7 @@ class Volkszahler:
     # Volkszahler EMS Module
     # Fetches Consumption and Generation details from Volkszahler API
 
+    cache = None
     cacheTime = 10
     config = None
     configConfig = None
@@ -29,6 +29,8 @@ class Volkszahler:
 
     def __init__(self, master):
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         self.configConfig = master.config.get("config", {})
         self.configVolkszahler = master.config.get("sources", {}).get("Volkszahler", {})
@@ -43,6 +45,11 @@ class Volkszahler:
             self.master.releaseModule("lib.TWCManager.EMS", self.__class__.__name__)
             return None
 
+        # Values are fetched in the background, before they expire
+        self.cache = master.readingCache.register(
+            self.__class__.__name__, self.fetch, self.cacheTime
+        )
+
     def getConsumption(self):
         if not self.status:
             logger.debug("EMS Module Disabled. Skipping getConsumption")
@@ -89,15 +96,15 @@ class Volkszahler:
 
         try:
             logger.debug("Fetching Volkszahler EMS sensor values")
-            httpResponse = requests.get(url, headers=headers, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            httpResponse = self.requests.get(url, headers=headers, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4, "Error connecting to Volkszahler to getPhotovoltaikW"
             )
             logger.debug(str(e))
             self.fetchFailed = True
             return False
-        except requests.exceptions.ReadTimeout as e:
+        except self.requests.exceptions.ReadTimeout as e:
             logger.log(logging.INFO4, "Read Timeout occurred at getPhotovoltaikW")
             logger.debug(str(e))
             self.fetchFailed = True
@@ -144,15 +151,15 @@ class Volkszahler:
 
         try:
             logger.debug("Fetching Volkszahler EMS sensor values")
-            httpResponse = requests.get(url, headers=headers, timeout=self.timeout)
-        except requests.exceptions.ConnectionError as e:
+            httpResponse = self.requests.get(url, headers=headers, timeout=self.timeout)
+        except self.requests.exceptions.ConnectionError as e:
             logger.log(
                 logging.INFO4, "Error connecting to Volkszahler to getTotalGridW"
             )
             logger.debug(str(e))
             self.fetchFailed = True
             return False
-        except requests.exceptions.ReadTimeout as e:
+        except self.requests.exceptions.ReadTimeout as e:
             logger.log(logging.INFO4, "Read Timeout occurred getTotalGridW")
             logger.debug(str(e))
             self.fetchFailed = True
@@ -184,22 +191,23 @@ class Volkszahler:
 
     def setCacheTime(self, cacheTime):
         self.cacheTime = cacheTime
+        if self.cache:
+            self.cache.cacheTime = cacheTime
 
     def setTimeout(self, timeout):
         self.timeout = timeout
 
-    def update(self):
-        # Update function - determine if an update is required
+    def fetch(self):
+        # Fetch values from Volkszahler. Returns False on failure.
+        self.getPhotovoltaikW()
+        self.getTotalGridW()
 
-        if (int(time.time()) - self.lastFetch) > self.cacheTime:
-            # Cache has expired. Fetch values from Volkszahler.
-            self.getPhotovoltaikW()
-            self.getTotalGridW()
-            # Update last fetch time
-            if self.fetchFailed is not True:
-                self.lastFetch = int(time.time())
+        # Update last fetch time
+        if self.fetchFailed is not True:
+            self.lastFetch = int(time.time())
 
-            return True
-        else:
-            # Cache time has not elapsed since last fetch, serve from cache.
-            return False
+        return self.fetchFailed is not True
+
+    def update(self):
+        # Fetch values if the cache has expired
+        return self.cache.update()
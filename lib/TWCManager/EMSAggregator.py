@@ -0,0 +1,172 @@
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.TaskStats import RollingHistogram
+
+logger = LoggerFactory.get_logger("EMS", "Master")
+
+
+class EMSAggregator:
+    # Fetches consumption and generation from every EMS module at once, so
+    # that one slow or unreachable device doesn't hold up the others.
+    #
+    # Each module's values are fetched in a thread of its own, and poll()
+    # waits for them until the cycle's deadline. A module that hasn't
+    # answered by then, or that failed, keeps its last good values, along
+    # with their age, until they are maxAge seconds old. Its fetch carries
+    # on in the background, and its values are used by the next cycle once
+    # it has finished. A module never has more than one fetch running.
+    #
+    # Threads are started for each fetch, rather than kept in a
+    # ThreadPoolExecutor, as its workers are waited for when Python exits,
+    # and a fetch that hangs would stop TWCManager from exiting.
+
+    def __init__(self, deadline=5, maxAge=300):
+        self.condition = threading.Condition()
+        self.cycles = RollingHistogram()
+        self.deadline = deadline
+        self.maxAge = maxAge
+        self.sources = {}
+
+    def fetch(self, name, source, ref):
+        # Run in a thread of its own for each fetch
+        started = time.monotonic()
+        try:
+            values = (
+                ref.getConsumption(),
+                (
+                    ref.getConsumptionAmps()
+                    if hasattr(ref, "getConsumptionAmps")
+                    else None
+                ),
+                ref.getGeneration(),
+            )
+            error = None
+        except Exception as e:
+            values = None
+            error = "%s: %s" % (type(e).__name__, str(e))
+            logger.warning("Unable to fetch values from EMS module %s: %s", name, error)
+
+        finished = time.monotonic()
+        with self.condition:
+            source["running"] = False
+            source["latency"].add(finished - started, finished)
+            source["lastLatency"] = finished - started
+            if values is None:
+                source["failures"] += 1
+                source["error"] = error
+            else:
+                source["values"] = values
+                source["updated"] = finished
+                source["error"] = None
+            self.condition.notify_all()
+
+    def getSource(self, name):
+        # Called with the lock held
+        if name not in self.sources:
+            self.sources[name] = {
+                "running": False,
+                "values": None,
+                "updated": None,
+                "polls": 0,
+                "failures": 0,
+                "late": 0,
+                "lastLatency": None,
+                "latency": RollingHistogram(),
+                "error": None,
+            }
+        return self.sources[name]
+
+    def getStats(self):
+        # Returns, for each module, how long its fetches took, how many were
+        # late or failed, and how old its values are. Latencies are in
+        # seconds, as rolling histograms like those of getTaskStats.
+        now = time.monotonic()
+        with self.condition:
+            sources = {}
+            for name, source in self.sources.items():
+                age = now - source["updated"] if source["updated"] else None
+                sources[name] = {
+                    "running": source["running"],
+                    "age": age,
+                    "expired": age is None or age > self.maxAge,
+                    "polls": source["polls"],
+                    "late": source["late"],
+                    "failures": source["failures"],
+                    "error": source["error"],
+                    "lastLatency": source["lastLatency"],
+                    "latency": source["latency"].getStats(now),
+                }
+            return {
+                "deadline": self.deadline,
+                "maxAge": self.maxAge,
+                "bounds": list(RollingHistogram.bounds),
+                "cycle": self.cycles.getStats(now),
+                "sources": sources,
+            }
+
+    def poll(self, modules):
+        # Fetches values from each of the modules given, as returned by
+        # master.getModulesByType("EMS"). Returns a dict of each module's
+        # consumption, consumptionAmps (None if the module doesn't report
+        # it), generation, and the age of those values in seconds. A module
+        # with no values, or none newer than maxAge, reports 0 with an age
+        # of None.
+        started = time.monotonic()
+        with self.condition:
+            for module in modules:
+                source = self.getSource(module["name"])
+                source["polls"] += 1
+                if not source["running"]:
+                    source["running"] = True
+                    threading.Thread(
+                        target=self.fetch,
+                        args=(module["name"], source, module["ref"]),
+                        name="ems-" + module["name"],
+                        daemon=True,
+                    ).start()
+
+            self.condition.wait_for(
+                lambda: not any(
+                    self.sources[module["name"]]["running"] for module in modules
+                ),
+                timeout=self.deadline,
+            )
+
+            now = time.monotonic()
+            readings = {}
+            for module in modules:
+                name = module["name"]
+                source = self.sources[name]
+                if source["running"]:
+                    source["late"] += 1
+                age = now - source["updated"] if source["updated"] else None
+                if age is None or age > self.maxAge:
+                    amps = 0 if hasattr(module["ref"], "getConsumptionAmps") else None
+                    values, age = (0, amps, 0), None
+                else:
+                    values = source["values"]
+                if source["running"] or source["error"]:
+                    logger.info(
+                        "EMS module %s %s, using %s",
+                        name,
+                        (
+                            "didn't respond within %ss" % (self.deadline)
+                            if source["running"]
+                            else "failed"
+                        ),
+                        (
+                            "values from %ds ago" % (age)
+                            if age is not None
+                            else "no values"
+                        ),
+                    )
+                readings[name] = {
+                    "consumption": values[0],
+                    "consumptionAmps": values[1],
+                    "generation": values[2],
+                    "age": age,
+                }
+
+        self.cycles.add(time.monotonic() - started, time.monotonic())
+        return readings
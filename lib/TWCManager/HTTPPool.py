@@ -0,0 +1,107 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HTTPPool:
+    # Shared HTTP connections for the modules that poll a device or service
+    # over HTTP, so that each poll reuses an open connection rather than
+    # making a new TCP connection, and TLS handshake, every time.
+    #
+    # Each host has a requests Session of its own, whose connections are
+    # kept alive between requests. Modules use the pool as they would the
+    # requests module: get(), post() and request() take the same arguments,
+    # and requests' exceptions are available as exceptions.
+    #
+    # Requests have a default timeout, and a connect timeout of at most
+    # connectTimeout, as a device on the LAN that hasn't accepted a
+    # connection by then isn't going to. Requests that can safely be sent
+    # again are retried after a connection error or a 502, 503 or 504
+    # response, with a backoff between attempts.
+
+    exceptions = requests.exceptions
+
+    def __init__(self, timeout=10, connectTimeout=5, retries=2, backoff=0.5):
+        self.connectTimeout = connectTimeout
+        self.lock = threading.Lock()
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = {}
+        self.sessions = {}
+        self.timeout = timeout
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def getSession(self, url):
+        # Returns the session for the host url is on, creating it if this
+        # is the first request to that host
+        parts = urlsplit(url)
+        host = "%s://%s" % (parts.scheme, parts.netloc)
+        with self.lock:
+            if host not in self.sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=4,
+                    max_retries=Retry(
+                        total=self.retries,
+                        connect=self.retries,
+                        read=1,
+                        status=self.retries,
+                        backoff_factor=self.backoff,
+                        status_forcelist=(502, 503, 504),
+                        raise_on_status=False,
+                    ),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[host] = session
+                self.requests[host] = 0
+            self.requests[host] += 1
+            return self.sessions[host]
+
+    def getStats(self):
+        # Returns, for each host, how many requests were made and how many
+        # new connections were opened for them. Every request beyond the
+        # first on a connection is one whose handshake was saved.
+        hosts = {}
+        with self.lock:
+            for host, session in self.sessions.items():
+                connections = 0
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        pool = pools.get(key)
+                        if pool is not None:
+                            connections += pool.num_connections
+                hosts[host] = {
+                    "requests": self.requests[host],
+                    "connections": connections,
+                    "reused": max(0, self.requests[host] - connections),
+                }
+        return {
+            "requests": sum(host["requests"] for host in hosts.values()),
+            "connections": sum(host["connections"] for host in hosts.values()),
+            "reused": sum(host["reused"] for host in hosts.values()),
+            "hosts": hosts,
+        }
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        timeout = kwargs.get("timeout", None) or self.timeout
+        if isinstance(timeout, (int, float)):
+            timeout = (min(self.connectTimeout, timeout), timeout)
+        kwargs["timeout"] = timeout
+        return self.getSession(url).request(method, url, **kwargs)
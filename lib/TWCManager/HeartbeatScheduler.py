@@ -0,0 +1,189 @@
+import logging
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Heartbeat", "Master")
+
+
+class HeartbeatScheduler:
+    # Decides when our fake master sends its next heartbeat, and to which
+    # slave TWC.
+    #
+    # We send one heartbeat every interval seconds, taking turns between
+    # slaves, and each slave replies with its own heartbeat straight away. We
+    # keep a due time for each slave, and send to whichever slave is most
+    # overdue. After sending, we leave the bus quiet for up to responseWindow
+    # seconds so the slave can reply, but we move on as soon as the reply has
+    # arrived. The main loop asks us what to do on every pass, so heartbeats
+    # are interleaved with processing of received messages rather than being
+    # separated by sleeps.
+    #
+    # We also record how far from its due time each heartbeat was actually
+    # sent (jitter), and how long each slave took to respond, so that it's
+    # possible to see how much headroom there is before slaveTimeout.
+
+    interval = 1.0
+    master = None
+    responseWindow = 0.1
+
+    def __init__(self, master):
+        self.master = master
+        self.slaves = {}
+        self.nextCycle = 0
+        self.nextSend = 0
+        self.timeLastSent = 0
+        self.waitingFor = None
+        self.windowEnd = 0
+
+    def _getState(self, twcid, now):
+        state = self.slaves.get(twcid, None)
+        if state is None:
+            # A slave we haven't sent to yet is due straight away
+            state = {
+                "due": now,
+                "lastSent": 0,
+                "sent": 0,
+                "responses": 0,
+                "missed": 0,
+                "jitterLast": 0,
+                "jitterMax": 0,
+                "jitterAvg": 0,
+                "responseTime": 0,
+            }
+            self.slaves[twcid] = state
+        return state
+
+    def busUntil(self):
+        # Returns the time until which we should not transmit, because we
+        # are waiting for a reply to our last heartbeat or something else
+        # (such as a background task) has just sent a message.
+        until = max(self.nextSend, self.windowEnd)
+        timeLastTx = self.master.getTimeLastTx()
+        if timeLastTx > self.timeLastSent:
+            until = max(until, timeLastTx + self.responseWindow)
+        return until
+
+    def cycleDue(self, now=None):
+        # Returns True once per full cycle of heartbeats to every slave. The
+        # main loop uses this to redistribute power among slaves at the same
+        # rate as each slave hears from us.
+        if now is None:
+            now = time.time()
+        if now < self.nextCycle:
+            return False
+        self.nextCycle = now + self.period()
+        return True
+
+    def period(self):
+        # Each slave is sent a heartbeat every period seconds
+        return self.interval * max(1, len(self.master.getSlaveTWCs()))
+
+    def nextDue(self, now=None):
+        # Returns the slave TWC that should be sent a heartbeat now, or None
+        # if no heartbeat should be sent yet.
+        if now is None:
+            now = time.time()
+        if now < self.busUntil():
+            return None
+
+        if self.waitingFor is not None:
+            # The response window has passed without a reply
+            state = self.slaves.get(self.waitingFor, None)
+            if state:
+                state["missed"] += 1
+                logger.log(
+                    logging.INFO9,
+                    "No heartbeat reply from slave %02X%02X within %dms"
+                    % (
+                        self.waitingFor[0],
+                        self.waitingFor[1],
+                        self.responseWindow * 1000,
+                    ),
+                )
+            self.waitingFor = None
+
+        nextSlave = None
+        nextDue = now
+        for slaveTWC in self.master.getSlaveTWCs():
+            due = self._getState(bytes(slaveTWC.TWCID), now)["due"]
+            if due < nextDue or (nextSlave is None and due == nextDue):
+                nextSlave = slaveTWC
+                nextDue = due
+        return nextSlave
+
+    def timeToNext(self, now=None):
+        # Returns the number of seconds until a heartbeat will next be due,
+        # or None if there are no slaves to send to.
+        if now is None:
+            now = time.time()
+        slaves = self.master.getSlaveTWCs()
+        if not slaves:
+            return None
+        due = min(
+            self.slaves[bytes(s.TWCID)]["due"] if bytes(s.TWCID) in self.slaves else now
+            for s in slaves
+        )
+        return max(0, max(due, self.busUntil()) - now)
+
+    def sendHeartbeat(self, slaveTWC, now=None):
+        # Send a heartbeat to slaveTWC now and schedule the next one.
+        if now is None:
+            now = time.time()
+        twcid = bytes(slaveTWC.TWCID)
+        state = self._getState(twcid, now)
+
+        # Jitter is how late this heartbeat is compared to when it was due.
+        # New slaves are sent a heartbeat as soon as they link, so we don't
+        # count the first one.
+        if state["sent"]:
+            jitter = now - state["due"]
+            state["jitterLast"] = jitter
+            state["jitterMax"] = max(state["jitterMax"], jitter)
+            state["jitterAvg"] = state["jitterAvg"] * 0.9 + jitter * 0.1
+
+        slaveTWC.send_master_heartbeat()
+
+        state["sent"] += 1
+        state["lastSent"] = now
+        state["due"] = now + self.period()
+        self.nextSend = now + self.interval
+        self.waitingFor = twcid
+        self.windowEnd = now + self.responseWindow
+        self.timeLastSent = self.master.getTimeLastTx()
+
+    def responseReceived(self, twcid, now=None):
+        # Called when a slave sends us its heartbeat. If it's the reply we
+        # were waiting for, the bus is free for the next heartbeat.
+        if now is None:
+            now = time.time()
+        twcid = bytes(twcid)
+        state = self.slaves.get(twcid, None)
+        if state is None:
+            return
+        state["responses"] += 1
+        if self.waitingFor == twcid:
+            state["responseTime"] = now - state["lastSent"]
+            self.waitingFor = None
+            self.windowEnd = 0
+
+    def removeSlave(self, twcid):
+        twcid = bytes(twcid)
+        self.slaves.pop(twcid, None)
+        if self.waitingFor == twcid:
+            self.waitingFor = None
+            self.windowEnd = 0
+
+    def getStats(self):
+        # Returns heartbeat timing for each slave, keyed by TWCID in hex
+        stats = {}
+        for twcid, state in self.slaves.items():
+            stats["%02X%02X" % (twcid[0], twcid[1])] = {
+                "sent": state["sent"],
+                "responses": state["responses"],
+                "missed": state["missed"],
+                "jitterLast": round(state["jitterLast"], 4),
+                "jitterMax": round(state["jitterMax"], 4),
+                "jitterAvg": round(state["jitterAvg"], 4),
+                "responseTime": round(state["responseTime"], 4),
+            }
+        return stats
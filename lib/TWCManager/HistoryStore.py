@@ -0,0 +1,129 @@
+import mmap
+import os
+import struct
+import threading
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("History", "Master")
+
+
+class HistoryStore:
+    # Charger power history, kept in a ring of fixed-interval slots.
+    #
+    # History used to be a list of (ISO timestamp, watts) in the settings,
+    # which snapHistoryData rebuilt every 5 minutes, parsing every timestamp
+    # to drop those more than two days old, before writing all the settings
+    # out again. /api/getHistory parsed every timestamp again.
+    #
+    # Each interval since the epoch now has a number, and is stored in the
+    # slot that number falls in modulo the number of slots, so writing an
+    # interval is O(1) and reading k intervals is O(k), and the oldest
+    # interval is overwritten once the ring has gone all the way round.
+    # Each slot holds its interval's number alongside its value, so slots
+    # that haven't been written since their interval are recognised and
+    # skipped.
+    #
+    # The slots are kept in a small binary file, mapped into memory, so
+    # that each write changes 16 bytes of it. Without a file, they're kept
+    # in memory only.
+
+    magic = b"TWCH"
+    version = 1
+    header = struct.Struct("<4sHHII")
+    record = struct.Struct("<qd")
+
+    def __init__(self, fileName=None, interval=300, slots=576):
+        self.fileName = fileName
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.slots = slots
+        self.size = self.header.size + self.record.size * slots
+
+        self.map = None
+        if fileName:
+            try:
+                self.map = self.openFile(fileName)
+            except (OSError, ValueError) as e:
+                logger.info("Unable to open history file %s: %s" % (fileName, e))
+        if self.map is None:
+            self.map = mmap.mmap(-1, self.size)
+            self.clear()
+
+    def append(self, timestamp, value):
+        # Store value for the interval starting at timestamp, in seconds
+        # since the epoch. A slot that already holds a later interval is
+        # left alone.
+        number = int(timestamp // self.interval)
+        offset = self.getOffset(number)
+        with self.lock:
+            stored = self.record.unpack_from(self.map, offset)[0]
+            if stored > number:
+                return False
+            self.record.pack_into(self.map, offset, number, value)
+        return True
+
+    def clear(self):
+        self.header.pack_into(
+            self.map, 0, self.magic, self.version, 0, self.interval, self.slots
+        )
+        for slot in range(self.slots):
+            self.record.pack_into(
+                self.map, self.header.size + slot * self.record.size, -1, 0.0
+            )
+
+    def close(self):
+        with self.lock:
+            self.map.flush()
+            self.map.close()
+
+    def get(self, start, end):
+        # Returns (timestamp, value) for each stored interval starting from
+        # start up to (but not including) end, in seconds since the epoch
+        first = int(-(-start // self.interval))
+        last = int(-(-end // self.interval))
+        first = max(first, last - self.slots)
+        values = []
+        with self.lock:
+            # Read the slots in at most two runs, either side of where the
+            # ring wraps round
+            number = first
+            while number < last:
+                count = min(last - number, self.slots - number % self.slots)
+                offset = self.getOffset(number)
+                records = self.map[offset : offset + count * self.record.size]
+                for stored, value in self.record.iter_unpack(records):
+                    if stored == number:
+                        values.append((number * self.interval, value))
+                    number += 1
+        return values
+
+    def getOffset(self, number):
+        return self.header.size + (number % self.slots) * self.record.size
+
+    def openFile(self, fileName):
+        # Map the history file, creating it if it doesn't exist or was
+        # written with a different interval or number of slots
+        fd = os.open(fileName, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fresh = False
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+                fresh = True
+            historyMap = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+        magic, version, reserved, interval, slots = self.header.unpack_from(
+            historyMap, 0
+        )
+        if (magic, version, interval, slots) != (
+            self.magic,
+            self.version,
+            self.interval,
+            self.slots,
+        ):
+            if not fresh:
+                logger.info("Starting a new history file %s" % (fileName))
+            self.map = historyMap
+            self.clear()
+        return historyMap
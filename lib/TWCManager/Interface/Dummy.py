@@ -4,11 +4,14 @@ import random
 import time
 from pathlib import Path
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCCodec import get_encoder, hex_str
+from TWCManager.Protocol.TWCJournal import JOURNAL_TX
 
 logger = LoggerFactory.get_logger("Dummy", "Interface")
 
 
 class Dummy:
+    configDummy = None
     enabled = False
     master = None
     msgBuffer = bytes()
@@ -30,25 +33,29 @@ class Dummy:
     BEHAVIOR_INTERMITTENT = "intermittent"
     BEHAVIOR_SLOW = "slow"
 
-    def __init__(self, master):
+    def __init__(self, master, config=None):
         self.master = master
         self.slaves = {}
         self.scenario_start_time = time.time()
         classname = self.__class__.__name__
 
+        if config is not None:
+            # We're simulating an additional bus, configured by an entry in
+            # interface.buses rather than by interface.Dummy
+            self.configDummy = config
+            self.enabled = True
+        elif "interface" in master.config and classname in master.config["interface"]:
+            self.configDummy = master.config["interface"][classname]
+            self.enabled = self.configDummy.get("enabled", True)
+
         # Unload if this module is disabled or misconfigured
-        if "interface" in master.config and classname in master.config["interface"]:
-            self.enabled = master.config["interface"][classname].get("enabled", True)
         if not self.enabled:
             self.master.releaseModule("lib.TWCManager.Interface", classname)
             return None
 
         # Configure the module
-        if "interface" in master.config:
-            if master.config["interface"][classname].get("twcID", False):
-                self.twcID = bytearray(
-                    str(master.config["interface"][classname].get("twcID")).encode()
-                )
+        if self.configDummy and self.configDummy.get("twcID", False):
+            self.twcID = bytearray(str(self.configDummy.get("twcID")).encode())
 
         # Instantiate protocol module for sending/recieving TWC protocol
         self.proto = self.master.getModuleByName("TWCProtocol")
@@ -84,11 +91,7 @@ class Dummy:
                 scenarios = json.load(f)
 
             # Get scenario name from config or use default
-            scenario_name = (
-                self.master.config.get("interface", {})
-                .get("Dummy", {})
-                .get("scenario", None)
-            )
+            scenario_name = (self.configDummy or {}).get("scenario", None)
 
             if scenario_name and scenario_name in scenarios.get("scenarios", {}):
                 self.scenario = scenarios["scenarios"][scenario_name]
@@ -169,26 +172,10 @@ class Dummy:
 
     def _send_internal(self, msg):
         """Send a message from the dummy slave to the master (scenario mode)."""
-        msg = bytearray(msg)
-        checksum = 0
-        for i in range(1, len(msg)):
-            checksum += msg[i]
-
-        msg.append(checksum & 0xFF)
-
-        # SLIP encoding: escape special characters
-        i = 0
-        while i < len(msg):
-            if msg[i] == 0xC0:
-                msg[i : i + 1] = b"\xdb\xdc"
-                i = i + 1
-            elif msg[i] == 0xDB:
-                msg[i : i + 1] = b"\xdb\xdd"
-                i = i + 1
-            i = i + 1
-
-        msg = bytearray(b"\xc0" + msg + b"\xc0\xfe")
-        logger.log(logging.INFO9, f"TxInt@: {self.master.hex_str(msg)}")
+        msg = bytearray(get_encoder().encode(msg))
+        msg.append(0xFE)
+        if logger.isEnabledFor(logging.INFO9):
+            logger.log(logging.INFO9, f"TxInt@: {hex_str(msg)}")
 
         self.msgBuffer = msg
 
@@ -211,6 +198,9 @@ class Dummy:
         # talking to a live TWC. The key here is that we treat it as our reciept interface and parse
         # the message as if we are a TWC
 
+        if self.master.journal:
+            self.master.journal.writeFrame(JOURNAL_TX, get_encoder().encode(msg))
+
         if self.use_scenarios:
             return self._send_scenario_mode(msg)
         else:
@@ -241,7 +231,8 @@ class Dummy:
                 )
             )
 
-        logger.log(logging.INFO9, "Tx@: " + self.master.hex_str(msg))
+        if logger.isEnabledFor(logging.INFO9):
+            logger.log(logging.INFO9, "Tx@: " + hex_str(msg))
         self.timeLastTx = time.time()
         return 0
 
@@ -265,7 +256,8 @@ class Dummy:
             elif command == "MasterHeartbeat" and receiver_id_str in self.slaves:
                 self._handle_heartbeat(packet, receiver_id_str)
 
-            logger.log(logging.INFO9, f"Tx@: {self.master.hex_str(msg)}")
+            if logger.isEnabledFor(logging.INFO9):
+                logger.log(logging.INFO9, f"Tx@: {hex_str(msg)}")
             self.timeLastTx = time.time()
 
         except Exception as e:
@@ -372,34 +364,9 @@ class Dummy:
         # updates the internal message buffer with the sent message and then
         # allows this to be polled & read by TWCManager on the next loop iteration
 
-        msg = bytearray(msg)
-        checksum = 0
-        for i in range(1, len(msg)):
-            checksum += msg[i]
-
-        msg.append(checksum & 0xFF)
-
-        # Escaping special chars:
-        # The protocol uses C0 to mark the start and end of the message.  If a C0
-        # must appear within the message, it is 'escaped' by replacing it with
-        # DB and DC bytes.
-        # A DB byte in the message is escaped by replacing it with DB DD.
-        #
-        # User FuzzyLogic found that this method of escaping and marking the start
-        # and end of messages is based on the SLIP protocol discussed here:
-        #   https://en.wikipedia.org/wiki/Serial_Line_Internet_Protocol
-
-        i = 0
-        while i < len(msg):
-            if msg[i] == 0xC0:
-                msg[i : i + 1] = b"\xdb\xdc"
-                i = i + 1
-            elif msg[i] == 0xDB:
-                msg[i : i + 1] = b"\xdb\xdd"
-                i = i + 1
-            i = i + 1
-
-        msg = bytearray(b"\xc0" + msg + b"\xc0\xfe")
-        logger.log(logging.INFO9, "TxInt@: " + self.master.hex_str(msg))
+        msg = bytearray(get_encoder().encode(msg))
+        msg.append(0xFE)
+        if logger.isEnabledFor(logging.INFO9):
+            logger.log(logging.INFO9, "TxInt@: " + hex_str(msg))
 
         self.msgBuffer = msg
@@ -1,6 +1,8 @@
 import logging
 import time
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCCodec import get_encoder, hex_str
+from TWCManager.Protocol.TWCJournal import JOURNAL_TX
 
 logger = LoggerFactory.get_logger("RS485", "Interface")
 
@@ -15,10 +17,20 @@ class RS485:
     ser = None
     timeLastTx = 0
 
-    def __init__(self, master):
+    def __init__(self, master, config=None):
         self.master = master
         classname = self.__class__.__name__
 
+        if config is not None:
+            # We're running an additional bus, configured by an entry in
+            # interface.buses rather than by interface.RS485
+            self.baud = config.get("baud", self.baud)
+            self.port = config.get("port", None)
+            if not self.port:
+                raise ValueError("RS485 bus has no port configured")
+            self.connect()
+            return None
+
         # Unload if this module is disabled or misconfigured
         if "interface" in master.config and classname in master.config["interface"]:
             self.enabled = master.config["interface"][classname].get("enabled", True)
@@ -69,6 +81,16 @@ class RS485:
         # Close the serial interface
         return self.ser.close()
 
+    def fileno(self):
+        # Returns the file descriptor of the serial port, so that the main
+        # loop can wait for incoming data rather than polling for it.
+        if not self.ser:
+            return None
+        try:
+            return self.ser.fileno()
+        except Exception:
+            return None
+
     def getBufferLen(self):
         # This function returns the size of the recieve buffer.
         # This is used by read functions to determine if information is waiting
@@ -96,39 +118,17 @@ class RS485:
             return b""
 
     def send(self, msg):
-        # Send msg on the RS485 network. We'll escape bytes with a special meaning,
-        # add a CRC byte to the message end, and add a C0 byte to the start and end
-        # to mark where it begins and ends.
-
-        msg = bytearray(msg)
-        checksum = 0
-        for i in range(1, len(msg)):
-            checksum += msg[i]
-
-        msg.append(checksum & 0xFF)
-
-        # Escaping special chars:
-        # The protocol uses C0 to mark the start and end of the message.  If a C0
-        # must appear within the message, it is 'escaped' by replacing it with
-        # DB and DC bytes.
-        # A DB byte in the message is escaped by replacing it with DB DD.
-        #
-        # User FuzzyLogic found that this method of escaping and marking the start
-        # and end of messages is based on the SLIP protocol discussed here:
-        #   https://en.wikipedia.org/wiki/Serial_Line_Internet_Protocol
-
-        i = 0
-        while i < len(msg):
-            if msg[i] == 0xC0:
-                msg[i : i + 1] = b"\xdb\xdc"
-                i = i + 1
-            elif msg[i] == 0xDB:
-                msg[i : i + 1] = b"\xdb\xdd"
-                i = i + 1
-            i = i + 1
-
-        msg = bytearray(b"\xc0" + msg + b"\xc0")
-        logger.log(logging.INFO9, "Tx@: " + self.master.hex_str(msg))
+        # Send msg on the RS485 network. The codec adds a checksum byte to the
+        # message end, escapes bytes with a special meaning, and adds a C0 byte
+        # to the start and end to mark where it begins and ends.
+        self.sendFrame(get_encoder().encode(msg))
+
+    def sendFrame(self, msg):
+        # Send a message that has already been encoded by the codec
+        if logger.isEnabledFor(logging.INFO9):
+            logger.log(logging.INFO9, "Tx@: " + hex_str(msg))
+        if self.master.journal:
+            self.master.journal.writeFrame(JOURNAL_TX, msg)
 
         try:
             self.ser.write(msg)
@@ -1,95 +1,336 @@
+import errno
 import logging
+import select
 import time
 import socket
+import threading
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCCodec import get_encoder, hex_str
+from TWCManager.Protocol.TWCJournal import JOURNAL_TX
 
 logger = LoggerFactory.get_logger("TCP", "Interface")
 
 
 class TCP:
+    # Talks to TWCs through a network RS485 gateway (a serial to Ethernet
+    # converter in raw TCP mode), either by connecting to the gateway or by
+    # listening for the gateway to connect to us.
+    #
+    # All sockets are non-blocking, so a gateway that is slow, unplugged or
+    # rebooting never holds up the main loop. Each time the main loop calls
+    # getBufferLen() we read everything the gateway has sent us into a
+    # receive buffer, which read() then takes from. If the connection drops,
+    # we try to reconnect, waiting twice as long after each failed attempt up
+    # to reconnectMax seconds.
+    #
+    # Background task lanes and control threads send messages, such as VIN
+    # queries and stop commands, while the main loop polls. The lock is held
+    # while the socket or transmit buffer are used, so that two threads
+    # never send the same bytes, or resize the buffer while it is sent.
 
     config = None
     configTCP = None
     enabled = False
+    keepalive = True
+    keepaliveCount = 3
+    keepaliveIdle = 10
+    keepaliveInterval = 5
+    listen = False
+    listenAddress = "localhost"
     master = None
+    maxTxBuffer = 4096
     port = 6000
+    reconnectMax = 60
+    reconnectMin = 1
     server = None
     sock = None
     timeLastTx = 0
 
-    def __init__(self, master):
+    def __init__(self, master, config=None):
         self.master = master
         self.config = master.config
-        if "interface" in master.config:
-            self.configTCP = master.config["interface"].get("TCP", {})
+        if config is not None:
+            # We're running an additional bus, configured by an entry in
+            # interface.buses rather than by interface.TCP
+            self.configTCP = config
+            self.enabled = True
         else:
-            self.configTCP = {}
+            if "interface" in master.config:
+                self.configTCP = master.config["interface"].get("TCP", {})
+            else:
+                self.configTCP = {}
+            self.enabled = self.configTCP.get("enabled", False)
 
-        self.enabled = self.configTCP.get("enabled", False)
         # Unload if this module is disabled or misconfigured
         if not self.enabled:
             self.master.releaseModule("lib.TWCManager.Interface", "TCP")
             return None
 
-        # Create TCP socket
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen = self.configTCP.get("listen", False)
+        self.listenAddress = self.configTCP.get("listenAddress", self.listenAddress)
+        self.server = self.configTCP.get("server", None)
+        self.port = int(self.configTCP.get("port", self.port))
+        self.keepalive = self.configTCP.get("keepalive", self.keepalive)
+        self.keepaliveIdle = int(
+            self.configTCP.get("keepaliveIdle", self.keepaliveIdle)
+        )
+        self.keepaliveInterval = int(
+            self.configTCP.get("keepaliveInterval", self.keepaliveInterval)
+        )
+        self.keepaliveCount = int(
+            self.configTCP.get("keepaliveCount", self.keepaliveCount)
+        )
+        # Always wait a little before reconnecting. As well as not hammering
+        # the gateway, this gives the main loop a chance to see we have no
+        # connection before a new one reuses the same file descriptor.
+        self.reconnectMin = max(
+            0.1, self.configTCP.get("reconnectMin", self.reconnectMin)
+        )
+        self.reconnectMax = self.configTCP.get("reconnectMax", self.reconnectMax)
 
-        # If we are configured to listen, open the listening socket
-        if self.configTCP.get("listen", False):
-            self.sock.bind(("localhost", self.port))
-            self.sock.listen(1)
+        if not self.listen and not self.server:
+            if config is not None:
+                raise ValueError("TCP bus has no server configured")
+            logger.error(
+                "TCP interface has no server configured. "
+                "Set interface.TCP.server in config.json, or set listen to true."
+            )
+            self.master.releaseModule("lib.TWCManager.Interface", "TCP")
+            return None
+
+        self.connecting = None
+        self.listenSock = None
+        self.lock = threading.Lock()
+        self.nextAttempt = 0
+        self.reconnectDelay = self.reconnectMin
+        self.rxBuffer = bytearray()
+        self.txBuffer = bytearray()
+        self.stats = {"connects": 0, "disconnects": 0, "failures": 0}
+
+        if self.listen:
+            self.listenSock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listenSock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.listenSock.bind((self.listenAddress, self.port))
+            self.listenSock.listen(1)
+            self.listenSock.setblocking(False)
+            logger.info(
+                "Waiting for RS485 gateway to connect on %s:%d"
+                % (self.listenAddress, self.port)
+            )
         else:
-            # Connect to server
-            self.sock.connect((self.server, self.port))
+            self.connect()
 
     def close(self):
         # Close the TCP socket interface
+        with self.lock:
+            self.disconnect()
+        if self.listenSock:
+            self.listenSock.close()
+            self.listenSock = None
+
+    def configureSocket(self, sock):
+        # Heartbeats are small and need to go out straight away, so don't let
+        # Nagle's algorithm hold them back waiting for an ACK.
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        # Keepalive lets us notice a gateway that has gone away without
+        # closing the connection (for example, it lost power) even while we
+        # aren't sending anything.
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in (
+                ("TCP_KEEPIDLE", self.keepaliveIdle),
+                ("TCP_KEEPINTVL", self.keepaliveInterval),
+                ("TCP_KEEPCNT", self.keepaliveCount),
+            ):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    def connect(self):
+        # Start connecting to the gateway, without waiting for the connection
+        # to complete. poll() finishes the job.
+        now = time.time()
+        if self.sock or self.connecting or now < self.nextAttempt:
+            return
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.configureSocket(sock)
+        try:
+            result = sock.connect_ex((self.server, self.port))
+        except OSError as e:
+            # Most likely the server name couldn't be resolved
+            sock.close()
+            self.connectFailed(e)
+            return
+
+        if result in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            self.connecting = sock
+        else:
+            sock.close()
+            self.connectFailed(OSError(result, errno.errorcode.get(result, result)))
+
+    def connected(self, sock):
+        self.sock = sock
+        self.connecting = None
+        self.reconnectDelay = self.reconnectMin
+        self.rxBuffer.clear()
+        self.txBuffer.clear()
+        self.stats["connects"] += 1
+
+        # Reset any Slave TWC last RX heartbeat counters, so that they aren't
+        # timed out because of the time we were disconnected.
+        for slaveTWC in self.master.getSlaveTWCs():
+            slaveTWC.timeLastRx = time.time()
+
+    def connectFailed(self, e):
+        self.stats["failures"] += 1
+        logger.error(
+            "Unable to connect to RS485 gateway %s:%d: %s. Retrying in %ds."
+            % (self.server, self.port, e, self.reconnectDelay)
+        )
+        self.nextAttempt = time.time() + self.reconnectDelay
+        self.reconnectDelay = min(self.reconnectDelay * 2, self.reconnectMax)
+
+    def disconnect(self, reason=None):
+        if self.connecting:
+            self.connecting.close()
+            self.connecting = None
+        if not self.sock:
+            return
+        if reason:
+            logger.error(
+                "Lost connection to RS485 gateway: %s. Will attempt re-connect."
+                % (reason)
+            )
+            self.stats["disconnects"] += 1
+            self.nextAttempt = time.time() + self.reconnectDelay
+            self.reconnectDelay = min(self.reconnectDelay * 2, self.reconnectMax)
         self.sock.close()
+        self.sock = None
+
+    def fileno(self):
+        # Returns the file descriptor of the connection to the gateway, so
+        # that the main loop can wait for incoming data rather than polling
+        # for it. While we aren't connected, the main loop polls instead,
+        # which gives us the chance to reconnect.
+        if not self.sock:
+            return None
+        return self.sock.fileno()
+
+    def flush(self):
+        # Send as much of the transmit buffer as the socket will take
+        with self.lock:
+            self.sendBuffer()
+
+    def sendBuffer(self):
+        # As flush(), called with the lock held
+        while self.sock and self.txBuffer:
+            try:
+                sent = self.sock.send(self.txBuffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.disconnect(e)
+                return
+            del self.txBuffer[:sent]
+
+    def poll(self):
+        # Accept or finish any connection in progress, then read everything
+        # that has arrived into the receive buffer.
+        with self.lock:
+            if self.listenSock:
+                try:
+                    sock, addr = self.listenSock.accept()
+                except (BlockingIOError, InterruptedError):
+                    pass
+                else:
+                    # A new connection from the gateway replaces the old one
+                    self.disconnect()
+                    self.configureSocket(sock)
+                    self.connected(sock)
+                    logger.info("RS485 gateway connected from %s:%d" % addr)
+            elif not self.sock:
+                if not self.connecting:
+                    self.connect()
+                if self.connecting:
+                    _, writable, _ = select.select([], [self.connecting], [], 0)
+                    if writable:
+                        sock = self.connecting
+                        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                        if error:
+                            self.connecting = None
+                            sock.close()
+                            self.connectFailed(os_error(error))
+                        else:
+                            self.connected(sock)
+                            logger.info(
+                                "Connected to RS485 gateway %s:%d"
+                                % (self.server, self.port)
+                            )
+
+            if not self.sock:
+                return
+
+            self.sendBuffer()
+            while self.sock:
+                try:
+                    data = self.sock.recv(4096)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as e:
+                    self.disconnect(e)
+                    break
+                if not data:
+                    self.disconnect("connection closed by gateway")
+                    break
+                self.rxBuffer += data
+                if len(data) < 4096:
+                    break
 
     def getBufferLen(self):
         # This function returns the size of the recieve buffer.
         # This is used by read functions to determine if information is waiting
-        return 0
+        self.poll()
+        return len(self.rxBuffer)
 
     def read(self, len):
-        # Read the specified amount of data from the TCP interface
-        return self.sock.recv(len)
+        # Read the specified amount of data from the receive buffer
+        data = bytes(self.rxBuffer[:len])
+        del self.rxBuffer[:len]
+        return data
 
     def send(self, msg):
-        # Send msg on the RS485 network. We'll escape bytes with a special meaning,
-        # add a CRC byte to the message end, and add a C0 byte to the start and end
-        # to mark where it begins and ends.
-
-        msg = bytearray(msg)
-        checksum = 0
-        for i in range(1, len(msg)):
-            checksum += msg[i]
-
-        msg.append(checksum & 0xFF)
-
-        # Escaping special chars:
-        # The protocol uses C0 to mark the start and end of the message.  If a C0
-        # must appear within the message, it is 'escaped' by replacing it with
-        # DB and DC bytes.
-        # A DB byte in the message is escaped by replacing it with DB DD.
-        #
-        # User FuzzyLogic found that this method of escaping and marking the start
-        # and end of messages is based on the SLIP protocol discussed here:
-        #   https://en.wikipedia.org/wiki/Serial_Line_Internet_Protocol
-
-        i = 0
-        while i < len(msg):
-            if msg[i] == 0xC0:
-                msg[i : i + 1] = b"\xdb\xdc"
-                i = i + 1
-            elif msg[i] == 0xDB:
-                msg[i : i + 1] = b"\xdb\xdd"
-                i = i + 1
-            i = i + 1
-
-        msg = bytearray(b"\xc0" + msg + b"\xc0")
-        logger.log(logging.INFO9, "Tx@: " + self.master.hex_str(msg))
-
-        self.sock.send(msg)
+        # Send msg on the RS485 network. The codec adds a checksum byte to the
+        # message end, escapes bytes with a special meaning, and adds a C0 byte
+        # to the start and end to mark where it begins and ends.
+        self.sendFrame(get_encoder().encode(msg))
+
+    def sendFrame(self, msg):
+        # Send a message that has already been encoded by the codec
+        if logger.isEnabledFor(logging.INFO9):
+            logger.log(logging.INFO9, "Tx@: " + hex_str(msg))
+        if self.master.journal:
+            self.master.journal.writeFrame(JOURNAL_TX, msg)
 
         self.timeLastTx = time.time()
+        with self.lock:
+            if not self.sock:
+                logger.log(
+                    logging.INFO9, "Not connected to RS485 gateway, message dropped"
+                )
+                return
+
+            if len(self.txBuffer) + len(msg) > self.maxTxBuffer:
+                # The gateway isn't keeping up. Anything we had queued is out
+                # of date by now, so drop it rather than sending it late.
+                logger.info(
+                    "RS485 gateway is not accepting data, dropping queued messages"
+                )
+                self.txBuffer.clear()
+            self.txBuffer += msg
+            self.sendBuffer()
+
+
+def os_error(code):
+    return OSError(code, errno.errorcode.get(code, str(code)))
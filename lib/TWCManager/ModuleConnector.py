@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Modules", "Master")
+
+
+class ModuleConnector:
+    # Modules that connect to a device or service when they are loaded, such
+    # as an inverter over Modbus, do so in a connectModule() method rather
+    # than in __init__. That way, one which can't be reached doesn't hold up
+    # the modules loaded after it, or the RS485 bus.
+    #
+    # Each module is connected in a thread of its own, all at once, while the
+    # rest of startup carries on. Before the main loop starts, wait() waits
+    # for each of them until its deadline. Modules still connecting after
+    # that are degraded: they are loaded but have no data yet, and finish
+    # connecting in the background.
+    #
+    # connectModule() returns True once connected, or False if the module
+    # couldn't connect and has disabled or released itself. Modules which
+    # raise an exception instead are released.
+
+    def __init__(self, releaseModule):
+        self.lock = threading.Lock()
+        self.releaseModule = releaseModule
+        self.states = {}
+        self.threads = []
+
+    def connect(self, name, moduleType, ref, timeout):
+        # Starts connecting a module, and gives it timeout seconds to connect
+        # before the main loop starts without it
+        with self.lock:
+            self.states[name] = "connecting"
+        thread = threading.Thread(
+            target=self.run,
+            args=(name, moduleType, ref),
+            name="connect-" + name,
+            daemon=True,
+        )
+        thread.start()
+        self.threads.append((name, thread, time.monotonic() + timeout))
+
+    def getConnecting(self):
+        # The modules which are still connecting
+        with self.lock:
+            return [
+                name for name, state in self.states.items() if state == "connecting"
+            ]
+
+    def getState(self, name):
+        # "connecting", "connected" or "failed" for a module which connects
+        # at startup, or None for other modules
+        with self.lock:
+            return self.states.get(name, None)
+
+    def run(self, name, moduleType, ref):
+        started = time.monotonic()
+        try:
+            connected = ref.connectModule()
+        except Exception as e:
+            logger.error(
+                "FAIL: %s - %s: %s",
+                name,
+                type(e).__name__,
+                str(e),
+                extra={"colored": "red"},
+            )
+            self.releaseModule("lib.TWCManager." + moduleType, name)
+            connected = False
+
+        with self.lock:
+            self.states[name] = "connected" if connected else "failed"
+        logger.log(
+            logging.INFO4,
+            "Module %s %s after %.1fs",
+            name,
+            "connected" if connected else "failed to connect",
+            time.monotonic() - started,
+        )
+
+    def wait(self):
+        # Waits for each module to connect, until its deadline. Returns the
+        # modules which are still connecting.
+        for name, thread, deadline in self.threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self.threads = []
+
+        connecting = self.getConnecting()
+        for name in connecting:
+            logger.warning(
+                "Module %s is still connecting, starting without it until it has",
+                name,
+            )
+        return connecting
@@ -0,0 +1,104 @@
+import importlib
+
+
+class ModuleEntry:
+    # A module TWCManager can load, and the config section that enables it.
+    #
+    # entryPoint names the module and class as "package.module:Class". The
+    # module is only imported by load(), so modules that aren't configured,
+    # and the libraries they import, are never imported at all.
+    #
+    # enabled says whether the module is loaded when its config section
+    # doesn't say: True to load it anyway, False not to, or "section" to
+    # load it only if the section exists. A module without a section is
+    # always loaded.
+
+    def __init__(self, name, section=None, key=None, enabled=False):
+        self.name = name
+        self.type, self.className = name.split(".")
+        self.entryPoint = "TWCManager.%s:%s" % (name, self.className)
+        self.section = section
+        self.key = key
+        self.enabled = enabled
+
+    def getConfig(self, config):
+        # Returns this module's config section, or None if there isn't one
+        if self.section is None:
+            return None
+        return (config.get(self.section, None) or {}).get(self.key, None)
+
+    def isEnabled(self, config):
+        # Whether config says this module should be loaded
+        if self.section is None:
+            return True
+        sectionConfig = self.getConfig(config)
+        if sectionConfig is None:
+            return self.enabled is True
+        if not isinstance(sectionConfig, dict):
+            return False
+        return bool(sectionConfig.get("enabled", self.enabled is not False))
+
+    def load(self):
+        # Import the module, and return its class
+        moduleName, className = self.entryPoint.split(":")
+        return getattr(importlib.import_module(moduleName), className)
+
+
+# The modules TWCManager can load, in the order they are loaded. Logging
+# modules should be the first to load.
+registry = (
+    ModuleEntry("Logging.ConsoleLogging", "logging", "Console", True),
+    ModuleEntry("Logging.FileLogging", "logging", "FileLogger"),
+    ModuleEntry("Logging.SentryLogging", "logging", "Sentry"),
+    ModuleEntry("Logging.CSVLogging", "logging", "CSV"),
+    ModuleEntry("Logging.MySQLLogging", "logging", "MySQL"),
+    ModuleEntry("Logging.SQLiteLogging", "logging", "SQLite"),
+    ModuleEntry("Protocol.TWCProtocol"),
+    ModuleEntry("Interface.Dummy", "interface", "Dummy", "section"),
+    ModuleEntry("Interface.RS485", "interface", "RS485", True),
+    ModuleEntry("Interface.TCP", "interface", "TCP"),
+    ModuleEntry("Policy.Policy"),
+    ModuleEntry("Vehicle.VehiclePriority"),
+    # Other modules expect TeslaAPI to be loaded, even when it is disabled
+    ModuleEntry("Vehicle.TeslaAPI"),
+    ModuleEntry("Vehicle.TeslaBLE", "vehicle", "teslaBLE", True),
+    ModuleEntry("Vehicle.TeslaMateVehicle", "vehicle", "TeslaMate"),
+    ModuleEntry("Vehicle.FleetTelemetryMQTT", "vehicle", "teslaFleetTelemetryMQTT"),
+    ModuleEntry("Vehicle.HomeAssistant", "vehicle", "HomeAssistant"),
+    ModuleEntry("Control.WebIPCControl", "control", "IPC"),
+    ModuleEntry("Control.HTTPControl", "control", "HTTP"),
+    ModuleEntry("Control.MQTTControl", "control", "MQTT"),
+    ModuleEntry("EMS.DSMRreader", "sources", "DSMRreader"),
+    ModuleEntry("EMS.Efergy", "sources", "Efergy"),
+    ModuleEntry("EMS.EmonCMS", "sources", "EmonCMS"),
+    ModuleEntry("EMS.Enphase", "sources", "Enphase"),
+    ModuleEntry("EMS.Fronius", "sources", "Fronius"),
+    ModuleEntry("EMS.Growatt", "sources", "Growatt"),
+    ModuleEntry("EMS.HASS", "sources", "HASS"),
+    ModuleEntry("EMS.IotaWatt", "sources", "IotaWatt"),
+    ModuleEntry("EMS.Kostal", "sources", "Kostal"),
+    ModuleEntry("EMS.MQTT", "sources", "MQTT"),
+    ModuleEntry("EMS.OpenHab", "sources", "openHAB"),
+    ModuleEntry("EMS.OpenWeatherMap", "sources", "OpenWeatherMap"),
+    # P1Monitor has no enabled option, and is used if it is configured
+    ModuleEntry("EMS.P1Monitor", "sources", "P1Monitor", "section"),
+    ModuleEntry("EMS.SmartMe", "sources", "SmartMe"),
+    ModuleEntry("EMS.SmartPi", "sources", "SmartPi"),
+    ModuleEntry("EMS.SolarEdge", "sources", "SolarEdge"),
+    ModuleEntry("EMS.SolarLog", "sources", "SolarLog"),
+    ModuleEntry("EMS.TeslaPowerwall2", "sources", "Powerwall2"),
+    ModuleEntry("EMS.TED", "sources", "TED"),
+    ModuleEntry("EMS.Volkszahler", "sources", "Volkszahler"),
+    ModuleEntry("EMS.ScenarioEMS", "sources", "ScenarioEMS"),
+    ModuleEntry("EMS.URL", "sources", "URL"),
+    ModuleEntry("Status.HASSStatus", "status", "HASS"),
+    ModuleEntry("Status.MQTTStatus", "status", "MQTT"),
+)
+
+
+def getEntry(name):
+    # Returns the registry entry for a module, such as "EMS.Fronius"
+    for entry in registry:
+        if entry.name == name:
+            return entry
+    return None
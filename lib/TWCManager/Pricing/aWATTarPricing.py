@@ -19,6 +19,8 @@ class aWATTarPricing:
     def __init__(self, master):
 
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         self.config = master.config
         try:
             self.configConfig = master.config["config"]
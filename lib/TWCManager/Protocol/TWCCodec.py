@@ -0,0 +1,286 @@
+import logging
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("TWCCodec", "Protocol")
+
+
+# Framing bytes used on the TWC RS485 bus. The protocol is based on SLIP:
+#   https://en.wikipedia.org/wiki/Serial_Line_Internet_Protocol
+# C0 marks the start and end of each message. A C0 within the message is
+# escaped as DB DC, and a DB within the message is escaped as DB DD.
+FRAME_END = 0xC0
+FRAME_ESC = 0xDB
+FRAME_ESC_END = 0xDC
+FRAME_ESC_ESC = 0xDD
+
+# After unescaping and removing the leading and trailing C0 bytes, the
+# messages we know about are 14 bytes long in original TWCs, 16 bytes in newer
+# TWCs (protocolVersion == 2) and 20 bytes for some extended responses.
+VALID_FRAME_LENGTHS = (14, 16, 20)
+
+# A C0 seen before this many (escaped) bytes have been received since the
+# opening C0 is treated as the start of a new message rather than the end of
+# the current one. See notes in TWCDeframer.feed().
+MIN_RAW_FRAME_BYTES = 14
+
+
+# Bytes that must be escaped when they appear within a message
+_ESCAPED = {
+    FRAME_END: bytes((FRAME_ESC, FRAME_ESC_END)),
+    FRAME_ESC: bytes((FRAME_ESC, FRAME_ESC_ESC)),
+}
+
+_local = threading.local()
+
+
+def hex_str(ba):
+    return " ".join("{:02X}".format(c) for c in ba)
+
+
+def get_encoder():
+    # Returns the TWCEncoder for the calling thread. Messages are sent from
+    # both the main loop and the background tasks thread, so each thread gets
+    # its own buffer to encode into.
+    encoder = getattr(_local, "encoder", None)
+    if encoder is None:
+        encoder = _local.encoder = TWCEncoder()
+    return encoder
+
+
+def encode_frame(msg):
+    # Returns msg encoded for sending, as bytes that can be kept and sent
+    # again later.
+    return bytes(get_encoder().encode(msg))
+
+
+class TWCEncoder:
+    # Encoder for messages we send to TWCs.
+    #
+    # Adds the checksum byte, escapes any C0 or DB bytes and adds the C0
+    # delimiters in a single pass, writing into a buffer that is reused from
+    # one message to the next. encode() returns a memoryview of that buffer,
+    # which is only valid until the next call to encode(), so it should be
+    # written to the interface straight away. Use encode_frame() to get a copy
+    # that can be kept.
+
+    def __init__(self, size=64):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+
+    def encode(self, msg):
+        # The checksum is the sum of every byte after the first
+        checksum = (sum(msg) - msg[0]) & 0xFF
+
+        # In the worst case, every byte of the message and the checksum is
+        # escaped.
+        size = len(msg) * 2 + 4
+        if size > len(self.buffer):
+            self.buffer = bytearray(size)
+            self.view = memoryview(self.buffer)
+
+        buf = self.buffer
+        buf[0] = FRAME_END
+        if FRAME_END in msg or FRAME_ESC in msg:
+            pos = 1
+            for byte in msg:
+                escaped = _ESCAPED.get(byte)
+                if escaped:
+                    buf[pos : pos + 2] = escaped
+                    pos += 2
+                else:
+                    buf[pos] = byte
+                    pos += 1
+        else:
+            # Most messages have nothing to escape, so copy them in one go
+            pos = len(msg) + 1
+            buf[1:pos] = msg
+
+        escaped = _ESCAPED.get(checksum)
+        if escaped:
+            buf[pos : pos + 2] = escaped
+            pos += 2
+        else:
+            buf[pos] = checksum
+            pos += 1
+        buf[pos] = FRAME_END
+        return self.view[: pos + 1]
+
+
+class TWCDeframer:
+    # Incremental decoder for the C0-delimited framing used by TWCs.
+    #
+    # Bytes can be fed in arbitrary chunks (for example whatever RS485.read()
+    # or TCP.read() returned) and framing state is kept across calls. Escape
+    # sequences are decoded in the same pass, and each complete frame is
+    # length and checksum checked before it is returned.
+    #
+    # Each frame is returned as a (msg, ignoredData) tuple, where msg is the
+    # unescaped message without its C0 delimiters and ignoredData holds any
+    # bytes that were seen on the bus between the previous frame and this one.
+
+    timeout = 2.0
+
+    def __init__(self, timeout=2.0):
+        self.timeout = timeout
+        self.ignoredData = bytearray()
+        self.stats = {
+            "bytes": 0,
+            "frames": 0,
+            "badChecksum": 0,
+            "badLength": 0,
+            "discarded": 0,
+            "timeouts": 0,
+        }
+        self.reset()
+
+    def reset(self):
+        # Drop any partially received message
+        self._msg = bytearray()
+        self._rawLen = 0
+        self._escape = False
+        self._inFrame = False
+        self.timeLastByte = 0
+
+    def expire(self, now=None):
+        # Discard a partial message if no further bytes have arrived for
+        # longer than the timeout. Returns True if a message was discarded.
+        if not self._inFrame:
+            return False
+        if now is None:
+            now = time.time()
+        if now - self.timeLastByte < self.timeout:
+            return False
+
+        logger.log(
+            logging.INFO9,
+            "Msg timeout (%s) C0 %s",
+            hex_str(self.ignoredData),
+            hex_str(self._msg),
+        )
+        self.stats["timeouts"] += 1
+        self.ignoredData = bytearray()
+        self.reset()
+        return True
+
+    def feed(self, data, now=None):
+        # Feed received bytes to the deframer and return a list of the frames
+        # that were completed by them.
+        frames = []
+        if not data:
+            return frames
+
+        self.timeLastByte = time.time() if now is None else now
+        self.stats["bytes"] += len(data)
+
+        msg = self._msg
+        for byte in data:
+            if byte == FRAME_END:
+                if not self._inFrame:
+                    self._inFrame = True
+                elif self._rawLen >= MIN_RAW_FRAME_BYTES:
+                    # Messages are usually 17 bytes or longer and end with
+                    # C0 FE. However, when the network lacks termination and
+                    # bias resistors, the last byte (FE) may be corrupted or
+                    # even missing, and you may receive additional garbage
+                    # bytes between messages.
+                    #
+                    # TWCs seem to account for corruption at the end and
+                    # between messages by simply ignoring anything after the
+                    # final C0 in a message, so we use the same tactic.
+                    frame = self._finish(msg)
+                    if frame is not None:
+                        frames.append(frame)
+                    msg = self._msg
+                    continue
+                else:
+                    # If c0 happens to be within the corrupt noise between
+                    # messages, we ignore it by starting a new message
+                    # whenever we see a c0 before a full-length message has
+                    # been received.
+                    #
+                    # If you see this when the program is first started, it
+                    # means we started listening in the middle of the TWC
+                    # sending a message so we didn't see the whole message
+                    # and must discard it. That's unavoidable.
+                    # If you see this any other time, it means there was some
+                    # corruption in what we received. It's normal for that to
+                    # happen every once in awhile but there may be a problem
+                    # such as incorrect termination or bias resistors on the
+                    # rs485 wiring if you see it frequently.
+                    logger.debug(
+                        "Found end of message before full-length message received.  "
+                        "Discard and wait for new message."
+                    )
+                    self.stats["discarded"] += 1
+                    msg.clear()
+                    self._rawLen = 0
+                    self._escape = False
+                continue
+
+            if not self._inFrame:
+                # We expect to find these non-c0 bytes between messages, so
+                # we don't print any warning at standard debug levels.
+                self.ignoredData.append(byte)
+                continue
+
+            self._rawLen += 1
+            if self._escape:
+                self._escape = False
+                if byte == FRAME_ESC_END:
+                    msg.append(FRAME_END)
+                elif byte == FRAME_ESC_ESC:
+                    msg.append(FRAME_ESC)
+                else:
+                    logger.info(
+                        "ERROR: Special character 0xDB in message is "
+                        "followed by invalid character 0x%02X.  "
+                        "Message may be corrupted." % (byte)
+                    )
+                    # Replace the character with something even though it's
+                    # probably not the right thing.
+                    msg.append(FRAME_ESC)
+            elif byte == FRAME_ESC:
+                self._escape = True
+            else:
+                msg.append(byte)
+
+        return frames
+
+    @property
+    def pending(self):
+        # True if we are part way through receiving a message
+        return self._inFrame
+
+    def _finish(self, msg):
+        # Close off the current message and prepare for the next one. The
+        # closing C0 is consumed as the end of this message, so anything that
+        # follows it is treated as data between messages until the next C0.
+        ignoredData = self.ignoredData
+        self.ignoredData = bytearray()
+        self._msg = bytearray()
+        self._rawLen = 0
+        self._escape = False
+        self._inFrame = False
+
+        if len(msg) not in VALID_FRAME_LENGTHS:
+            logger.info(
+                "ERROR: Ignoring message of unexpected length %d: %s"
+                % (len(msg), hex_str(msg))
+            )
+            self.stats["badLength"] += 1
+            return None
+
+        checksumExpected = msg[-1]
+        checksum = sum(msg[1:-1]) & 0xFF
+        if checksum != checksumExpected:
+            logger.info(
+                "ERROR: Checksum %X does not match %02X.  Ignoring message: %s"
+                % (checksum, checksumExpected, hex_str(msg))
+            )
+            self.stats["badChecksum"] += 1
+            return None
+
+        self.stats["frames"] += 1
+        return (msg, ignoredData)
@@ -0,0 +1,180 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCCodec import FRAME_END
+
+logger = LoggerFactory.get_logger("TWCJournal", "Protocol")
+
+# Binary capture of the messages sent and received on the TWC bus.
+#
+# The file starts with an 8 byte header: the magic bytes TWCJ, the format
+# version and the size of each record header. Each record is then a record
+# header followed by the message and the bytes that were ignored on the bus
+# before it:
+#
+#   timestamp   double      time.time() when the message was sent or received
+#   direction   byte        JOURNAL_RX or JOURNAL_TX
+#   (pad)       byte
+#   msgLen      uint16
+#   ignoredLen  uint16
+#   msg         msgLen bytes, unescaped and including the checksum byte
+#   ignored     ignoredLen bytes
+#
+# All values are little endian. Records are only ever appended, so a
+# capture can be read while it is still being written, and a record that
+# was cut short (for example by a power failure) marks the end of the file.
+JOURNAL_MAGIC = b"TWCJ"
+JOURNAL_VERSION = 1
+JOURNAL_RX = 0
+JOURNAL_TX = 1
+
+_header = struct.Struct("<4sHH")
+_record = struct.Struct("<dBxHH")
+
+
+def unescape_frame(frame):
+    # Turns an encoded frame (as passed to an interface's sendFrame) back in
+    # to the message it was encoded from, including the checksum byte.
+    msg = bytes(frame).strip(bytes((FRAME_END,)))
+    return msg.replace(b"\xdb\xdc", b"\xc0").replace(b"\xdb\xdd", b"\xdb")
+
+
+class TWCJournalWriter:
+    # Appends messages to a capture file.
+    #
+    # Writes are buffered and flushed at most once every flushInterval seconds,
+    # so that capturing everything on the bus costs little more than a
+    # struct.pack and a memory copy per message. The main loop and the
+    # background tasks thread both send messages, so writes are serialised.
+
+    flushInterval = 1.0
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = 0
+        self.timeLastFlush = 0
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, "rb") as f:
+                TWCJournalReader.checkHeader(f.read(_header.size), path)
+        self.file = open(path, "ab", buffering=65536)
+        if not exists:
+            self.file.write(_header.pack(JOURNAL_MAGIC, JOURNAL_VERSION, _record.size))
+
+        logger.info("Capturing TWC messages to %s", path)
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def flush(self):
+        with self.lock:
+            if self.file:
+                self.file.flush()
+                self.timeLastFlush = time.time()
+
+    def write(self, direction, msg, ignoredData=b"", now=None):
+        # Append a message. msg is the unescaped message including its
+        # checksum, as returned by TWCDeframer.
+        if now is None:
+            now = time.time()
+        if len(ignoredData) > 0xFFFF:
+            ignoredData = ignoredData[-0xFFFF:]
+
+        with self.lock:
+            if not self.file:
+                return
+            self.file.write(_record.pack(now, direction, len(msg), len(ignoredData)))
+            self.file.write(msg)
+            if ignoredData:
+                self.file.write(ignoredData)
+            self.records += 1
+
+            if now - self.timeLastFlush >= self.flushInterval:
+                self.file.flush()
+                self.timeLastFlush = now
+
+    def writeFrame(self, direction, frame, now=None):
+        # Append an encoded frame, as passed to an interface's sendFrame()
+        self.write(direction, unescape_frame(frame), now=now)
+
+
+class TWCJournalReader:
+    # Reads a capture file written by TWCJournalWriter.
+    #
+    # The file is memory mapped, and the messages are returned as
+    # memoryviews of the mapping rather than being copied, so even large
+    # captures can be read quickly. Take a copy of anything that needs to be
+    # kept after the reader is closed.
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = None
+        self.view = None
+
+        size = os.fstat(self.file.fileno()).st_size
+        self.checkHeader(self.file.read(_header.size), path)
+        if size > _header.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+
+    @staticmethod
+    def checkHeader(header, path):
+        if len(header) < _header.size:
+            raise ValueError("%s is not a TWC capture file" % (path))
+        magic, version, recordSize = _header.unpack(header)
+        if magic != JOURNAL_MAGIC:
+            raise ValueError("%s is not a TWC capture file" % (path))
+        if version != JOURNAL_VERSION or recordSize != _record.size:
+            raise ValueError(
+                "%s is a version %d capture, which is not supported" % (path, version)
+            )
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # Messages from the capture are still in use. The mapping
+                # is closed once they have all been released.
+                pass
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        # Yields (timestamp, direction, msg, ignoredData) for each record
+        if self.view is None:
+            return
+        view = self.view
+        end = len(view)
+        pos = _header.size
+        unpack = _record.unpack_from
+        recordSize = _record.size
+        while pos + recordSize <= end:
+            timestamp, direction, msgLen, ignoredLen = unpack(view, pos)
+            pos += recordSize
+            if pos + msgLen + ignoredLen > end:
+                logger.info("Capture %s ends part way through a record", self.path)
+                return
+            msg = view[pos : pos + msgLen]
+            pos += msgLen
+            ignoredData = view[pos : pos + ignoredLen]
+            pos += ignoredLen
+            yield timestamp, direction, msg, ignoredData
@@ -0,0 +1,167 @@
+import struct
+
+# Fixed-offset layouts of the message types we decode. All multi-byte values
+# are big-endian. Each layout skips the two opcode bytes at the start of the
+# message.
+_sender = struct.Struct(">2x2s")
+_senderReceiver = struct.Struct(">2x2s2s")
+_senderSign = struct.Struct(">2x2sc")
+_slaveLinkready = struct.Struct(">2x2scH")
+_voltageResponse = struct.Struct(">2x2sIHHH")
+
+_ZEROS = bytes(20)
+
+# The second opcode byte of a VIN response tells us which part of the VIN it
+# contains
+_vinParts = {0xEE: 0, 0xEF: 1, 0xF1: 2}
+
+
+class TWCMessageTable:
+    # Dispatch table for received TWC messages.
+    #
+    # Messages are looked up by their two byte opcode and their length, so
+    # each message is matched with a single dict lookup rather than by trying
+    # a series of regular expressions in turn. Each entry holds the Command
+    # name for the message and a decoder which reads the fields of the message
+    # from fixed offsets and returns them as a packet dict, in the same format
+    # used by TWCProtocol. A decoder may return None if the message doesn't
+    # look the way we expect (for example, padding bytes that should be zero),
+    # in which case the message is reported as unknown.
+    #
+    # To add a new message type, register its opcode, the message lengths it
+    # can arrive in and a decoder for it. Note that the lengths are for the
+    # unescaped message including the checksum byte, but without the leading
+    # and trailing C0 bytes.
+
+    def __init__(self):
+        self.table = {}
+
+    def register(self, opcode, lengths, command, decoder):
+        for length in lengths:
+            self.table[(opcode[0], opcode[1], length)] = (command, decoder)
+
+    def decode(self, msg):
+        packet = {"Command": None, "Errors": [], "SenderID": None, "Match": False}
+
+        if len(msg) < 2:
+            return packet
+        entry = self.table.get((msg[0], msg[1], len(msg)), None)
+        if not entry:
+            return packet
+
+        command, decoder = entry
+        fields = decoder(msg)
+        if fields is None:
+            return packet
+
+        packet.update(fields)
+        packet["Command"] = command
+        packet["Match"] = True
+        return packet
+
+
+def decodeAck(msg):
+    # FD B1 <Slave TWCID> 00 00 ...
+    # FD B2 <Slave TWCID> 00 00 ...
+    if msg[4:6] != _ZEROS[:2]:
+        return None
+    return {"SenderID": _sender.unpack_from(msg)[0]}
+
+
+def decodeMasterLinkready(msg):
+    # FC E1 <Master TWCID> <Sign> 00 00 00 00 00 00 00 00 ...
+    # FB E2 <Master TWCID> <Sign> 00 00 00 00 00 00 00 00 ...
+    if msg[5:13] != _ZEROS[:8]:
+        return None
+    senderID, sign = _senderSign.unpack_from(msg)
+    return {"SenderID": senderID, "Sign": sign}
+
+
+def decodeSlaveLinkready(msg):
+    # FD E2 <Slave TWCID> <Sign> <Max Amps * 100> 00 00 00 00 00 00 ...
+    if msg[7:13] != _ZEROS[:6]:
+        return None
+    senderID, sign, maxAmps = _slaveLinkready.unpack_from(msg)
+    return {"SenderID": senderID, "Sign": sign, "MaxAmps": maxAmps / 100}
+
+
+def decodeHeartbeat(msg):
+    # FB E0 <Master TWCID> <Slave TWCID> <Heartbeat Data> <Checksum>
+    # FD E0 <Slave TWCID> <Master TWCID> <Heartbeat Data> <Checksum>
+    senderID, receiverID = _senderReceiver.unpack_from(msg)
+    return {
+        "SenderID": senderID,
+        "RecieverID": receiverID,
+        "HeartbeatData": bytes(msg[6:-1]),
+    }
+
+
+def decodeMasterIdle(msg):
+    # FC 1D 00 00 00 00 00 00 00 00 00 00 00 ...
+    if msg[2:-1] != _ZEROS[: len(msg) - 3]:
+        return None
+    return {}
+
+
+def decodeVoltageRequest(msg):
+    # FB EB <Master TWCID> <Slave TWCID> 00 00 00 00 00 00 00 00 00 ...
+    if msg[6:-1] != _ZEROS[: len(msg) - 7]:
+        return None
+    senderID, receiverID = _senderReceiver.unpack_from(msg)
+    return {"SenderID": senderID, "RecieverID": receiverID}
+
+
+def decodeVoltageResponse(msg):
+    # FD EB <Slave TWCID> <Lifetime kWh> <Volts A> <Volts B> <Volts C> ...
+    senderID, kWh, voltsA, voltsB, voltsC = _voltageResponse.unpack_from(msg)
+    return {
+        "SenderID": senderID,
+        "LifetimekWh": kWh,
+        "VoltsPhaseA": voltsA,
+        "VoltsPhaseB": voltsB,
+        "VoltsPhaseC": voltsC,
+    }
+
+
+def decodeVIN(msg):
+    # FD EE <Slave TWCID> <VIN characters> <Checksum>  (VIN part 0)
+    # FD EF <Slave TWCID> <VIN characters> <Checksum>  (VIN part 1)
+    # FD F1 <Slave TWCID> <VIN characters> <Checksum>  (VIN part 2)
+    return {
+        "SenderID": _sender.unpack_from(msg)[0],
+        "VINPart": _vinParts[msg[1]],
+        "VINData": bytes(msg[4:-1]),
+    }
+
+
+# Messages received from the RS485 bus are 14, 16 or 20 bytes long. The
+# TWCProtocol parser is also used by the Dummy interface on messages we are
+# about to send, which have no checksum byte yet, so the master messages it
+# parses are registered for a wider range of lengths.
+_busLengths = (14, 16, 20)
+_masterLengths = range(13, 21)
+
+messageTable = TWCMessageTable()
+messageTable.register(b"\xfd\xb1", _busLengths, "StartAck", decodeAck)
+messageTable.register(b"\xfd\xb2", _busLengths, "StopAck", decodeAck)
+messageTable.register(
+    b"\xfc\xe1", _masterLengths, "MasterLinkready1", decodeMasterLinkready
+)
+messageTable.register(
+    b"\xfb\xe2", _masterLengths, "MasterLinkready2", decodeMasterLinkready
+)
+messageTable.register(
+    b"\xfc\xe2", _busLengths, "MasterModeLinkready", decodeMasterLinkready
+)
+messageTable.register(b"\xfb\xe0", range(14, 21), "MasterHeartbeat", decodeHeartbeat)
+messageTable.register(b"\xfc\x1d", _busLengths, "MasterIdle", decodeMasterIdle)
+messageTable.register(
+    b"\xfb\xeb", _busLengths[1:], "VoltageRequest", decodeVoltageRequest
+)
+messageTable.register(b"\xfd\xe2", _busLengths, "SlaveLinkready", decodeSlaveLinkready)
+messageTable.register(b"\xfd\xe0", _busLengths, "SlaveHeartbeat", decodeHeartbeat)
+messageTable.register(
+    b"\xfd\xeb", _busLengths[1:], "VoltageResponse", decodeVoltageResponse
+)
+for opcode in (b"\xfd\xee", b"\xfd\xef", b"\xfd\xf1"):
+    messageTable.register(opcode, _busLengths, "VIN", decodeVIN)
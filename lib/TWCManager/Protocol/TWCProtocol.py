@@ -1,6 +1,6 @@
 import logging
-import re
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCMessages import messageTable
 
 logger = LoggerFactory.get_logger("TWCProtocol", "Protocol")
 
@@ -15,6 +15,7 @@ class TWCProtocol:
     #   2 = Master (not currently implemented)
 
     master = None
+    masterCommands = ("MasterLinkready1", "MasterLinkready2", "MasterHeartbeat")
     masterTWCID = None
     operationMode = 0
 
@@ -111,33 +112,27 @@ class TWCProtocol:
             return msg
 
     def parseMessage(self, msg):
-        # Define protocol packet format
-        packet = {"Command": None, "Errors": [], "SenderID": None, "Match": False}
-
-        msgMatch = re.search(
-            rb"\xfc\xe1(..)(.)\x00\x00\x00\x00\x00\x00\x00\x00+?.*\Z",
-            msg,
-            re.DOTALL,
-        )
-
-        if msgMatch and packet["Match"] == False:
-            # Handle linkready1 from master.
+        # Look the message up in the shared message table. We only act on
+        # messages that a master sends, as this parser pretends to be a slave.
+        packet = messageTable.decode(msg)
+        if packet["Command"] not in self.masterCommands:
+            return {"Command": None, "Errors": [], "SenderID": None, "Match": False}
+
+        if packet["Command"] in ("MasterLinkready1", "MasterLinkready2"):
+            # Handle linkready1 or linkready2 from master.
             # See notes in send_master_linkready1() for details.
-            packet["Match"] = True
-            packet["Command"] = "MasterLinkready1"
-            packet["SenderID"] = msgMatch.group(1)
-            sign = msgMatch.group(2)
-            # self.master.setMasterTWCID(senderID)
+            # self.master.setMasterTWCID(packet["SenderID"])
 
             # This message seems to always contain seven 00 bytes in its
             # data area. If we ever get this message with non-00 data
             # we'll print it as an unexpected message.
             logger.info(
-                "Master TWC %02X%02X Linkready1.  Sign: %s"
+                "Master TWC %02X%02X %s.  Sign: %s"
                 % (
                     packet["SenderID"][0],
                     packet["SenderID"][1],
-                    self.master.hex_str(sign),
+                    packet["Command"][6:],
+                    self.master.hex_str(packet["Sign"]),
                 )
             )
 
@@ -146,45 +141,6 @@ class TWCProtocol:
             # sort of direct response when sent a master's linkready1 or
             # linkready2.
 
-        else:
-            msgMatch = re.search(
-                rb"\xfb\xe2(..)(.)\x00\x00\x00\x00\x00\x00\x00\x00+?.*\Z",
-                msg,
-                re.DOTALL,
-            )
-            if msgMatch and packet["Match"] == False:
-                # Handle linkready2 from master.
-                # See notes in send_master_linkready2() for details.
-                packet["Match"] = True
-                packet["Command"] = "MasterLinkready2"
-                packet["SenderID"] = msgMatch.group(1)
-                sign = msgMatch.group(2)
-                # master.setMasterTWCID(senderID)
-
-                # This message seems to always contain seven 00 bytes in its
-                # data area. If we ever get this message with non-00 data
-                # we'll print it as an unexpected message.
-
-                logger.info(
-                    "Master TWC %02X%02X Linkready2.  Sign: %s"
-                    % (
-                        packet["SenderID"][0],
-                        packet["SenderID"][1],
-                        self.master.hex_str(sign),
-                    )
-                )
-
-            else:
-                msgMatch = re.search(
-                    rb"\A\xfb\xe0(..)(..)(.......+?).\Z", msg, re.DOTALL
-                )
-            if msgMatch and packet["Match"] == False:
-                # Handle heartbeat message from Master.
-                # NOTE: This is very much a cut down version of handling of this message for now
-                packet["Match"] = True
-                packet["Command"] = "MasterHeartbeat"
-                packet["SenderID"] = msgMatch.group(1)
-                packet["RecieverID"] = msgMatch.group(2)
-                packet["HeartbeatData"] = msgMatch.group(3)
-
+        # NOTE: Handling of the MasterHeartbeat message is very much a cut down
+        # version of handling of this message for now
         return packet
@@ -0,0 +1,201 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCJournal import JOURNAL_RX, TWCJournalReader
+from TWCManager.Protocol.TWCMessages import messageTable
+
+logger = LoggerFactory.get_logger("TWCReplay", "Protocol")
+
+
+class ReplayInterface:
+    # Stands in for the RS485 interface while a capture is replayed. Nothing
+    # is received from it, and messages sent to it are counted and dropped.
+
+    timeLastTx = 0
+
+    def __init__(self):
+        self.sent = 0
+
+    def getBufferLen(self):
+        return 0
+
+    def read(self, len):
+        return b""
+
+    def send(self, msg):
+        self.sent += 1
+        self.timeLastTx = time.time()
+
+    def sendFrame(self, msg):
+        self.send(msg)
+
+
+class TWCReplay:
+    # Feeds messages from a capture file back through the same decoding and
+    # slave TWC handling as the main loop, so that problems seen with real
+    # TWCs can be reproduced, and changes to message handling benchmarked,
+    # without any hardware.
+    #
+    # Only received messages are replayed: linkready messages create slave
+    # TWCs, and heartbeat and voltage responses are passed to them. Messages
+    # we sent are skipped, as the master being replayed into sends its own.
+    #
+    # By default messages are replayed as fast as they can be processed. Set
+    # speed to replay them at that multiple of the rate they were captured.
+
+    master = None
+
+    def __init__(self, master):
+        self.master = master
+        self.stats = {"frames": 0, "skipped": 0, "unknown": 0, "commands": {}}
+        self.handlers = {
+            "SlaveLinkready": self.handleSlaveLinkready,
+            "SlaveHeartbeat": self.handleSlaveHeartbeat,
+            "VoltageResponse": self.handleVoltageResponse,
+        }
+
+    def handleSlaveLinkready(self, packet):
+        self.master.newSlave(packet["SenderID"], packet["MaxAmps"])
+
+    def handleSlaveHeartbeat(self, packet):
+        try:
+            slaveTWC = self.master.getSlaveByID(packet["SenderID"])
+        except KeyError:
+            # The capture started after this slave linked, so we never saw
+            # its linkready. Assume it's a U.S. charger.
+            slaveTWC = self.master.newSlave(packet["SenderID"], 80)
+        slaveTWC.timeLastRx = time.time()
+        slaveTWC.receive_slave_heartbeat(bytearray(packet["HeartbeatData"]))
+
+    def handleVoltageResponse(self, packet):
+        slaveTWC = self.master.slaveTWCs.get(packet["SenderID"], None)
+        if slaveTWC:
+            slaveTWC.lifetimekWh = packet["LifetimekWh"]
+            slaveTWC.voltsPhaseA = packet["VoltsPhaseA"]
+            slaveTWC.voltsPhaseB = packet["VoltsPhaseB"]
+            slaveTWC.voltsPhaseC = packet["VoltsPhaseC"]
+
+    def replay(self, path, speed=0):
+        # Replay the capture at path. Returns the stats for this replay.
+        start = time.time()
+        firstTimestamp = None
+        commands = self.stats["commands"]
+
+        with TWCJournalReader(path) as reader:
+            for timestamp, direction, msg, ignoredData in reader:
+                if direction != JOURNAL_RX:
+                    self.stats["skipped"] += 1
+                    continue
+
+                if speed:
+                    if firstTimestamp is None:
+                        firstTimestamp = timestamp
+                    delay = (timestamp - firstTimestamp) / speed - (time.time() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                packet = messageTable.decode(msg)
+                command = packet["Command"]
+                self.stats["frames"] += 1
+                if command is None:
+                    self.stats["unknown"] += 1
+                    continue
+                commands[command] = commands.get(command, 0) + 1
+
+                handler = self.handlers.get(command, None)
+                if handler:
+                    handler(packet)
+
+        self.stats["elapsed"] = time.time() - start
+        return self.stats
+
+
+def offline_master(config):
+    # Builds a TWCMaster with just enough modules loaded for slave TWC
+    # heartbeats to be processed, talking to a ReplayInterface.
+    from TWCManager.LoggingLevels import initialize_logging_levels
+
+    initialize_logging_levels()
+
+    from TWCManager.Policy.Policy import Policy
+    from TWCManager.TWCMaster import TWCMaster
+    from TWCManager.Vehicle.TeslaAPI import TeslaAPI
+
+    master = TWCMaster(bytearray(b"\x77\x77"), config)
+    master.registerModule(
+        {"name": "Replay", "ref": ReplayInterface(), "type": "Interface"}
+    )
+    master.registerModule(
+        {"name": "TeslaAPI", "ref": TeslaAPI(master), "type": "Vehicle"}
+    )
+    master.registerModule({"name": "Policy", "ref": Policy(master), "type": "Policy"})
+    return master
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a TWC capture file through TWCManager's slave handling"
+    )
+    parser.add_argument("capture", help="capture file written using captureFile")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="replay at this multiple of real time (default: as fast as possible)",
+    )
+    parser.add_argument(
+        "--amps",
+        type=int,
+        default=32,
+        help="wiringMaxAmpsAllTWCs and wiringMaxAmpsPerTWC to replay with",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="show log output from replayed TWCs"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    settingsPath = os.path.dirname(os.path.abspath(args.capture))
+    config = {
+        "config": {
+            "fakeMaster": 1,
+            "minAmpsPerTWC": 6,
+            "settingsPath": settingsPath,
+            "wiringMaxAmpsAllTWCs": args.amps,
+            "wiringMaxAmpsPerTWC": args.amps,
+        },
+        "policy": {},
+        "vehicle": {},
+    }
+    master = offline_master(config)
+    replay = TWCReplay(master)
+    stats = replay.replay(args.capture, args.speed)
+
+    print(
+        "Replayed %d messages (%d unknown, %d sent messages skipped) in %.3fs"
+        % (stats["frames"], stats["unknown"], stats["skipped"], stats["elapsed"])
+    )
+    for command, count in sorted(stats["commands"].items()):
+        print("  %-20s %d" % (command, count))
+    for slaveTWC in master.getSlaveTWCs():
+        print(
+            "Slave %02X%02X: state %d, %.2fA actual, %.2fA offered, %d kWh"
+            % (
+                slaveTWC.TWCID[0],
+                slaveTWC.TWCID[1],
+                slaveTWC.reportedState,
+                slaveTWC.reportedAmpsActual,
+                slaveTWC.lastAmpsOffered,
+                slaveTWC.lifetimekWh,
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import selectors
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Reactor", "Manager")
+
+
+class Reactor:
+    # Waits for something to do in the main loop.
+    #
+    # In the default polling mode, the main loop sleeps for 25ms at the top of
+    # each pass and checks the interface for data. In reactor mode, it instead
+    # blocks on the file descriptor of the interface (for example, the serial
+    # port) until either data arrives or the next periodic message is due. This
+    # means we reply to slaves as soon as their message has arrived, and we
+    # don't wake up 40 times a second when there is nothing to do.
+    #
+    # Sources we can't wait on directly, like the WebIPC message queue or an
+    # interface with no file descriptor (such as Dummy), are polled every
+    # pollInterval seconds instead.
+    #
+    # Each additional bus gets its own Reactor, which waits on that bus's
+    # interface only.
+
+    bus = None
+    enabled = False
+    master = None
+    pollInterval = 0.1
+
+    def __init__(self, master, bus=None):
+        self.master = master
+        self.bus = bus
+        self.enabled = master.config["config"].get("reactorMode", False)
+        self.pollInterval = master.config["config"].get(
+            "reactorPollInterval", self.pollInterval
+        )
+        self.interface = None
+        self.interfaceFD = None
+        self.selector = None
+        self.stats = {"wakeups": 0, "timeouts": 0, "polls": 0}
+
+        if not self.enabled:
+            return
+
+        self.selector = selectors.DefaultSelector()
+
+        if not bus:
+            logger.info(
+                "Main loop will wait for interface data instead of polling every 25ms."
+            )
+
+    def close(self):
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+
+    def getInterfaceFD(self, interface):
+        # Returns the file descriptor we can wait on for incoming data from
+        # the interface, or None if it doesn't have one.
+        fileno = getattr(interface, "fileno", None)
+        if not fileno:
+            return None
+        try:
+            fd = fileno()
+        except Exception:
+            return None
+        if isinstance(fd, int) and fd >= 0:
+            return fd
+        return None
+
+    def mustPoll(self):
+        # True if there is something we can't wait on and so need to check
+        # regularly.
+        if self.interfaceFD is None:
+            return True
+        if not self.bus and self.master.getModuleByName("WebIPCControl"):
+            return True
+        return False
+
+    def updateInterface(self):
+        # The interface may have re-connected (and so changed file
+        # descriptor) since we last looked, so check it on every wait.
+        if self.bus:
+            interface = self.bus.interface
+        else:
+            interface = self.master.getInterfaceModule()
+        fd = self.getInterfaceFD(interface)
+        if interface is self.interface and fd == self.interfaceFD:
+            return
+
+        if self.interfaceFD is not None:
+            try:
+                self.selector.unregister(self.interfaceFD)
+            except (KeyError, ValueError):
+                pass
+        self.interface = interface
+        self.interfaceFD = fd
+        if fd is not None:
+            try:
+                self.selector.register(fd, selectors.EVENT_READ, "interface")
+            except (KeyError, ValueError, OSError) as e:
+                logger.info("Unable to wait on interface: %s" % (e))
+                self.interfaceFD = None
+
+    def wait(self, timeout):
+        # Wait until the interface has data to read or timeout seconds have
+        # passed. Returns True if there may be data to read from the
+        # interface.
+        if not self.enabled:
+            time.sleep(max(0, timeout))
+            return True
+
+        self.updateInterface()
+        if self.interfaceFD is None and self.interface.getBufferLen() > 0:
+            return True
+
+        if timeout < 0:
+            timeout = 0
+        if self.mustPoll() and timeout > self.pollInterval:
+            timeout = self.pollInterval
+            self.stats["polls"] += 1
+
+        events = self.selector.select(timeout)
+        if not events:
+            self.stats["timeouts"] += 1
+            return self.interfaceFD is None
+
+        self.stats["wakeups"] += 1
+        return True
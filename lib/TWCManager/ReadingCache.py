@@ -0,0 +1,194 @@
+import math
+import random
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Cache", "Manager")
+
+
+class CachedReading:
+    # Returned by ReadingCache.register(). Modules call update() before
+    # returning their values, in place of checking cacheTime themselves.
+
+    def __init__(self, cache, name, fetch, cacheTime):
+        self.accessed = None
+        self.cache = cache
+        self.cacheTime = cacheTime
+        self.error = None
+        self.failures = 0
+        self.fetch = fetch
+        self.fetching = False
+        self.interval = None
+        self.lastLatency = None
+        self.name = name
+        self.retryAt = 0
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0, "failures": 0}
+        self.timer = None
+        self.updated = None
+
+    def cancel(self):
+        with self.cache.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+
+    def refresh(self):
+        # Called from the timer thread when the values are due to be
+        # refreshed, so the fetch itself runs in a thread of its own
+        now = time.monotonic()
+        with self.cache.lock:
+            self.timer = None
+            if self.fetching:
+                return
+            if self.accessed is None or now - self.accessed > self.cache.idleTime:
+                # Nothing has asked for the values in a while, so stop
+                # fetching them until something does
+                return
+            self.fetching = True
+            self.stats["refreshes"] += 1
+        threading.Thread(
+            target=self.run, name="cache-" + self.name, daemon=True
+        ).start()
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            fetched = self.fetch() is not False
+            error = None if fetched else "Fetch failed"
+        except Exception as e:
+            fetched = False
+            error = "%s: %s" % (type(e).__name__, str(e))
+
+        finished = time.monotonic()
+        with self.cache.lock:
+            self.fetching = False
+            self.lastLatency = finished - started
+            if fetched:
+                self.updated = finished
+                self.failures = 0
+                self.retryAt = 0
+                self.error = None
+                # Start the next fetch early by as long as this one took,
+                # so that new values arrive as these expire. If we know how
+                # often values are read, have them arrive just before the
+                # first read after these expire instead, so as not to fetch
+                # values that are never used.
+                delay = self.cacheTime - self.lastLatency
+                if self.interval:
+                    expires = finished + self.cacheTime
+                    nextRead = self.accessed + self.interval
+                    if nextRead < expires:
+                        nextRead += self.interval * math.ceil(
+                            (expires - nextRead) / self.interval
+                        )
+                    delay = nextRead - finished - self.lastLatency - self.interval / 10
+                delay = max(self.cacheTime / 2, delay)
+            else:
+                self.failures += 1
+                self.stats["failures"] += 1
+                self.error = error
+                delay = self.cache.getBackoff(self.cacheTime, self.failures)
+                self.retryAt = finished + delay
+                logger.info(
+                    "Unable to fetch values for %s, retrying in %ds: %s",
+                    self.name,
+                    delay,
+                    error,
+                )
+            if self.timer:
+                self.timer.cancel()
+            self.timer = self.cache.timers.schedule(delay, self.refresh)
+
+    def update(self):
+        # Returns True if the values were fetched just now, or False if the
+        # module should use the values it has. Values older than cacheTime
+        # are fetched while the caller waits, unless a fetch is already
+        # under way or failed recently, in which case the caller makes do
+        # with what it has.
+        now = time.monotonic()
+        with self.cache.lock:
+            # Reads less than a second apart, such as getConsumption() and
+            # getGeneration() for the same check, count as one
+            if self.accessed is not None and now - self.accessed >= 1:
+                interval = now - self.accessed
+                self.interval = interval if interval < self.cache.idleTime else None
+            self.accessed = now
+            if self.updated is not None and now - self.updated <= self.cacheTime:
+                self.stats["hits"] += 1
+                return False
+            if self.fetching or now < self.retryAt:
+                self.stats["stale"] += 1
+                return False
+            self.stats["misses"] += 1
+            self.fetching = True
+        self.run()
+        return True
+
+
+class ReadingCache:
+    # Keeps the values of modules that poll a device or service fresh, by
+    # fetching them in the background before they expire, so that the
+    # module can return them at once when asked.
+    #
+    # Modules register a function which fetches their values and stores
+    # them in the module, returning False (or raising an exception) if it
+    # couldn't, along with how long the values are good for. The first time
+    # values are asked for, the caller waits for them to be fetched. After
+    # that, each fetch schedules the next one on the master's TimerHeap, to
+    # run in a thread of its own in time for the values to be replaced as
+    # they expire. A module whose values haven't been asked for in idleTime
+    # seconds isn't fetched from until they are again.
+    #
+    # Once values have been read twice, a second or more apart, fetches are
+    # timed to finish just before the first read expected after the values
+    # expire. Modules read less often than cacheTime, such as once each
+    # policy check, are then fetched from once per read, as they were when
+    # they were only fetched when read.
+    #
+    # A fetch that fails is retried after a backoff which doubles with each
+    # failure in a row, from cacheTime up to maxBackoff seconds, with up to
+    # half of it taken off at random, so that modules polling the same
+    # device don't retry in step. The module's last values are used
+    # meanwhile.
+
+    def __init__(self, timers, idleTime=300, maxBackoff=120):
+        self.idleTime = idleTime
+        self.lock = threading.Lock()
+        self.maxBackoff = maxBackoff
+        self.readings = {}
+        self.timers = timers
+
+    def getBackoff(self, cacheTime, failures):
+        backoff = min(self.maxBackoff, cacheTime * 2 ** (failures - 1))
+        return backoff - random.uniform(0, backoff / 2)
+
+    def getStats(self):
+        # Returns, for each module, how often its values were served from
+        # the cache, served past cacheTime, or waited for, how many fetches
+        # ran in the background, and how many of them failed
+        now = time.monotonic()
+        stats = {}
+        with self.lock:
+            for name, reading in self.readings.items():
+                stats[name] = dict(
+                    reading.stats,
+                    cacheTime=reading.cacheTime,
+                    age=now - reading.updated if reading.updated else None,
+                    fetching=reading.fetching,
+                    lastLatency=reading.lastLatency,
+                    error=reading.error,
+                    retryIn=max(0, reading.retryAt - now) if reading.failures else None,
+                )
+        return stats
+
+    def register(self, name, fetch, cacheTime):
+        # Returns a CachedReading for the module called name, replacing any
+        # registered before under that name
+        reading = CachedReading(self, name, fetch, cacheTime)
+        with self.lock:
+            previous = self.readings.get(name, None)
+            self.readings[name] = reading
+        if previous:
+            previous.cancel()
+        return reading
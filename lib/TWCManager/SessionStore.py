@@ -0,0 +1,253 @@
+import sqlite3
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Sessions", "Master")
+
+
+class SessionStore:
+    # Keeps each vehicle's charging sessions in an SQLite database,
+    # sessions.db, rather than counters in settings["Vehicles"].
+    #
+    # Each session is a row of the sessions table, indexed by VIN and the
+    # time it started. Sessions older than the retention period are deleted
+    # when the store is compacted, so it doesn't grow without bound. The
+    # monthly table keeps a rollup of the number of sessions and kWh
+    # delivered for each vehicle in each month, which is kept when the
+    # sessions are deleted, so totals don't change.
+    #
+    # A session is counted in the month it started, when it starts, and
+    # its kWh are added to that month's rollup when it ends.
+    #
+    # Counters from settings["Vehicles"] are imported into a rollup with an
+    # empty month, as we don't know when those sessions were.
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        "id INTEGER PRIMARY KEY, vin TEXT NOT NULL, twcid TEXT, "
+        "month TEXT NOT NULL, start REAL NOT NULL, end REAL, startkWh REAL, "
+        "kWh REAL NOT NULL DEFAULT 0)",
+        "CREATE INDEX IF NOT EXISTS sessionsByVIN ON sessions (vin, start)",
+        "CREATE INDEX IF NOT EXISTS sessionsByStart ON sessions (start)",
+        "CREATE TABLE IF NOT EXISTS monthly ("
+        "vin TEXT NOT NULL, month TEXT NOT NULL, "
+        "sessions INTEGER NOT NULL DEFAULT 0, kWh REAL NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (vin, month))",
+    )
+
+    def __init__(self, fileName=":memory:", retentionDays=365):
+        self.connection = None
+        self.fileName = fileName
+        self.lock = threading.Lock()
+        # Sessions older than this are deleted by compact(). 0 keeps them.
+        self.retentionDays = retentionDays
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def compact(self, now=None):
+        # Delete sessions that started longer than retentionDays ago, and
+        # return the space they used to the file system. Returns the number
+        # of sessions deleted.
+        if not self.retentionDays:
+            return 0
+        if now is None:
+            now = time.time()
+        with self.lock:
+            try:
+                db = self.connect()
+                with db:
+                    deleted = db.execute(
+                        "DELETE FROM sessions WHERE start < ? AND end IS NOT NULL",
+                        (now - self.retentionDays * 86400,),
+                    ).rowcount
+                if deleted:
+                    db.execute("PRAGMA incremental_vacuum").fetchall()
+                db.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.info("Unable to compact %s: %s" % (self.fileName, e))
+                return 0
+        if deleted:
+            logger.info(
+                "Deleted %d charge sessions over %d days old"
+                % (deleted, self.retentionDays)
+            )
+        return deleted
+
+    def connect(self):
+        # Called with the lock held
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.fileName, check_same_thread=False)
+            # Only takes effect on a new database, before the tables are
+            # created, but lets compact() shrink the file
+            self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            with self.connection:
+                for statement in self.schema:
+                    self.connection.execute(statement)
+        return self.connection
+
+    def endSession(self, vin, endkWh, end=None):
+        # Close the vehicle's open session, if it has one. Returns the kWh
+        # delivered during it, or None if there was no open session.
+        if end is None:
+            end = time.time()
+        with self.lock:
+            try:
+                db = self.connect()
+                with db:
+                    row = db.execute(
+                        "SELECT id, month, startkWh FROM sessions "
+                        "WHERE vin = ? AND end IS NULL ORDER BY start DESC LIMIT 1",
+                        (vin,),
+                    ).fetchone()
+                    if row is None:
+                        return None
+                    sessionID, month, startkWh = row
+                    kWh = 0
+                    if startkWh and endkWh > startkWh:
+                        kWh = endkWh - startkWh
+                    db.execute(
+                        "UPDATE sessions SET end = ?, kWh = ? WHERE id = ?",
+                        (end, kWh, sessionID),
+                    )
+                    db.execute(
+                        "UPDATE monthly SET kWh = kWh + ? WHERE vin = ? AND month = ?",
+                        (kWh, vin, month),
+                    )
+            except sqlite3.Error as e:
+                logger.info("Unable to record end of charge session: %s" % (e))
+                return None
+        return kWh
+
+    def getMonth(self, timestamp):
+        return time.strftime("%Y-%m", time.localtime(timestamp))
+
+    def getSessions(self, vin, limit=20):
+        # Returns the vehicle's most recent sessions, newest first, as dicts
+        with self.lock:
+            try:
+                rows = (
+                    self.connect()
+                    .execute(
+                        "SELECT twcid, start, end, kWh FROM sessions "
+                        "WHERE vin = ? ORDER BY start DESC LIMIT ?",
+                        (vin, limit),
+                    )
+                    .fetchall()
+                )
+            except sqlite3.Error as e:
+                logger.info("Unable to read charge sessions: %s" % (e))
+                return []
+        return [
+            {"twcid": twcid, "start": start, "end": end, "kWh": kWh}
+            for twcid, start, end, kWh in rows
+        ]
+
+    def getMonths(self, vin):
+        # Returns the vehicle's rollup for each month, newest first. Imported
+        # counters have an empty month, and come last.
+        with self.lock:
+            try:
+                rows = (
+                    self.connect()
+                    .execute(
+                        "SELECT month, sessions, kWh FROM monthly "
+                        "WHERE vin = ? ORDER BY month DESC",
+                        (vin,),
+                    )
+                    .fetchall()
+                )
+            except sqlite3.Error as e:
+                logger.info("Unable to read charge sessions: %s" % (e))
+                return []
+        return [
+            {"month": month, "sessions": sessions, "kWh": kWh}
+            for month, sessions, kWh in rows
+        ]
+
+    def getTotals(self):
+        # Returns {vin: (sessions, kWh)} with each vehicle's totals
+        with self.lock:
+            try:
+                rows = (
+                    self.connect()
+                    .execute(
+                        "SELECT vin, SUM(sessions), SUM(kWh) FROM monthly GROUP BY vin"
+                    )
+                    .fetchall()
+                )
+            except sqlite3.Error as e:
+                logger.info("Unable to read charge sessions: %s" % (e))
+                return {}
+        return {vin: (sessions, kWh) for vin, sessions, kWh in rows}
+
+    def importVehicle(self, vin, sessions, kWh, startkWh=0, now=None):
+        # Import a vehicle's counters from settings["Vehicles"]. Importing
+        # the same counters again replaces them, so this is safe to repeat if
+        # the settings weren't saved afterwards. A session that was in
+        # progress is opened again, without counting it twice.
+        if now is None:
+            now = time.time()
+        with self.lock:
+            try:
+                db = self.connect()
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO monthly (vin, month, sessions, kWh) "
+                        "VALUES (?, '', ?, ?)",
+                        (vin, sessions, kWh),
+                    )
+                    if (
+                        startkWh
+                        and not db.execute(
+                            "SELECT 1 FROM sessions WHERE vin = ? AND end IS NULL",
+                            (vin,),
+                        ).fetchone()
+                    ):
+                        # Any kWh it delivers are added to the imported
+                        # counters, which is where the session was counted
+                        db.execute(
+                            "INSERT INTO sessions (vin, month, start, startkWh) "
+                            "VALUES (?, '', ?, ?)",
+                            (vin, now, startkWh),
+                        )
+            except sqlite3.Error as e:
+                logger.info("Unable to import charge sessions: %s" % (e))
+                return False
+        return True
+
+    def startSession(self, vin, twcid, startkWh, start=None):
+        # Open a session for the vehicle, and count it in this month's
+        # rollup. A session the vehicle still has open was never closed off,
+        # and is ended with nothing delivered.
+        if start is None:
+            start = time.time()
+        with self.lock:
+            try:
+                db = self.connect()
+                with db:
+                    db.execute(
+                        "UPDATE sessions SET end = ? WHERE vin = ? AND end IS NULL",
+                        (start, vin),
+                    )
+                    month = self.getMonth(start)
+                    db.execute(
+                        "INSERT INTO sessions (vin, twcid, month, start, startkWh) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (vin, twcid, month, start, startkWh),
+                    )
+                    db.execute(
+                        "INSERT INTO monthly (vin, month, sessions) VALUES (?, ?, 1) "
+                        "ON CONFLICT (vin, month) DO UPDATE SET sessions = sessions + 1",
+                        (vin, month),
+                    )
+            except sqlite3.Error as e:
+                logger.info("Unable to record start of charge session: %s" % (e))
+                return False
+        return True
@@ -0,0 +1,279 @@
+import argparse
+import json
+import sqlite3
+import sys
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.SettingsPersister import SettingsPersister
+
+logger = LoggerFactory.get_logger("Settings", "Master")
+
+
+class SettingsDatabase(SettingsPersister):
+    # Keeps settings in an SQLite database instead of settings.json, when
+    # settingsBackend is "sqlite".
+    #
+    # settings.json is written whole on every save, however little has
+    # changed, including every vehicle's details and every charge limit.
+    # Here each top level setting is a row of its own, each vehicle in
+    # settings["Vehicles"] is a row of the vehicles table, and each charge
+    # limit a row of the chargeLimits table. A save only writes the rows
+    # that have changed, in one transaction.
+    #
+    # Changes made through setSetting() (or markSettingsDirty() with a key)
+    # mark just that setting dirty, so only it is compared when saving.
+    # Otherwise, every setting is compared against what was last written.
+    #
+    # The database uses write-ahead logging, so a transaction is appended
+    # to the log rather than rewriting the database, and is only synced to
+    # disk at checkpoints.
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS settings "
+        "(key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS vehicles "
+        "(vin TEXT PRIMARY KEY, value TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS chargeLimits "
+        "(id TEXT PRIMARY KEY, outsideLimit REAL, lastApplied REAL)",
+    )
+    # Settings kept in tables of their own, rather than as a single row
+    tables = ("Vehicles", "chargeLimits")
+
+    def __init__(self, fileName, window=10):
+        super().__init__(window)
+        self.connection = None
+        self.dirtyKeys = set()
+        self.fileName = fileName
+        # What was last written, or loaded, for each row
+        self.storedKeys = {}
+        self.storedLimits = {}
+        self.storedVehicles = {}
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def connect(self):
+        # Called with the lock held
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.fileName, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            with self.connection:
+                for statement in self.schema:
+                    self.connection.execute(statement)
+        return self.connection
+
+    def decode(self, rows):
+        # Returns a dict of the JSON value in each (key, value) row. Parsing
+        # them as one JSON object is quicker than parsing each on its own.
+        return json.loads(
+            "{" + ",".join(json.dumps(key) + ":" + value for key, value in rows) + "}"
+        )
+
+    def export(self, fileName):
+        # Write the settings in the database to fileName, in the format of
+        # settings.json
+        settings = self.load()
+        return self.write(json.dumps(settings or {}).encode("utf-8"), fileName)
+
+    def getChanges(self, settings, keys):
+        # Returns the rows to write and delete in each table, comparing the
+        # given keys of settings (or all of them) with what was last written
+        if keys is None:
+            keys = set(settings) | set(self.storedKeys) | set(self.tables)
+        changes = {
+            "keys": [],
+            "deletedKeys": [],
+            "vehicles": [],
+            "deletedVehicles": [],
+            "limits": [],
+            "deletedLimits": [],
+        }
+
+        for key in keys:
+            if key in self.tables:
+                continue
+            if key not in settings:
+                if key in self.storedKeys:
+                    changes["deletedKeys"].append(key)
+                continue
+            value = json.dumps(settings[key])
+            if self.storedKeys.get(key, None) != value:
+                changes["keys"].append((key, value))
+
+        # Copy the vehicles and charge limits before going through them, as
+        # other lanes may add to them meanwhile
+        if "Vehicles" in keys:
+            vehicles = dict(settings.get("Vehicles", None) or {})
+            for vin, vehicle in vehicles.items():
+                value = json.dumps(vehicle)
+                if self.storedVehicles.get(vin, None) != value:
+                    changes["vehicles"].append((vin, value))
+            changes["deletedVehicles"] = [
+                vin for vin in self.storedVehicles if vin not in vehicles
+            ]
+
+        if "chargeLimits" in keys:
+            limits = dict(settings.get("chargeLimits", None) or {})
+            for limitID, limit in limits.items():
+                value = (limit[0], limit[1])
+                if self.storedLimits.get(limitID, None) != value:
+                    changes["limits"].append((limitID, value[0], value[1]))
+            changes["deletedLimits"] = [
+                limitID for limitID in self.storedLimits if limitID not in limits
+            ]
+
+        return changes
+
+    def load(self):
+        # Returns the settings in the database, or None if it doesn't have
+        # any yet
+        with self.lock:
+            try:
+                db = self.connect()
+                keys = db.execute("SELECT key, value FROM settings").fetchall()
+                vehicles = db.execute("SELECT vin, value FROM vehicles").fetchall()
+                limits = db.execute(
+                    "SELECT id, outsideLimit, lastApplied FROM chargeLimits"
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.info("Unable to load settings from %s: %s" % (self.fileName, e))
+                return None
+            if not keys:
+                return None
+
+            settings = self.decode(keys)
+            self.storedKeys = dict(keys)
+            if vehicles:
+                settings["Vehicles"] = self.decode(vehicles)
+            self.storedVehicles = dict(vehicles)
+            if limits:
+                settings["chargeLimits"] = {
+                    limitID: [outsideLimit, lastApplied]
+                    for limitID, outsideLimit, lastApplied in limits
+                }
+            self.storedLimits = {
+                limitID: (outsideLimit, lastApplied)
+                for limitID, outsideLimit, lastApplied in limits
+            }
+            return settings
+
+    def loaded(self, settings):
+        # Settings were loaded from settings.json, as the database doesn't
+        # have any yet. They need writing to the database.
+        logger.info("Moving settings from settings.json to %s" % (self.fileName))
+        self.markDirty()
+
+    def markDirty(self, key=None):
+        with self.lock:
+            self.dirty = True
+            if key is None:
+                self.dirtyKeys = None
+            elif self.dirtyKeys is not None:
+                self.dirtyKeys.add(key)
+
+    def save(self, settings, fileName=None):
+        # Write the settings that have changed to the database. fileName
+        # (of settings.json) isn't used. Returns False if writing failed.
+        with self.lock:
+            # If we weren't told what changed, as when a module queues a
+            # saveSettings task itself, compare everything. The settings are
+            # only clean once what changed has been written, as markDirty()
+            # waits for the lock meanwhile.
+            keys = self.dirtyKeys or None
+            try:
+                changes = self.getChanges(settings, keys)
+            except (TypeError, ValueError, IndexError, RuntimeError) as e:
+                # RuntimeError if another lane changed the settings as we
+                # went through them
+                logger.info("Exception raised while attempting to save settings:")
+                logger.info(str(e))
+                return False
+
+            if not any(changes.values()):
+                self.dirty = False
+                self.dirtyKeys = set()
+                self.skipped += 1
+                return True
+
+            try:
+                db = self.connect()
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                        changes["keys"],
+                    )
+                    db.executemany(
+                        "DELETE FROM settings WHERE key = ?",
+                        [(key,) for key in changes["deletedKeys"]],
+                    )
+                    db.executemany(
+                        "INSERT OR REPLACE INTO vehicles (vin, value) VALUES (?, ?)",
+                        changes["vehicles"],
+                    )
+                    db.executemany(
+                        "DELETE FROM vehicles WHERE vin = ?",
+                        [(vin,) for vin in changes["deletedVehicles"]],
+                    )
+                    db.executemany(
+                        "INSERT OR REPLACE INTO chargeLimits "
+                        "(id, outsideLimit, lastApplied) VALUES (?, ?, ?)",
+                        changes["limits"],
+                    )
+                    db.executemany(
+                        "DELETE FROM chargeLimits WHERE id = ?",
+                        [(limitID,) for limitID in changes["deletedLimits"]],
+                    )
+            except sqlite3.Error as e:
+                logger.info("Exception raised while attempting to save settings:")
+                logger.info(str(e))
+                # Compare everything next time, as we don't know what was
+                # written
+                self.dirtyKeys = None
+                return False
+
+            self.dirty = False
+            self.dirtyKeys = set()
+
+            written = 0
+            for key, value in changes["keys"]:
+                self.storedKeys[key] = value
+                written += len(key) + len(value)
+            for key in changes["deletedKeys"]:
+                del self.storedKeys[key]
+            for vin, value in changes["vehicles"]:
+                self.storedVehicles[vin] = value
+                written += len(vin) + len(value)
+            for vin in changes["deletedVehicles"]:
+                del self.storedVehicles[vin]
+            for limitID, outsideLimit, lastApplied in changes["limits"]:
+                self.storedLimits[limitID] = (outsideLimit, lastApplied)
+                written += len(limitID) + 16
+            for limitID in changes["deletedLimits"]:
+                del self.storedLimits[limitID]
+            self.recordWrite(written)
+            return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export settings from a TWCManager settings database to JSON"
+    )
+    parser.add_argument("database", help="settings database, such as settings.db")
+    parser.add_argument("output", help="JSON file to write, such as settings.json")
+    args = parser.parse_args(argv)
+
+    database = SettingsDatabase(args.database)
+    if database.load() is None:
+        print("No settings found in %s" % (args.database))
+        return 1
+    if not database.export(args.output):
+        return 1
+    print("Exported settings to %s" % (args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Settings", "Master")
+
+
+class SettingsPersister:
+    # Writes the settings dict to settings.json.
+    #
+    # Settings used to be written every time a saveSettings task was queued,
+    # which happens for every history snapshot, web form and MQTT command,
+    # and at the start and end of every charging session. Each write
+    # serialised every setting, fsynced it and rotated the backup, which on
+    # an SD card costs both time and wear.
+    #
+    # Changes now mark the settings dirty and queue a saveSettings task,
+    # which is held for window seconds so that every change made meanwhile
+    # is written at once. A write is skipped if the serialised settings are
+    # the same as those last written or loaded. The bytes written are
+    # counted, to report how much is written each hour.
+
+    def __init__(self, window=10):
+        self.bytesWritten = 0
+        self.digest = None
+        self.dirty = False
+        self.lastWrite = None
+        self.lock = threading.Lock()
+        # (time, bytes) for each write in the last hour
+        self.recent = collections.deque()
+        self.skipped = 0
+        self.started = time.time()
+        self.window = window
+        self.writes = 0
+
+    def close(self):
+        # settings.json is closed after every write, but other ways of
+        # keeping settings may have something to close at exit
+        pass
+
+    def getDigest(self, content):
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    def getStats(self):
+        # Returns how many writes have been made and skipped, and how many
+        # bytes have been written in all, in the last hour and on average
+        # per hour
+        now = time.time()
+        with self.lock:
+            self.trim(now)
+            return {
+                "window": self.window,
+                "dirty": self.dirty,
+                "writes": self.writes,
+                "skipped": self.skipped,
+                "bytesWritten": self.bytesWritten,
+                "bytesLastHour": sum(written for when, written in self.recent),
+                "bytesPerHour": self.bytesWritten / max(1, (now - self.started) / 3600),
+                "lastWrite": self.lastWrite,
+            }
+
+    def load(self):
+        # settings.json is loaded by TWCMaster.loadSettings(). Other ways of
+        # keeping settings return what they have here, or None if nothing.
+        return None
+
+    def loaded(self, settings):
+        # Called with the settings just loaded, which there is no need to
+        # write again until they change
+        with self.lock:
+            self.digest = self.getDigest(json.dumps(settings).encode("utf-8"))
+
+    def markDirty(self, key=None):
+        # key is the setting that changed, if it's known. All of them are
+        # written regardless.
+        self.dirty = True
+
+    def save(self, settings, fileName):
+        # Write settings to fileName, unless they haven't changed since they
+        # were last written. Returns False if writing failed, in which case
+        # the settings are left dirty to be saved again.
+        with self.lock:
+            # Cleared before the settings are read, so that a change made
+            # while they are being written marks them dirty again
+            self.dirty = False
+            try:
+                content = json.dumps(settings).encode("utf-8")
+            except (TypeError, ValueError, RuntimeError) as e:
+                # RuntimeError if another lane changed the settings as we
+                # went through them
+                logger.info("Exception raised while attempting to save settings file:")
+                logger.info(str(e))
+                self.dirty = True
+                return False
+
+            digest = self.getDigest(content)
+            if digest == self.digest:
+                self.skipped += 1
+                return True
+
+            if not self.write(content, fileName):
+                self.dirty = True
+                return False
+
+            self.digest = digest
+            self.recordWrite(len(content))
+            return True
+
+    def recordWrite(self, written):
+        # Count a write of some bytes. Called with the lock held.
+        now = time.time()
+        self.bytesWritten += written
+        self.lastWrite = now
+        self.recent.append((now, written))
+        self.trim(now)
+        self.writes += 1
+
+    def trim(self, now):
+        # Forget writes made more than an hour ago. Called with the lock held.
+        while self.recent and self.recent[0][0] < now - 3600:
+            self.recent.popleft()
+
+    def write(self, content, fileName):
+        # Use temp file + rename to ensure atomic write and prevent corruption
+        tempFileName = fileName + ".tmp"
+        backupFileName = fileName + ".backup"
+        try:
+            # Write to temp file first
+            with open(tempFileName, "wb") as outconfig:
+                outconfig.write(content)
+                outconfig.flush()
+                os.fsync(outconfig.fileno())
+
+            # Create backup of existing file if it exists
+            if os.path.exists(fileName):
+                try:
+                    os.replace(fileName, backupFileName)
+                except OSError:
+                    # If backup creation fails, continue anyway
+                    pass
+
+            # Atomically move temp to final location
+            os.replace(tempFileName, fileName)
+            return True
+        except PermissionError:
+            logger.info(
+                "Permission Denied trying to save to settings.json. Please check the permissions of the file and try again."
+            )
+        except (OSError, IOError) as e:
+            logger.info("Exception raised while attempting to save settings file:")
+            logger.info(str(e))
+
+        # Clean up temp file if it exists
+        if os.path.exists(tempFileName):
+            try:
+                os.remove(tempFileName)
+            except OSError:
+                pass
+        return False
@@ -32,6 +32,8 @@ class HASSStatus:
     def __init__(self, master):
         self.config = master.config
         self.master = master
+        # HTTP requests share connections with other modules
+        self.requests = master.httpPool
         try:
             self.configConfig = self.config["config"]
         except KeyError:
@@ -26,6 +26,7 @@ class MQTTStatus:
     password = None
     status = False
     brokerTLS = False
+    taskStats = False
     topicPrefix = None
     username = None
 
@@ -56,6 +57,7 @@ class MQTTStatus:
         self.password = self.__configMQTT.get("password", None)
         self.brokerTLS = bool(self.__configMQTT.get("brokerTLS", False))
         self.__msgRatePerTopic = int(self.__configMQTT.get("ratelimit", 60))
+        self.taskStats = bool(self.__configMQTT.get("taskStats", False))
 
         self.homeassistantDiscovery = bool(
             self.__configMQTT.get("homeassistantDiscovery", False)
@@ -353,6 +355,32 @@ class MQTTStatus:
 
         return True
 
+    def setTaskStats(self, stats):
+        # Publish how many of each background task finished per minute, and
+        # how long they waited and ran (95th percentile, in ms), from
+        # TWCMaster.getBackgroundTaskStats()
+        if not self.taskStats:
+            return
+
+        for cmd, cmdStats in stats["cmds"].items():
+            if cmd is None:
+                continue
+            self.setStatus(
+                bytes("tasks", "UTF-8"),
+                cmd + "_per_minute",
+                cmd + "/perMinute",
+                round(cmdStats["perMinute"], 2),
+                "",
+            )
+            for kind in ("wait", "run"):
+                self.setStatus(
+                    bytes("tasks", "UTF-8"),
+                    cmd + "_" + kind + "_p95",
+                    cmd + "/" + kind + "P95",
+                    round(cmdStats[kind]["p95"] * 1000, 1),
+                    "ms",
+                )
+
     @staticmethod
     def _get_mqtt_error_message(rc: int) -> str:
         """Map MQTT error codes to human-readable messages."""
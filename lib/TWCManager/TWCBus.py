@@ -0,0 +1,258 @@
+import collections
+import logging
+import threading
+import time
+import traceback
+from TWCManager.HeartbeatScheduler import HeartbeatScheduler
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCCodec import TWCDeframer, hex_str
+from TWCManager.Protocol.TWCJournal import JOURNAL_RX
+from TWCManager.Protocol.TWCMessages import messageTable
+
+logger = LoggerFactory.get_logger("Bus", "Master")
+
+
+class TWCBus:
+    # One RS485 bus of TWCs, and the fake master that runs it.
+    #
+    # A bus can only carry a few slave TWCs, so sites with more chargers than
+    # that run several buses, each on its own interface. Everything to do
+    # with talking to the TWCs on a bus is kept here: the interface, the fake
+    # master TWCID we use on it, the deframer for received data, the slave
+    # TWCs linked to it and the schedule of heartbeats we send them.
+    #
+    # Everything else, including the list of every slave TWC on every bus
+    # and the amps they share, belongs to TWCMaster. Slave TWCs are created
+    # and deleted through TWCMaster, which adds them to their bus.
+    #
+    # The first bus is run by the main loop. Any others run in their own
+    # thread, started by start().
+
+    interface = None
+    master = None
+    # A real master drops the oldest slave if more than this link to it
+    maxSlaves = 3
+    name = None
+    running = False
+    TWCID = None
+
+    def __init__(self, master, name, interface, TWCID):
+        self.master = master
+        self.name = name
+        self.interface = interface
+        self.TWCID = TWCID
+        self.deframer = TWCDeframer()
+        self.heartbeatScheduler = HeartbeatScheduler(self)
+        self.msgRxCount = 0
+        self.numInitMsgsToSend = 10
+        self.rxFrames = collections.deque()
+        self.slaveTWCs = {}
+        self.slaveTWCRoundRobin = []
+        self.thread = None
+
+    def addSlaveTWC(self, slaveTWC):
+        # The list is replaced rather than changed, so that other threads can
+        # iterate over getSlaveTWCs() while slaves link and drop off.
+        self.slaveTWCs[bytes(slaveTWC.TWCID)] = slaveTWC
+        self.slaveTWCRoundRobin = self.slaveTWCRoundRobin + [slaveTWC]
+
+    def close(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(1)
+        self.interface.close()
+
+    def dispatch(self, handlers, msg):
+        # Pass msg to the handler for its command. Returns False if we don't
+        # handle messages of this type.
+        packet = messageTable.decode(msg)
+        handler = handlers.get(packet["Command"], None)
+        if not handler:
+            return False
+        handler(self, msg, packet)
+        return True
+
+    def getSlaveByID(self, twcid):
+        return self.slaveTWCs[bytes(twcid)]
+
+    def getSlaveTWCs(self):
+        # Returns a list of the Slave TWCs on this bus
+        return self.slaveTWCRoundRobin
+
+    def getTimeLastTx(self):
+        return self.interface.timeLastTx
+
+    def nextMessage(self):
+        # Returns the next message received on this bus and any data seen
+        # before it that wasn't part of a message.
+        msg, ignoredData = self.rxFrames.popleft()
+        self.msgRxCount += 1
+        if self.master.journal:
+            self.master.journal.write(JOURNAL_RX, msg, ignoredData)
+
+        # When the sendTWCMsg web command is used to send a message to the
+        # TWC, it sets lastTWCResponseMsg = b''.  When we see that here,
+        # set lastTWCResponseMsg to any unusual message received in response
+        # to the sent message.  Never set lastTWCResponseMsg to a commonly
+        # repeated message like master or slave linkready, heartbeat, or
+        # voltage/kWh report.
+        if self.master.lastTWCResponseMsg == b"" and msg[0:2] not in (
+            b"\xfb\xe0",
+            b"\xfd\xe0",
+            b"\xfc\xe1",
+            b"\xfb\xe2",
+            b"\xfd\xe2",
+            b"\xfb\xeb",
+            b"\xfd\xeb",
+        ):
+            self.master.lastTWCResponseMsg = msg
+
+        if logger.isEnabledFor(logging.INFO9):
+            logger.log(
+                logging.INFO9, "Rx@: (%s) %s" % (hex_str(ignoredData), hex_str(msg))
+            )
+        return msg, ignoredData
+
+    def readInterface(self, wait):
+        # Read everything waiting on the interface into rxFrames. If the
+        # start of a message has arrived, we keep reading until the rest of
+        # it has, calling wait(timeout) between reads, so that we don't start
+        # transmitting in the middle of the incoming message.
+        while not self.rxFrames:
+            dataLen = self.interface.getBufferLen()
+            if dataLen == 0:
+                if not self.deframer.pending or self.deframer.expire():
+                    return
+                wait(self.deframer.timeLastByte + self.deframer.timeout - time.time())
+                continue
+
+            # Read everything that is waiting in one call rather than one
+            # byte at a time. The deframer keeps track of partial messages
+            # between reads and returns each complete, checksum-verified
+            # message along with any noise seen before it.
+            data = self.interface.read(dataLen)
+            if len(data) == 0:
+                logger.error(
+                    "We received a buffer length of %s from the %s interface, but data buffer length is %s. This should not occur."
+                    % (str(dataLen), self.name, str(len(data)))
+                )
+                return
+
+            self.rxFrames.extend(self.deframer.feed(data, time.time()))
+
+    def removeSlaveTWC(self, twcid):
+        twcid = bytes(twcid)
+        self.slaveTWCs.pop(twcid, None)
+        self.slaveTWCRoundRobin = [
+            slaveTWC
+            for slaveTWC in self.slaveTWCRoundRobin
+            if bytes(slaveTWC.TWCID) != twcid
+        ]
+        self.heartbeatScheduler.removeSlave(twcid)
+
+    def run(self, handlers, reactor=None):
+        # Main loop for a bus with its own thread. This does the same for the
+        # bus as the main loop in TWCManager.py does for the first bus.
+        while self.running:
+            try:
+                if not self.rxFrames:
+                    if reactor and reactor.enabled:
+                        reactor.wait(self.timeToNext())
+                    else:
+                        time.sleep(0.025)
+
+                self.sendPeriodicMessages(time.time())
+
+                if reactor and reactor.enabled:
+                    self.readInterface(reactor.wait)
+                else:
+                    self.readInterface(lambda timeout: time.sleep(0.005))
+
+                if self.rxFrames:
+                    msg, ignoredData = self.nextMessage()
+                    if not self.dispatch(handlers, msg):
+                        logger.info(
+                            "*** UNKNOWN MESSAGE FROM SLAVE on %s: %s"
+                            % (self.name, hex_str(msg))
+                        )
+            except Exception:
+                logger.info(
+                    "Unhandled Exception on %s: %s"
+                    % (self.name, traceback.format_exc())
+                )
+                time.sleep(5)
+
+    def sendPeriodicMessages(self, now):
+        # Send whichever linkready or heartbeat message is due on this bus
+        if self.numInitMsgsToSend > 0:
+            # A real master sends 5 copies of linkready1 and linkready2
+            # whenever it starts up, which we do here, 100ms apart to give
+            # slaves time to respond.
+            if now - self.getTimeLastTx() < 0.1:
+                return
+            if self.numInitMsgsToSend > 5:
+                self.master.send_master_linkready1(self)
+            else:
+                self.master.send_master_linkready2(self)
+            self.numInitMsgsToSend -= 1
+            return
+
+        # After finishing the 5 startup linkready1 and linkready2 messages,
+        # master will send a heartbeat message to every slave it's received a
+        # linkready message from. A real master would keep sending linkready
+        # messages periodically as long as no slave was connected, but since
+        # real slaves send linkready once every 10 seconds till they're
+        # connected to a master, we'll just wait for that.
+        # The heartbeat scheduler picks the slave that is next due a
+        # heartbeat, once we've given the last slave time to respond.
+        slaveTWC = self.heartbeatScheduler.nextDue(now)
+        if not slaveTWC:
+            return
+
+        # Run centralized EVSE power distribution once per full cycle of
+        # heartbeats to every slave. The amps available are shared between
+        # the slaves on every bus.
+        if self.heartbeatScheduler.cycleDue(now):
+            self.master.distributeEVSEPower()
+
+        if time.time() - slaveTWC.timeLastRx > self.master.config.get(
+            "interfaces", {}
+        ).get("RS485", {}).get("slaveTimeout", 26):
+            # A real master stops sending heartbeats to a slave that hasn't
+            # responded for ~26 seconds. It may still send the slave a
+            # heartbeat every once in awhile but we're just going to scratch
+            # the slave from our little black book and add them again if they
+            # ever send us a linkready.
+            logger.info(
+                "WARNING: We haven't heard from slave "
+                "%02X%02X for over 26 seconds.  "
+                "Stop sending them heartbeat messages."
+                % (slaveTWC.TWCID[0], slaveTWC.TWCID[1])
+            )
+            self.master.deleteSlaveTWC(slaveTWC.TWCID)
+        else:
+            self.heartbeatScheduler.sendHeartbeat(slaveTWC)
+
+    def start(self, handlers, reactor=None):
+        # Run this bus in its own thread
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.run, args=(handlers, reactor), name="TWCBus-" + self.name
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def timeToNext(self, now=None):
+        # Returns the number of seconds until we next have a linkready or
+        # heartbeat message to send on this bus. We never report more than a
+        # second, so that a bus with no slaves still checks in regularly.
+        if now is None:
+            now = time.time()
+        due = now + 1.0
+        if self.numInitMsgsToSend > 0:
+            due = self.getTimeLastTx() + 0.1
+        else:
+            timeToNext = self.heartbeatScheduler.timeToNext(now)
+            if timeToNext is not None:
+                due = now + timeToNext
+        return max(0, min(due, now + 1.0) - now)
@@ -31,17 +31,21 @@ import importlib
 import logging
 import os.path
 import math
-import re
 import sys
 import time
 import traceback
 import datetime
-import yaml
-import threading
+from TWCManager.ConfigLoader import ConfigError, ConfigSnapshot, loadConfig
+from TWCManager.TWCBus import TWCBus
 from TWCManager.TWCMaster import TWCMaster
+from TWCManager.Reactor import Reactor
+from TWCManager.TaskExecutor import TaskCancelled
 import requests
 from enum import Enum
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.ModuleRegistry import registry as moduleRegistry
+
+startupStarted = time.perf_counter()
 
 logging.addLevelName(19, "INFO2")
 logging.addLevelName(18, "INFO3")
@@ -65,56 +69,14 @@ logging.DEBUG2 = 9
 
 logger = LoggerFactory.get_logger("Manager", "Manager")
 
-# Define available modules for the instantiator
-# All listed modules will be loaded at boot time
-# Logging modules should be the first one to load
-modules_available = [
-    "Logging.ConsoleLogging",
-    "Logging.FileLogging",
-    "Logging.SentryLogging",
-    "Logging.CSVLogging",
-    "Logging.MySQLLogging",
-    "Logging.SQLiteLogging",
-    "Protocol.TWCProtocol",
-    "Interface.Dummy",
-    "Interface.RS485",
-    "Interface.TCP",
-    "Policy.Policy",
-    "Vehicle.VehiclePriority",
-    "Vehicle.TeslaAPI",
-    "Vehicle.TeslaBLE",
-    "Vehicle.TeslaMateVehicle",
-    "Vehicle.FleetTelemetryMQTT",
-    "Vehicle.HomeAssistant",
-    "Control.WebIPCControl",
-    "Control.HTTPControl",
-    "Control.MQTTControl",
-    #    "Control.OCPPControl",
-    "EMS.DSMRreader",
-    "EMS.Efergy",
-    "EMS.EmonCMS",
-    "EMS.Enphase",
-    "EMS.Fronius",
-    "EMS.Growatt",
-    "EMS.HASS",
-    "EMS.IotaWatt",
-    "EMS.Kostal",
-    "EMS.MQTT",
-    "EMS.OpenHab",
-    "EMS.OpenWeatherMap",
-    "EMS.P1Monitor",
-    "EMS.SmartMe",
-    "EMS.SmartPi",
-    "EMS.SolarEdge",
-    "EMS.SolarLog",
-    "EMS.TeslaPowerwall2",
-    "EMS.TED",
-    "EMS.Volkszahler",
-    "EMS.ScenarioEMS",
-    "EMS.URL",
-    "Status.HASSStatus",
-    "Status.MQTTStatus",
-]
+# The modules available to the instantiator are listed, in the order they
+# are loaded, in ModuleRegistry. Only those enabled in config.json are
+# imported.
+modules_available = [entry.name for entry in moduleRegistry]
+
+# With --profile-startup, the time taken to import and initialise each
+# module is logged once they are all loaded
+profileStartup = "--profile-startup" in sys.argv
 
 # Enable support for Python Visual Studio Debugger
 if "DEBUG_SECRET" in os.environ:
@@ -126,23 +88,21 @@ if "DEBUG_SECRET" in os.environ:
 ##########################
 # Load Configuration File
 config = None
-jsonconfig = None
+configFile = None
 if os.path.isfile("/etc/twcmanager/config.json"):
-    jsonconfig = open("/etc/twcmanager/config.json")
+    configFile = "/etc/twcmanager/config.json"
 else:
     if os.path.isfile("config.json"):
-        jsonconfig = open("config.json")
+        configFile = "config.json"
 
-if jsonconfig:
-    configtext = ""
-    for line in jsonconfig:
-        if line.lstrip().startswith("//") or line.lstrip().startswith("#"):
-            configtext += "\n"
-        else:
-            configtext += line.replace("\t", " ").split("#")[0]
-
-    config = yaml.safe_load(configtext)
-    configtext = None
+if configFile:
+    # The parsed config is cached next to config.json, and used until
+    # config.json is changed
+    try:
+        config = loadConfig(configFile, configFile + ".cache")
+    except ConfigError as e:
+        logger.error(str(e))
+        sys.exit(1)
 else:
     logger.error("Unable to find a configuration file.")
     # Only exit if not in test mode
@@ -163,6 +123,9 @@ else:
             "sources": {},
         }
 
+# Code run often, such as the main loop, reads options from the snapshot
+# rather than looking them up in config
+configSnapshot = ConfigSnapshot(config["config"])
 
 logLevel = config["config"].get("logLevel")
 if logLevel == None:
@@ -248,52 +211,10 @@ def hex_str(ba: bytearray):
 def time_now():
     global config
     return datetime.datetime.now().strftime(
-        "%H:%M:%S" + (".%f" if config["config"]["displayMilliseconds"] else "")
+        "%H:%M:%S" + (".%f" if configSnapshot.displayMilliseconds else "")
     )
 
 
-def unescape_msg(inmsg: bytearray, msgLen):
-    # Given a message received on the RS485 network, remove leading and trailing
-    # C0 byte, unescape special byte values, and verify its data matches the CRC
-    # byte.
-
-    # Note that a bytearray is mutable, whereas a bytes object isn't.
-    # By initializing a bytearray and concatenating the incoming bytearray
-    # to it, we protect against being passed an immutable bytes object
-    msg = bytearray() + inmsg[0:msgLen]
-
-    # See notes in RS485.send() for the way certain bytes in messages are escaped.
-    # We basically want to change db dc into c0 and db dd into db.
-    # Only scan to one less than the length of the string to avoid running off
-    # the end looking at i+1.
-    i = 0
-    while i < len(msg):
-        if msg[i] == 0xDB:
-            if msg[i + 1] == 0xDC:
-                # Replace characters at msg[i] and msg[i+1] with 0xc0,
-                # shortening the string by one character. In Python, msg[x:y]
-                # refers to a substring starting at x and ending immediately
-                # before y. y - x is the length of the substring.
-                msg[i : i + 2] = [0xC0]
-            elif msg[i + 1] == 0xDD:
-                msg[i : i + 2] = [0xDB]
-            else:
-                logger.info(
-                    "ERROR: Special character 0xDB in message is "
-                    "followed by invalid character 0x%02X.  "
-                    "Message may be corrupted." % (msg[i + 1])
-                )
-
-                # Replace the character with something even though it's probably
-                # not the right thing.
-                msg[i : i + 2] = [0xDB]
-        i = i + 1
-
-    # Remove leading and trailing C0 byte.
-    msg = msg[1 : len(msg) - 1]
-    return msg
-
-
 def get_vehicle_module():
     carHass = master.getModuleByName("HomeAssistant")
     if carHass:
@@ -307,122 +228,211 @@ def get_vehicle_module():
     return None
 
 
-def background_tasks_thread(master):
-    while True:
+def background_tasks_thread(master, lane):
+    # Once a task runs past its deadline, another thread takes over the
+    # lane, and this one exits when the task returns
+    while master.backgroundTasks.isWorker(lane):
+        task = master.getBackgroundTask(lane)
         try:
-            task = master.getBackgroundTask()
-            vehicleModule = master.getModuleByName("VehiclePriority")
-            if not vehicleModule:
-                # Fallback to direct API if VehiclePriority not available
-                vehicleModule = get_vehicle_module()
-
-            if "cmd" in task:
-                if task["cmd"] == "applyChargeLimit":
-                    vehicleModule.applyChargeLimit(limit=task["limit"])
-                elif task["cmd"] == "charge":
-                    vehicleModule.car_api_charge(task)
-                elif task["cmd"] == "checkArrival":
-                    # Use the policy-tracked limit, not TeslaAPI's own
-                    # lastChargeLimitApplied: that attribute is only updated
-                    # when TeslaAPI itself applies a limit, so it stays 0
-                    # (and this would wrongly restore/-1) whenever TeslaBLE
-                    # is the module actually managing charge limits.
-                    limit = (
-                        master.lastChargeLimitApplied
-                        if master.lastChargeLimitApplied != 0
-                        else -1
-                    )
-                    vehicleModule.applyChargeLimit(limit=limit, checkArrival=True)
-                elif task["cmd"] == "checkCharge":
-                    vehicleModule.updateChargeAtHome()
-                elif task["cmd"] == "checkDeparture":
-                    limit = (
-                        master.lastChargeLimitApplied
-                        if master.lastChargeLimitApplied != 0
-                        else -1
-                    )
-                    vehicleModule.applyChargeLimit(limit=limit, checkDeparture=True)
-                elif task["cmd"] == "checkGreenEnergy":
-                    check_green_energy()
-                elif task["cmd"] == "checkVINEntitlement":
-                    # The two possible arguments are task["subTWC"] which tells us
-                    # which TWC to check, or task["vin"] which tells us which VIN
-                    if task.get("vin", None):
-                        task["subTWC"] = master.getTWCbyVIN(task["vin"])
-
-                    if task["subTWC"]:
-                        if master.checkVINEntitlement(task["subTWC"]):
-                            logger.info(
-                                "Vehicle %s on TWC %02X%02X is permitted to charge."
-                                % (
-                                    task["subTWC"].currentVIN,
-                                    task["subTWC"].TWCID[0],
-                                    task["subTWC"].TWCID[1],
-                                )
-                            )
-                        else:
-                            logger.info(
-                                "Vehicle %s on TWC %02X%02X is not permitted to charge. Terminating session."
-                                % (
-                                    task["subTWC"].currentVIN,
-                                    task["subTWC"].TWCID[0],
-                                    task["subTWC"].TWCID[1],
-                                )
-                            )
-                            master.sendStopCommand(task["subTWC"].TWCID)
-
-                elif task["cmd"] == "getLifetimekWh":
-                    master.getSlaveLifetimekWh()
-                elif task["cmd"] == "getVehicleVIN":
-                    master.getVehicleVIN(task["slaveTWC"], task["vinPart"])
-                elif task["cmd"] == "snapHistoryData":
-                    master.snapHistoryData()
-                elif task["cmd"] == "updateStatus":
-                    update_statuses()
-                elif task["cmd"] == "webhook":
-                    if config["config"].get("webhookMethod", "POST") == "GET":
-                        requests.get(task["url"])
-                    else:
-                        body = master.getStatus()
-                        requests.post(task["url"], json=body)
-                elif task["cmd"] == "saveSettings":
-                    master.saveSettings()
-                elif task["cmd"] == "sunrise":
-                    update_sunrise_sunset()
-
+            # Run the handler registered for the task's command
+            master.backgroundTasks.run(task)
+        except TaskCancelled:
+            logger.info(
+                "Background task %s was cancelled at its deadline" % (task.get("cmd"))
+            )
+            master.backgroundTasks.taskCancelled(task)
         except Exception as e:
             logger.error(
                 f"BackgroundError: {traceback.format_exc()}, occurred when processing background task: {e}",
                 extra={"colored": "red"},
             )
 
-        # task_done() must be called to let the queue know the task is finished.
-        # backgroundTasksQueue.join() can then be used to block until all tasks
-        # in the queue are done.
+        # The task must be marked done to let its lane know it is finished,
+        # so that master.backgroundTasks.join() can block until every lane
+        # is empty.
         master.doneBackgroundTask(task)
 
 
-def check_green_energy():
-    global config, master
-
-    # Poll all loaded EMS modules for consumption and generation values
-    for module in master.getModulesByType("EMS"):
-        master.setConsumption(module["name"], module["ref"].getConsumption())
-        if hasattr(module["ref"], "getConsumptionAmps"):
-            master.setConsumptionAmps(
-                module["name"], module["ref"].getConsumptionAmps()
+def get_task_vehicle_module():
+    vehicleModule = master.getModuleByName("VehiclePriority")
+    if not vehicleModule:
+        # Fallback to direct API if VehiclePriority not available
+        vehicleModule = get_vehicle_module()
+    return vehicleModule
+
+
+def log_startup_profile():
+    # Log how long each module took to import and initialise, slowest first.
+    # The import time of a module includes the libraries it was the first
+    # to import.
+    logger.info("%-28s %10s %10s %10s", "Module", "Import", "Init", "Total")
+    for module, importTime, initTime in sorted(
+        modules_profile, key=lambda profile: profile[1] + profile[2], reverse=True
+    ):
+        logger.info(
+            "%-28s %8.1fms %8.1fms %8.1fms",
+            module,
+            importTime * 1000,
+            initTime * 1000,
+            (importTime + initTime) * 1000,
+        )
+    logger.info(
+        "%-28s %8.1fms %8.1fms %8.1fms",
+        "All modules",
+        sum(profile[1] for profile in modules_profile) * 1000,
+        sum(profile[2] for profile in modules_profile) * 1000,
+        sum(profile[1] + profile[2] for profile in modules_profile) * 1000,
+    )
+    logger.info(
+        "Startup took %.1fms, from loading config.json to starting the main loop",
+        (time.perf_counter() - startupStarted) * 1000,
+    )
+
+
+def register_background_tasks():
+    # Register the handlers for the background tasks we queue ourselves.
+    # Their lanes, priorities and deadlines are in TaskExecutor.builtinTasks.
+    # Modules register their own with master.registerBackgroundTask().
+    for cmd, handler in (
+        ("applyChargeLimit", task_apply_charge_limit),
+        ("charge", task_charge),
+        ("checkArrival", task_check_arrival),
+        ("checkCharge", task_check_charge),
+        ("checkDeparture", task_check_departure),
+        ("checkGreenEnergy", lambda task: check_green_energy()),
+        ("checkVINEntitlement", task_check_vin_entitlement),
+        ("compactSessions", task_compact_sessions),
+        ("getLifetimekWh", lambda task: master.getSlaveLifetimekWh()),
+        (
+            "getVehicleVIN",
+            lambda task: master.getVehicleVIN(task["slaveTWC"], task["vinPart"]),
+        ),
+        ("snapHistoryData", lambda task: master.snapHistoryData()),
+        ("sunrise", lambda task: update_sunrise_sunset()),
+        ("updateStatus", lambda task: update_statuses()),
+        ("webhook", task_webhook),
+    ):
+        master.registerBackgroundTask(cmd, handler)
+
+    # Values pushed by an EMS module are taken emsPushWindow seconds after
+    # the first of them, along with any others it pushes meanwhile
+    master.registerBackgroundTask(
+        "checkPushedEnergy",
+        lambda task: check_pushed_energy(task["module"]),
+        coalesce=master.configSnapshot.emsPushWindow,
+    )
+
+    # Changes to settings are saved together, settingsSaveWindow seconds
+    # after the first of them
+    master.registerBackgroundTask(
+        "saveSettings",
+        lambda task: master.saveSettings(),
+        coalesce=master.settingsPersister.window,
+    )
+
+
+def task_apply_charge_limit(task):
+    get_task_vehicle_module().applyChargeLimit(limit=task["limit"])
+
+
+def task_charge(task):
+    get_task_vehicle_module().car_api_charge(task)
+
+
+def task_check_arrival(task):
+    # Use the policy-tracked limit, not TeslaAPI's own
+    # lastChargeLimitApplied: that attribute is only updated
+    # when TeslaAPI itself applies a limit, so it stays 0
+    # (and this would wrongly restore/-1) whenever TeslaBLE
+    # is the module actually managing charge limits.
+    limit = master.lastChargeLimitApplied if master.lastChargeLimitApplied != 0 else -1
+    get_task_vehicle_module().applyChargeLimit(limit=limit, checkArrival=True)
+
+
+def task_check_charge(task):
+    get_task_vehicle_module().updateChargeAtHome()
+
+
+def task_check_departure(task):
+    limit = master.lastChargeLimitApplied if master.lastChargeLimitApplied != 0 else -1
+    get_task_vehicle_module().applyChargeLimit(limit=limit, checkDeparture=True)
+
+
+def task_check_vin_entitlement(task):
+    # The two possible arguments are task["subTWC"] which tells us
+    # which TWC to check, or task["vin"] which tells us which VIN
+    subTWC = task.get("subTWC", None)
+    if task.get("vin", None):
+        subTWC = master.getTWCbyVIN(task["vin"])
+
+    if subTWC:
+        if master.checkVINEntitlement(subTWC):
+            logger.info(
+                "Vehicle %s on TWC %02X%02X is permitted to charge."
+                % (
+                    subTWC.currentVIN,
+                    subTWC.TWCID[0],
+                    subTWC.TWCID[1],
+                )
             )
-        master.setGeneration(module["name"], module["ref"].getGeneration())
+        else:
+            logger.info(
+                "Vehicle %s on TWC %02X%02X is not permitted to charge. Terminating session."
+                % (
+                    subTWC.currentVIN,
+                    subTWC.TWCID[0],
+                    subTWC.TWCID[1],
+                )
+            )
+            master.sendStopCommand(subTWC.TWCID)
+
+
+def task_compact_sessions(task):
+    # Delete charging sessions past sessionRetentionDays, then do it again
+    # tomorrow
+    master.sessionStore.compact()
+    master.queue_background_task({"cmd": "compactSessions"}, 86400)
+
+
+def task_webhook(task):
+    if configSnapshot.webhookMethod == "GET":
+        master.httpPool.get(task["url"], timeout=10)
+    else:
+        body = master.getStatus()
+        master.httpPool.post(task["url"], json=body, timeout=10)
+
+
+def check_green_energy():
+    # Poll all loaded EMS modules for consumption and generation values, at
+    # once. Modules which don't answer in time report their last values.
+    apply_green_energy(master.emsAggregator.poll(master.getModulesByType("EMS")))
+
+
+def check_pushed_energy(name):
+    # An EMS module that is sent its values, such as MQTT, has new ones.
+    # Take them without polling every other module, which keep the values
+    # they gave at the last check, and work out the amps to offer again.
+    modules = [
+        module for module in master.getModulesByType("EMS") if module["name"] == name
+    ]
+    if modules:
+        apply_green_energy(master.emsAggregator.poll(modules))
+
+
+def apply_green_energy(readings):
+    for name, reading in readings.items():
+        master.setConsumption(name, reading["consumption"])
+        if reading["consumptionAmps"] is not None:
+            master.setConsumptionAmps(name, reading["consumptionAmps"])
+        master.setGeneration(name, reading["generation"])
 
     # Set max amps iff charge_amps isn't specified on the policy.
     if master.getModuleByName("Policy").policyIsGreen():
         master.setMaxAmpsToDivideAmongSlaves(master.getMaxAmpsForTargetGridUsage())
-        master.setLimitAmpsToDivideAmongSlaves(config["config"]["wiringMaxAmpsAllTWCs"])
-    elif config.get("config", {}).get("maxAmpsAllowedFromGrid", None):
+        master.setLimitAmpsToDivideAmongSlaves(configSnapshot.wiringMaxAmpsAllTWCs)
+    elif configSnapshot.maxAmpsAllowedFromGrid:
         master.setLimitAmpsToDivideAmongSlaves(
-            master.getMaxAmpsForTargetGridUsage(
-                config["config"]["maxAmpsAllowedFromGrid"]
-            )
+            master.getMaxAmpsForTargetGridUsage(configSnapshot.maxAmpsAllowedFromGrid)
         )
 
 
@@ -431,10 +441,8 @@ def update_statuses():
     # generation and consumption figures
     maxamps = master.getMaxAmpsToDivideAmongSlaves()
     maxampsDisplay = f"{maxamps:.2f}A"
-    subtractChargerLoad = config["config"].get("subtractChargerLoad", False)
-    treatGenerationAsGridDelivery = config["config"].get(
-        "treatGenerationAsGridDelivery", False
-    )
+    subtractChargerLoad = configSnapshot.subtractChargerLoad
+    treatGenerationAsGridDelivery = configSnapshot.treatGenerationAsGridDelivery
     if master.getModuleByName("Policy").policyIsGreen():
         genwatts = master.getGeneration()
         conwatts = master.getConsumption()
@@ -549,22 +557,20 @@ def update_statuses():
         )
 
     # Print minimum charge for all charging policies
-    minchg = f"{config['config']['minAmpsPerTWC']}A"
+    minchg = f"{configSnapshot.minAmpsPerTWC}A"
     logger.info(
         "Charge when above %s (minAmpsPerTWC).", minchg, extra={"colored": "magenta"}
     )
 
     # Warn if minAmpsPerTWC > wiringMaxAmpsPerTWC - this is a misconfiguration
     # that will prevent charging from ever starting (closes #24).
-    if config["config"].get("minAmpsPerTWC", 12) > config["config"].get(
-        "wiringMaxAmpsPerTWC", 6
-    ):
+    if configSnapshot.minAmpsPerTWC > configSnapshot.wiringMaxAmpsPerTWC:
         logger.warning(
             "WARNING: minAmpsPerTWC (%dA) is greater than wiringMaxAmpsPerTWC (%dA). "
             "Charging will never start because the minimum charge rate exceeds the "
             "wiring limit. Please review your config.json settings.",
-            config["config"]["minAmpsPerTWC"],
-            config["config"]["wiringMaxAmpsPerTWC"],
+            configSnapshot.minAmpsPerTWC,
+            configSnapshot.wiringMaxAmpsPerTWC,
         )
 
     # Update Sensors with min/max amp values
@@ -573,7 +579,7 @@ def update_statuses():
             bytes("config", "UTF-8"),
             "min_amps_per_twc",
             "minAmpsPerTWC",
-            config["config"]["minAmpsPerTWC"],
+            configSnapshot.minAmpsPerTWC,
             "A",
         )
         module["ref"].setStatus(
@@ -584,6 +590,12 @@ def update_statuses():
             "A",
         )
 
+    # Publish background task telemetry, if the MQTT Status module is set up
+    # to
+    mqttStatus = master.getModuleByName("MQTTStatus")
+    if mqttStatus:
+        mqttStatus.setTaskStats(master.getBackgroundTaskStats())
+
 
 def update_sunrise_sunset():
     ltNow = time.localtime()
@@ -606,7 +618,7 @@ def update_sunrise_sunset():
 
         r = {}
         try:
-            response = requests.get(url)
+            response = master.httpPool.get(url, timeout=10)
             response.raise_for_status()
             r = response.json().get("results", {})
         except (requests.exceptions.RequestException, ValueError) as e:
@@ -640,6 +652,735 @@ def update_sunrise_sunset():
     master.queue_background_task({"cmd": "sunrise"}, diff.total_seconds())
 
 
+def time_to_next_periodic_message():
+    # Returns the number of seconds until the top of the main loop next has a
+    # linkready or heartbeat message to send. We never report more than a
+    # second, so that the other periodic checks in the main loop still run.
+    now = time.time()
+    due = now + 1.0
+    if configSnapshot.fakeMaster == 1:
+        due = now + bus.timeToNext(now)
+    elif configSnapshot.fakeMaster != 2:
+        due = master.getTimeLastTx() + 10.0
+    return max(0, min(due, now + 1.0) - now)
+
+
+def handle_slave_ack(bus, msg, packet):
+    # Handle acknowledgement of Start or Stop command. There is nothing we
+    # need to do with these.
+    pass
+
+
+def handle_slave_linkready(bus, msg, packet):
+    # Handle linkready message from slave.
+    #
+    # We expect to see one of these before we start sending our
+    # own heartbeat message to slave.
+    # Once we start sending our heartbeat to slave once per
+    # second, it should no longer send these linkready messages.
+    # If slave doesn't hear master's heartbeat for around 10
+    # seconds, it sends linkready once per 10 seconds and starts
+    # flashing its red LED 4 times with the top green light on.
+    # Red LED stops flashing if we start sending heartbeat
+    # again.
+    senderID = packet["SenderID"]
+    sign = packet["Sign"]
+    maxAmps = packet["MaxAmps"]
+
+    logger.info(
+        "%.2f amp slave TWC %02X%02X is ready to link.  Sign: %s"
+        % (maxAmps, senderID[0], senderID[1], hex_str(sign))
+    )
+
+    if maxAmps >= 80:
+        # U.S. chargers need a spike to 21A to cancel a 6A
+        # charging limit imposed in an Oct 2017 Tesla car
+        # firmware update. See notes where
+        # spikeAmpsToCancel6ALimit is used.
+        master.setSpikeAmps(21)
+    else:
+        # EU chargers need a spike to only 16A.  This value
+        # comes from a forum post and has not been directly
+        # tested.
+        master.setSpikeAmps(16)
+
+    if senderID == bus.TWCID:
+        logger.info(
+            "Slave TWC %02X%02X reports same TWCID as master.  "
+            "Slave should resolve by changing its TWCID." % (senderID[0], senderID[1])
+        )
+        # I tested sending a linkready to a real master with the
+        # same TWCID as master and instead of master sending back
+        # its heartbeat message, it sent 5 copies of its
+        # linkready1 and linkready2 messages. Those messages
+        # will prompt a real slave to pick a new random value
+        # for its TWCID.
+        #
+        # We mimic that behavior by setting the bus numInitMsgsToSend =
+        # 10 to make the idle code at the top of the for()
+        # loop send 5 copies of linkready1 and linkready2.
+        bus.numInitMsgsToSend = 10
+        return
+
+    # We should always get this linkready message at least once
+    # and generally no more than once, so this is a good
+    # opportunity to add the slave to our known pool of slave
+    # devices.
+    slaveTWC = master.newSlave(senderID, maxAmps, bus)
+    if not slaveTWC:
+        return
+
+    if slaveTWC.protocolVersion == 1 and slaveTWC.minAmpsTWCSupports == 6:
+        if len(msg) == 14:
+            slaveTWC.protocolVersion = 1
+            slaveTWC.minAmpsTWCSupports = 5
+        elif len(msg) == 16:
+            slaveTWC.protocolVersion = 2
+            slaveTWC.minAmpsTWCSupports = 6
+
+        logger.info(
+            "Set slave TWC %02X%02X protocolVersion to %d, minAmpsTWCSupports to %d."
+            % (
+                senderID[0],
+                senderID[1],
+                slaveTWC.protocolVersion,
+                slaveTWC.minAmpsTWCSupports,
+            )
+        )
+
+    # We expect maxAmps to be 80 on U.S. chargers and 32 on EU
+    # chargers. Either way, don't allow
+    # slaveTWC.wiringMaxAmps to be greater than maxAmps.
+    if slaveTWC.wiringMaxAmps > maxAmps:
+        logger.info(
+            "\n\n!!! DANGER DANGER !!!\nYou have set wiringMaxAmpsPerTWC to "
+            + str(config["config"]["wiringMaxAmpsPerTWC"])
+            + " which is greater than the max "
+            + str(maxAmps)
+            + " amps your charger says it can handle.  "
+            "Please review instructions in the source code and consult an "
+            "electrician if you don't know what to do."
+        )
+        slaveTWC.wiringMaxAmps = maxAmps / 4
+
+    # Make sure we print one SHB message after a slave
+    # linkready message is received by clearing
+    # lastHeartbeatDebugOutput. This helps with debugging
+    # cases where I can't tell if we responded with a
+    # heartbeat or not.
+    slaveTWC.lastHeartbeatDebugOutput = ""
+
+    slaveTWC.timeLastRx = time.time()
+    bus.heartbeatScheduler.sendHeartbeat(slaveTWC)
+
+
+def handle_slave_heartbeat(bus, msg, packet):
+    # Handle heartbeat message from slave.
+    #
+    # These messages come in as a direct response to each
+    # heartbeat message from master. Slave does not send its
+    # heartbeat until it gets one from master first.
+    # A real master sends heartbeat to a slave around once per
+    # second, so we do the same near the top of this for()
+    # loop. Thus, we should receive a heartbeat reply from the
+    # slave around once per second as well.
+    senderID = packet["SenderID"]
+    receiverID = packet["RecieverID"]
+    heartbeatData = packet["HeartbeatData"]
+
+    try:
+        slaveTWC = bus.getSlaveByID(senderID)
+    except KeyError:
+        # Normally, a slave only sends us a heartbeat message if
+        # we send them ours first, so it's not expected we would
+        # hear heartbeat from a slave that's not in our list.
+        logger.info(
+            "ERROR: Received heartbeat message from "
+            "slave %02X%02X that we've not met before." % (senderID[0], senderID[1])
+        )
+        return
+
+    if bus.TWCID == receiverID:
+        bus.heartbeatScheduler.responseReceived(senderID)
+        slaveTWC.receive_slave_heartbeat(heartbeatData)
+    else:
+        # I've tried different fakeTWCID values to verify a
+        # slave will send our fakeTWCID back to us as
+        # receiverID. However, I once saw it send receiverID =
+        # 0000.
+        # I'm not sure why it sent 0000 and it only happened
+        # once so far, so it could have been corruption in the
+        # data or an unusual case.
+        logger.info(
+            "WARNING: Slave TWC %02X%02X status data: "
+            "%s sent to unknown TWC %02X%02X."
+            % (
+                senderID[0],
+                senderID[1],
+                hex_str(heartbeatData),
+                receiverID[0],
+                receiverID[1],
+            )
+        )
+
+
+def handle_slave_voltage_response(bus, msg, packet):
+    # Handle kWh total and voltage message from slave.
+    #
+    # This message can only be generated by TWCs running newer
+    # firmware.  I believe it's only sent as a response to a
+    # message from Master in this format:
+    #   FB EB <Master TWCID> <Slave TWCID> 00 00 00 00 00 00 00 00 00
+    # According to FuzzyLogic, this message has the following
+    # format on an EU (3-phase) TWC:
+    #   FD EB <Slave TWCID> 00000038 00E6 00F1 00E8 00
+    #   00000038 (56) is the total kWh delivered to cars
+    #     by this TWC since its construction.
+    #   00E6 (230) is voltage on phase A
+    #   00F1 (241) is voltage on phase B
+    #   00E8 (232) is voltage on phase C
+    #
+    # I'm guessing in world regions with two-phase power that
+    # this message would be four bytes shorter, but the message
+    # table accepts it at any of the lengths we receive on the bus
+    # so long as there is room for all three phases.
+    senderID = packet["SenderID"]
+    kWh = packet["LifetimekWh"]
+    voltsPhaseA = packet["VoltsPhaseA"]
+    voltsPhaseB = packet["VoltsPhaseB"]
+    voltsPhaseC = packet["VoltsPhaseC"]
+
+    logger.info(
+        "Slave TWC %02X%02X: Delivered %d kWh, voltage per phase: (%d, %d, %d).",
+        senderID[0],
+        senderID[1],
+        kWh,
+        voltsPhaseA,
+        voltsPhaseB,
+        voltsPhaseC,
+        extra={
+            "logtype": "slave_status",
+            "TWCID": senderID,
+            "kWh": kWh,
+            "voltsPerPhase": [voltsPhaseA, voltsPhaseB, voltsPhaseC],
+        },
+    )
+
+    # Set minAmpsTWCSupports to 1A for 3 phase chargers
+    slaveTWC = bus.slaveTWCs.get(senderID, None)
+    if slaveTWC and voltsPhaseA >= 200 and voltsPhaseB >= 200 and voltsPhaseC >= 200:
+        slaveTWC.minAmpsTWCSupports = 1
+        logger.debug(
+            "Slave TWC %02X%02X: Set minAmpsTWCSupports to 1A",
+            senderID[0],
+            senderID[1],
+        )
+
+    # Update the timestamp of the last reciept of this message
+    master.lastkWhMessage = time.time()
+
+    # Every time we get this message, we re-queue the query
+    master.queue_background_task({"cmd": "getLifetimekWh"})
+
+    # Update this detail for the Slave TWC
+    master.updateSlaveLifetime(senderID, kWh, voltsPhaseA, voltsPhaseB, voltsPhaseC)
+
+
+def handle_slave_vin(bus, msg, packet):
+    # Get 7 characters of VIN from slave. (XE is first 7, XF second 7)
+    #
+    # This message can only be generated by TWCs running newer
+    # firmware.  I believe it's only sent as a response to a
+    # message from Master in this format:
+    #   FB EE <Master TWCID> <Slave TWCID> 00 00 00 00 00 00 00 00 00
+
+    # Response message is FD EE <Slave TWCID> VV VV VV VV VV VV VV where VV is an ascii character code
+    # representing a letter or number. VV will be all zero when car CAN communication is disabled
+    # (DIP switch 2 down) or when a non-Tesla vehicle is plugged in using something like a JDapter.
+
+    vinPart = packet["VINPart"]
+    senderID = packet["SenderID"]
+    data = packet["VINData"]
+
+    logger.log(
+        logging.INFO6,
+        "Slave TWC %02X%02X reported VIN data: %s."
+        % (senderID[0], senderID[1], hex_str(data)),
+    )
+    slaveTWC = bus.getSlaveByID(senderID)
+    slaveTWC.VINData[vinPart] = data.decode("utf-8").rstrip("\x00")
+    if vinPart < 2:
+        vinPart += 1
+        master.queue_background_task(
+            {
+                "cmd": "getVehicleVIN",
+                "slaveTWC": senderID,
+                "vinPart": str(vinPart),
+            }
+        )
+    else:
+        potentialVIN = "".join(slaveTWC.VINData)
+
+        # Ensure we have a valid VIN
+        vinValid = True
+
+        if len(potentialVIN) != 17 and len(potentialVIN) != 0:
+            vinValid = False
+
+        if vinValid and len(potentialVIN) == 17:
+            potentialVIN = potentialVIN.upper()
+            check = potentialVIN[8]
+            if check == "X":
+                check = 10
+            elif check.isdigit():
+                check = int(check)
+            else:
+                vinValid = False
+
+        if vinValid and len(potentialVIN) == 17:
+            weights = [
+                8,
+                7,
+                6,
+                5,
+                4,
+                3,
+                2,
+                10,
+                0,
+                9,
+                8,
+                7,
+                6,
+                5,
+                4,
+                3,
+                2,
+            ]
+            replaceValues = {
+                "A": 1,
+                "B": 2,
+                "C": 3,
+                "D": 4,
+                "E": 5,
+                "F": 6,
+                "G": 7,
+                "H": 8,
+                "J": 1,
+                "K": 2,
+                "L": 3,
+                "M": 4,
+                "N": 5,
+                "P": 7,
+                "R": 9,
+                "S": 2,
+                "T": 3,
+                "U": 4,
+                "V": 5,
+                "W": 6,
+                "X": 7,
+                "Y": 8,
+                "Z": 9,
+                "1": 1,
+                "2": 2,
+                "3": 3,
+                "4": 4,
+                "5": 5,
+                "6": 6,
+                "7": 7,
+                "8": 8,
+                "9": 9,
+                "0": 0,
+            }
+
+            sum = 0
+            for digit, weight in zip(potentialVIN, weights):
+                if digit not in replaceValues:
+                    vinValid = False
+                    break
+                sum += replaceValues[digit] * weight
+            if sum % 11 != check:
+                vinValid = False
+
+        if vinValid and len(potentialVIN) == 0:
+            # All VIN parts are empty - non-Tesla vehicle or CAN
+            # communication disabled (DIP switch 2 down). Stop
+            # querying; there is no VIN to retrieve.
+            slaveTWC.lastVINQuery = 0
+            slaveTWC.vinQueryAttempt = 0
+        elif vinValid:
+            # Record Vehicle VIN
+            slaveTWC.currentVIN = potentialVIN
+
+            # Clear VIN retry timer
+            slaveTWC.lastVINQuery = 0
+            slaveTWC.vinQueryAttempt = 0
+
+            # Record this vehicle being connected
+            master.recordVehicleVIN(slaveTWC)
+
+            # Send VIN data to Status modules
+            master.updateVINStatus()
+
+            # Establish if this VIN should be able to charge
+            # If not, send stop command
+            master.queue_background_task(
+                {
+                    "cmd": "checkVINEntitlement",
+                    "subTWC": slaveTWC,
+                }
+            )
+
+            vinPart += 1
+        else:
+            # Unfortunately the VIN was not received correctly.
+            # Re-request VIN
+            master.queue_background_task(
+                {
+                    "cmd": "getVehicleVIN",
+                    "slaveTWC": slaveTWC.TWCID,
+                    "vinPart": 0,
+                }
+            )
+
+    logger.log(
+        logging.INFO6,
+        "Current VIN string is: %s at part %d." % (str(slaveTWC.VINData), vinPart),
+    )
+
+
+def handle_twc_in_master_mode(bus, msg, packet):
+    logger.info(
+        "ERROR: TWC is set to Master mode so it can't be controlled by TWCManager.  "
+        "Search installation instruction PDF for 'rotary switch' and set "
+        "switch so its arrow points to F on the dial."
+    )
+
+
+def handle_master_linkready(bus, msg, packet):
+    # Handle linkready1 or linkready2 from master.
+    # See notes in send_master_linkready1() and send_master_linkready2() for
+    # details.
+    senderID = packet["SenderID"]
+    sign = packet["Sign"]
+    master.setMasterTWCID(senderID)
+
+    # This message seems to always contain seven 00 bytes in its
+    # data area. If we ever get this message with non-00 data
+    # we'll print it as an unexpected message.
+    logger.info(
+        "Master TWC %02X%02X %s.  Sign: %s"
+        % (senderID[0], senderID[1], packet["Command"][6:], hex_str(sign))
+    )
+
+    if senderID == bus.TWCID:
+        master.master_id_conflict()
+
+    # Other than picking a new fakeTWCID if ours conflicts with
+    # master, it doesn't seem that a real slave will make any
+    # sort of direct response when sent a master's linkready1 or
+    # linkready2.
+
+
+def handle_master_heartbeat(bus, msg, packet):
+    global timeLastkWhDelivered, timeLastkWhSaved, timeTo0Aafter06, timeToRaise2A
+
+    # Handle heartbeat message from Master.
+    senderID = packet["SenderID"]
+    receiverID = packet["RecieverID"]
+    heartbeatData = packet["HeartbeatData"]
+    master.setMasterTWCID(senderID)
+    try:
+        slaveTWC = master.slaveTWCs[receiverID]
+    except KeyError:
+        slaveTWC = master.newSlave(receiverID, 80)
+
+    slaveTWC.masterHeartbeatData = heartbeatData
+
+    if receiverID != bus.TWCID:
+        # This message was intended for another slave.
+        # Ignore it.
+        logger.log(
+            logging.DEBUG2,
+            "Master %02X%02X sent "
+            "heartbeat message %s to receiver %02X%02X "
+            "that isn't our fake slave."
+            % (
+                senderID[0],
+                senderID[1],
+                hex_str(heartbeatData),
+                receiverID[0],
+                receiverID[1],
+            ),
+        )
+        return
+
+    amps = (master.slaveHeartbeatData[1] << 8) + master.slaveHeartbeatData[2]
+    master.addkWhDelivered(
+        (master.convertAmpsToWatts(amps / 100) / 1000 / 60 / 60)
+        * (now - timeLastkWhDelivered)
+    )
+    timeLastkWhDelivered = now
+    if time.time() - timeLastkWhSaved >= 300.0:
+        timeLastkWhSaved = now
+        logger.log(
+            logging.INFO9,
+            "Fake slave has delivered %.3fkWh" % (master.getkWhDelivered()),
+        )
+        # Save settings to file
+        master.markSettingsDirty()
+
+    if heartbeatData[0] == 0x07:
+        # Lower amps in use (not amps allowed) by 2 for 10
+        # seconds. Set state to 07.
+        master.slaveHeartbeatData[0] = heartbeatData[0]
+        timeToRaise2A = now + 10
+        amps -= 280
+        master.slaveHeartbeatData[3] = (amps >> 8) & 0xFF
+        master.slaveHeartbeatData[4] = amps & 0xFF
+    elif heartbeatData[0] == 0x06:
+        # Raise amp setpoint by 2 permanently and reply with
+        # state 06.  After 44 seconds, report state 0A.
+        timeTo0Aafter06 = now + 44
+        master.slaveHeartbeatData[0] = heartbeatData[0]
+        amps += 200
+        master.slaveHeartbeatData[1] = (amps >> 8) & 0xFF
+        master.slaveHeartbeatData[2] = amps & 0xFF
+        amps -= 80
+        master.slaveHeartbeatData[3] = (amps >> 8) & 0xFF
+        master.slaveHeartbeatData[4] = amps & 0xFF
+    elif (
+        heartbeatData[0] == 0x05 or heartbeatData[0] == 0x08 or heartbeatData[0] == 0x09
+    ):
+        if ((heartbeatData[1] << 8) + heartbeatData[2]) > 0:
+            # A real slave mimics master's status bytes [1]-[2]
+            # representing max charger power even if the master
+            # sends it a crazy value.
+            master.slaveHeartbeatData[1] = heartbeatData[1]
+            master.slaveHeartbeatData[2] = heartbeatData[2]
+
+            ampsUsed = (heartbeatData[1] << 8) + heartbeatData[2]
+            ampsUsed -= 80
+            master.slaveHeartbeatData[3] = (ampsUsed >> 8) & 0xFF
+            master.slaveHeartbeatData[4] = ampsUsed & 0xFF
+    elif heartbeatData[0] == 0:
+        if timeTo0Aafter06 > 0 and timeTo0Aafter06 < now:
+            timeTo0Aafter06 = 0
+            master.slaveHeartbeatData[0] = 0x0A
+        elif timeToRaise2A > 0 and timeToRaise2A < now:
+            # Real slave raises amps used by 2 exactly 10
+            # seconds after being sent into state 07. It raises
+            # a bit slowly and sets its state to 0A 13 seconds
+            # after state 07. We aren't exactly emulating that
+            # timing here but hopefully close enough.
+            timeToRaise2A = 0
+            amps -= 80
+            master.slaveHeartbeatData[3] = (amps >> 8) & 0xFF
+            master.slaveHeartbeatData[4] = amps & 0xFF
+            master.slaveHeartbeatData[0] = 0x0A
+    elif heartbeatData[0] == 0x02:
+        logger.info(
+            "Master heartbeat contains error %ld: %s"
+            % (heartbeatData[1], hex_str(heartbeatData))
+        )
+    else:
+        logger.info("UNKNOWN MHB state %s" % (hex_str(heartbeatData)))
+
+    # Slaves always respond to master's heartbeat by sending
+    # theirs back.
+    slaveTWC.send_slave_heartbeat(senderID)
+    slaveTWC.print_status(master.slaveHeartbeatData)
+
+
+def handle_master_idle(bus, msg, packet):
+    # Handle 2-hour idle message
+    #
+    # This message is sent from a Master TWC three times in a
+    # row every 2 hours:
+    #   c0 fc 1d 00 00 00 00 00 00 00 00 00 00 00 1d c0
+    #
+    # I'd say this is used to indicate the master is still
+    # alive, but it doesn't contain the Master's TWCID or any other
+    # data so I don't see what any receiving TWC can do with it.
+    #
+    # I suspect this message is only sent when the master
+    # doesn't see any other TWCs on the network, so I don't
+    # bother to have our fake master send these messages being
+    # as there's no point in playing a fake master with no
+    # slaves around.
+    logger.info("Received 2-hour idle message from Master.")
+
+
+def handle_other_slave_linkready(bus, msg, packet):
+    # Handle linkready message from slave on network that
+    # presumably isn't us.
+    senderID = packet["SenderID"]
+    sign = packet["Sign"]
+    maxAmps = packet["MaxAmps"]
+    logger.info(
+        "%.2f amp slave TWC %02X%02X is ready to link.  Sign: %s"
+        % (maxAmps, senderID[0], senderID[1], hex_str(sign))
+    )
+    if senderID == bus.TWCID:
+        logger.info(
+            "ERROR: Received slave heartbeat message from "
+            "slave %02X%02X that has the same TWCID as our fake slave."
+            % (senderID[0], senderID[1])
+        )
+        return
+
+    master.newSlave(senderID, maxAmps)
+
+
+def handle_other_slave_heartbeat(bus, msg, packet):
+    # Handle heartbeat message from slave on network that
+    # presumably isn't us.
+    senderID = packet["SenderID"]
+    heartbeatData = packet["HeartbeatData"]
+
+    if senderID == bus.TWCID:
+        logger.info(
+            "ERROR: Received slave heartbeat message from "
+            "slave %02X%02X that has the same TWCID as our fake slave."
+            % (senderID[0], senderID[1])
+        )
+        return
+
+    try:
+        slaveTWC = master.slaveTWCs[senderID]
+    except KeyError:
+        # Slave is unlikely to send another linkready since it's
+        # already linked with a real Master TWC, so just assume
+        # it's 80A.
+        slaveTWC = master.newSlave(senderID, 80)
+
+    slaveTWC.print_status(heartbeatData)
+
+
+def handle_voltage_request(bus, msg, packet):
+    # Handle voltage request message.  This is only supported in
+    # Protocol 2 so we always reply with a 16-byte message.
+    senderID = packet["SenderID"]
+    receiverID = packet["RecieverID"]
+
+    if senderID == bus.TWCID:
+        logger.info(
+            "ERROR: Received voltage request message from "
+            "TWC %02X%02X that has the same TWCID as our fake slave."
+            % (senderID[0], senderID[1])
+        )
+        return
+
+    logger.log(
+        logging.INFO8,
+        "VRQ from %02X%02X to %02X%02X"
+        % (senderID[0], senderID[1], receiverID[0], receiverID[1]),
+    )
+
+    if receiverID == bus.TWCID:
+        kWhCounter = int(master.getkWhDelivered())
+        kWhPacked = bytearray(
+            [
+                ((kWhCounter >> 24) & 0xFF),
+                ((kWhCounter >> 16) & 0xFF),
+                ((kWhCounter >> 8) & 0xFF),
+                (kWhCounter & 0xFF),
+            ]
+        )
+        logger.info(
+            "VRS %02X%02X: %dkWh (%s) %dV %dV %dV"
+            % (
+                bus.TWCID[0],
+                bus.TWCID[1],
+                kWhCounter,
+                hex_str(kWhPacked),
+                240,
+                0,
+                0,
+            )
+        )
+        bus.interface.send(
+            bytearray(b"\xfd\xeb")
+            + bus.TWCID
+            + kWhPacked
+            + bytearray(b"\x00\xf0\x00\x00\x00\x00\x00")
+        )
+
+
+def handle_other_voltage_response(bus, msg, packet):
+    # Handle voltage response message.
+    # Example US value:
+    #   FD EB 7777 00000014 00F6 0000 0000 00
+    # EU value (3 phase power):
+    #   FD EB 7777 00000038 00E6 00F1 00E8 00
+    senderID = packet["SenderID"]
+    kWhCounter = packet["LifetimekWh"]
+    voltsPhaseA = packet["VoltsPhaseA"]
+    voltsPhaseB = packet["VoltsPhaseB"]
+    voltsPhaseC = packet["VoltsPhaseC"]
+
+    # Update this detail for the Slave TWC
+    master.updateSlaveLifetime(
+        senderID, kWhCounter, voltsPhaseA, voltsPhaseB, voltsPhaseC
+    )
+
+    if senderID == bus.TWCID:
+        logger.info(
+            "ERROR: Received voltage response message from "
+            "TWC %02X%02X that has the same TWCID as our fake slave."
+            % (senderID[0], senderID[1])
+        )
+        return
+
+    # Publish Lifetime kWh Value via Status modules
+    # with this in any scenario ,including fakeMaster = 2, MQTT/HASS will get Status update
+    for module in master.getModulesByType("Status"):
+        module["ref"].setStatus(
+            senderID, "lifetime_kwh", "lifetimekWh", kWhCounter, "kWh"
+        )
+
+    logger.info(
+        "VRS %02X%02X: %dkWh %dV %dV %dV"
+        % (
+            senderID[0],
+            senderID[1],
+            kWhCounter,
+            voltsPhaseA,
+            voltsPhaseB,
+            voltsPhaseC,
+        )
+    )
+
+
+# Handlers for each message type we act on, keyed by the Command name that
+# the message table in Protocol/TWCMessages.py gives the message.
+#
+# When we pretend to be a master TWC, we handle messages from slaves:
+fakeMasterHandlers = {
+    "StartAck": handle_slave_ack,
+    "StopAck": handle_slave_ack,
+    "SlaveLinkready": handle_slave_linkready,
+    "SlaveHeartbeat": handle_slave_heartbeat,
+    "VoltageResponse": handle_slave_voltage_response,
+    "VIN": handle_slave_vin,
+    "MasterLinkready1": handle_twc_in_master_mode,
+    "MasterModeLinkready": handle_twc_in_master_mode,
+}
+
+# When we pretend to be a slave TWC, we handle messages from the master and
+# from any other slaves on the network:
+fakeSlaveHandlers = {
+    "MasterLinkready1": handle_master_linkready,
+    "MasterLinkready2": handle_master_linkready,
+    "MasterHeartbeat": handle_master_heartbeat,
+    "MasterIdle": handle_master_idle,
+    "SlaveLinkready": handle_other_slave_linkready,
+    "SlaveHeartbeat": handle_other_slave_heartbeat,
+    "VoltageRequest": handle_voltage_request,
+    "VoltageResponse": handle_other_voltage_response,
+}
+
+
 #
 # End functions
 #
@@ -650,16 +1391,6 @@ def update_sunrise_sunset():
 # Begin global vars
 #
 
-data = ""
-dataLen = 0
-ignoredData = bytearray()
-msg = bytearray()
-msgLen = 0
-
-numInitMsgsToSend = 10
-msgRxCount = 0
-
-idxSlaveToSendNextHeartbeat = 0
 timeLastkWhDelivered = time.time()
 timeLastkWhSaved = time.time()
 timeLastHeartbeatDebugOutput = 0
@@ -688,38 +1419,49 @@ master = TWCMaster(fakeTWCID, config)
 # Update LoggerFactory with the actual master instance
 LoggerFactory.set_master(master)
 
-# Instantiate all modules in the modules_available list automatically
+# Instantiate each module enabled in config.json
 modules_loaded = 0
 modules_skipped = 0
 modules_failed = 0
+modules_profile = []
 
-for module in modules_available:
-    modulename = []
-    if str(module).find(".") != -1:
-        modulename = str(module).split(".")
+for entry in moduleRegistry:
+    module = entry.name
 
     try:
-        # Pre-emptively skip modules that we know are not configured
-        configlocation = master.translateModuleNameToConfig(modulename)
-        if (
-            not config.get(configlocation[0], {})
-            .get(configlocation[1], {})
-            .get("enabled", 1)
-        ):
-            # We can see that this module is explicitly disabled in config, skip it
+        # Skip modules that aren't configured, without importing them
+        if not entry.isEnabled(config):
             modules_skipped += 1
             continue
 
-        moduleref = importlib.import_module("TWCManager." + module)
-        modclassref = getattr(moduleref, modulename[1])
+        started = time.perf_counter()
+        modclassref = entry.load()
+        imported = time.perf_counter()
         modinstance = modclassref(master)
+        modules_profile.append(
+            (module, imported - started, time.perf_counter() - imported)
+        )
 
         # Register the new module with master class, so every other module can
         # interact with it
         master.registerModule(
-            {"name": modulename[1], "ref": modinstance, "type": modulename[0]}
+            {"name": entry.className, "ref": modinstance, "type": entry.type}
         )
         modules_loaded += 1
+
+        # Modules which connect to a device or service do so in the
+        # background, rather than holding up the modules after them
+        if hasattr(modinstance, "connectModule") and master.modules.get(
+            entry.className
+        ):
+            master.moduleConnector.connect(
+                entry.className,
+                entry.type,
+                modinstance,
+                (entry.getConfig(config) or {}).get(
+                    "connectTimeout", configSnapshot.moduleConnectTimeout
+                ),
+            )
     except ImportError as e:
         logger.error(
             "FAIL: %s - ImportError: %s",
@@ -792,22 +1534,86 @@ if _gen3_cfg.get("enabled", False):
         logger.warning("Could not register Gen3TWCs: %s", _e)
 
 
+# The first RS485 bus is the one on the interface module loaded above, and is
+# run by the main loop below. Any additional buses listed in
+# config.interface.buses each get their own interface, and are run in their
+# own thread.
+bus = TWCBus(
+    master,
+    master.getModulesByType("Interface")[0]["name"],
+    master.getInterfaceModule(),
+    master.getFakeTWCID(),
+)
+master.addBus(bus)
+
+for busNum, busConfig in enumerate(config["interface"].get("buses", [])):
+    busName = busConfig.get("name", "bus%d" % (busNum + 2))
+    if configSnapshot.fakeMaster != 1:
+        logger.error(
+            "FAIL: %s - Additional buses are only supported when fakeMaster is 1",
+            busName,
+            extra={"colored": "red"},
+        )
+        continue
+    try:
+        moduleref = importlib.import_module("TWCManager.Interface." + busConfig["type"])
+        interface = getattr(moduleref, busConfig["type"])(master, busConfig)
+    except Exception as e:
+        logger.error(
+            "FAIL: %s - %s: %s",
+            busName,
+            type(e).__name__,
+            str(e),
+            extra={"colored": "red"},
+        )
+        continue
+
+    # Each bus needs a fake master TWCID of its own. We count up from ours
+    # unless one is configured.
+    if busConfig.get("fakeTWCID", None):
+        busTWCID = bytearray.fromhex(busConfig["fakeTWCID"])
+    else:
+        busTWCID = bytearray([fakeTWCID[0], (fakeTWCID[1] + busNum + 1) & 0xFF])
+    master.addBus(TWCBus(master, busName, interface, busTWCID))
+
 # Load settings from file
 master.loadSettings()
 
-# Create a background thread to handle tasks that take too long on the main
-# thread.  For a primer on threads in Python, see:
+# Register the handlers for our own background tasks. Modules register
+# theirs with master.registerBackgroundTask() when they are loaded.
+register_background_tasks()
+
+# Create background threads to handle tasks that take too long on the main
+# thread, one for each lane of tasks.  For a primer on threads in Python, see:
 # http://www.laurentluce.com/posts/python-threads-synchronization-locks-rlocks-semaphores-conditions-events-and-queues/
-backgroundTasksThread = threading.Thread(target=background_tasks_thread, args=(master,))
-backgroundTasksThread.daemon = True
-backgroundTasksThread.start()
+backgroundTasksThreads = master.backgroundTasks.start(background_tasks_thread, master)
+
+# Set up the reactor which lets the main loop wait for incoming data rather
+# than polling for it, if enabled in the config.
+reactor = Reactor(master)
+
+for extraBus in master.getBuses()[1:]:
+    logger.info(
+        "Starting bus %s as fake Master with id %02X%02X"
+        % (extraBus.name, extraBus.TWCID[0], extraBus.TWCID[1])
+    )
+    extraBus.start(fakeMasterHandlers, Reactor(master, extraBus))
 
 master.queue_background_task({"cmd": "sunrise"}, 30)
+master.queue_background_task({"cmd": "compactSessions"}, 300)
+
+# Give modules still connecting until their deadline. Any which haven't
+# connected by then are degraded until they do, but don't stop the main
+# loop from starting.
+master.moduleConnector.wait()
+
+if profileStartup:
+    log_startup_profile()
 
 logger.info(
     "TWC Manager starting as fake %s with id %02X%02X and sign %02X"
     % (
-        ("Master" if config["config"]["fakeMaster"] else "Slave"),
+        ("Master" if configSnapshot.fakeMaster else "Slave"),
         ord(fakeTWCID[0:1]),
         ord(fakeTWCID[1:2]),
         ord(master.getSlaveSign()),
@@ -838,64 +1644,25 @@ while True:
         # would corrupt both messages.
 
         # Add a 25ms sleep to prevent pegging pi's CPU at 100%. Lower CPU means
-        # less power used and less waste heat.
-        time.sleep(0.025)
+        # less power used and less waste heat. We skip this if there are still
+        # messages waiting from the last read of the interface.
+        #
+        # In reactor mode, we instead wait until data arrives on the interface
+        # or it is time to send our next periodic message.
+        if not bus.rxFrames:
+            if reactor.enabled:
+                reactor.wait(time_to_next_periodic_message())
+            else:
+                time.sleep(0.025)
 
         now = time.time()
 
-        if config["config"]["fakeMaster"] == 1:
+        if configSnapshot.fakeMaster == 1:
             # A real master sends 5 copies of linkready1 and linkready2 whenever
-            # it starts up, which we do here.
-            # It doesn't seem to matter if we send these once per second or once
-            # per 100ms so I do once per 100ms to get them over with.
-            if numInitMsgsToSend > 5:
-                master.send_master_linkready1()
-                time.sleep(0.1)  # give slave time to respond
-                numInitMsgsToSend -= 1
-            elif numInitMsgsToSend > 0:
-                master.send_master_linkready2()
-                time.sleep(0.1)  # give slave time to respond
-                numInitMsgsToSend = numInitMsgsToSend - 1
-            else:
-                # After finishing the 5 startup linkready1 and linkready2
-                # messages, master will send a heartbeat message to every slave
-                # it's received a linkready message from. Do that here.
-                # A real master would keep sending linkready messages periodically
-                # as long as no slave was connected, but since real slaves send
-                # linkready once every 10 seconds till they're connected to a
-                # master, we'll just wait for that.
-                if time.time() - master.getTimeLastTx() >= 1.0:
-                    # It's been about a second since our last heartbeat.
-                    if master.countSlaveTWC() > 0:
-                        # Run centralized EVSE power distribution once per
-                        # full round-robin cycle (when index wraps to 0).
-                        if idxSlaveToSendNextHeartbeat == 0:
-                            master.distributeEVSEPower()
-
-                        slaveTWC = master.getSlaveTWC(idxSlaveToSendNextHeartbeat)
-                        if time.time() - slaveTWC.timeLastRx > config.get(
-                            "interfaces", {}
-                        ).get("RS485", {}).get("slaveTimeout", 26):
-                            # A real master stops sending heartbeats to a slave
-                            # that hasn't responded for ~26 seconds. It may
-                            # still send the slave a heartbeat every once in
-                            # awhile but we're just going to scratch the slave
-                            # from our little black book and add them again if
-                            # they ever send us a linkready.
-                            logger.info(
-                                "WARNING: We haven't heard from slave "
-                                "%02X%02X for over 26 seconds.  "
-                                "Stop sending them heartbeat messages."
-                                % (slaveTWC.TWCID[0], slaveTWC.TWCID[1])
-                            )
-                            master.deleteSlaveTWC(slaveTWC.TWCID)
-                        else:
-                            slaveTWC.send_master_heartbeat()
-
-                        idxSlaveToSendNextHeartbeat = idxSlaveToSendNextHeartbeat + 1
-                        if idxSlaveToSendNextHeartbeat >= master.countSlaveTWC():
-                            idxSlaveToSendNextHeartbeat = 0
-                        time.sleep(0.1)  # give slave time to respond
+            # it starts up, then sends a heartbeat message to every slave it's
+            # received a linkready message from. The bus works out which of
+            # those, if any, is due now.
+            bus.sendPeriodicMessages(now)
         else:
             # As long as a slave is running, it sends link ready messages every
             # 10 seconds. They trigger any master on the network to handshake
@@ -908,7 +1675,7 @@ while True:
             # ready as long as we send status updates in response to master's
             # status updates.
             if (
-                config["config"]["fakeMaster"] != 2
+                configSnapshot.fakeMaster != 2
                 and time.time() - master.getTimeLastTx() >= 10.0
             ):
                 logger.info(
@@ -929,7 +1696,7 @@ while True:
 
         # If it has been more than 2 minutes since the last kWh value,
         # queue the command to request it from slaves
-        if config["config"]["fakeMaster"] == 1 and (
+        if configSnapshot.fakeMaster == 1 and (
             (time.time() - master.lastkWhMessage) > (60 * 2)
         ):
             master.lastkWhMessage = time.time()
@@ -952,616 +1719,27 @@ while True:
         ########################################################################
         # See if there's an incoming message on the input interface.
 
-        timeMsgRxStart = time.time()
-        actualDataLen = 0
-        while True:
-            now = time.time()
-            dataLen = master.getInterfaceModule().getBufferLen()
-            if dataLen == 0:
-                if msgLen == 0:
-                    # No message data waiting and we haven't received the
-                    # start of a new message yet. Break out of inner while
-                    # to continue at top of outer while loop where we may
-                    # decide to send a periodic message.
-                    break
-                else:
-                    # No message data waiting but we've received a partial
-                    # message that we should wait to finish receiving.
-                    if now - timeMsgRxStart >= 2.0:
-                        logger.log(
-                            logging.INFO9,
-                            "Msg timeout ("
-                            + hex_str(ignoredData)
-                            + ") "
-                            + hex_str(msg[0:msgLen]),
-                        )
-                        msgLen = 0
-                        ignoredData = bytearray()
-                        break
-
-                    time.sleep(0.025)
-                    continue
-            else:
-                actualDataLen = dataLen
-                dataLen = 1
-                data = master.getInterfaceModule().read(dataLen)
-
-            if dataLen != 1:
-                # This should never happen
-                logger.info("WARNING: No data available.")
-                break
-
-            timeMsgRxStart = now
-            timeLastRx = now
-            if msgLen == 0 and len(data) > 0 and data[0] != 0xC0:
-                # We expect to find these non-c0 bytes between messages, so
-                # we don't print any warning at standard debug levels.
-                logger.log(
-                    logging.DEBUG2, "Ignoring byte %02X between messages." % (data[0])
-                )
-                ignoredData += data
-                continue
-            elif msgLen > 0 and msgLen < 15 and len(data) > 0 and data[0] == 0xC0:
-                # If you see this when the program is first started, it
-                # means we started listening in the middle of the TWC
-                # sending a message so we didn't see the whole message and
-                # must discard it. That's unavoidable.
-                # If you see this any other time, it means there was some
-                # corruption in what we received. It's normal for that to
-                # happen every once in awhile but there may be a problem
-                # such as incorrect termination or bias resistors on the
-                # rs485 wiring if you see it frequently.
-                logger.debug(
-                    "Found end of message before full-length message received.  "
-                    "Discard and wait for new message."
-                )
-
-                msg = data
-                msgLen = 1
-                continue
-            elif dataLen and len(data) == 0:
-                logger.error(
-                    "We received a buffer length of %s from the RS485 module, but data buffer length is %s. This should not occur."
-                    % (str(actualDataLen), str(len(data)))
-                )
-
-            if msgLen == 0:
-                msg = bytearray()
-            msg += data
-            msgLen += 1
-
-            # Messages are usually 17 bytes or longer and end with \xc0\xfe.
-            # However, when the network lacks termination and bias
-            # resistors, the last byte (\xfe) may be corrupted or even
-            # missing, and you may receive additional garbage bytes between
-            # messages.
-            #
-            # TWCs seem to account for corruption at the end and between
-            # messages by simply ignoring anything after the final \xc0 in a
-            # message, so we use the same tactic. If c0 happens to be within
-            # the corrupt noise between messages, we ignore it by starting a
-            # new message whenever we see a c0 before 15 or more bytes are
-            # received.
-            #
-            # Uncorrupted messages can be over 17 bytes long when special
-            # values are "escaped" as two bytes. See notes in sendMsg.
-            #
-            # To prevent most noise between messages, add a 120ohm
-            # "termination" resistor in parallel to the D+ and D- lines.
-            # Also add a 680ohm "bias" resistor between the D+ line and +5V
-            # and a second 680ohm "bias" resistor between the D- line and
-            # ground. See here for more information:
-            #   https://www.ni.com/support/serial/resinfo.htm
-            #   http://www.ti.com/lit/an/slyt514/slyt514.pdf
-            # This explains what happens without "termination" resistors:
-            #   https://e2e.ti.com/blogs_/b/analogwire/archive/2016/07/28/rs-485-basics-when-termination-is-necessary-and-how-to-do-it-properly
-            if msgLen >= 16 and data[0] == 0xC0:
-                break
-
-        if msgLen >= 16:
-            msg = unescape_msg(msg, msgLen)
-            # Set msgLen = 0 at start so we don't have to do it on errors below.
-            # len($msg) now contains the unescaped message length.
-            msgLen = 0
-
-            msgRxCount += 1
-
-            # When the sendTWCMsg web command is used to send a message to the
-            # TWC, it sets lastTWCResponseMsg = b''.  When we see that here,
-            # set lastTWCResponseMsg to any unusual message received in response
-            # to the sent message.  Never set lastTWCResponseMsg to a commonly
-            # repeated message like master or slave linkready, heartbeat, or
-            # voltage/kWh report.
-            if (
-                master.lastTWCResponseMsg == b""
-                and msg[0:2] != b"\xfb\xe0"
-                and msg[0:2] != b"\xfd\xe0"
-                and msg[0:2] != b"\xfc\xe1"
-                and msg[0:2] != b"\xfb\xe2"
-                and msg[0:2] != b"\xfd\xe2"
-                and msg[0:2] != b"\xfb\xeb"
-                and msg[0:2] != b"\xfd\xeb"
-                and msg[0:2] != b"\xfd\xe0"
-            ):
-                master.lastTWCResponseMsg = msg
-
-            logger.log(
-                logging.INFO9,
-                "Rx@" + ": (" + hex_str(ignoredData) + ") " + hex_str(msg) + "",
-            )
-
-            ignoredData = bytearray()
-
-            # After unescaping special values and removing the leading and
-            # trailing C0 bytes, the messages we know about are always 14 bytes
-            # long in original TWCs, or 16 bytes in newer TWCs (protocolVersion
-            # == 2).
-            if len(msg) != 14 and len(msg) != 16 and len(msg) != 20:
-                logger.info(
-                    "ERROR: Ignoring message of unexpected length %d: %s"
-                    % (len(msg), hex_str(msg))
-                )
-                continue
-
-            checksumExpected = msg[len(msg) - 1]
-            checksum = 0
-            for i in range(1, len(msg) - 1):
-                checksum += msg[i]
-
-            if (checksum & 0xFF) != checksumExpected:
-                logger.info(
-                    "ERROR: Checksum %X does not match %02X.  Ignoring message: %s"
-                    % (checksum, checksumExpected, hex_str(msg))
-                )
-                continue
-
-            if config["config"]["fakeMaster"] == 1:
+        # If we've received the start of a message, the bus keeps reading
+        # until the rest of it arrives, so that we don't start transmitting
+        # in the middle of it.
+        if reactor.enabled:
+            bus.readInterface(reactor.wait)
+        else:
+            bus.readInterface(lambda timeout: time.sleep(0.005))
+
+        if bus.rxFrames:
+            # Handle one message per pass of the outer loop. Any further
+            # messages that arrived in the same read are handled on the
+            # following passes, without the usual 25ms sleep.
+            msg, ignoredData = bus.nextMessage()
+
+            # Look up the message in the message table by its opcode and
+            # length, then pass it to the handler for the mode we're running
+            # in. Each handler returns once it is done with the message.
+            if configSnapshot.fakeMaster == 1:
                 ############################
                 # Pretend to be a master TWC
-
-                foundMsgMatch = False
-                # We end each regex message search below with \Z instead of $
-                # because $ will match a newline at the end of the string or the
-                # end of the string (even without the re.MULTILINE option), and
-                # sometimes our strings do end with a newline character that is
-                # actually the CRC byte with a value of 0A or 0D.
-                msgMatch = re.search(rb"^\xfd\xb1(..)\x00\x00.+\Z", msg, re.DOTALL)
-                if msgMatch and foundMsgMatch == False:
-                    # Handle acknowledgement of Start command
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-
-                msgMatch = re.search(rb"^\xfd\xb2(..)\x00\x00.+\Z", msg, re.DOTALL)
-                if msgMatch and foundMsgMatch == False:
-                    # Handle acknowledgement of Stop command
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-
-                msgMatch = re.search(
-                    rb"^\xfd\xe2(..)(.)(..)\x00\x00\x00\x00\x00\x00.+\Z", msg, re.DOTALL
-                )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle linkready message from slave.
-                    #
-                    # We expect to see one of these before we start sending our
-                    # own heartbeat message to slave.
-                    # Once we start sending our heartbeat to slave once per
-                    # second, it should no longer send these linkready messages.
-                    # If slave doesn't hear master's heartbeat for around 10
-                    # seconds, it sends linkready once per 10 seconds and starts
-                    # flashing its red LED 4 times with the top green light on.
-                    # Red LED stops flashing if we start sending heartbeat
-                    # again.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    sign = msgMatch.group(2)
-                    maxAmps = ((msgMatch.group(3)[0] << 8) + msgMatch.group(3)[1]) / 100
-
-                    logger.info(
-                        "%.2f amp slave TWC %02X%02X is ready to link.  Sign: %s"
-                        % (maxAmps, senderID[0], senderID[1], hex_str(sign))
-                    )
-
-                    if maxAmps >= 80:
-                        # U.S. chargers need a spike to 21A to cancel a 6A
-                        # charging limit imposed in an Oct 2017 Tesla car
-                        # firmware update. See notes where
-                        # spikeAmpsToCancel6ALimit is used.
-                        master.setSpikeAmps(21)
-                    else:
-                        # EU chargers need a spike to only 16A.  This value
-                        # comes from a forum post and has not been directly
-                        # tested.
-                        master.setSpikeAmps(16)
-
-                    if senderID == fakeTWCID:
-                        logger.info(
-                            "Slave TWC %02X%02X reports same TWCID as master.  "
-                            "Slave should resolve by changing its TWCID."
-                            % (senderID[0], senderID[1])
-                        )
-                        # I tested sending a linkready to a real master with the
-                        # same TWCID as master and instead of master sending back
-                        # its heartbeat message, it sent 5 copies of its
-                        # linkready1 and linkready2 messages. Those messages
-                        # will prompt a real slave to pick a new random value
-                        # for its TWCID.
-                        #
-                        # We mimic that behavior by setting numInitMsgsToSend =
-                        # 10 to make the idle code at the top of the for()
-                        # loop send 5 copies of linkready1 and linkready2.
-                        numInitMsgsToSend = 10
-                        continue
-
-                    # We should always get this linkready message at least once
-                    # and generally no more than once, so this is a good
-                    # opportunity to add the slave to our known pool of slave
-                    # devices.
-                    slaveTWC = master.newSlave(senderID, maxAmps)
-
-                    if (
-                        slaveTWC.protocolVersion == 1
-                        and slaveTWC.minAmpsTWCSupports == 6
-                    ):
-                        if len(msg) == 14:
-                            slaveTWC.protocolVersion = 1
-                            slaveTWC.minAmpsTWCSupports = 5
-                        elif len(msg) == 16:
-                            slaveTWC.protocolVersion = 2
-                            slaveTWC.minAmpsTWCSupports = 6
-
-                        logger.info(
-                            "Set slave TWC %02X%02X protocolVersion to %d, minAmpsTWCSupports to %d."
-                            % (
-                                senderID[0],
-                                senderID[1],
-                                slaveTWC.protocolVersion,
-                                slaveTWC.minAmpsTWCSupports,
-                            )
-                        )
-
-                    # We expect maxAmps to be 80 on U.S. chargers and 32 on EU
-                    # chargers. Either way, don't allow
-                    # slaveTWC.wiringMaxAmps to be greater than maxAmps.
-                    if slaveTWC.wiringMaxAmps > maxAmps:
-                        logger.info(
-                            "\n\n!!! DANGER DANGER !!!\nYou have set wiringMaxAmpsPerTWC to "
-                            + str(config["config"]["wiringMaxAmpsPerTWC"])
-                            + " which is greater than the max "
-                            + str(maxAmps)
-                            + " amps your charger says it can handle.  "
-                            "Please review instructions in the source code and consult an "
-                            "electrician if you don't know what to do."
-                        )
-                        slaveTWC.wiringMaxAmps = maxAmps / 4
-
-                    # Make sure we print one SHB message after a slave
-                    # linkready message is received by clearing
-                    # lastHeartbeatDebugOutput. This helps with debugging
-                    # cases where I can't tell if we responded with a
-                    # heartbeat or not.
-                    slaveTWC.lastHeartbeatDebugOutput = ""
-
-                    slaveTWC.timeLastRx = time.time()
-                    slaveTWC.send_master_heartbeat()
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfd\xe0(..)(..)(.......+?).\Z", msg, re.DOTALL
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle heartbeat message from slave.
-                    #
-                    # These messages come in as a direct response to each
-                    # heartbeat message from master. Slave does not send its
-                    # heartbeat until it gets one from master first.
-                    # A real master sends heartbeat to a slave around once per
-                    # second, so we do the same near the top of this for()
-                    # loop. Thus, we should receive a heartbeat reply from the
-                    # slave around once per second as well.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    receiverID = msgMatch.group(2)
-                    heartbeatData = msgMatch.group(3)
-
-                    try:
-                        slaveTWC = master.getSlaveByID(senderID)
-                    except KeyError:
-                        # Normally, a slave only sends us a heartbeat message if
-                        # we send them ours first, so it's not expected we would
-                        # hear heartbeat from a slave that's not in our list.
-                        logger.info(
-                            "ERROR: Received heartbeat message from "
-                            "slave %02X%02X that we've not met before."
-                            % (senderID[0], senderID[1])
-                        )
-                        continue
-
-                    if fakeTWCID == receiverID:
-                        slaveTWC.receive_slave_heartbeat(heartbeatData)
-                    else:
-                        # I've tried different fakeTWCID values to verify a
-                        # slave will send our fakeTWCID back to us as
-                        # receiverID. However, I once saw it send receiverID =
-                        # 0000.
-                        # I'm not sure why it sent 0000 and it only happened
-                        # once so far, so it could have been corruption in the
-                        # data or an unusual case.
-                        logger.info(
-                            "WARNING: Slave TWC %02X%02X status data: "
-                            "%s sent to unknown TWC %02X%02X."
-                            % (
-                                senderID[0],
-                                senderID[1],
-                                hex_str(heartbeatData),
-                                receiverID[0],
-                                receiverID[1],
-                            )
-                        )
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfd\xeb(..)(....)(..)(..)(..)(.+?).\Z", msg, re.DOTALL
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle kWh total and voltage message from slave.
-                    #
-                    # This message can only be generated by TWCs running newer
-                    # firmware.  I believe it's only sent as a response to a
-                    # message from Master in this format:
-                    #   FB EB <Master TWCID> <Slave TWCID> 00 00 00 00 00 00 00 00 00
-                    # According to FuzzyLogic, this message has the following
-                    # format on an EU (3-phase) TWC:
-                    #   FD EB <Slave TWCID> 00000038 00E6 00F1 00E8 00
-                    #   00000038 (56) is the total kWh delivered to cars
-                    #     by this TWC since its construction.
-                    #   00E6 (230) is voltage on phase A
-                    #   00F1 (241) is voltage on phase B
-                    #   00E8 (232) is voltage on phase C
-                    #
-                    # I'm guessing in world regions with two-phase power that
-                    # this message would be four bytes shorter, but the pattern
-                    # above will match a message of any length that starts with
-                    # FD EB.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    lifetimekWh = msgMatch.group(2)
-                    kWh = (
-                        (lifetimekWh[0] << 24)
-                        + (lifetimekWh[1] << 16)
-                        + (lifetimekWh[2] << 8)
-                        + lifetimekWh[3]
-                    )
-                    vPhaseA = msgMatch.group(3)
-                    voltsPhaseA = (vPhaseA[0] << 8) + vPhaseA[1]
-                    vPhaseB = msgMatch.group(4)
-                    voltsPhaseB = (vPhaseB[0] << 8) + vPhaseB[1]
-                    vPhaseC = msgMatch.group(5)
-                    voltsPhaseC = (vPhaseC[0] << 8) + vPhaseC[1]
-                    data = msgMatch.group(6)
-
-                    logger.info(
-                        "Slave TWC %02X%02X: Delivered %d kWh, voltage per phase: (%d, %d, %d).",
-                        senderID[0],
-                        senderID[1],
-                        kWh,
-                        voltsPhaseA,
-                        voltsPhaseB,
-                        voltsPhaseC,
-                        extra={
-                            "logtype": "slave_status",
-                            "TWCID": senderID,
-                            "kWh": kWh,
-                            "voltsPerPhase": [voltsPhaseA, voltsPhaseB, voltsPhaseC],
-                        },
-                    )
-
-                    # Set minAmpsTWCSupports to 1A for 3 phase chargers
-                    if voltsPhaseA >= 200 and voltsPhaseB >= 200 and voltsPhaseC >= 200:
-                        slaveTWC.minAmpsTWCSupports = 1
-                        logger.debug(
-                            "Slave TWC %02X%02X: Set minAmpsTWCSupports to 1A",
-                            senderID[0],
-                            senderID[1],
-                        )
-
-                    # Update the timestamp of the last reciept of this message
-                    master.lastkWhMessage = time.time()
-
-                    # Every time we get this message, we re-queue the query
-                    master.queue_background_task({"cmd": "getLifetimekWh"})
-
-                    # Update this detail for the Slave TWC
-                    master.updateSlaveLifetime(
-                        senderID, kWh, voltsPhaseA, voltsPhaseB, voltsPhaseC
-                    )
-
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfd(\xee|\xef|\xf1)(..)(.+?).\Z", msg, re.DOTALL
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Get 7 characters of VIN from slave. (XE is first 7, XF second 7)
-                    #
-                    # This message can only be generated by TWCs running newer
-                    # firmware.  I believe it's only sent as a response to a
-                    # message from Master in this format:
-                    #   FB EE <Master TWCID> <Slave TWCID> 00 00 00 00 00 00 00 00 00
-
-                    # Response message is FD EE <Slave TWCID> VV VV VV VV VV VV VV where VV is an ascii character code
-                    # representing a letter or number. VV will be all zero when car CAN communication is disabled
-                    # (DIP switch 2 down) or when a non-Tesla vehicle is plugged in using something like a JDapter.
-
-                    foundMsgMatch = True
-                    vinPart = msgMatch.group(1)
-                    senderID = msgMatch.group(2)
-                    data = msgMatch.group(3)
-
-                    logger.log(
-                        logging.INFO6,
-                        "Slave TWC %02X%02X reported VIN data: %s."
-                        % (senderID[0], senderID[1], hex_str(data)),
-                    )
-                    slaveTWC = master.getSlaveByID(senderID)
-                    if vinPart == b"\xee":
-                        vinPart = 0
-                    if vinPart == b"\xef":
-                        vinPart = 1
-                    if vinPart == b"\xf1":
-                        vinPart = 2
-                    slaveTWC.VINData[vinPart] = data.decode("utf-8").rstrip("\x00")
-                    if vinPart < 2:
-                        vinPart += 1
-                        master.queue_background_task(
-                            {
-                                "cmd": "getVehicleVIN",
-                                "slaveTWC": senderID,
-                                "vinPart": str(vinPart),
-                            }
-                        )
-                    else:
-                        potentialVIN = "".join(slaveTWC.VINData)
-
-                        # Ensure we have a valid VIN
-                        vinValid = True
-
-                        if len(potentialVIN) != 17 and len(potentialVIN) != 0:
-                            vinValid = False
-
-                        if vinValid and len(potentialVIN) == 17:
-                            potentialVIN = potentialVIN.upper()
-                            check = potentialVIN[8]
-                            if check == "X":
-                                check = 10
-                            elif check.isdigit():
-                                check = int(check)
-                            else:
-                                vinValid = False
-
-                        if vinValid and len(potentialVIN) == 17:
-                            weights = [
-                                8,
-                                7,
-                                6,
-                                5,
-                                4,
-                                3,
-                                2,
-                                10,
-                                0,
-                                9,
-                                8,
-                                7,
-                                6,
-                                5,
-                                4,
-                                3,
-                                2,
-                            ]
-                            replaceValues = {
-                                "A": 1,
-                                "B": 2,
-                                "C": 3,
-                                "D": 4,
-                                "E": 5,
-                                "F": 6,
-                                "G": 7,
-                                "H": 8,
-                                "J": 1,
-                                "K": 2,
-                                "L": 3,
-                                "M": 4,
-                                "N": 5,
-                                "P": 7,
-                                "R": 9,
-                                "S": 2,
-                                "T": 3,
-                                "U": 4,
-                                "V": 5,
-                                "W": 6,
-                                "X": 7,
-                                "Y": 8,
-                                "Z": 9,
-                                "1": 1,
-                                "2": 2,
-                                "3": 3,
-                                "4": 4,
-                                "5": 5,
-                                "6": 6,
-                                "7": 7,
-                                "8": 8,
-                                "9": 9,
-                                "0": 0,
-                            }
-
-                            sum = 0
-                            for digit, weight in zip(potentialVIN, weights):
-                                if digit not in replaceValues:
-                                    vinValid = False
-                                    break
-                                sum += replaceValues[digit] * weight
-                            if sum % 11 != check:
-                                vinValid = False
-
-                        if vinValid and len(potentialVIN) == 0:
-                            # All VIN parts are empty - non-Tesla vehicle or CAN
-                            # communication disabled (DIP switch 2 down). Stop
-                            # querying; there is no VIN to retrieve.
-                            slaveTWC.lastVINQuery = 0
-                            slaveTWC.vinQueryAttempt = 0
-                        elif vinValid:
-                            # Record Vehicle VIN
-                            slaveTWC.currentVIN = potentialVIN
-
-                            # Clear VIN retry timer
-                            slaveTWC.lastVINQuery = 0
-                            slaveTWC.vinQueryAttempt = 0
-
-                            # Record this vehicle being connected
-                            master.recordVehicleVIN(slaveTWC)
-
-                            # Send VIN data to Status modules
-                            master.updateVINStatus()
-
-                            # Establish if this VIN should be able to charge
-                            # If not, send stop command
-                            master.queue_background_task(
-                                {
-                                    "cmd": "checkVINEntitlement",
-                                    "subTWC": slaveTWC,
-                                }
-                            )
-
-                            vinPart += 1
-                        else:
-                            # Unfortunately the VIN was not received correctly.
-                            # Re-request VIN
-                            master.queue_background_task(
-                                {
-                                    "cmd": "getVehicleVIN",
-                                    "slaveTWC": slaveTWC.TWCID,
-                                    "vinPart": 0,
-                                }
-                            )
-
-                    logger.log(
-                        logging.INFO6,
-                        "Current VIN string is: %s at part %d."
-                        % (str(slaveTWC.VINData), vinPart),
-                    )
-
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfc(\xe1|\xe2)(..)(.)\x00\x00\x00\x00\x00\x00\x00\x00.+\Z",
-                        msg,
-                        re.DOTALL,
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    foundMsgMatch = True
-                    logger.info(
-                        "ERROR: TWC is set to Master mode so it can't be controlled by TWCManager.  "
-                        "Search installation instruction PDF for 'rotary switch' and set "
-                        "switch so its arrow points to F on the dial."
-                    )
-                if foundMsgMatch == False:
+                if not bus.dispatch(fakeMasterHandlers, msg):
                     logger.info(
                         "*** UNKNOWN MESSAGE FROM SLAVE:"
                         + hex_str(msg)
@@ -1571,365 +1749,7 @@ while True:
             else:
                 ###########################
                 # Pretend to be a slave TWC
-
-                foundMsgMatch = False
-                msgMatch = re.search(
-                    rb"\A\xfc\xe1(..)(.)\x00\x00\x00\x00\x00\x00\x00\x00+?.\Z",
-                    msg,
-                    re.DOTALL,
-                )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle linkready1 from master.
-                    # See notes in send_master_linkready1() for details.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    sign = msgMatch.group(2)
-                    master.setMasterTWCID(senderID)
-
-                    # This message seems to always contain seven 00 bytes in its
-                    # data area. If we ever get this message with non-00 data
-                    # we'll print it as an unexpected message.
-                    logger.info(
-                        "Master TWC %02X%02X Linkready1.  Sign: %s"
-                        % (senderID[0], senderID[1], hex_str(sign))
-                    )
-
-                    if senderID == fakeTWCID:
-                        master.master_id_conflict()
-
-                    # Other than picking a new fakeTWCID if ours conflicts with
-                    # master, it doesn't seem that a real slave will make any
-                    # sort of direct response when sent a master's linkready1 or
-                    # linkready2.
-
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfb\xe2(..)(.)\x00\x00\x00\x00\x00\x00\x00\x00+?.\Z",
-                        msg,
-                        re.DOTALL,
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle linkready2 from master.
-                    # See notes in send_master_linkready2() for details.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    sign = msgMatch.group(2)
-                    master.setMasterTWCID(senderID)
-
-                    # This message seems to always contain seven 00 bytes in its
-                    # data area. If we ever get this message with non-00 data
-                    # we'll print it as an unexpected message.
-
-                    logger.info(
-                        "Master TWC %02X%02X Linkready2.  Sign: %s"
-                        % (senderID[0], senderID[1], hex_str(sign))
-                    )
-
-                    if senderID == fakeTWCID:
-                        master.master_id_conflict()
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfb\xe0(..)(..)(.......+?).\Z", msg, re.DOTALL
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle heartbeat message from Master.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    receiverID = msgMatch.group(2)
-                    heartbeatData = msgMatch.group(3)
-                    master.setMasterTWCID(senderID)
-                    try:
-                        slaveTWC = master.slaveTWCs[receiverID]
-                    except KeyError:
-                        slaveTWC = master.newSlave(receiverID, 80)
-
-                    slaveTWC.masterHeartbeatData = heartbeatData
-
-                    if receiverID != fakeTWCID:
-                        # This message was intended for another slave.
-                        # Ignore it.
-                        logger.log(
-                            logging.DEBUG2,
-                            "Master %02X%02X sent "
-                            "heartbeat message %s to receiver %02X%02X "
-                            "that isn't our fake slave."
-                            % (
-                                senderID[0],
-                                senderID[1],
-                                hex_str(heartbeatData),
-                                receiverID[0],
-                                receiverID[1],
-                            ),
-                        )
-                        continue
-
-                    amps = (
-                        master.slaveHeartbeatData[1] << 8
-                    ) + master.slaveHeartbeatData[2]
-                    master.addkWhDelivered(
-                        (master.convertAmpsToWatts(amps / 100) / 1000 / 60 / 60)
-                        * (now - timeLastkWhDelivered)
-                    )
-                    timeLastkWhDelivered = now
-                    if time.time() - timeLastkWhSaved >= 300.0:
-                        timeLastkWhSaved = now
-                        logger.log(
-                            logging.INFO9,
-                            "Fake slave has delivered %.3fkWh"
-                            % (master.getkWhDelivered()),
-                        )
-                        # Save settings to file
-                        master.queue_background_task({"cmd": "saveSettings"})
-
-                    if heartbeatData[0] == 0x07:
-                        # Lower amps in use (not amps allowed) by 2 for 10
-                        # seconds. Set state to 07.
-                        master.slaveHeartbeatData[0] = heartbeatData[0]
-                        timeToRaise2A = now + 10
-                        amps -= 280
-                        master.slaveHeartbeatData[3] = (amps >> 8) & 0xFF
-                        master.slaveHeartbeatData[4] = amps & 0xFF
-                    elif heartbeatData[0] == 0x06:
-                        # Raise amp setpoint by 2 permanently and reply with
-                        # state 06.  After 44 seconds, report state 0A.
-                        timeTo0Aafter06 = now + 44
-                        master.slaveHeartbeatData[0] = heartbeatData[0]
-                        amps += 200
-                        master.slaveHeartbeatData[1] = (amps >> 8) & 0xFF
-                        master.slaveHeartbeatData[2] = amps & 0xFF
-                        amps -= 80
-                        master.slaveHeartbeatData[3] = (amps >> 8) & 0xFF
-                        master.slaveHeartbeatData[4] = amps & 0xFF
-                    elif (
-                        heartbeatData[0] == 0x05
-                        or heartbeatData[0] == 0x08
-                        or heartbeatData[0] == 0x09
-                    ):
-                        if ((heartbeatData[1] << 8) + heartbeatData[2]) > 0:
-                            # A real slave mimics master's status bytes [1]-[2]
-                            # representing max charger power even if the master
-                            # sends it a crazy value.
-                            master.slaveHeartbeatData[1] = heartbeatData[1]
-                            master.slaveHeartbeatData[2] = heartbeatData[2]
-
-                            ampsUsed = (heartbeatData[1] << 8) + heartbeatData[2]
-                            ampsUsed -= 80
-                            master.slaveHeartbeatData[3] = (ampsUsed >> 8) & 0xFF
-                            master.slaveHeartbeatData[4] = ampsUsed & 0xFF
-                    elif heartbeatData[0] == 0:
-                        if timeTo0Aafter06 > 0 and timeTo0Aafter06 < now:
-                            timeTo0Aafter06 = 0
-                            master.slaveHeartbeatData[0] = 0x0A
-                        elif timeToRaise2A > 0 and timeToRaise2A < now:
-                            # Real slave raises amps used by 2 exactly 10
-                            # seconds after being sent into state 07. It raises
-                            # a bit slowly and sets its state to 0A 13 seconds
-                            # after state 07. We aren't exactly emulating that
-                            # timing here but hopefully close enough.
-                            timeToRaise2A = 0
-                            amps -= 80
-                            master.slaveHeartbeatData[3] = (amps >> 8) & 0xFF
-                            master.slaveHeartbeatData[4] = amps & 0xFF
-                            master.slaveHeartbeatData[0] = 0x0A
-                    elif heartbeatData[0] == 0x02:
-                        logger.info(
-                            "Master heartbeat contains error %ld: %s"
-                            % (heartbeatData[1], hex_str(heartbeatData))
-                        )
-                    else:
-                        logger.info("UNKNOWN MHB state %s" % (hex_str(heartbeatData)))
-
-                    # Slaves always respond to master's heartbeat by sending
-                    # theirs back.
-                    slaveTWC.send_slave_heartbeat(senderID)
-                    slaveTWC.print_status(master.slaveHeartbeatData)
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfc\x1d\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00+?.\Z",
-                        msg,
-                        re.DOTALL,
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle 2-hour idle message
-                    #
-                    # This message is sent from a Master TWC three times in a
-                    # row every 2 hours:
-                    #   c0 fc 1d 00 00 00 00 00 00 00 00 00 00 00 1d c0
-                    #
-                    # I'd say this is used to indicate the master is still
-                    # alive, but it doesn't contain the Master's TWCID or any other
-                    # data so I don't see what any receiving TWC can do with it.
-                    #
-                    # I suspect this message is only sent when the master
-                    # doesn't see any other TWCs on the network, so I don't
-                    # bother to have our fake master send these messages being
-                    # as there's no point in playing a fake master with no
-                    # slaves around.
-                    foundMsgMatch = True
-                    logger.info("Received 2-hour idle message from Master.")
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfd\xe2(..)(.)(..)\x00\x00\x00\x00\x00\x00.+\Z",
-                        msg,
-                        re.DOTALL,
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle linkready message from slave on network that
-                    # presumably isn't us.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    sign = msgMatch.group(2)
-                    maxAmps = ((msgMatch.group(3)[0] << 8) + msgMatch.group(3)[1]) / 100
-                    logger.info(
-                        "%.2f amp slave TWC %02X%02X is ready to link.  Sign: %s"
-                        % (maxAmps, senderID[0], senderID[1], hex_str(sign))
-                    )
-                    if senderID == fakeTWCID:
-                        logger.info(
-                            "ERROR: Received slave heartbeat message from "
-                            "slave %02X%02X that has the same TWCID as our fake slave."
-                            % (senderID[0], senderID[1])
-                        )
-                        continue
-
-                    master.newSlave(senderID, maxAmps)
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfd\xe0(..)(..)(.......+?).\Z", msg, re.DOTALL
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle heartbeat message from slave on network that
-                    # presumably isn't us.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    receiverID = msgMatch.group(2)
-                    heartbeatData = msgMatch.group(3)
-
-                    if senderID == fakeTWCID:
-                        logger.info(
-                            "ERROR: Received slave heartbeat message from "
-                            "slave %02X%02X that has the same TWCID as our fake slave."
-                            % (senderID[0], senderID[1])
-                        )
-                        continue
-
-                    try:
-                        slaveTWC = master.slaveTWCs[senderID]
-                    except KeyError:
-                        # Slave is unlikely to send another linkready since it's
-                        # already linked with a real Master TWC, so just assume
-                        # it's 80A.
-                        slaveTWC = master.newSlave(senderID, 80)
-
-                    slaveTWC.print_status(heartbeatData)
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfb\xeb(..)(..)(\x00\x00\x00\x00\x00\x00\x00\x00\x00+?).\Z",
-                        msg,
-                        re.DOTALL,
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle voltage request message.  This is only supported in
-                    # Protocol 2 so we always reply with a 16-byte message.
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    receiverID = msgMatch.group(2)
-
-                    if senderID == fakeTWCID:
-                        logger.info(
-                            "ERROR: Received voltage request message from "
-                            "TWC %02X%02X that has the same TWCID as our fake slave."
-                            % (senderID[0], senderID[1])
-                        )
-                        continue
-
-                    logger.log(
-                        logging.INFO8,
-                        "VRQ from %02X%02X to %02X%02X"
-                        % (senderID[0], senderID[1], receiverID[0], receiverID[1]),
-                    )
-
-                    if receiverID == fakeTWCID:
-                        kWhCounter = int(master.getkWhDelivered())
-                        kWhPacked = bytearray(
-                            [
-                                ((kWhCounter >> 24) & 0xFF),
-                                ((kWhCounter >> 16) & 0xFF),
-                                ((kWhCounter >> 8) & 0xFF),
-                                (kWhCounter & 0xFF),
-                            ]
-                        )
-                        logger.info(
-                            "VRS %02X%02X: %dkWh (%s) %dV %dV %dV"
-                            % (
-                                fakeTWCID[0],
-                                fakeTWCID[1],
-                                kWhCounter,
-                                hex_str(kWhPacked),
-                                240,
-                                0,
-                                0,
-                            )
-                        )
-                        master.getInterfaceModule().send(
-                            bytearray(b"\xfd\xeb")
-                            + fakeTWCID
-                            + kWhPacked
-                            + bytearray(b"\x00\xf0\x00\x00\x00\x00\x00")
-                        )
-                else:
-                    msgMatch = re.search(
-                        rb"\A\xfd\xeb(..)(.........+?).\Z", msg, re.DOTALL
-                    )
-                if msgMatch and foundMsgMatch == False:
-                    # Handle voltage response message.
-                    # Example US value:
-                    #   FD EB 7777 00000014 00F6 0000 0000 00
-                    # EU value (3 phase power):
-                    #   FD EB 7777 00000038 00E6 00F1 00E8 00
-                    foundMsgMatch = True
-                    senderID = msgMatch.group(1)
-                    data = msgMatch.group(2)
-                    kWhCounter = (
-                        (data[0] << 24) + (data[1] << 16) + (data[2] << 8) + data[3]
-                    )
-                    voltsPhaseA = (data[4] << 8) + data[5]
-                    voltsPhaseB = (data[6] << 8) + data[7]
-                    voltsPhaseC = (data[8] << 8) + data[9]
-
-                    # Update this detail for the Slave TWC
-                    master.updateSlaveLifetime(
-                        senderID, kWhCounter, voltsPhaseA, voltsPhaseB, voltsPhaseC
-                    )
-
-                    if senderID == fakeTWCID:
-                        logger.info(
-                            "ERROR: Received voltage response message from "
-                            "TWC %02X%02X that has the same TWCID as our fake slave."
-                            % (senderID[0], senderID[1])
-                        )
-                        continue
-
-                    # Publish Lifetime kWh Value via Status modules
-                    # with this in any scenario ,including fakeMaster = 2, MQTT/HASS will get Status update
-                    for module in master.getModulesByType("Status"):
-                        module["ref"].setStatus(
-                            senderID, "lifetime_kwh", "lifetimekWh", kWhCounter, "kWh"
-                        )
-
-                    logger.info(
-                        "VRS %02X%02X: %dkWh %dV %dV %dV"
-                        % (
-                            senderID[0],
-                            senderID[1],
-                            kWhCounter,
-                            voltsPhaseA,
-                            voltsPhaseB,
-                            voltsPhaseC,
-                        )
-                    )
-
-                if foundMsgMatch == False:
+                if not bus.dispatch(fakeSlaveHandlers, msg):
                     logger.info("***UNKNOWN MESSAGE from master: " + hex_str(msg))
 
     except KeyboardInterrupt:
@@ -1944,17 +1764,25 @@ while True:
         # Sleep 5 seconds so the user might see the error.
         time.sleep(5)
 
-# Make sure any volatile data is written to disk before exiting
-master.queue_background_task({"cmd": "saveSettings"})
-
-# Wait for background tasks thread to finish all tasks.
-# Note that there is no such thing as backgroundTasksThread.stop(). Because we
-# set the thread type to daemon, it will be automatically killed when we exit
+# Wait for background tasks threads to finish all tasks.
+# Note that there is no such thing as Thread.stop(). Because we set the
+# threads' type to daemon, they will be automatically killed when we exit
 # this program.
-master.backgroundTasksQueue.join()
-
-# Close the input module
-master.getInterfaceModule().close()
+master.backgroundTasks.join()
+
+# Make sure any volatile data is written to disk before exiting. Saves wait
+# a while before they are queued, so don't wait for one that is pending.
+master.saveSettings()
+master.settingsPersister.close()
+master.history.close()
+master.sessionStore.close()
+
+# Close the interface of each bus
+for closeBus in master.getBuses():
+    closeBus.close()
+reactor.close()
+if master.journal:
+    master.journal.close()
 
 #
 # End main program
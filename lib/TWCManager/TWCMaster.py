@@ -1,19 +1,29 @@
 #! /usr/bin/python3
 
+from TWCManager.ConfigLoader import ConfigSnapshot
 from TWCManager.EVSEController.Gen2TWCs import Gen2TWCs
 from TWCManager.EVSEInstance.Gen2TWC import Gen2TWC as TWCSlave
+from TWCManager.EMSAggregator import EMSAggregator
+from TWCManager.HistoryStore import HistoryStore
+from TWCManager.HTTPPool import HTTPPool
+from TWCManager.ModuleConnector import ModuleConnector
+from TWCManager.ReadingCache import ReadingCache
+from TWCManager.Protocol.TWCJournal import TWCJournalWriter
+from TWCManager.SessionStore import SessionStore
+from TWCManager.SettingsDatabase import SettingsDatabase
+from TWCManager.SettingsPersister import SettingsPersister
+from TWCManager.TaskExecutor import EXPIRE_RESCHEDULE, TaskExecutor
+from TWCManager.TimerHeap import TimerHeap
 from datetime import datetime, timedelta
 import json
 import logging
 import os.path
-import queue
 from sys import modules
 import threading
 import time
 import math
 import random
 import requests
-import bisect
 from TWCManager.Logging.LoggerFactory import LoggerFactory
 
 logger = LoggerFactory.get_logger("Master", "Master")
@@ -21,15 +31,16 @@ logger = LoggerFactory.get_logger("Master", "Master")
 
 class TWCMaster:
     allowed_flex = 0
-    backgroundTasksQueue = queue.Queue()
+    backgroundTasks = None
     backgroundTasksCmds = {}
     backgroundTasksLock = threading.Lock()
-    backgroundTasksDelayed = []
+    buses = []
     config = None
     consumptionValues = {}
     consumptionAmpsValues = {}
     debugOutputToFile = False
     generationValues = {}
+    journal = None
     lastChargeLimitApplied = 0
     lastkWhMessage = time.time()
     lastkWhPoll = 0
@@ -71,6 +82,7 @@ class TWCMaster:
     spikeAmpsToCancel6ALimit = 16
     subtractChargerLoad = False
     treatGenerationAsGridDelivery = False
+    timers = None
     TWCID = None
     updateVersion = False
     version = "1.3.4"
@@ -86,16 +98,74 @@ class TWCMaster:
 
     def __init__(self, TWCID, config):
         self.config = config
-        self.debugOutputToFile = config["config"].get("debugOutputToFile", False)
+        # Options read often are read from a snapshot of the config section
+        self.configSnapshot = ConfigSnapshot(config["config"])
+        self.debugOutputToFile = self.configSnapshot.debugOutputToFile
         self.TWCID = TWCID
-        self.subtractChargerLoad = config["config"].get("subtractChargerLoad", False)
-        self.treatGenerationAsGridDelivery = config["config"].get(
-            "treatGenerationAsGridDelivery", False
+        self.subtractChargerLoad = self.configSnapshot.subtractChargerLoad
+        self.treatGenerationAsGridDelivery = (
+            self.configSnapshot.treatGenerationAsGridDelivery
         )
         # Instance-level mutable state (class-level definitions are defaults only)
         self.modules = {}
+        # Modules which connect to a device or service at startup do so in
+        # the background, so that they don't hold up the rest of startup
+        self.moduleConnector = ModuleConnector(self.releaseModule)
         self.slaveTWCRoundRobin = []
         self.slaveTWCs = {}
+        self.buses = []
+        # Delayed tasks, and anything else that needs to happen after a
+        # while, are run from a heap of timers shared by every thread
+        self.timers = TimerHeap()
+        # Background tasks are run in lanes, so that slow vehicle commands
+        # don't hold up everything else. The timers cancel tasks that run
+        # past their deadline.
+        self.backgroundTasks = TaskExecutor(
+            self.configSnapshot.backgroundTaskLanes,
+            self.timers,
+            self.expiredBackgroundTask,
+        )
+        self.backgroundTasksCmds = {}
+        # Changes to settings are written to settings.json, or the settings
+        # database, a while after they are made, along with any others made
+        # meanwhile
+        if self.configSnapshot.settingsBackend == "sqlite":
+            self.settingsPersister = SettingsDatabase(
+                self.configSnapshot.settingsPath + "/settings.db",
+                self.configSnapshot.settingsSaveWindow,
+            )
+        else:
+            self.settingsPersister = SettingsPersister(
+                self.configSnapshot.settingsSaveWindow
+            )
+        # Modules that poll over HTTP share connections, which are kept
+        # alive between polls
+        self.httpPool = HTTPPool()
+        # Modules that poll a device or service keep their values fresh
+        # through the reading cache, which fetches them before they expire
+        self.readingCache = ReadingCache(self.timers)
+        # EMS modules are polled at once, each within a deadline, falling
+        # back to their last values for a while if they don't answer
+        self.emsAggregator = EMSAggregator(
+            self.configSnapshot.emsPollDeadline, self.configSnapshot.emsMaxAge
+        )
+        # Charger power history, every 5 minutes for two days. It is kept in
+        # memory until loadSettings() opens the history file.
+        self.history = HistoryStore()
+        # Each vehicle's charging sessions, kept in memory until
+        # loadSettings() opens the sessions database
+        self.sessionStore = SessionStore(
+            retentionDays=self.configSnapshot.sessionRetentionDays
+        )
+        # Held while slave TWCs are added or deleted, which may happen on
+        # any bus's thread
+        self.slaveLock = threading.RLock()
+        # Held while power is shared out between EVSEs
+        self.distributeLock = threading.Lock()
+
+        # Capture every message sent and received to a file, if configured
+        if self.configSnapshot.captureFile:
+            self.journal = TWCJournalWriter(self.configSnapshot.captureFile)
         self.stats = {"moduleDispatch": {}, "moduleFailures": {}, "moduleSuccess": {}}
         self.settings = {
             "chargeNowAmps": 0,
@@ -131,9 +201,15 @@ class TWCMaster:
     def addkWhDelivered(self, kWh):
         self.settings["kWhDelivered"] = self.settings.get("kWhDelivered", 0) + kWh
 
+    def addBus(self, bus):
+        # Adds a TWCBus. The first bus added is run by the main loop.
+        self.buses.append(bus)
+
     def addSlaveTWC(self, slaveTWC):
-        # Adds the Slave TWC to the Round Robin list
-        return self.slaveTWCRoundRobin.append(slaveTWC)
+        # Adds the Slave TWC to the Round Robin list. The list is replaced
+        # rather than changed, so that other threads can iterate over
+        # getSlaveTWCs() while slaves on another bus link or drop off.
+        self.slaveTWCRoundRobin = self.slaveTWCRoundRobin + [slaveTWC]
 
     def advanceHistorySnap(self):
         try:
@@ -170,7 +246,7 @@ class TWCMaster:
             pkgInfo = None
 
             try:
-                req = requests.get(url)
+                req = self.httpPool.get(url, timeout=10)
                 logger.log(logging.INFO8, "Requesting PyPi package info " + str(req))
                 pkgInfo = json.loads(req.text)
             except requests.exceptions.RequestException:
@@ -301,45 +377,76 @@ class TWCMaster:
         return int(len(self.slaveTWCRoundRobin))
 
     def delete_background_task(self, task):
-        if (
-            task["cmd"] in self.backgroundTasksCmds
-            and self.backgroundTasksCmds[task["cmd"]] == task
-        ):
-            del self.backgroundTasksCmds[task["cmd"]]["cmd"]
-            del self.backgroundTasksCmds[task["cmd"]]
+        key = self.backgroundTasks.getDedupKey(task)
+        if key in self.backgroundTasksCmds and self.backgroundTasksCmds[key] == task:
+            del self.backgroundTasksCmds[key]["cmd"]
+            del self.backgroundTasksCmds[key]
 
     def doneBackgroundTask(self, task):
-        # Delete task['cmd'] from backgroundTasksCmds such that
-        # queue_background_task() can queue another task['cmd'] in the future.
-        if "cmd" in task:
-            del self.backgroundTasksCmds[task["cmd"]]
+        if not self.backgroundTasks.done(task):
+            # The task ran past its deadline, and has already been dropped
+            # or rescheduled by expiredBackgroundTask()
+            return
 
-        # task_done() must be called to let the queue know the task is finished.
-        # backgroundTasksQueue.join() can then be used to block until all tasks
-        # in the queue are done.
-        self.backgroundTasksQueue.task_done()
+        # Delete the task from backgroundTasksCmds such that
+        # queue_background_task() can queue another like it in the future.
+        self.getBackgroundTasksLock()
+        try:
+            self.forgetBackgroundTask(task)
+        finally:
+            self.releaseBackgroundTasksLock()
+
+    def expiredBackgroundTask(self, task):
+        # Called when a background task misses its deadline. Tasks are
+        # rescheduled if their command's policy says so, unless another
+        # task like it has been queued since, which is more up to date.
+        # Returns True if the task was rescheduled.
+        reschedule = self.backgroundTasks.getDeadline(task)[1] == EXPIRE_RESCHEDULE
+        self.getBackgroundTasksLock()
+        try:
+            if not self.forgetBackgroundTask(task):
+                if self.backgroundTasks.getDedupKey(task) in self.backgroundTasksCmds:
+                    reschedule = False
+        finally:
+            self.releaseBackgroundTasksLock()
+
+        if reschedule:
+            # The task may still be in use by a worker that hasn't returned,
+            # so queue a copy
+            self.timers.schedule(
+                self.backgroundTasks.rescheduleDelay,
+                self.requeueBackgroundTask,
+                dict(task),
+            )
+        return reschedule
+
+    def forgetBackgroundTask(self, task):
+        # Remove a task from backgroundTasksCmds, so that another like it can
+        # be queued. The task is found by identity rather than by its dedup
+        # key, in case its handler changed it. Called with the background
+        # tasks lock held; returns False if it wasn't there.
+        for key, queued in self.backgroundTasksCmds.items():
+            if queued is task:
+                del self.backgroundTasksCmds[key]
+                return True
+        return False
 
     def getAllowedFlex(self):
         return self.allowed_flex
 
-    def getBackgroundTask(self):
-        result = None
+    def getBackgroundTask(self, lane="general"):
+        # Returns the next task to run in lane, waiting until there is one.
+        # Delayed tasks are added to their lane by the timer thread when they
+        # are due.
+        return self.backgroundTasks.get(lane)
 
-        while result is None:
-            # Insert any delayed tasks
-            while (
-                self.backgroundTasksDelayed
-                and self.backgroundTasksDelayed[0][0] <= datetime.now()
-            ):
-                self.queue_background_task(self.backgroundTasksDelayed.pop(0)[1])
-
-            # Get the next task
-            try:
-                result = self.backgroundTasksQueue.get(timeout=30)
-            except queue.Empty:
-                continue
+    def getBackgroundTaskQueues(self):
+        # Returns the number of background tasks waiting in each lane
+        return self.backgroundTasks.getQueueDepths()
 
-        return result
+    def getBackgroundTaskStats(self):
+        # Returns telemetry for background tasks, per command
+        return self.backgroundTasks.getStats()
 
     def getBackgroundTasksLock(self):
         self.backgroundTasksLock.acquire()
@@ -355,9 +462,7 @@ class TWCMaster:
     def getConsumptionOffset(self):
         # Start by reading the offset value from config, if it exists
         # This is a legacy value but it doesn't hurt to keep it
-        offset = self.convertAmpsToWatts(
-            self.config["config"].get("greenEnergyAmpsOffset", 0)
-        )
+        offset = self.convertAmpsToWatts(self.configSnapshot.greenEnergyAmpsOffset)
 
         # Iterate through the offsets listed in settings
         for offsetName in self.settings.get("consumptionOffset", {}).keys():
@@ -430,8 +535,9 @@ class TWCMaster:
 
     def getModulesByType(self, type):
         matched = []
-        for module in self.modules:
-            modinfo = self.modules[module]
+        # Modules still connecting in the background may release themselves
+        # while we look through them
+        for module, modinfo in list(self.modules.items()):
             if modinfo["type"] == type:
                 matched.append(
                     {
@@ -494,6 +600,18 @@ class TWCMaster:
 
         Ported from ngardiner/TWCManager#483 (MikeBishop).
         """
+        # Each bus runs this once per cycle of heartbeats to its slaves. If
+        # another bus is already sharing out the power, there's no need to do
+        # it again.
+        if not self.distributeLock.acquire(blocking=False):
+            return
+        try:
+            self.allocateEVSEPower()
+        finally:
+            self.distributeLock.release()
+
+    def allocateEVSEPower(self) -> None:
+        """Share the available power between EVSEs. See distributeEVSEPower."""
         controllers = self.getModulesByType("EVSEController")
         if not controllers:
             return
@@ -515,9 +633,8 @@ class TWCMaster:
             return
 
         # Total watts available from EMS/policy
-        cfg = self.config["config"]
-        voltage = cfg.get("defaultVoltage", 240)
-        phases = cfg.get("numberOfPhases", 1)
+        voltage = self.configSnapshot.defaultVoltage
+        phases = self.configSnapshot.numberOfPhases
         available_watts = self.getMaxAmpsToDivideAmongSlaves() * voltage * phases
 
         # Per-controller remaining power budgets and EVSE counts
@@ -571,6 +688,13 @@ class TWCMaster:
             if evse not in wants_power and not evse.isReadOnly:
                 evse.setTargetPower(0)
 
+    def getBusInterface(self, bus=None):
+        # Returns the interface for bus and the TWCID our fake master uses on
+        # it. Without a bus, returns the first interface and our own TWCID.
+        if bus:
+            return bus.interface, bus.TWCID
+        return self.getInterfaceModule(), self.TWCID
+
     def getInterfaceModule(self):
         return self.getModulesByType("Interface")[0]["ref"]
 
@@ -652,11 +776,8 @@ class TWCMaster:
         now = time.time()
         if now >= self.lastkWhPoll + 60:
             for slaveTWC in self.getSlaveTWCs():
-                self.getInterfaceModule().send(
-                    bytearray(b"\xfb\xeb")
-                    + self.TWCID
-                    + slaveTWC.TWCID
-                    + bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00")
+                slaveTWC.send_master_command(
+                    b"\xfb\xeb", b"\x00\x00\x00\x00\x00\x00\x00\x00"
                 )
             self.lastkWhPoll = now
 
@@ -776,23 +897,26 @@ class TWCMaster:
         if int(part) == 2:
             prefixByte = bytearray(b"\xfb\xf1")
 
-        if prefixByte:
-            self.getInterfaceModule().send(
-                prefixByte
-                + self.TWCID
-                + slaveID
-                + bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00")
+        slaveTWC = self.slaveTWCs.get(bytes(slaveID), None)
+        if prefixByte and slaveTWC:
+            slaveTWC.send_master_command(
+                prefixByte, b"\x00\x00\x00\x00\x00\x00\x00\x00"
             )
 
     def deleteSlaveTWC(self, deleteSlaveID):
-        for i in range(0, len(self.slaveTWCRoundRobin)):
-            if self.slaveTWCRoundRobin[i].TWCID == deleteSlaveID:
-                del self.slaveTWCRoundRobin[i]
-                break
-        try:
-            del self.slaveTWCs[deleteSlaveID]
-        except KeyError:
-            pass
+        with self.slaveLock:
+            self.slaveTWCRoundRobin = [
+                slaveTWC
+                for slaveTWC in self.slaveTWCRoundRobin
+                if slaveTWC.TWCID != deleteSlaveID
+            ]
+            slaveTWC = self.slaveTWCs.pop(deleteSlaveID, None)
+            if slaveTWC and slaveTWC.bus:
+                slaveTWC.bus.removeSlaveTWC(deleteSlaveID)
+
+    def getBuses(self):
+        # Returns the list of TWCBuses
+        return self.buses
 
     def getChargerLoad(self):
         # Calculate in watts the load that the charger is generating so
@@ -826,6 +950,14 @@ class TWCMaster:
 
         return float(consumptionAmpsVal)
 
+    def getEMSStats(self):
+        # Returns how long each EMS module takes to answer, how old the
+        # values in use are, and how often modules' values were served from
+        # the reading cache
+        stats = self.emsAggregator.getStats()
+        stats["caches"] = self.readingCache.getStats()
+        return stats
+
     def getFakeTWCID(self):
         return self.TWCID
 
@@ -858,6 +990,11 @@ class TWCMaster:
             generationOffset = 0
         return float(generationOffset)
 
+    def getHTTPStats(self):
+        # Returns how many HTTP requests modules have made to each host, and
+        # how many connections were opened for them
+        return self.httpPool.getStats()
+
     def getHomeLatLon(self):
         # Returns Lat/Lon coordinates to check if car location is
         # at home
@@ -899,7 +1036,7 @@ class TWCMaster:
 
         currentOffer = max(
             int(self.getMaxAmpsToDivideAmongSlaves()),
-            self.num_cars_charging_now() * self.config["config"]["minAmpsPerTWC"],
+            self.num_cars_charging_now() * self.configSnapshot.minAmpsPerTWC,
         )
         newOffer = currentOffer + availableA
 
@@ -954,8 +1091,8 @@ class TWCMaster:
         if len(slavesWithVoltage) == 0:
             # No slaves support returning voltage
             return (
-                self.config["config"].get("defaultVoltage", 240),
-                self.config["config"].get("numberOfPhases", 1),
+                self.configSnapshot.defaultVoltage,
+                self.configSnapshot.numberOfPhases,
             )
 
         total = 0
@@ -977,8 +1114,8 @@ class TWCMaster:
                         "FATAL:  Mix of multi-phase TWC configurations not currently supported."
                     )
                     return (
-                        self.config["config"].get("defaultVoltage", 240),
-                        self.config["config"].get("numberOfPhases", 1),
+                        self.configSnapshot.defaultVoltage,
+                        self.configSnapshot.numberOfPhases,
                     )
             else:
                 phases = localPhases
@@ -1000,13 +1137,27 @@ class TWCMaster:
 
     def loadSettings(self):
         # Loads the volatile application settings (such as charger timings,
-        # API credentials, etc) from a JSON file
+        # API credentials, etc) from a JSON file, or the settings database
+
+        # Charger power history is kept in a file of its own
+        self.history = HistoryStore(
+            self.config["config"]["settingsPath"] + "/history.bin"
+        )
+        # As are charging sessions
+        self.sessionStore.close()
+        self.sessionStore = SessionStore(
+            self.config["config"]["settingsPath"] + "/sessions.db",
+            self.configSnapshot.sessionRetentionDays,
+        )
 
-        # Step 1 - Load settings from JSON file
+        # Step 1 - Load settings from the settings database, if they are kept
+        # in one, or from JSON file
         fileName = self.config["config"]["settingsPath"] + "/settings.json"
-        backupFileName = fileName + ".backup"
 
-        if not os.path.exists(fileName):
+        settings = self.settingsPersister.load()
+        if settings is not None:
+            self.settings = settings
+        elif not os.path.exists(fileName):
             # Initialize with class defaults if file doesn't exist
             self.settings = {
                 "chargeNowAmps": 0,
@@ -1025,53 +1176,8 @@ class TWCMaster:
                 "sendServerTime": 0,
             }
             return
-
-        # Try to load the main settings file
-        loadSuccess = False
-        with open(fileName, "r") as inconfig:
-            try:
-                self.settings = json.load(inconfig)
-                loadSuccess = True
-            except Exception as e:
-                logger.info(
-                    "There was an exception whilst loading settings file " + fileName
-                )
-                logger.log(logging.DEBUG2, str(e))
-
-        # If main file failed to load, try the backup
-        if not loadSuccess and os.path.exists(backupFileName):
-            logger.info(
-                "Attempting to restore settings from backup file: " + backupFileName
-            )
-            try:
-                with open(backupFileName, "r") as inconfig:
-                    self.settings = json.load(inconfig)
-                    loadSuccess = True
-                logger.info("Successfully restored settings from backup file")
-                # Restore the backup to the main file
-                try:
-                    import shutil
-
-                    shutil.copy2(backupFileName, fileName)
-                    logger.info("Restored backup to main settings file")
-                except Exception as restore_error:
-                    logger.info(
-                        f"Could not restore backup to main file: {restore_error}"
-                    )
-            except Exception as backup_error:
-                logger.info("Failed to load backup settings file: " + str(backup_error))
-
-        # If both files failed, show helpful message
-        if not loadSuccess:
-            logger.info(
-                "Some data may have been loaded. This may be because the file is being created for the first time."
-            )
-            logger.info(
-                "It may also be because you are upgrading from a TWCManager version prior to v1.1.4, which used the old settings file format."
-            )
-            logger.info(
-                "If this is the case, you may need to locate the old config file and migrate some settings manually."
-            )
+        else:
+            self.loadSettingsFile(fileName)
 
         # Step 1b - Merge loaded settings with defaults to ensure all required keys exist
         defaults = {
@@ -1094,6 +1200,20 @@ class TWCMaster:
             if key not in self.settings:
                 self.settings[key] = value
 
+        # Settings loaded from settings.json, when they are to be kept in a
+        # database, need writing to it
+        if self.settingsPersister.dirty:
+            self.markSettingsDirty()
+
+        # History used to be kept in the settings dict. Move it to the
+        # history file.
+        if "history" in self.settings:
+            self.migrateHistory()
+
+        # As were each vehicle's charging sessions. Move them to the
+        # sessions database.
+        self.migrateVehicleSessions()
+
         # Step 2 - Send settings to other modules
         carapi = self.getModuleByName("TeslaAPI")
         carapi.setCarApiBearerToken(self.settings.get("carApiBearerToken", ""))
@@ -1142,26 +1262,57 @@ class TWCMaster:
             % (self.TWCID[0], self.TWCID[1], self.slaveSign[0])
         )
 
-    def newSlave(self, newSlaveID, maxAmps):
-        try:
-            slaveTWC = self.slaveTWCs[newSlaveID]
-            # We didn't get KeyError exception, so this slave is already in
-            # slaveTWCs and we can simply return it.
-            return slaveTWC
-        except KeyError:
-            pass
-
-        slaveTWC = TWCSlave(newSlaveID, maxAmps, self.config, self)
-        self.slaveTWCs[newSlaveID] = slaveTWC
-        self.addSlaveTWC(slaveTWC)
-
-        if self.countSlaveTWC() > 3:
-            logger.info(
-                "WARNING: More than 3 slave TWCs seen on network. Dropping oldest: "
-                + self.hex_str(self.getSlaveTWCID(0))
-                + "."
-            )
-            self.deleteSlaveTWC(self.getSlaveTWCID(0))
+    def newSlave(self, newSlaveID, maxAmps, bus=None):
+        # Returns the slave TWC with ID newSlaveID on bus, adding it if we
+        # haven't seen it before. If bus isn't given, the slave is on the
+        # first bus.
+        if bus is None and self.buses:
+            bus = self.buses[0]
+
+        with self.slaveLock:
+            try:
+                slaveTWC = self.slaveTWCs[newSlaveID]
+            except KeyError:
+                slaveTWC = None
+
+            if slaveTWC:
+                if slaveTWC.bus is bus:
+                    # This slave is already in slaveTWCs and we can simply
+                    # return it.
+                    return slaveTWC
+
+                # TWCs only change their TWCID if another TWC on the same
+                # bus has the same one, so this conflict won't resolve
+                # itself.
+                logger.info(
+                    "ERROR: Slave TWC %02X%02X on %s has the same TWCID as a "
+                    "slave TWC on %s. Ignoring it until the other TWC goes "
+                    "away or one of them is reset."
+                    % (newSlaveID[0], newSlaveID[1], bus.name, slaveTWC.bus.name)
+                )
+                return None
+
+            slaveTWC = TWCSlave(newSlaveID, maxAmps, self.config, self)
+            slaveTWC.bus = bus
+            self.slaveTWCs[newSlaveID] = slaveTWC
+            self.addSlaveTWC(slaveTWC)
+
+            if bus:
+                bus.addSlaveTWC(slaveTWC)
+                slaves = bus.getSlaveTWCs()
+                maxSlaves = bus.maxSlaves
+            else:
+                slaves = self.getSlaveTWCs()
+                maxSlaves = 3
+
+            if len(slaves) > maxSlaves:
+                logger.info(
+                    "WARNING: More than %d slave TWCs seen on network. Dropping oldest: "
+                    % (maxSlaves)
+                    + self.hex_str(slaves[0].TWCID)
+                    + "."
+                )
+                self.deleteSlaveTWC(slaves[0].TWCID)
 
         return slaveTWC
 
@@ -1237,30 +1388,72 @@ class TWCMaster:
 
     def queue_background_task(self, task, delay=0):
         if delay > 0:
-            bisect.insort(
-                self.backgroundTasksDelayed,
-                (datetime.now() + timedelta(seconds=delay), task),
-            )
-            return
+            # Queue the task once delay seconds have passed. The returned
+            # Timer can be used to cancel it before then.
+            return self.timers.schedule(delay, self.queue_background_task, task)
 
         self.getBackgroundTasksLock()
         try:
-            if task["cmd"] in self.backgroundTasksCmds:
+            # Tasks are identified by their command, and for some commands
+            # the values of the keys that their TaskType dedups on
+            key = self.backgroundTasks.getDedupKey(task)
+            coalesce = self.backgroundTasks.getCoalesce(task)
+            if key in self.backgroundTasksCmds:
+                if coalesce and self.backgroundTasks.isRunning(
+                    self.backgroundTasksCmds[key]
+                ):
+                    # The one we'd merge into has already started, and may
+                    # have missed what this one is for, so try again after
+                    # it has finished
+                    self.timers.schedule(coalesce, self.queue_background_task, task)
+                    return
+
                 # Some tasks, like cmd='charge', will be called once per second until
                 # a charge starts or we determine the car is done charging.  To avoid
                 # wasting memory queing up a bunch of these tasks when we're handling
                 # a charge cmd already, don't queue two of the same task.
-                self.backgroundTasksCmds[task["cmd"]].update(task)
+                self.backgroundTasksCmds[key].update(task)
+                self.backgroundTasks.promote(self.backgroundTasksCmds[key])
                 return
 
-            # Insert task['cmd'] in backgroundTasksCmds to prevent queuing another
-            # task['cmd'] till we've finished handling this one.
-            self.backgroundTasksCmds[task["cmd"]] = task
+            # Insert the task in backgroundTasksCmds to prevent queuing another
+            # like it till we've finished handling this one.
+            if key is not None:
+                self.backgroundTasksCmds[key] = task
+        finally:
+            self.releaseBackgroundTasksLock()
+
+        if coalesce:
+            # Hold the task for a while, so that a burst of tasks like it
+            # are merged into it and it only runs once
+            self.timers.schedule(coalesce, self.backgroundTasks.put, task)
+            return
+
+        # Queue the task to be handled by background_tasks_thread, in the
+        # lane for its command.
+        self.backgroundTasks.put(task)
+
+    def requeueBackgroundTask(self, task):
+        # Queue a rescheduled task, unless another task like it has been
+        # queued in the meantime. That one is more up to date, so we don't
+        # merge the old one into it as queue_background_task() would.
+        self.getBackgroundTasksLock()
+        try:
+            key = self.backgroundTasks.getDedupKey(task)
+            if key in self.backgroundTasksCmds:
+                return
+            if key is not None:
+                self.backgroundTasksCmds[key] = task
         finally:
             self.releaseBackgroundTasksLock()
 
-        # Queue the task to be handled by background_tasks_thread.
-        self.backgroundTasksQueue.put(task)
+        self.backgroundTasks.put(task)
+
+    def registerBackgroundTask(self, cmd, handler, **options):
+        # Register handler(task) to run background tasks with the given
+        # command. Modules can use this to queue work of their own; see
+        # TaskType for the options.
+        return self.backgroundTasks.register(cmd, handler, **options)
 
     def registerModule(self, module):
         # This function is used during module instantiation to either reference a
@@ -1306,19 +1499,9 @@ class TWCMaster:
     def recordVehicleSessionEnd(self, slaveTWC):
         # This function is called when a vehicle charge session ends.
         # If we have a last vehicle VIN set, close off the charging session
-        # for this vehicle and save the settings.
-        if not self.settings.get("Vehicles", None):
-            self.settings["Vehicles"] = {}
-        if self.settings["Vehicles"].get(slaveTWC.lastVIN, None):
-            if self.settings["Vehicles"][slaveTWC.lastVIN].get("startkWh", 0) > 0:
-                # End current session
-                delta = (
-                    slaveTWC.lifetimekWh
-                    - self.settings["Vehicles"][slaveTWC.lastVIN]["startkWh"]
-                )
-                self.settings["Vehicles"][slaveTWC.lastVIN]["startkWh"] = 0
-                self.settings["Vehicles"][slaveTWC.lastVIN]["totalkWh"] += delta
-                self.queue_background_task({"cmd": "saveSettings"})
+        # for this vehicle.
+        if slaveTWC.lastVIN:
+            self.sessionStore.endSession(slaveTWC.lastVIN, slaveTWC.lifetimekWh)
 
         # Update Charge Session details in logging modules
         logger.info(
@@ -1361,25 +1544,17 @@ class TWCMaster:
             self.settings["SlaveTWCs"][twcid] = {}
         if not self.settings["SlaveTWCs"][twcid].get("supportsVINQuery", 0):
             self.settings["SlaveTWCs"][twcid]["supportsVINQuery"] = 1
-            self.queue_background_task({"cmd": "saveSettings"})
+            self.markSettingsDirty("SlaveTWCs")
 
-        # Increment sessions counter for this VIN in persistent settings file
+        # Remember this VIN in the persistent settings file, if it is new
         if not self.settings.get("Vehicles", None):
             self.settings["Vehicles"] = {}
-        if not self.settings["Vehicles"].get(slaveTWC.currentVIN, None):
-            self.settings["Vehicles"][slaveTWC.currentVIN] = {
-                "chargeSessions": 1,
-                "startkWh": slaveTWC.lifetimekWh,
-                "totalkWh": 0,
-            }
-        else:
-            self.settings["Vehicles"][slaveTWC.currentVIN]["chargeSessions"] += 1
-            self.settings["Vehicles"][slaveTWC.currentVIN][
-                "startkWh"
-            ] = slaveTWC.lifetimekWh
-            if not self.settings["Vehicles"][slaveTWC.currentVIN].get("totalkWh", None):
-                self.settings["Vehicles"][slaveTWC.currentVIN]["totalkWh"] = 0
-        self.queue_background_task({"cmd": "saveSettings"})
+        if slaveTWC.currentVIN not in self.settings["Vehicles"]:
+            self.settings["Vehicles"][slaveTWC.currentVIN] = {}
+            self.markSettingsDirty("Vehicles")
+
+        # Start a charging session for it
+        self.sessionStore.startSession(slaveTWC.currentVIN, twcid, slaveTWC.lifetimekWh)
 
         # Update Charge Session details in logging modules
         logger.info(
@@ -1428,14 +1603,14 @@ class TWCMaster:
     def removeNormalChargeLimit(self, ID):
         if "chargeLimits" in self.settings and str(ID) in self.settings["chargeLimits"]:
             del self.settings["chargeLimits"][str(ID)]
-            self.queue_background_task({"cmd": "saveSettings"})
+            self.markSettingsDirty("chargeLimits")
 
     def resetChargeNowAmps(self):
         # Sets chargeNowAmps back to zero, so we follow the green energy
         # tracking again
         self.settings["chargeNowAmps"] = 0
         self.settings["chargeNowTimeEnd"] = 0
-        self.queue_background_task({"cmd": "saveSettings"})
+        self.markSettingsDirty()
 
     def retryVINQuery(self):
         # For each Slave TWC, check if it's been more than 60 seconds since the last
@@ -1465,63 +1640,183 @@ class TWCMaster:
             self.settings["chargeLimits"] = dict()
 
         self.settings["chargeLimits"][str(ID)] = (outsideLimit, lastApplied)
-        self.queue_background_task({"cmd": "saveSettings"})
+        self.markSettingsDirty("chargeLimits")
 
     def saveSettings(self):
         # Saves the volatile application settings (such as charger timings,
-        # API credentials, etc) to a JSON file
+        # API credentials, etc) to a JSON file, or the settings database
         fileName = self.config["config"]["settingsPath"] + "/settings.json"
-        tempFileName = fileName + ".tmp"
-        backupFileName = fileName + ".backup"
 
         # Step 1 - Merge any config from other modules
         carapi = self.getModuleByName("TeslaAPI")
-        self.settings["carApiBearerToken"] = carapi.getCarApiBearerToken()
-        self.settings["carApiRefreshToken"] = carapi.getCarApiRefreshToken()
-        self.settings["carApiTokenExpireTime"] = carapi.getCarApiTokenExpireTime()
+        for key, value in (
+            ("carApiBearerToken", carapi.getCarApiBearerToken()),
+            ("carApiRefreshToken", carapi.getCarApiRefreshToken()),
+            ("carApiTokenExpireTime", carapi.getCarApiTokenExpireTime()),
+        ):
+            if self.settings.get(key, None) != value:
+                self.settings[key] = value
+                self.settingsPersister.markDirty(key)
 
-        # Step 2 - Write the settings dict to a JSON file atomically
-        # Use temp file + rename to ensure atomic write and prevent corruption
-        try:
-            # Write to temp file first
-            with open(tempFileName, "w") as outconfig:
-                json.dump(self.settings, outconfig)
-                outconfig.flush()
-                os.fsync(outconfig.fileno())
-
-            # Create backup of existing file if it exists
-            if os.path.exists(fileName):
-                try:
-                    os.replace(fileName, backupFileName)
-                except OSError:
-                    # If backup creation fails, continue anyway
-                    pass
+        # Step 2 - Write the settings dict to a JSON file atomically, or to
+        # the settings database, if it has changed since it was last written
+        if self.settingsPersister.save(self.settings, fileName):
+            self.lastSaveFailed = 0
+        else:
+            # The settings are still dirty, so try again after the window
+            self.lastSaveFailed = 1
+            self.queue_background_task({"cmd": "saveSettings"})
 
-            # Atomically move temp to final location
-            os.replace(tempFileName, fileName)
+    def loadSettingsFile(self, fileName):
+        # Loads settings from a JSON file, or from its backup if that fails
+        backupFileName = fileName + ".backup"
 
-            self.lastSaveFailed = 0
-        except PermissionError as e:
+        # Try to load the main settings file
+        loadSuccess = False
+        with open(fileName, "r") as inconfig:
+            try:
+                self.settings = json.load(inconfig)
+                loadSuccess = True
+            except Exception as e:
+                logger.info(
+                    "There was an exception whilst loading settings file " + fileName
+                )
+                logger.log(logging.DEBUG2, str(e))
+
+        # If main file failed to load, try the backup
+        if not loadSuccess and os.path.exists(backupFileName):
             logger.info(
-                "Permission Denied trying to save to settings.json. Please check the permissions of the file and try again."
+                "Attempting to restore settings from backup file: " + backupFileName
             )
-            self.lastSaveFailed = 1
-            # Clean up temp file if it exists
-            if os.path.exists(tempFileName):
-                try:
-                    os.remove(tempFileName)
-                except:
-                    pass
-        except (TypeError, OSError, IOError) as e:
-            logger.info("Exception raised while attempting to save settings file:")
-            logger.info(str(e))
-            self.lastSaveFailed = 1
-            # Clean up temp file if it exists
-            if os.path.exists(tempFileName):
+            try:
+                with open(backupFileName, "r") as inconfig:
+                    self.settings = json.load(inconfig)
+                    loadSuccess = True
+                logger.info("Successfully restored settings from backup file")
+                # Restore the backup to the main file
                 try:
-                    os.remove(tempFileName)
-                except:
-                    pass
+                    import shutil
+
+                    shutil.copy2(backupFileName, fileName)
+                    logger.info("Restored backup to main settings file")
+                except Exception as restore_error:
+                    logger.info(
+                        f"Could not restore backup to main file: {restore_error}"
+                    )
+            except Exception as backup_error:
+                logger.info("Failed to load backup settings file: " + str(backup_error))
+
+        if loadSuccess:
+            self.settingsPersister.loaded(self.settings)
+
+        # If both files failed, show helpful message
+        if not loadSuccess:
+            logger.info(
+                "Some data may have been loaded. This may be because the file is being created for the first time."
+            )
+            logger.info(
+                "It may also be because you are upgrading from a TWCManager version prior to v1.1.4, which used the old settings file format."
+            )
+            logger.info(
+                "If this is the case, you may need to locate the old config file and migrate some settings manually."
+            )
+
+    def migrateHistory(self):
+        migrated = 0
+        for timestamp, watts in self.settings["history"]:
+            try:
+                when = datetime.fromisoformat(timestamp).timestamp()
+            except (TypeError, ValueError):
+                continue
+            if self.history.append(when, watts):
+                migrated += 1
+        logger.info("Moved %d history entries to the history file" % (migrated))
+        del self.settings["history"]
+        self.markSettingsDirty()
+
+    def migrateVehicleSessions(self):
+        # Charging sessions used to be counted in each vehicle's entry in
+        # settings["Vehicles"], which is kept for the vehicle's other details
+        migrated = 0
+        for vin, vehicle in (self.settings.get("Vehicles", None) or {}).items():
+            if not isinstance(vehicle, dict) or not any(
+                key in vehicle for key in ("chargeSessions", "startkWh", "totalkWh")
+            ):
+                continue
+            if not self.sessionStore.importVehicle(
+                vin,
+                vehicle.get("chargeSessions", 0) or 0,
+                vehicle.get("totalkWh", 0) or 0,
+                vehicle.get("startkWh", 0) or 0,
+            ):
+                # Leave them where they are, and try again next time
+                continue
+            for key in ("chargeSessions", "startkWh", "totalkWh"):
+                vehicle.pop(key, None)
+            migrated += 1
+        if migrated:
+            logger.info(
+                "Moved charge sessions for %d vehicles to the sessions database"
+                % (migrated)
+            )
+            self.markSettingsDirty("Vehicles")
+
+    def markEMSValuesChanged(self, name):
+        # An EMS module which is sent its values, rather than polling for
+        # them, has been sent new ones. The amps offered are worked out again
+        # emsPushWindow seconds later, from that module's values alone, so
+        # that changes in surplus are acted on without waiting for the next
+        # green energy check. Values sent meanwhile are taken together.
+        self.queue_background_task({"cmd": "checkPushedEnergy", "module": name})
+
+    def markSettingsDirty(self, key=None):
+        # Settings have changed, and need to be saved. The save waits for
+        # settingsSaveWindow seconds, so that other changes made meanwhile
+        # are saved with it. If only one setting has changed, pass its key,
+        # so that the settings database only needs to compare that one.
+        self.settingsPersister.markDirty(key)
+        self.queue_background_task({"cmd": "saveSettings"})
+
+    def getHistory(self, start, end):
+        # Returns (timestamp, watts) for each 5 minute period from start up
+        # to end, given as datetimes, in which a charger delivered power
+        return self.history.get(start.timestamp(), end.timestamp())
+
+    def getVehicleSessions(self, vin, limit=20):
+        # Returns a vehicle's total sessions and kWh, its rollup for each
+        # month and its most recent sessions
+        sessions, kWh = self.sessionStore.getTotals().get(vin, (0, 0))
+        recent = self.sessionStore.getSessions(vin, limit)
+        for session in recent:
+            session["startFormat"] = datetime.fromtimestamp(session["start"]).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            session["endFormat"] = ""
+            if session["end"] is not None:
+                session["endFormat"] = datetime.fromtimestamp(session["end"]).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+        return {
+            "chargeSessions": sessions,
+            "totalkWh": kWh,
+            "months": self.sessionStore.getMonths(vin),
+            "recent": recent,
+        }
+
+    def getVehicleTotals(self):
+        # Returns {vin: {"chargeSessions": n, "totalkWh": kWh}} for each
+        # vehicle we know of, or have recorded sessions for
+        totals = {
+            vin: {"chargeSessions": 0, "totalkWh": 0}
+            for vin in (self.settings.get("Vehicles", None) or {})
+        }
+        for vin, (sessions, kWh) in self.sessionStore.getTotals().items():
+            totals[vin] = {"chargeSessions": sessions, "totalkWh": kWh}
+        return totals
+
+    def getSettingsStats(self):
+        # Returns how often settings have been written, and how many bytes
+        return self.settingsPersister.getStats()
 
     def getSetting(self, key, default=None):
         """Get a setting value by key.
@@ -1543,8 +1838,9 @@ class TWCMaster:
             value: The value to set
         """
         self.settings[key] = value
+        self.markSettingsDirty(key)
 
-    def send_master_linkready1(self):
+    def send_master_linkready1(self, bus=None):
         logger.log(logging.INFO8, "Send master linkready1")
 
         # When master is powered on or reset, it sends 5 to 7 copies of this
@@ -1593,14 +1889,15 @@ class TWCMaster:
         # send slave linkready every 10 seconds whether or not they got master
         # linkready1/2 and if a master sees slave linkready, it will start sending
         # the slave master heartbeat once per second and the two are then connected.
-        self.getInterfaceModule().send(
+        interface, TWCID = self.getBusInterface(bus)
+        interface.send(
             bytearray(b"\xfc\xe1")
-            + self.TWCID
+            + TWCID
             + self.masterSign
             + bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00")
         )
 
-    def send_master_linkready2(self):
+    def send_master_linkready2(self, bus=None):
         logger.log(logging.INFO8, "Send master linkready2")
 
         # This linkready2 message is also sent 5 times when master is booted/reset
@@ -1619,9 +1916,10 @@ class TWCMaster:
         # Once a master starts sending heartbeat messages to a slave, it
         # no longer sends the global linkready2 message (or if it does,
         # they're quite rare so I haven't seen them).
-        self.getInterfaceModule().send(
+        interface, TWCID = self.getBusInterface(bus)
+        interface.send(
             bytearray(b"\xfb\xe2")
-            + self.TWCID
+            + TWCID
             + self.masterSign
             + bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00")
         )
@@ -1649,11 +1947,8 @@ class TWCMaster:
     def sendStartCommand(self):
         # This function will loop through each of the Slave TWCs, and send them the start command.
         for slaveTWC in self.getSlaveTWCs():
-            self.getInterfaceModule().send(
-                bytearray(b"\xfc\xb1")
-                + self.TWCID
-                + slaveTWC.TWCID
-                + bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+            slaveTWC.send_master_command(
+                b"\xfc\xb1", b"\x00\x00\x00\x00\x00\x00\x00\x00\x00"
             )
 
     def sendStopCommand(self, subTWC=None):
@@ -1661,11 +1956,8 @@ class TWCMaster:
         # If the subTWC parameter is supplied, we only stop the specified TWC
         for slaveTWC in self.getSlaveTWCs():
             if (not subTWC) or (subTWC == slaveTWC.TWCID):
-                self.getInterfaceModule().send(
-                    bytearray(b"\xfc\xb2")
-                    + self.TWCID
-                    + slaveTWC.TWCID
-                    + bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+                slaveTWC.send_master_command(
+                    b"\xfc\xb2", b"\x00\x00\x00\x00\x00\x00\x00\x00\x00"
                 )
 
     def setAllowedFlex(self, amps):
@@ -1674,7 +1966,7 @@ class TWCMaster:
     def setChargeNowAmps(self, amps):
         # Accepts a number of amps to define the amperage at which we
         # should charge
-        if amps > self.config["config"]["wiringMaxAmpsAllTWCs"]:
+        if amps > self.configSnapshot.wiringMaxAmpsAllTWCs:
             logger.info(
                 "setChargeNowAmps failed because specified amps are above wiringMaxAmpsAllTWCs"
             )
@@ -1727,10 +2019,10 @@ class TWCMaster:
         # that value.
         self.getBackgroundTasksLock()
 
-        if amps > self.config["config"]["wiringMaxAmpsAllTWCs"]:
+        if amps > self.configSnapshot.wiringMaxAmpsAllTWCs:
             # Never tell the slaves
             # to draw more amps than the physical charger wiring can handle.
-            amps = self.config["config"]["wiringMaxAmpsAllTWCs"]
+            amps = self.configSnapshot.wiringMaxAmpsAllTWCs
 
         self.limitAmpsToDivideAmongSlaves = amps
 
@@ -1742,17 +2034,17 @@ class TWCMaster:
         # that value.
         self.getBackgroundTasksLock()
 
-        if amps > self.config["config"]["wiringMaxAmpsAllTWCs"]:
+        if amps > self.configSnapshot.wiringMaxAmpsAllTWCs:
             # Never tell the slaves to draw more amps than the physical charger
             # wiring can handle.
             logger.error(
                 "ERROR: specified maxAmpsToDivideAmongSlaves "
                 + str(amps)
                 + " > wiringMaxAmpsAllTWCs "
-                + str(self.config["config"]["wiringMaxAmpsAllTWCs"])
+                + str(self.configSnapshot.wiringMaxAmpsAllTWCs)
                 + ".\nSee notes above wiringMaxAmpsAllTWCs in the 'Configuration parameters' section."
             )
-            amps = self.config["config"]["wiringMaxAmpsAllTWCs"]
+            amps = self.configSnapshot.wiringMaxAmpsAllTWCs
 
         self.maxAmpsToDivideAmongSlaves = amps
 
@@ -1812,24 +2104,13 @@ class TWCMaster:
         if avgCurrent > 0:
             periodTimestamp = snaptime - timedelta(minutes=5)
 
-            if not "history" in self.settings:
-                self.settings["history"] = []
-
-            self.settings["history"].append(
-                (
-                    periodTimestamp.isoformat(timespec="seconds"),
-                    self.convertAmpsToWatts(avgCurrent)
-                    * self.getRealPowerFactor(avgCurrent),
-                )
+            # History more than two days old is overwritten as we go
+            self.history.append(
+                periodTimestamp.timestamp(),
+                self.convertAmpsToWatts(avgCurrent)
+                * self.getRealPowerFactor(avgCurrent),
             )
 
-            self.settings["history"] = [
-                e
-                for e in self.settings["history"]
-                if datetime.fromisoformat(e[0]) >= (now - timedelta(days=2))
-            ]
-            self.queue_background_task({"cmd": "saveSettings"})
-
     def startCarsCharging(self, vin=None):
         # This function is the opposite functionality to the stopCarsCharging function
         # below
@@ -1867,7 +2148,7 @@ class TWCMaster:
 
     def time_now(self):
         return datetime.now().strftime(
-            "%H:%M:%S" + (".%f" if self.config["config"]["displayMilliseconds"] else "")
+            "%H:%M:%S" + (".%f" if self.configSnapshot.displayMilliseconds else "")
         )
 
     def tokenSyncEnabled(self):
@@ -1943,10 +2224,10 @@ class TWCMaster:
             )
 
     def getRealPowerFactor(self, amps):
-        realPowerFactorMinAmps = self.config["config"].get("realPowerFactorMinAmps", 1)
-        realPowerFactorMaxAmps = self.config["config"].get("realPowerFactorMaxAmps", 1)
-        minAmps = self.config["config"]["minAmpsPerTWC"]
-        maxAmps = self.config["config"]["wiringMaxAmpsAllTWCs"]
+        realPowerFactorMinAmps = self.configSnapshot.realPowerFactorMinAmps
+        realPowerFactorMaxAmps = self.configSnapshot.realPowerFactorMaxAmps
+        minAmps = self.configSnapshot.minAmpsPerTWC
+        maxAmps = self.configSnapshot.wiringMaxAmpsAllTWCs
         if minAmps == maxAmps:
             return realPowerFactorMaxAmps
         else:
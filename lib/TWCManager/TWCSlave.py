@@ -2,12 +2,15 @@ from datetime import datetime
 import logging
 import re
 import time
+from TWCManager.ConfigLoader import ConfigSnapshot
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.Protocol.TWCCodec import encode_frame
 
 logger = LoggerFactory.get_logger("Slave", "Slave")
 
 
 class TWCSlave:
+    bus = None
     config = None
     configConfig = None
     TWCID = None
@@ -26,6 +29,11 @@ class TWCSlave:
     masterHeartbeatData = bytearray(b"\x00\x00\x00\x00\x00\x00\x00\x00\x00")
     timeLastRx = time.time()
 
+    # The last heartbeat we sent to this TWC, already encoded for the
+    # interface, and the masterHeartbeatData it was built from.
+    heartbeatFrame = None
+    heartbeatFrameData = None
+
     # reported* vars below are reported to us in heartbeat messages from a Slave
     # TWC.
     reportedAmpsMax = 0
@@ -75,6 +83,8 @@ class TWCSlave:
     def __init__(self, TWCID, maxAmps, config, master):
         self.config = config
         self.configConfig = self.config.get("config", {})
+        # Options read on every heartbeat are read from a snapshot
+        self.configSnapshot = ConfigSnapshot(self.configConfig)
         self.master = master
         self.TWCID = TWCID
         self.maxAmps = maxAmps
@@ -89,6 +99,18 @@ class TWCSlave:
         self.startStopDelay = self.configConfig.get("startStopDelay", 60)
         self.vehicleModule = self.get_vehicle_module()
 
+    def getInterface(self):
+        # Returns the interface for the bus this TWC is on
+        if self.bus:
+            return self.bus.interface
+        return self.master.getModulesByType("Interface")[0]["ref"]
+
+    def getMasterTWCID(self):
+        # Returns the TWCID our fake master uses on the bus this TWC is on
+        if self.bus:
+            return self.bus.TWCID
+        return self.master.getFakeTWCID()
+
     def get_vehicle_module(self):
         # Try to use VehiclePriority proxy for fallback logic
         vehiclePriority = self.master.getModuleByName("VehiclePriority")
@@ -126,7 +148,7 @@ class TWCSlave:
                 debugOutput += " %02X%02X" % (heartbeatData[7], heartbeatData[8])
             debugOutput += "  M"
 
-            if not self.config["config"]["fakeMaster"]:
+            if not self.configSnapshot.fakeMaster:
                 debugOutput += " %02X%02X" % (
                     self.master.getMasterTWCID()[0],
                     self.master.getMasterTWCID()[1],
@@ -348,13 +370,23 @@ class TWCSlave:
                 # Increase array length to 9
                 self.master.slaveHeartbeatData.append(0x00)
 
-        self.master.getModulesByType("Interface")[0]["ref"].send(
+        self.getInterface().send(
             bytearray(b"\xfd\xe0")
-            + self.master.getFakeTWCID()
+            + self.getMasterTWCID()
             + bytearray(masterID)
             + bytearray(self.master.slaveHeartbeatData)
         )
 
+    def send_master_command(self, command, data):
+        # Send a message with the two byte command from our fake master to
+        # this TWC, on the bus it's connected to.
+        self.getInterface().send(
+            bytearray(command)
+            + self.getMasterTWCID()
+            + bytearray(self.TWCID)
+            + bytearray(data)
+        )
+
     def send_master_heartbeat(self):
         # Send our fake master's heartbeat to this TWCSlave.
         #
@@ -563,7 +595,7 @@ class TWCSlave:
                     # to near zero within a few seconds.
                     self.master.stopCarsCharging(self.currentVIN)
             elif (
-                self.lastAmpsOffered >= self.config["config"]["minAmpsPerTWC"]
+                self.lastAmpsOffered >= self.configSnapshot.minAmpsPerTWC
                 and self.reportedAmpsActual < 1.0
                 and self.reportedState != 0x02
             ):
@@ -585,12 +617,26 @@ class TWCSlave:
                 ).getCarApiVehicles():
                     vehicle.stopAskingToStartCharging = False
 
-        self.master.getModulesByType("Interface")[0]["ref"].send(
-            bytearray(b"\xfb\xe0")
-            + self.master.getFakeTWCID()
-            + bytearray(self.TWCID)
-            + bytearray(self.masterHeartbeatData)
-        )
+        interface = self.getInterface()
+        sendFrame = getattr(interface, "sendFrame", None)
+        if sendFrame is None:
+            self.send_master_command(b"\xfb\xe0", self.masterHeartbeatData)
+            return
+
+        # We send the same heartbeat every second until masterHeartbeatData
+        # changes, so only encode it when it does.
+        if (
+            self.heartbeatFrame is None
+            or self.heartbeatFrameData != self.masterHeartbeatData
+        ):
+            self.heartbeatFrameData = bytes(self.masterHeartbeatData)
+            self.heartbeatFrame = encode_frame(
+                bytearray(b"\xfb\xe0")
+                + self.getMasterTWCID()
+                + bytearray(self.TWCID)
+                + self.heartbeatFrameData
+            )
+        sendFrame(self.heartbeatFrame)
 
     def receive_slave_heartbeat(self, heartbeatData):
         # Handle heartbeat message received from real slave TWC.
@@ -747,7 +793,7 @@ class TWCSlave:
                 + "."
             )
 
-        minAmpsToOffer = self.config["config"]["minAmpsPerTWC"]
+        minAmpsToOffer = self.configSnapshot.minAmpsPerTWC
         if self.minAmpsTWCSupports > minAmpsToOffer:
             minAmpsToOffer = self.minAmpsTWCSupports
 
@@ -1142,13 +1188,13 @@ class TWCSlave:
                 - self.reportedAmpsActual
                 + self.lastAmpsOffered
             )
-            if totalAmpsAllTWCs > self.config["config"]["wiringMaxAmpsAllTWCs"]:
+            if totalAmpsAllTWCs > self.configSnapshot.wiringMaxAmpsAllTWCs:
                 # totalAmpsAllTWCs would exceed wiringMaxAmpsAllTWCs if we
                 # allowed this TWC to use desiredAmpsOffered.  Instead, try
                 # offering as many amps as will increase total_amps_actual_all_twcs()
                 # up to wiringMaxAmpsAllTWCs.
                 self.lastAmpsOffered = int(
-                    self.config["config"]["wiringMaxAmpsAllTWCs"]
+                    self.configSnapshot.wiringMaxAmpsAllTWCs
                     - (self.master.getTotalAmpsInUse() - self.reportedAmpsActual)
                 )
 
@@ -0,0 +1,585 @@
+import collections
+import queue
+import threading
+import time
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.TaskStats import TaskStats
+
+logger = LoggerFactory.get_logger("Tasks", "Manager")
+
+# Task priorities, highest first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+priorityNames = ("high", "normal", "low")
+
+# What to do with a task that misses its deadline
+EXPIRE_DROP = "drop"
+EXPIRE_RESCHEDULE = "reschedule"
+
+# The task being run by the current thread, if it is a background task worker
+current = threading.local()
+
+
+class TaskCancelled(BaseException):
+    # Raised by cancellableSleep() in a task that has run past its deadline.
+    #
+    # Like asyncio.CancelledError, this isn't an Exception, so that it isn't
+    # swallowed by the "except Exception" blocks around API calls and
+    # retries on its way back up to the worker.
+    pass
+
+
+def cancellableSleep(seconds):
+    # Sleep for seconds, unless the background task we're running is
+    # cancelled first, in which case TaskCancelled is raised. Outside of a
+    # background task, this is just time.sleep().
+    context = getattr(current, "context", None)
+    if context is None:
+        time.sleep(seconds)
+    elif context.cancelled.wait(seconds):
+        raise TaskCancelled()
+
+
+class TaskContext:
+    # A task being run by a lane's worker, and the deadline it must finish
+    # by. cancelled is set if it doesn't.
+
+    def __init__(self, lane, task, deadline):
+        self.lane = lane
+        self.task = task
+        self.deadline = deadline
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self.timer = None
+
+
+class TaskQueue:
+    # A queue of tasks for one lane, which hands out the highest priority
+    # task first, and tasks of the same priority in the order they were
+    # queued.
+    #
+    # So that a steady stream of higher priority tasks can't hold back the
+    # rest forever, a waiting task is treated as one priority higher for
+    # every agingInterval seconds it has waited.
+
+    agingInterval = 5
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.tasks = [collections.deque() for priority in priorityNames]
+        self.unfinished = 0
+        self.waits = [
+            {"count": 0, "total": 0.0, "max": 0.0} for priority in priorityNames
+        ]
+
+    def get(self, timeout=None):
+        # Returns the next task, or raises queue.Empty if there is none
+        # within timeout seconds.
+        return self.getEntry(timeout)[2]
+
+    def getEntry(self, timeout=None):
+        # As get(), but returns when the task was queued and its deadline
+        # along with it
+        with self.condition:
+            if not self.condition.wait_for(self.qsize, timeout):
+                raise queue.Empty
+            now = time.monotonic()
+            best = None
+            for priority, tasks in enumerate(self.tasks):
+                if not tasks:
+                    continue
+                queued, deadline, task = tasks[0]
+                rank = (priority - int((now - queued) / self.agingInterval), queued)
+                if best is None or rank < best[0]:
+                    best = (rank, priority)
+            queued, deadline, task = self.tasks[best[1]].popleft()
+
+            waits = self.waits[best[1]]
+            waits["count"] += 1
+            waits["total"] += now - queued
+            waits["max"] = max(waits["max"], now - queued)
+            return queued, deadline, task
+
+    def getStats(self):
+        with self.condition:
+            return {
+                name: {
+                    "queued": len(self.tasks[priority]),
+                    "waits": self.waits[priority]["count"],
+                    "meanWait": self.waits[priority]["total"]
+                    / max(1, self.waits[priority]["count"]),
+                    "maxWait": self.waits[priority]["max"],
+                }
+                for priority, name in enumerate(priorityNames)
+            }
+
+    def join(self):
+        # Block until every task queued so far has been marked done
+        with self.condition:
+            self.condition.wait_for(lambda: self.unfinished == 0)
+
+    def promote(self, task, priority):
+        # Move a queued task up to priority, if it's lower than that now
+        with self.condition:
+            for lower in range(priority + 1, len(self.tasks)):
+                for entry in self.tasks[lower]:
+                    if entry[2] is task:
+                        self.tasks[lower].remove(entry)
+                        self.tasks[priority].append(entry)
+                        return True
+        return False
+
+    def put(self, task, priority, timeout=None):
+        # The task must be finished within timeout seconds of being queued
+        now = time.monotonic()
+        deadline = now + timeout if timeout is not None else float("inf")
+        with self.condition:
+            self.tasks[priority].append((now, deadline, task))
+            self.unfinished += 1
+            self.condition.notify_all()
+
+    def qsize(self):
+        return sum(len(tasks) for tasks in self.tasks)
+
+    def task_done(self):
+        with self.condition:
+            self.unfinished -= 1
+            self.condition.notify_all()
+
+
+def stopChargeFirst(task):
+    # Stopping a charge can't wait behind anything else
+    return PRIORITY_HIGH if not task.get("charge", True) else PRIORITY_NORMAL
+
+
+class TaskType:
+    # A kind of background task, identified by its "cmd", with the handler
+    # that runs it and how it is queued:
+    #
+    #   lane      the lane it runs in
+    #   priority  its priority in that lane, or a function that is given the
+    #             task and returns it
+    #   deadline  seconds it has to finish, from when it is queued
+    #   expiry    EXPIRE_DROP or EXPIRE_RESCHEDULE, if it misses its deadline
+    #   dedup     task keys that, with the cmd, identify a task for merging:
+    #             while a task is queued or running, another with the same
+    #             values is merged into it rather than queued. By default
+    #             every task with the same cmd is merged. None turns merging
+    #             off.
+    #   coalesce  seconds to hold a task before queuing it, so that those
+    #             like it queued meanwhile are merged into it and run once
+
+    def __init__(
+        self,
+        cmd,
+        handler=None,
+        lane="general",
+        priority=PRIORITY_NORMAL,
+        deadline=120,
+        expiry=EXPIRE_DROP,
+        dedup=(),
+        coalesce=0,
+    ):
+        self.cmd = cmd
+        self.coalesce = coalesce
+        self.handler = handler
+        self.lane = lane
+        self.priority = priority
+        self.deadline = deadline
+        self.expiry = expiry
+        self.dedup = dedup
+
+    def getDedupKey(self, task):
+        if self.dedup is None or "cmd" not in task:
+            return None
+        if not self.dedup:
+            return task["cmd"]
+        key = [task["cmd"]]
+        for name in self.dedup:
+            value = task.get(name, None)
+            if isinstance(value, bytearray):
+                # TWCIDs may be bytearrays, which can't be hashed
+                value = bytes(value)
+            key.append(value)
+        return tuple(key)
+
+    def getPriority(self, task):
+        if callable(self.priority):
+            return self.priority(task)
+        return self.priority
+
+    def toDict(self):
+        return {
+            "handler": getattr(self.handler, "__name__", None),
+            "lane": self.lane,
+            "priority": (
+                priorityNames[self.priority]
+                if not callable(self.priority)
+                else self.priority.__name__
+            ),
+            "deadline": self.deadline,
+            "expiry": self.expiry,
+            "dedup": list(self.dedup) if self.dedup is not None else None,
+            "coalesce": self.coalesce,
+        }
+
+
+class TaskExecutor:
+    # Queues background tasks in lanes, each run by its own worker thread.
+    #
+    # Background tasks used to share a single queue and thread, so a slow
+    # vehicle command (which may sleep between retries while a car wakes up)
+    # held up green energy tracking, status updates and saving settings until
+    # it finished. Each lane now has a queue and worker of its own, so a task
+    # only waits behind tasks of the same kind. Tasks within a lane still run
+    # one at a time, in the order they were queued.
+    #
+    # What a task does, and how it is queued, is looked up by its "cmd" in a
+    # registry of TaskTypes. TWCManager registers handlers for the commands
+    # it queues itself, and modules can register() their own. Commands
+    # without a lane of their own run in the general lane, along with the
+    # commands we send to the TWCs themselves.
+    #
+    # Within a lane, tasks that stop a charge or end an unauthorised session
+    # run before routine ones, and housekeeping runs last. A task can set its
+    # own priority with a "priority" key.
+    #
+    # Every task has a deadline, some seconds (or its own "timeout" key)
+    # after it was queued. A task still waiting at its deadline isn't run.
+    # One still running at its deadline is cancelled: cancellableSleep()
+    # raises TaskCancelled in it, and as it may be stuck somewhere that
+    # doesn't check, a new worker takes over the lane. The old worker exits
+    # when the task finally returns. Either way, the task is then dropped or
+    # rescheduled, depending on its type.
+
+    lanes = ("general", "vehicle", "ems", "persistence", "notify")
+    # How the commands TWCManager queues itself are queued, used for those
+    # that haven't been registered yet, and as the defaults when they are.
+    #
+    # Tasks that are queued again every few seconds are dropped if they miss
+    # their deadline, as a fresh one will be along shortly. Those that only
+    # happen once, or that would lose settings if dropped, are rescheduled.
+    builtinTasks = {
+        "applyChargeLimit": {
+            "lane": "vehicle",
+            "deadline": 300,
+            "expiry": EXPIRE_RESCHEDULE,
+        },
+        "charge": {
+            "lane": "vehicle",
+            "priority": stopChargeFirst,
+            "deadline": 300,
+            "expiry": EXPIRE_RESCHEDULE,
+        },
+        "checkArrival": {
+            "lane": "vehicle",
+            "deadline": 300,
+            "expiry": EXPIRE_RESCHEDULE,
+        },
+        "checkCharge": {"lane": "vehicle", "deadline": 300},
+        "checkDeparture": {
+            "lane": "vehicle",
+            "deadline": 300,
+            "expiry": EXPIRE_RESCHEDULE,
+        },
+        "checkGreenEnergy": {"lane": "ems", "deadline": 60},
+        "checkPushedEnergy": {"lane": "ems", "deadline": 60, "dedup": ("module",)},
+        "checkVINEntitlement": {
+            "priority": PRIORITY_HIGH,
+            "expiry": EXPIRE_RESCHEDULE,
+            "dedup": ("subTWC", "vin"),
+        },
+        "compactSessions": {"lane": "persistence", "priority": PRIORITY_LOW},
+        "getLifetimekWh": {"priority": PRIORITY_LOW},
+        "getVehicleVIN": {"dedup": ("slaveTWC",)},
+        "saveSettings": {
+            "lane": "persistence",
+            "deadline": 60,
+            "expiry": EXPIRE_RESCHEDULE,
+        },
+        "snapHistoryData": {
+            "lane": "persistence",
+            "priority": PRIORITY_LOW,
+            "deadline": 60,
+        },
+        "sunrise": {
+            "lane": "ems",
+            "priority": PRIORITY_LOW,
+            "deadline": 60,
+            "expiry": EXPIRE_RESCHEDULE,
+        },
+        "updateStatus": {"lane": "notify", "deadline": 60},
+        "webhook": {"lane": "notify", "priority": PRIORITY_LOW, "deadline": 60},
+    }
+    rescheduleDelay = 30
+
+    def __init__(self, useLanes=True, timers=None, expired=None):
+        # timers is the TimerHeap used to cancel tasks that run past their
+        # deadline; without it, tasks are only checked before they start.
+        # expired(task) is called when a task misses its deadline, and
+        # returns True if it was rescheduled.
+        if not useLanes:
+            # Run every task on a single worker, one after another
+            self.lanes = ("general",)
+        self.builtinTypes = {
+            cmd: TaskType(cmd, **options) for cmd, options in self.builtinTasks.items()
+        }
+        self.contexts = {lane: None for lane in self.lanes}
+        self.counters = {}
+        self.defaultType = TaskType(None)
+        self.expired = expired
+        self.lock = threading.Lock()
+        self.queues = {lane: TaskQueue() for lane in self.lanes}
+        self.running = {lane: None for lane in self.lanes}
+        self.stats = TaskStats()
+        self.taskTypes = {}
+        self.timers = timers
+        self.worker = None
+        self.workers = {lane: None for lane in self.lanes}
+
+    def count(self, task, counter):
+        # Count a timeout, expiry, cancellation or reschedule for the task's
+        # command. Called with the lock held.
+        counters = self.counters.setdefault(
+            task.get("cmd", None),
+            {"expired": 0, "timeouts": 0, "cancelled": 0, "rescheduled": 0},
+        )
+        counters[counter] += 1
+
+    def done(self, task):
+        # task_done() must be called to let the queue know the task is
+        # finished. join() can then be used to block until all tasks in the
+        # queue are done.
+        #
+        # Returns False if the task had already run past its deadline and
+        # been given up on, in which case this has already been done.
+        context = getattr(current, "context", None)
+        if context is None or context.task is not task:
+            return False
+        current.context = None
+        with self.lock:
+            if self.contexts[context.lane] is not context:
+                return False
+            self.contexts[context.lane] = None
+            self.running[context.lane] = None
+        if context.timer:
+            context.timer.cancel()
+        self.stats.ran(task.get("cmd", None), time.monotonic() - context.started)
+        self.queues[context.lane].task_done()
+        return True
+
+    def expire(self, lane, task, counter):
+        # Give up on a task that missed its deadline, and let the owner drop
+        # or reschedule it
+        rescheduled = self.expired(task) if self.expired else False
+        with self.lock:
+            self.count(task, counter)
+            if rescheduled:
+                self.count(task, "rescheduled")
+        self.queues[lane].task_done()
+
+    def get(self, lane, timeout=None):
+        # Returns the next task in lane, or raises queue.Empty if there is
+        # none within timeout seconds. Tasks that are past their deadline
+        # are skipped.
+        while True:
+            queued, deadline, task = self.queues[lane].getEntry(timeout=timeout)
+            now = time.monotonic()
+            self.stats.waited(task.get("cmd", None), now - queued)
+            if now < deadline:
+                break
+            logger.info(
+                "Background task %s missed its deadline while queued"
+                % (task.get("cmd", None))
+            )
+            self.expire(lane, task, "expired")
+
+        context = TaskContext(lane, task, deadline)
+        current.context = context
+        with self.lock:
+            self.contexts[lane] = context
+            self.running[lane] = task.get("cmd", None)
+        if self.timers is not None and deadline != float("inf"):
+            context.timer = self.timers.schedule(
+                deadline - time.monotonic(), self.timedOut, context
+            )
+        return task
+
+    def getCoalesce(self, task):
+        # Returns the number of seconds to hold a task before queuing it
+        return self.getTaskType(task).coalesce
+
+    def getCounters(self):
+        # Returns the number of tasks that missed their deadline while
+        # queued, were timed out while running, ended early because they
+        # were cancelled, or were rescheduled, for each command
+        with self.lock:
+            return {cmd: dict(counters) for cmd, counters in self.counters.items()}
+
+    def getDeadline(self, task):
+        # Returns the number of seconds a task has to finish, and what to do
+        # with it if it doesn't
+        taskType = self.getTaskType(task)
+        return task.get("timeout", taskType.deadline), taskType.expiry
+
+    def getDedupKey(self, task):
+        # Returns the key that identifies tasks to be merged with this one,
+        # or None if it shouldn't be merged with any
+        return self.getTaskType(task).getDedupKey(task)
+
+    def getLane(self, task):
+        lane = self.getTaskType(task).lane
+        return lane if lane in self.queues else "general"
+
+    def getPriority(self, task):
+        if "priority" in task:
+            return task["priority"]
+        return self.getTaskType(task).getPriority(task)
+
+    def getLanes(self):
+        return self.lanes
+
+    def getQueueDepths(self):
+        # Returns the number of tasks waiting in each lane, and the command
+        # each lane is running now, if any. For each priority, we also give
+        # the number of tasks waiting, and how long tasks have waited before
+        # starting, in seconds. For each command run in the lane that has
+        # missed a deadline, we give the counters from getCounters().
+        counters = self.getCounters()
+        return {
+            lane: {
+                "queued": self.queues[lane].qsize(),
+                "running": self.running[lane],
+                "priorities": self.queues[lane].getStats(),
+                "deadlines": {
+                    cmd: counters[cmd]
+                    for cmd in counters
+                    if self.getLane({"cmd": cmd}) == lane
+                },
+            }
+            for lane in self.lanes
+        }
+
+    def getStats(self):
+        # Returns how many tasks of each command have been queued, taken
+        # from the queue and finished, and histograms of how long they
+        # waited and ran, from TaskStats
+        return self.stats.getStats()
+
+    def getTaskType(self, task):
+        # Returns the registered TaskType for the task's command, or if there
+        # isn't one, its built in defaults
+        cmd = task.get("cmd", None)
+        taskType = self.taskTypes.get(cmd, None)
+        if taskType is None:
+            taskType = self.builtinTypes.get(cmd, self.defaultType)
+        return taskType
+
+    def getTaskTypes(self):
+        # Returns each registered command, with its handler and how it is
+        # queued
+        return {cmd: taskType.toDict() for cmd, taskType in self.taskTypes.items()}
+
+    def isRunning(self, task):
+        # True while a worker is running the task
+        with self.lock:
+            return any(
+                context is not None and context.task is task
+                for context in self.contexts.values()
+            )
+
+    def isWorker(self, lane):
+        # False once the current thread has been replaced as lane's worker,
+        # after its task ran past its deadline
+        return threading.current_thread() is self.workers[lane]
+
+    def join(self):
+        # Block until every task queued so far has been run
+        for lane in self.lanes:
+            self.queues[lane].join()
+
+    def promote(self, task):
+        # Called when a queued task has been changed, in case it now needs
+        # to run sooner (for example, a charge start that became a stop)
+        self.queues[self.getLane(task)].promote(task, self.getPriority(task))
+
+    def put(self, task):
+        self.stats.queued(task.get("cmd", None))
+        self.queues[self.getLane(task)].put(
+            task, self.getPriority(task), self.getDeadline(task)[0]
+        )
+
+    def register(self, cmd, handler, **options):
+        # Register handler(task) to run tasks with the given command. The
+        # options are those of TaskType; any not given are taken from
+        # builtinTasks for the commands TWCManager queues itself, or are
+        # the TaskType defaults. Registering a command again replaces it.
+        options = dict(self.builtinTasks.get(cmd, {}), **options)
+        if options.get("lane", "general") not in TaskExecutor.lanes:
+            raise ValueError(
+                "Unknown background task lane %s for %s" % (options["lane"], cmd)
+            )
+        self.taskTypes[cmd] = TaskType(cmd, handler, **options)
+        return self.taskTypes[cmd]
+
+    def run(self, task):
+        # Run a task with the handler registered for its command. Returns
+        # False if there isn't one.
+        taskType = self.taskTypes.get(task.get("cmd", None), None)
+        if taskType is None or taskType.handler is None:
+            if "cmd" in task:
+                logger.warning(
+                    "No handler is registered for background task %s" % (task["cmd"])
+                )
+            return False
+        taskType.handler(task)
+        return True
+
+    def start(self, worker, *args):
+        # Start a daemon thread for each lane, which calls worker(*args, lane)
+        self.worker = (worker, args)
+        threads = [self.startWorker(lane) for lane in self.lanes]
+        logger.info("Started %d background task lanes" % (len(threads)))
+        return threads
+
+    def startWorker(self, lane):
+        worker, args = self.worker
+        thread = threading.Thread(
+            target=worker, args=args + (lane,), name="BackgroundTasks-" + lane
+        )
+        thread.daemon = True
+        self.workers[lane] = thread
+        thread.start()
+        return thread
+
+    def taskCancelled(self, task):
+        # Called by the worker when a task ended early because it was
+        # cancelled
+        with self.lock:
+            self.count(task, "cancelled")
+
+    def timedOut(self, context):
+        # Called from the timer thread when a task is still running at its
+        # deadline
+        with self.lock:
+            if self.contexts[context.lane] is not context:
+                # It finished in time
+                return
+            self.contexts[context.lane] = None
+            self.running[context.lane] = None
+        context.cancelled.set()
+        self.stats.ran(
+            context.task.get("cmd", None), time.monotonic() - context.started
+        )
+        logger.warning(
+            "Background task %s in lane %s ran past its deadline, cancelling it"
+            % (context.task.get("cmd", None), context.lane),
+            extra={"colored": "red"},
+        )
+        self.expire(context.lane, context.task, "timeouts")
+
+        # The worker may never come back from the task, so hand the lane to
+        # a new one
+        if self.worker:
+            self.startWorker(context.lane)
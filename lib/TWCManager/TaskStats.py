@@ -0,0 +1,166 @@
+import array
+import bisect
+import threading
+import time
+
+
+class RollingHistogram:
+    # Counts how many values fell into each of a fixed set of buckets, over
+    # the last windows * windowLength seconds.
+    #
+    # Each window has a fixed-size row of bucket counts in one array, used as
+    # a ring: when a value arrives in a new window, the row of the window it
+    # replaces is cleared and reused. Memory use doesn't grow however many
+    # values are added, and old values age out a window at a time.
+
+    # Upper bounds of the buckets, in seconds. Values above the last bound go
+    # in an extra bucket.
+    bounds = (
+        0.001,
+        0.002,
+        0.005,
+        0.01,
+        0.02,
+        0.05,
+        0.1,
+        0.2,
+        0.5,
+        1,
+        2,
+        5,
+        10,
+        20,
+        60,
+        120,
+        300,
+    )
+
+    def __init__(self, windows=15, windowLength=60):
+        self.buckets = len(self.bounds) + 1
+        self.counts = array.array("L", [0] * (windows * self.buckets))
+        self.epochs = array.array("q", [-1] * windows)
+        self.maxes = array.array("d", [0.0] * windows)
+        self.totals = array.array("d", [0.0] * windows)
+        self.windowLength = windowLength
+        self.windows = windows
+
+    def add(self, value, now):
+        epoch = int(now // self.windowLength)
+        slot = epoch % self.windows
+        if self.epochs[slot] != epoch:
+            # Reuse the oldest window's row
+            start = slot * self.buckets
+            for bucket in range(start, start + self.buckets):
+                self.counts[bucket] = 0
+            self.epochs[slot] = epoch
+            self.maxes[slot] = 0.0
+            self.totals[slot] = 0.0
+        self.counts[slot * self.buckets + bisect.bisect_left(self.bounds, value)] += 1
+        self.maxes[slot] = max(self.maxes[slot], value)
+        self.totals[slot] += value
+
+    def getStats(self, now):
+        # Returns the number of values in each bucket over the windows that
+        # haven't aged out yet, with their count, mean and max, and the 50th,
+        # 95th and 99th percentiles. Percentiles are the upper bound of the
+        # bucket they fall in, or the max if that is lower.
+        epoch = int(now // self.windowLength)
+        buckets = [0] * self.buckets
+        maximum = 0.0
+        total = 0.0
+        for slot in range(self.windows):
+            if epoch - self.epochs[slot] >= self.windows:
+                continue
+            start = slot * self.buckets
+            for bucket in range(self.buckets):
+                buckets[bucket] += self.counts[start + bucket]
+            maximum = max(maximum, self.maxes[slot])
+            total += self.totals[slot]
+        count = sum(buckets)
+
+        stats = {
+            "count": count,
+            "mean": total / max(1, count),
+            "max": maximum,
+            "buckets": buckets,
+        }
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[name] = self.percentile(buckets, count, fraction, maximum)
+        return stats
+
+    def percentile(self, buckets, count, fraction, maximum):
+        seen = 0
+        for bucket, bucketCount in enumerate(buckets):
+            seen += bucketCount
+            if count and seen >= count * fraction:
+                if bucket < len(self.bounds):
+                    return min(self.bounds[bucket], maximum)
+                return maximum
+        return 0.0
+
+
+class TaskStats:
+    # Telemetry for background tasks, kept per command: how many have been
+    # queued, taken from the queue and finished, and rolling histograms of how long they
+    # waited in the queue and how long they took to run.
+
+    def __init__(self, windows=15, windowLength=60):
+        self.cmds = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.windowLength = windowLength
+        self.windows = windows
+
+    def getCmd(self, cmd):
+        # Called with the lock held
+        if cmd not in self.cmds:
+            self.cmds[cmd] = {
+                "queued": 0,
+                "dequeued": 0,
+                "finished": 0,
+                "wait": RollingHistogram(self.windows, self.windowLength),
+                "run": RollingHistogram(self.windows, self.windowLength),
+            }
+        return self.cmds[cmd]
+
+    def getStats(self):
+        # Returns the counters and histograms for each command. Histogram
+        # values are in seconds, and perMinute is the number of tasks
+        # finished per minute over the period the histograms cover.
+        now = time.monotonic()
+        period = min(self.windows * self.windowLength, now - self.started)
+        with self.lock:
+            cmds = {}
+            for cmd, stats in self.cmds.items():
+                run = stats["run"].getStats(now)
+                cmds[cmd] = {
+                    "queued": stats["queued"],
+                    "dequeued": stats["dequeued"],
+                    "finished": stats["finished"],
+                    "perMinute": run["count"] * 60 / max(1, period),
+                    "wait": stats["wait"].getStats(now),
+                    "run": run,
+                }
+        return {
+            "bounds": list(RollingHistogram.bounds),
+            "period": period,
+            "cmds": cmds,
+        }
+
+    def queued(self, cmd):
+        with self.lock:
+            self.getCmd(cmd)["queued"] += 1
+
+    def ran(self, cmd, seconds):
+        # A task finished, or was given up on, after running for seconds
+        with self.lock:
+            stats = self.getCmd(cmd)
+            stats["finished"] += 1
+            stats["run"].add(seconds, time.monotonic())
+
+    def waited(self, cmd, seconds):
+        # A task was taken from the queue after waiting for seconds
+        with self.lock:
+            stats = self.getCmd(cmd)
+            stats["dequeued"] += 1
+            stats["wait"].add(seconds, time.monotonic())
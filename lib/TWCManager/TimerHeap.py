@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from TWCManager.Logging.LoggerFactory import LoggerFactory
+
+logger = LoggerFactory.get_logger("Timers", "Manager")
+
+
+class Timer:
+    # Returned by TimerHeap.schedule(), so that the caller can cancel the
+    # timer before it fires.
+
+    def __init__(self, lock, due, callback, args):
+        self.lock = lock
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.fired = False
+
+    def cancel(self):
+        # Stop the timer from firing. Returns False if it already has.
+        with self.lock:
+            self.cancelled = True
+            return not self.fired
+
+    def timeLeft(self):
+        return max(0, self.due - time.monotonic())
+
+
+class TimerHeap:
+    # Runs callbacks once their delay has passed.
+    #
+    # Timers are kept in a heap ordered by when they are due, and a single
+    # thread sleeps on a condition variable until the earliest one is. If a
+    # timer is scheduled that is due before the one we're waiting for, we're
+    # woken to wait for that instead. Due times use the monotonic clock, so
+    # timers aren't fired early or late when the system clock is changed.
+    #
+    # Callbacks run on the timer thread, one after another, so they should
+    # be quick. Anything that takes a while, such as delayed background
+    # tasks, should be handed off to a background task lane.
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+        self.heap = []
+        self.stats = {"fired": 0, "cancelled": 0, "maxLate": 0.0}
+        self.thread = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def popDue(self, now):
+        # Remove and return the timers that are due. Called with the lock
+        # held.
+        due = []
+        while self.heap:
+            dueTime, seq, timer = self.heap[0]
+            if timer.cancelled:
+                heapq.heappop(self.heap)
+                self.stats["cancelled"] += 1
+            elif dueTime <= now:
+                heapq.heappop(self.heap)
+                timer.fired = True
+                self.stats["fired"] += 1
+                self.stats["maxLate"] = max(self.stats["maxLate"], now - dueTime)
+                due.append(timer)
+            else:
+                break
+        return due
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    due = self.popDue(now)
+                    if due:
+                        break
+                    # Sleep until the next timer is due, or until one is
+                    # scheduled that is due before it.
+                    self.condition.wait(self.heap[0][0] - now if self.heap else None)
+
+            # Run the callbacks without holding the lock, so that they can
+            # schedule further timers
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    logger.error(
+                        "Error in timer callback: %s" % (traceback.format_exc()),
+                        extra={"colored": "red"},
+                    )
+
+    def schedule(self, delay, callback, *args):
+        # Call callback(*args) after delay seconds, from the timer thread.
+        # Returns a Timer, which can be used to cancel it.
+        timer = Timer(self.condition, time.monotonic() + max(0, delay), callback, args)
+        with self.condition:
+            # The counter breaks ties between timers due at the same time, so
+            # they fire in the order they were scheduled.
+            heapq.heappush(self.heap, (timer.due, next(self.counter), timer))
+            if self.heap[0][2] is timer:
+                self.condition.notify()
+            if not self.thread:
+                self.thread = threading.Thread(
+                    target=self.run, name="TimerHeap", daemon=True
+                )
+                self.thread.start()
+        return timer
@@ -190,6 +190,14 @@ class HomeAssistant:
 
         logger.info("HomeAssistant vehicle module initialising, URL=%s", self.url)
 
+    def connectModule(self) -> bool:
+        # Connects to Home Assistant and discovers vehicles. This is run in
+        # the background at startup, so that a Home Assistant which can't be
+        # reached doesn't hold up startup. Until it is done, there are no
+        # vehicles.
+        if not self._enabled:
+            return False
+
         # Test connectivity before attempting discovery
         try:
             resp = self._session.get(f"{self.rest_base}/config", timeout=5)
@@ -201,7 +209,7 @@ class HomeAssistant:
                 self.url,
             )
             self._enabled = False
-            return
+            return False
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
                 logger.error(
@@ -214,11 +222,11 @@ class HomeAssistant:
                     e.response.status_code,
                 )
             self._enabled = False
-            return
+            return False
         except Exception as e:
             logger.error("Failed to verify HomeAssistant connectivity: %s", str(e))
             self._enabled = False
-            return
+            return False
 
         try:
             self._discover_vehicles()
@@ -232,6 +240,7 @@ class HomeAssistant:
                 logger.info(
                     "Discovered Tesla: %s (slug=%s, VIN=%s)", v.name, v.slug, v.vin
                 )
+        return True
 
     def enabled(self) -> bool:
         return self._enabled
@@ -306,6 +315,7 @@ class HomeAssistant:
                 return msg
 
     def _build_vehicles_from_registry(self, devices, entities):
+        vehicles: List[HaVehicle] = []
         ents_by_device: Dict[str, List[dict]] = {}
         for e in entities:
             dev_id = e.get("device_id")
@@ -356,7 +366,11 @@ class HomeAssistant:
                 logger.debug("Device '%s' missing charge_switch entity", name)
                 continue
 
-            self.carApiVehicles.append(HaVehicle(name, vin, d.get("id"), entity_ids))
+            vehicles.append(HaVehicle(name, vin, d.get("id"), entity_ids))
+
+        # Discovery runs in the background, so the vehicles are only made
+        # available once they are all found
+        self.carApiVehicles = vehicles
 
     @staticmethod
     def _extract_vin_from_identifiers(identifiers):
@@ -699,7 +713,7 @@ class HomeAssistant:
             logger.info("Adopting first seen vehicle location as 'home'.")
             self.master.setHomeLat(lat)
             self.master.setHomeLon(lon)
-            self.master.queue_background_task({"cmd": "saveSettings"})
+            self.master.markSettingsDirty()
             return True
 
         feet = float(self.config.get("config", {}).get("atHomeRadius", 10560))
@@ -8,8 +8,8 @@ import secrets
 from threading import Thread
 import time
 from urllib.parse import urlencode, urlsplit, parse_qs
-import jwt
 from TWCManager.Logging.LoggerFactory import LoggerFactory
+from TWCManager.TaskExecutor import cancellableSleep
 
 logger = LoggerFactory.get_logger("TeslaAPI", "Vehicle")
 
@@ -42,6 +42,9 @@ class TeslaAPI:
     __loginRegion = None
     __loginVerifier = None
     verifyCert = True
+    # Seconds to wait for the API to respond, so that a request can't hang
+    # the background task that made it
+    requestTimeout = 30
     carApiLastErrorTime = 0
     wakeDelayMins = 3
     carApiBearerToken = ""
@@ -159,7 +162,9 @@ class TeslaAPI:
         req = None
         now = time.time()
         try:
-            req = requests.post(myRefreshURL, headers=headers, json=data)
+            req = requests.post(
+                myRefreshURL, headers=headers, json=data, timeout=self.requestTimeout
+            )
             logger.log(logging.INFO2, "Car API request" + str(req))
             req.raise_for_status()
             apiResponseDict = json.loads(req.text)
@@ -178,7 +183,7 @@ class TeslaAPI:
             # on web interface. I feel this is safer than trying to log in every
             # ten minutes with a bad token because Tesla might decide to block
             # remote access to your car after too many authorization errors.
-            self.master.queue_background_task({"cmd": "saveSettings"})
+            self.master.markSettingsDirty()
             return False
         except json.decoder.JSONDecodeError:
             logger.log(
@@ -194,7 +199,7 @@ class TeslaAPI:
             self.setCarApiBearerToken(apiResponseDict["access_token"])
             self.setCarApiRefreshToken(apiResponseDict["refresh_token"])
             self.setCarApiTokenExpireTime(now + apiResponseDict["expires_in"])
-            self.master.queue_background_task({"cmd": "saveSettings"})
+            self.master.markSettingsDirty()
             return True
 
         except Exception as e:
@@ -258,7 +263,12 @@ class TeslaAPI:
                     "Authorization": "Bearer " + self.getCarApiBearerToken(),
                 }
                 try:
-                    req = requests.get(url, headers=headers, verify=self.verifyCert)
+                    req = requests.get(
+                        url,
+                        headers=headers,
+                        verify=self.verifyCert,
+                        timeout=self.requestTimeout,
+                    )
                     logger.log(logging.INFO8, "Car API cmd vehicles " + str(req))
                     apiResponseDict = json.loads(req.text)
                 except requests.exceptions.RequestException:
@@ -422,7 +432,7 @@ class TeslaAPI:
                             self.resetCarApiLastErrorTime()
                             # Brief pause to avoid hammering the API on a
                             # transient connectivity hiccup.
-                            time.sleep(5)
+                            cancellableSleep(5)
                         else:
                             # Handle 'error' state.
                             self.updateCarApiLastErrorTime()
@@ -497,7 +507,7 @@ class TeslaAPI:
             # quickly after we send wake_up.  I haven't seen a problem sending a
             # command immediately, but it seems safest to sleep 5 seconds after
             # waking before sending a command.
-            time.sleep(5)
+            cancellableSleep(5)
 
         return True
 
@@ -532,7 +542,7 @@ class TeslaAPI:
             )
             self.master.setHomeLat(lat)
             self.master.setHomeLon(lon)
-            self.master.queue_background_task({"cmd": "saveSettings"})
+            self.master.markSettingsDirty()
             self.master.queue_background_task({"cmd": "sunrise"})
             return True
 
@@ -710,7 +720,7 @@ class TeslaAPI:
             #   {'response': {'result': False, 'reason': 'could_not_wake_buses'}}
             # Waiting 2 seconds seems to consistently avoid the error, but let's
             # wait 5 seconds in case of hardware differences between cars.
-            time.sleep(5)
+            cancellableSleep(5)
 
             if charge:
                 self.applyChargeLimit(self.lastChargeLimitApplied, checkArrival=True)
@@ -725,7 +735,12 @@ class TeslaAPI:
             # Retry up to 3 times on certain errors.
             for _ in range(0, 3):
                 try:
-                    req = requests.post(url, headers=headers, verify=self.verifyCert)
+                    req = requests.post(
+                        url,
+                        headers=headers,
+                        verify=self.verifyCert,
+                        timeout=self.requestTimeout,
+                    )
                     logger.log(
                         logging.INFO8,
                         "Car API cmd charge_" + startOrStop + " " + str(req),
@@ -830,7 +845,7 @@ class TeslaAPI:
                                 # If all retries fail, we'll try again in a
                                 # minute because we set
                                 # carApiLastStartOrStopChargeTime = now earlier.
-                                time.sleep(5)
+                                cancellableSleep(5)
                                 continue
                             else:
                                 # Start charge failed with an error I
@@ -1048,7 +1063,7 @@ class TeslaAPI:
             # the vehicle sometimes refuses the start command because it's
             # "fully charged" under the old limit, but then continues to say
             # charging was stopped once the new limit is in place.
-            time.sleep(5)
+            cancellableSleep(5)
 
         if checkArrival:
             self.updateChargeAtHome()
@@ -1221,7 +1236,9 @@ class TeslaAPI:
 
         req = None
         try:
-            req = requests.post(tokenURL, headers=headers, data=data)
+            req = requests.post(
+                tokenURL, headers=headers, data=data, timeout=self.requestTimeout
+            )
             params = json.loads(req.text)
         except requests.exceptions.RequestException:
             logger.error("Request Exception during Tesla token exchange.")
@@ -1245,7 +1262,7 @@ class TeslaAPI:
             )
             self.__loginState = None
             self.__loginVerifier = None
-            self.master.queue_background_task({"cmd": "saveSettings"})
+            self.master.markSettingsDirty()
             logger.log(logging.INFO2, "Tesla FleetAPI tokens stored successfully.")
             return "success"
 
@@ -1269,6 +1286,10 @@ class TeslaAPI:
                 return False
             else:
                 self.carApiBearerToken = token
+                # TeslaAPI is always loaded, but jwt is only needed once
+                # there is a token, so it isn't imported until then
+                import jwt
+
                 try:
                     decoded = jwt.decode(
                         token,
@@ -1348,7 +1369,13 @@ class TeslaAPI:
         body = {"charging_amps": charge_rate}
 
         try:
-            req = requests.post(url, headers=headers, json=body, verify=self.verifyCert)
+            req = requests.post(
+                url,
+                headers=headers,
+                json=body,
+                verify=self.verifyCert,
+                timeout=self.requestTimeout,
+            )
             logger.log(
                 logging.INFO8,
                 f"Car API cmd set_charging_amps {charge_rate}A {str(req)}",
@@ -1361,7 +1388,7 @@ class TeslaAPI:
 
         # Set charge rates < 5 twice, see https://github.com/tdorssers/TeslaPy/pull/42
         if charge_rate < 5 and not set_again:
-            time.sleep(5)
+            cancellableSleep(5)
             return self.setChargeRate(charge_rate, vehicle, set_again=True)
         else:
             return apiResponseDict
@@ -1442,7 +1469,7 @@ class TeslaAPI:
                             self.master.setHomeLat(car.lat)
                             self.master.setHomeLon(car.lon)
                             self.master.queue_background_task({"cmd": "sunrise"})
-                            self.master.queue_background_task({"cmd": "saveSettings"})
+                            self.master.markSettingsDirty()
                         car.atHome = True
                 return
 
@@ -1458,7 +1485,12 @@ class TeslaAPI:
             "Authorization": "Bearer " + self.getCarApiBearerToken(),
         }
         try:
-            req = requests.post(url, headers=headers, verify=self.verifyCert)
+            req = requests.post(
+                url,
+                headers=headers,
+                verify=self.verifyCert,
+                timeout=self.requestTimeout,
+            )
             logger.log(logging.INFO8, "Car API cmd wake_up" + str(req))
             req.raise_for_status()
             apiResponseDict = json.loads(req.text)
@@ -1651,7 +1683,12 @@ class CarApiVehicle:
         # Retry up to 3 times on certain errors.
         for _ in range(0, 3):
             try:
-                req = requests.get(url, headers=headers, verify=self.verifyCert)
+                req = requests.get(
+                    url,
+                    headers=headers,
+                    verify=self.verifyCert,
+                    timeout=self.carapi.requestTimeout,
+                )
                 req.raise_for_status()
                 logger.log(logging.INFO8, "Car API cmd " + url + " " + str(req))
                 apiResponseDict = json.loads(req.text)
@@ -1685,7 +1722,7 @@ class CarApiVehicle:
                 ):
                     # Retry after 5 seconds.  See notes in car_api_charge where
                     # 'could_not_wake_buses' is handled.
-                    time.sleep(5)
+                    cancellableSleep(5)
                     continue
             except (KeyError, TypeError):
                 # This catches cases like trying to access
@@ -1707,7 +1744,7 @@ class CarApiVehicle:
                         + error
                         + ".  Will retry shortly.",
                     )
-                    time.sleep(5)
+                    cancellableSleep(5)
                     continue
                 logger.info(
                     "ERROR: Can't access vehicle status for "
@@ -1964,7 +2001,11 @@ class CarApiVehicle:
         for _ in range(0, 3):
             try:
                 req = requests.post(
-                    url, headers=headers, json=body, verify=self.verifyCert
+                    url,
+                    headers=headers,
+                    json=body,
+                    verify=self.verifyCert,
+                    timeout=self.carapi.requestTimeout,
                 )
                 logger.log(logging.INFO8, "Car API cmd set_charge_limit " + str(req))
 
@@ -1991,7 +2032,7 @@ class CarApiVehicle:
                 self.carapi.resetCarApiLastErrorTime(self)
                 return True
             elif reason == "could_not_wake_buses":
-                time.sleep(5)
+                cancellableSleep(5)
                 continue
             else:
                 self.carapi.updateCarApiLastErrorTime(self)
@@ -869,7 +869,7 @@ class TeslaBLE:
                             )
                         ).decode()
                     )
-                    self.master.queue_background_task({"cmd": "saveSettings"})
+                    self.master.markSettingsDirty()
         else:
             logger.log(logging.INFO2, "No known vehicles.")
 
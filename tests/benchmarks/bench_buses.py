@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark for running several RS485 buses from one TWCManager process.
+
+Runs TWCManager with 1, 2 and 4 buses, each on a Dummy interface simulating
+one slave TWC, in both the default polling mode and reactor mode. Watches the
+log for the heartbeats sent to each slave, and reports:
+
+  * heartbeats sent per second to each slave (a real master sends one a
+    second)
+  * jitter: how far the time between heartbeats to the same slave strays
+    from its median, at the 99th percentile
+  * CPU time used by the TWCManager process per second it was running
+
+Usage:
+    python tests/benchmarks/bench_buses.py [seconds per run]
+"""
+
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+
+# Ignore the startup linkready messages and the first few heartbeats
+WARMUP = 5
+
+HEARTBEAT = re.compile(r"Tx@: FB E0 [0-9A-F]{2} [0-9A-F]{2} ([0-9A-F]{2} [0-9A-F]{2})")
+
+
+def write_config(path, buses, reactor):
+    config = {
+        "config": {
+            "settingsPath": path,
+            "logLevel": 12,
+            "fakeMaster": 1,
+            "wiringMaxAmpsAllTWCs": 16 * buses,
+            "wiringMaxAmpsPerTWC": 32,
+            "minAmpsPerTWC": 6,
+            "reactorMode": reactor,
+        },
+        "interface": {
+            "Dummy": {"enabled": True, "twcID": "A1"},
+            "RS485": {"enabled": False},
+            "buses": [
+                {"type": "Dummy", "twcID": "B%d" % (bus)} for bus in range(2, buses + 1)
+            ],
+        },
+        "control": {},
+        "status": {},
+        "sources": {},
+        "vehicle": {},
+        "logging": {"Console": {"enabled": True}},
+    }
+    with open(os.path.join(path, "config.json"), "w") as configFile:
+        json.dump(config, configFile)
+
+
+def run(buses, reactor, seconds):
+    # Returns the times each slave was sent a heartbeat, and the CPU seconds
+    # TWCManager used.
+    heartbeats = {}
+    with tempfile.TemporaryDirectory() as path:
+        write_config(path, buses, reactor)
+        env = dict(os.environ, PYTHONPATH=LIB, PYTHONUNBUFFERED="1")
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        proc = subprocess.Popen(
+            [sys.executable, "-c", "import TWCManager.TWCManager"],
+            cwd=path,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+
+        def reader():
+            for line in proc.stdout:
+                match = HEARTBEAT.search(line)
+                if match:
+                    heartbeats.setdefault(match.group(1), []).append(time.monotonic())
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        start = time.monotonic()
+        time.sleep(seconds)
+        proc.terminate()
+        proc.wait()
+        thread.join()
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    for slave in heartbeats:
+        heartbeats[slave] = [t for t in heartbeats[slave] if t - start > WARMUP]
+    return heartbeats, cpu / seconds
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    for reactor in (False, True):
+        for buses in (1, 2, 4):
+            heartbeats, cpu = run(buses, reactor, seconds)
+            rates = []
+            deviations = []
+            for times in heartbeats.values():
+                if len(times) < 2:
+                    continue
+                intervals = [b - a for a, b in zip(times, times[1:])]
+                median = sorted(intervals)[len(intervals) // 2]
+                rates.append(len(intervals) / (times[-1] - times[0]))
+                deviations += [abs(i - median) for i in intervals]
+            deviations.sort()
+            print(
+                "%-7s %d buses: %d slaves, %.2f-%.2f heartbeats/s per slave, "
+                "jitter p99 %5.1f ms, CPU %4.1f%%"
+                % (
+                    "reactor" if reactor else "poll",
+                    buses,
+                    len(rates),
+                    min(rates) if rates else 0,
+                    max(rates) if rates else 0,
+                    deviations[int(len(deviations) * 0.99)] * 1000 if deviations else 0,
+                    cpu * 100,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark for caching EMS readings.
+
+Compares reading a module whose fetch takes 0.1 seconds and whose values are
+good for 0.4 seconds: checking cacheTime in the getter and fetching while
+the caller waits, as the EMS modules did, vs ReadingCache fetching in the
+background. It is run with the module read every 0.1 seconds, and every
+1.2 seconds, less often than its values expire, as with a policy check
+every 30 seconds and a cacheTime of 10.
+
+Usage:
+    python tests/benchmarks/bench_cache.py [reads]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.ReadingCache import ReadingCache  # noqa: E402
+from TWCManager.TimerHeap import TimerHeap  # noqa: E402
+
+
+class SlowEMS:
+    cacheTime = 0.4
+    delay = 0.1
+
+    def __init__(self):
+        self.fetches = 0
+        self.lastFetch = 0
+        self.updated = None
+
+    def fetch(self):
+        time.sleep(self.delay)
+        self.fetches += 1
+        self.updated = time.monotonic()
+        return True
+
+    def update(self):
+        # What the EMS modules did
+        if time.monotonic() - self.lastFetch > self.cacheTime:
+            self.fetch()
+            self.lastFetch = time.monotonic()
+
+
+def run(update, module, interval, reads):
+    # Reads are made on a schedule, as policy checks are
+    waits = []
+    ages = []
+    start = time.monotonic()
+    for i in range(reads):
+        time.sleep(max(0, start + i * interval - time.monotonic()))
+        started = time.monotonic()
+        update()
+        waits.append(time.monotonic() - started)
+        ages.append(time.monotonic() - module.updated)
+    # The first read waits for a fetch either way
+    waits, ages = waits[1:], ages[1:]
+    return (
+        sum(waits) / len(waits) * 1000,
+        max(waits) * 1000,
+        sum(ages) / len(ages),
+        module.fetches,
+    )
+
+
+def main():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    initialize_logging_levels()
+    cache = ReadingCache(TimerHeap())
+
+    for interval, count in ((0.1, reads * 4), (1.2, reads)):
+        old = SlowEMS()
+        new = SlowEMS()
+        reading = cache.register("EMS%s" % (interval), new.fetch, new.cacheTime)
+        for name, update, module in (
+            ("in getter", old.update, old),
+            ("ReadingCache", reading.update, new),
+        ):
+            print(
+                "every %.2fs, %-12s: wait %6.1f ms mean %6.1f ms max, "
+                "values %.2fs old, %d fetches"
+                % ((interval, name) + run(update, module, interval, count))
+            )
+        reading.cancel()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark for loading the config.
+
+Compares, for the sample config.json:
+
+  * reading it at startup: removing comments and parsing the rest as YAML,
+    as TWCManager.py did, vs loadConfig() parsing and validating it, vs
+    loadConfig() reading the cached result
+  * reading an option in code run often: config["config"]["fakeMaster"] vs
+    the config snapshot's attribute
+
+Usage:
+    python tests/benchmarks/bench_config.py [repeats]
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+import yaml
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.ConfigLoader import ConfigSnapshot, loadConfig  # noqa: E402
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+
+sampleConfig = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "..",
+    "etc",
+    "twcmanager",
+    "config.json",
+)
+
+
+def oldLoad(fileName):
+    # What TWCManager.py did
+    jsonconfig = open(fileName)
+    configtext = ""
+    for line in jsonconfig:
+        if line.lstrip().startswith("//") or line.lstrip().startswith("#"):
+            configtext += "\n"
+        else:
+            configtext += line.replace("\t", " ").split("#")[0]
+    jsonconfig.close()
+    return yaml.safe_load(configtext)
+
+
+def timePerCall(function, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    initialize_logging_levels()
+
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = os.path.join(directory, "config.json")
+        shutil.copy(sampleConfig, fileName)
+        cacheFile = fileName + ".cache"
+        loadConfig(fileName, cacheFile)
+
+        print(
+            "startup: comments + YAML %6.2f ms, loadConfig %6.2f ms, "
+            "loadConfig from cache %6.2f ms"
+            % (
+                timePerCall(lambda: oldLoad(fileName), repeats) * 1000,
+                timePerCall(lambda: loadConfig(fileName), repeats) * 1000,
+                timePerCall(lambda: loadConfig(fileName, cacheFile), repeats) * 1000,
+            )
+        )
+
+    config = loadConfig(sampleConfig)
+    configSnapshot = ConfigSnapshot(config["config"])
+    number = 1000000
+    lookup = timeit.timeit(
+        'config["config"]["fakeMaster"] == 1', globals=locals(), number=number
+    )
+    attribute = timeit.timeit(
+        "configSnapshot.fakeMaster == 1", globals=locals(), number=number
+    )
+    print(
+        "option read: config dict %5.1f ns, snapshot attribute %5.1f ns"
+        % (lookup / number * 1e9, attribute / number * 1e9)
+    )
+
+
+if __name__ == "__main__":
+    main()
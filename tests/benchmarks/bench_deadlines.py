@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark for background task deadlines.
+
+Starts a web server that accepts connections but never responds, as a hung
+webhook receiver does, and queues a webhook to it. Meanwhile an updateStatus
+task is queued every 100ms in the same lane. Measures how often updateStatus
+gets to run and the longest gap between runs:
+
+  * as before, with no timeout on the request and no deadline on the task
+  * with the request timeout used by the webhook task, but no deadlines
+  * with a webhook deadline shorter than that, so that the task is cancelled
+    and the lane handed to a new worker
+
+Usage:
+    python tests/benchmarks/bench_deadlines.py [seconds]
+"""
+
+import logging
+import os
+import socket
+import sys
+import time
+
+import requests
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.TWCMaster import TWCMaster  # noqa: E402
+
+
+def worker(master, url, requestTimeout, runs, lane):
+    while master.backgroundTasks.isWorker(lane):
+        task = master.getBackgroundTask(lane)
+        try:
+            if task["cmd"] == "webhook":
+                requests.post(url, json={}, timeout=requestTimeout)
+            elif task["cmd"] == "updateStatus":
+                runs.append(time.perf_counter())
+        except requests.exceptions.RequestException:
+            pass
+        master.doneBackgroundTask(task)
+
+
+def run(url, requestTimeout, deadline, seconds):
+    master = TWCMaster(
+        bytearray(b"\x77\x77"),
+        {"config": {"wiringMaxAmpsAllTWCs": 80, "maxAmpsAllowedFromGrid": None}},
+    )
+    if deadline is None:
+        # Tasks had no deadlines before
+        master.backgroundTasks.timers = None
+    runs = []
+    master.backgroundTasks.start(worker, master, url, requestTimeout, runs)
+
+    task = {"cmd": "webhook"}
+    if deadline is not None:
+        task["timeout"] = deadline
+    master.queue_background_task(task)
+    start = time.perf_counter()
+    end = time.time() + seconds
+    while time.time() < end:
+        master.queue_background_task({"cmd": "updateStatus"})
+        time.sleep(0.1)
+    times = [start] + runs + [time.perf_counter()]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    return len(runs), max(gaps), master.backgroundTasks.getCounters()
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 15
+    initialize_logging_levels()
+
+    # Accepts connections into its backlog, but never reads or replies
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+    url = "http://127.0.0.1:%d/" % (server.getsockname()[1])
+
+    for name, requestTimeout, deadline in (
+        ("before", None, None),
+        ("request timeout", 10, None),
+        ("deadline", 10, 2),
+    ):
+        runs, gap, counters = run(url, requestTimeout, deadline, seconds)
+        print(
+            "%-15s updateStatus ran %3d times, longest gap %8.1f ms, "
+            "webhook timeouts %d"
+            % (
+                name,
+                runs,
+                gap * 1000,
+                counters.get("webhook", {}).get("timeouts", 0),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
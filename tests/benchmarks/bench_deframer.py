@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the RS485 receive path.
+
+Compares the original byte-at-a-time receive loop (one getBufferLen() and one
+read(1) call per byte, followed by a separate unescape and checksum pass) with
+the streaming TWCDeframer fed by bulk reads.
+
+Reports frames per second and interface calls per frame for each path.
+
+Usage:
+    python tests/benchmarks/bench_deframer.py [frames]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.Protocol.TWCCodec import TWCDeframer  # noqa: E402
+
+
+def build_frame(body):
+    msg = bytes(body) + bytes([sum(body[1:]) & 0xFF])
+    out = bytearray(b"\xc0")
+    for byte in msg:
+        if byte == 0xC0:
+            out += b"\xdb\xdc"
+        elif byte == 0xDB:
+            out += b"\xdb\xdd"
+        else:
+            out.append(byte)
+    out += b"\xc0\xfe"
+    return bytes(out)
+
+
+# A representative mix of traffic seen on a bus with one slave
+FRAMES = [
+    build_frame(b"\xfd\xe0\x77\x77\x12\x34\x01\x0c\x80\x0c\x80\x00\x00\x00\x00"),
+    build_frame(b"\xfd\xeb\x77\x77\x00\x00\x00\x38\x00\xe6\x00\xf1\x00\xe8\x00"),
+    build_frame(b"\xfd\xe2\x77\x77\x01\x1f\x40\x00\x00\x00\x00\x00\x00"),
+    build_frame(b"\xfd\xe0\x77\x77\x12\x34\x01\x0c\xdb\x0c\xc0\x00\x00\x00\x00"),
+]
+
+
+class FakeSerial:
+    # Serves a fixed byte stream in chunks of up to chunk bytes, the way the
+    # OS receive buffer fills between polls, and counts calls made to it.
+
+    def __init__(self, data, chunk):
+        self.data = data
+        self.pos = 0
+        self.chunk = chunk
+        self.calls = 0
+
+    def getBufferLen(self):
+        self.calls += 1
+        return min(self.chunk, len(self.data) - self.pos)
+
+    def read(self, n):
+        self.calls += 1
+        out = self.data[self.pos : self.pos + n]
+        self.pos += len(out)
+        return out
+
+
+def legacy_unescape(msg):
+    msg = bytearray(msg)
+    i = 0
+    while i < len(msg):
+        if msg[i] == 0xDB:
+            if msg[i + 1] == 0xDC:
+                msg[i : i + 2] = [0xC0]
+            elif msg[i + 1] == 0xDD:
+                msg[i : i + 2] = [0xDB]
+            else:
+                msg[i : i + 2] = [0xDB]
+        i = i + 1
+    return msg[1 : len(msg) - 1]
+
+
+def run_legacy(port):
+    # Mirrors the receive loop in TWCManager.py before the deframer was added
+    frames = 0
+    msg = bytearray()
+    msgLen = 0
+    while True:
+        dataLen = port.getBufferLen()
+        if dataLen == 0:
+            break
+        data = port.read(1)
+        if msgLen == 0 and data[0] != 0xC0:
+            continue
+        elif msgLen > 0 and msgLen < 15 and data[0] == 0xC0:
+            msg = data
+            msgLen = 1
+            continue
+        if msgLen == 0:
+            msg = bytearray()
+        msg += data
+        msgLen += 1
+        if msgLen >= 16 and data[0] == 0xC0:
+            msg = legacy_unescape(msg)
+            msgLen = 0
+            if len(msg) not in (14, 16, 20):
+                continue
+            checksum = 0
+            for i in range(1, len(msg) - 1):
+                checksum += msg[i]
+            if (checksum & 0xFF) == msg[len(msg) - 1]:
+                frames += 1
+    return frames
+
+
+def run_deframer(port):
+    frames = 0
+    deframer = TWCDeframer()
+    while True:
+        dataLen = port.getBufferLen()
+        if dataLen == 0:
+            break
+        frames += len(deframer.feed(port.read(dataLen), 0))
+    return frames
+
+
+def bench(name, func, data, chunk, count):
+    port = FakeSerial(data, chunk)
+    start = time.perf_counter()
+    frames = func(port)
+    elapsed = time.perf_counter() - start
+    assert frames == count, "%s decoded %d of %d frames" % (name, frames, count)
+    print(
+        "%-10s chunk=%-4d %10.0f frames/s %8.2f calls/frame"
+        % (name, chunk, frames / elapsed, port.calls / frames)
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = b"".join(FRAMES[i % len(FRAMES)] for i in range(count))
+
+    for chunk in (1, 20, 64, 4096):
+        bench("legacy", run_legacy, data, chunk, count)
+        bench("deframer", run_deframer, data, chunk, count)
+
+
+if __name__ == "__main__":
+    main()
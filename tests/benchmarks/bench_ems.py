@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark for polling EMS modules.
+
+Compares how long a green energy check waits for three EMS modules which
+take 0.1, 0.3 and 0.5 seconds to answer, such as Fronius, Powerwall2 and
+SolarEdge over HTTP: asking each in turn, as check_green_energy() did, vs
+EMSAggregator asking them at once. It is repeated with the slowest module
+unreachable, taking 10 seconds to time out, against a 2 second deadline.
+
+Usage:
+    python tests/benchmarks/bench_ems.py [repeats]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.EMSAggregator import EMSAggregator  # noqa: E402
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+
+
+class SlowEMS:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def getConsumption(self):
+        time.sleep(self.delay)
+        return 1000
+
+    def getGeneration(self):
+        return 3000
+
+
+def sequential(modules):
+    # What check_green_energy() did
+    readings = {}
+    for module in modules:
+        readings[module["name"]] = (
+            module["ref"].getConsumption(),
+            module["ref"].getGeneration(),
+        )
+    return readings
+
+
+def timePerCall(function, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    initialize_logging_levels()
+
+    for name, delays in (("answering", (0.1, 0.3, 0.5)), ("one down", (0.1, 0.3, 10))):
+        modules = [
+            {"name": "EMS%d" % (number), "ref": SlowEMS(delay), "priority": 0}
+            for number, delay in enumerate(delays)
+        ]
+        aggregator = EMSAggregator(deadline=2)
+        print(
+            "%-9s: one at a time %6.2f s, at once %6.2f s"
+            % (
+                name,
+                timePerCall(
+                    lambda: sequential(modules), 1 if delays[2] > 2 else repeats
+                ),
+                timePerCall(lambda: aggregator.poll(modules), repeats),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark for encoding messages we send to TWCs.
+
+Encodes a mix of master heartbeats, linkready and VIN requests with the
+checksum and escape loop that RS485.send() and TCP.send() used, with
+TWCEncoder, and by reusing an encoded heartbeat the way
+TWCSlave.send_master_heartbeat() does while masterHeartbeatData is unchanged.
+Also times building the Tx@ log line, which is now skipped unless the INFO9
+log level is enabled.
+
+Usage:
+    python tests/benchmarks/bench_encode.py [iterations]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.Protocol.TWCCodec import (  # noqa: E402
+    encode_frame,
+    get_encoder,
+    hex_str,
+)
+
+MESSAGES = [
+    b"\xfb\xe0\x77\x77\x12\x34\x05\x0f\xa0\x00\x00\x00\x00\x00\x00",
+    b"\xfb\xe0\x77\x77\x56\x78\x05\x07\xd0\x01\x00\x00\x00\x00\x00",
+    b"\xfb\xe2\x77\x77\x77\x00\x00\x00\x00\x00\x00\x00\x00",
+    b"\xfb\xee\x77\x77\x12\x34\x00\x00\x00\x00\x00\x00\x00\x00",
+    # A heartbeat that needs escaping
+    b"\xfb\xe0\x77\x77\xc0\xdb\x05\x0f\xa0\x00\x00\x00\x00\x00\x00",
+]
+
+
+def legacy_encode(msg):
+    # The checksum and escape loop from RS485.send()
+    msg = bytearray(msg)
+    checksum = 0
+    for i in range(1, len(msg)):
+        checksum += msg[i]
+
+    msg.append(checksum & 0xFF)
+
+    i = 0
+    while i < len(msg):
+        if msg[i] == 0xC0:
+            msg[i : i + 1] = b"\xdb\xdc"
+            i = i + 1
+        elif msg[i] == 0xDB:
+            msg[i : i + 1] = b"\xdb\xdd"
+            i = i + 1
+        i = i + 1
+
+    return bytearray(b"\xc0" + msg + b"\xc0")
+
+
+def legacy_send(msg):
+    # Encoding plus building the Tx@ log line, as RS485.send() did whether or
+    # not the line was going to be logged
+    msg = legacy_encode(msg)
+    "Tx@: " + hex_str(msg)
+    return msg
+
+
+def encoder_send(msg, encoder=get_encoder()):
+    return encoder.encode(msg)
+
+
+def cached_send(msg, cache={}):
+    frame = cache.get(msg)
+    if frame is None:
+        frame = cache[msg] = encode_frame(msg)
+    return frame
+
+
+def check():
+    encoder = get_encoder()
+    for msg in MESSAGES:
+        assert bytes(encoder.encode(msg)) == bytes(legacy_encode(msg)), msg
+
+
+def bench(name, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for msg in MESSAGES:
+            func(msg)
+    elapsed = time.perf_counter() - start
+    count = iterations * len(MESSAGES)
+    print("%-16s %8.2f us/frame" % (name, elapsed / count * 1000000))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    check()
+    bench("legacy+log", legacy_send, iterations)
+    bench("legacy", legacy_encode, iterations)
+    bench("encoder", encoder_send, iterations)
+    bench("cached", cached_send, iterations)
+
+
+if __name__ == "__main__":
+    main()
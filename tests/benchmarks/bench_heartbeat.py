@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for slave heartbeat scheduling.
+
+Runs a cut down fake master main loop against three simulated slaves, which
+reply to each heartbeat after a random delay. Compares the round robin that
+TWCManager.py used (send when a second has passed since the last message, then
+sleep 100ms to give the slave time to respond) with HeartbeatScheduler.
+Reports the time between heartbeats to each slave, and the longest time the
+loop went without checking for received messages.
+
+Usage:
+    python tests/benchmarks/bench_heartbeat.py [seconds]
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.HeartbeatScheduler import HeartbeatScheduler  # noqa: E402
+
+
+class BenchSlave:
+    def __init__(self, master, TWCID):
+        self.master = master
+        self.TWCID = bytearray(TWCID)
+        self.sent = []
+
+    def send_master_heartbeat(self):
+        now = time.perf_counter()
+        self.sent.append(now)
+        self.master.timeLastTx = now
+        # The slave replies some time within the next 30ms
+        self.master.replies.append(
+            (now + random.uniform(0.005, 0.03), bytes(self.TWCID))
+        )
+
+
+class BenchMaster:
+    def __init__(self):
+        self.timeLastTx = 0
+        self.replies = []
+        self.slaves = [
+            BenchSlave(self, b"\x11\x11"),
+            BenchSlave(self, b"\x22\x22"),
+            BenchSlave(self, b"\x33\x33"),
+        ]
+
+    def getSlaveTWCs(self):
+        return self.slaves
+
+    def getTimeLastTx(self):
+        return self.timeLastTx
+
+    def receive(self, now):
+        # Returns the replies that have "arrived" by now
+        arrived = [r for r in self.replies if r[0] <= now]
+        self.replies = [r for r in self.replies if r[0] > now]
+        return arrived
+
+
+def run_roundrobin(master, seconds):
+    idx = 0
+    end = time.perf_counter() + seconds
+    gaps = []
+    lastCheck = time.perf_counter()
+    while time.perf_counter() < end:
+        time.sleep(0.025)
+        now = time.perf_counter()
+        gaps.append(now - lastCheck)
+        lastCheck = now
+        master.receive(now)
+        if now - master.getTimeLastTx() >= 1.0:
+            master.slaves[idx].send_master_heartbeat()
+            idx = (idx + 1) % len(master.slaves)
+            time.sleep(0.1)
+    return gaps
+
+
+def run_scheduler(master, seconds):
+    scheduler = HeartbeatScheduler(master)
+    end = time.perf_counter() + seconds
+    gaps = []
+    lastCheck = time.perf_counter()
+    while time.perf_counter() < end:
+        time.sleep(0.025)
+        now = time.perf_counter()
+        gaps.append(now - lastCheck)
+        lastCheck = now
+        for arrived, twcid in master.receive(now):
+            scheduler.responseReceived(twcid, arrived)
+        slaveTWC = scheduler.nextDue(now)
+        if slaveTWC:
+            scheduler.sendHeartbeat(slaveTWC, now)
+    return gaps
+
+
+def report(name, master, gaps):
+    periods = []
+    for slave in master.slaves:
+        periods += [b - a for a, b in zip(slave.sent, slave.sent[1:])]
+    periods.sort()
+    print(
+        "%-11s period median %5.3fs  min %5.3fs  max %5.3fs  loop gap max %5.1fms"
+        % (
+            name,
+            periods[len(periods) // 2],
+            periods[0],
+            periods[-1],
+            max(gaps) * 1000,
+        )
+    )
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    master = BenchMaster()
+    report("roundrobin", master, run_roundrobin(master, seconds))
+    master = BenchMaster()
+    report("scheduler", master, run_scheduler(master, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark for charger power history.
+
+With two days of history, compares:
+
+  * a history snapshot: appending to the list in the settings dict and
+    rebuilding it without entries over two days old, as snapHistoryData
+    did, vs writing a slot of HistoryStore
+  * reading the two days for /api/getHistory: parsing every timestamp in
+    the list, vs reading the slots from HistoryStore
+  * how much history adds to each write of settings.json
+
+Usage:
+    python tests/benchmarks/bench_history.py [repeats]
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.HistoryStore import HistoryStore  # noqa: E402
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+
+
+def oldSnap(settings, now, watts):
+    # What snapHistoryData did
+    settings["history"].append(
+        ((now - timedelta(minutes=5)).isoformat(timespec="seconds"), watts)
+    )
+    settings["history"] = [
+        e
+        for e in settings["history"]
+        if datetime.fromisoformat(e[0]) >= (now - timedelta(days=2))
+    ]
+
+
+def oldRead(settings, startTime):
+    # What /api/getHistory did
+    return {
+        k: v for k, v in settings["history"] if datetime.fromisoformat(k) >= startTime
+    }
+
+
+def timePerCall(function, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        function(i)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    initialize_logging_levels()
+
+    now = datetime.now().astimezone().replace(second=0, microsecond=0)
+    now = now.replace(minute=now.minute // 5 * 5)
+    startTime = now - timedelta(days=2) + timedelta(minutes=5)
+    periods = [now - timedelta(minutes=5 * i) for i in range(576, 0, -1)]
+
+    settings = {"chargeNowAmps": 0, "history": []}
+    with tempfile.TemporaryDirectory() as directory:
+        history = HistoryStore(os.path.join(directory, "history.bin"))
+        for period in periods:
+            settings["history"].append((period.isoformat(timespec="seconds"), 2300.0))
+            history.append(period.timestamp(), 2300.0)
+
+        results = (
+            (
+                "snapshot",
+                timePerCall(
+                    lambda i: oldSnap(settings, now + timedelta(minutes=5 * i), 2300.0),
+                    repeats,
+                ),
+                timePerCall(
+                    lambda i: history.append(
+                        (now + timedelta(minutes=5 * i)).timestamp(), 2300.0
+                    ),
+                    repeats,
+                ),
+            ),
+            (
+                "read 2 days",
+                timePerCall(lambda i: oldRead(settings, startTime), repeats),
+                timePerCall(
+                    lambda i: history.get(startTime.timestamp(), now.timestamp()),
+                    repeats,
+                ),
+            ),
+        )
+        history.close()
+
+    for name, old, new in results:
+        print(
+            "%-12s settings list %8.1f us, HistoryStore %6.1f us"
+            % (name, old * 1e6, new * 1e6)
+        )
+
+    withHistory = len(json.dumps(settings))
+    del settings["history"]
+    print(
+        "history adds %d bytes to every settings.json write (%d without it)"
+        % (withHistory - len(json.dumps(settings)), len(json.dumps(settings)))
+    )
+
+
+if __name__ == "__main__":
+    main()
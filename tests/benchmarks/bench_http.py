@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark for HTTP polling.
+
+Compares polling a local HTTP server, as an EMS module polls an inverter on
+the LAN: with requests.get(), making a new connection for every request, as
+the modules did, vs through HTTPPool, reusing one connection kept alive.
+The server waits for a given time before accepting each new connection, to
+stand in for the round trips a connection takes to a device on a busy
+network, or the TLS handshake with a cloud service.
+
+Usage:
+    python tests/benchmarks/bench_http.py [requests] [connect delay ms]
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.HTTPPool import HTTPPool  # noqa: E402
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Headers and body are written separately, which with Nagle's algorithm
+    # waits on a delayed ACK when the connection is kept alive
+    disable_nagle_algorithm = True
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"Body": {"Data": {"Site": {"P_Grid": 1200, "P_PV": 3400}}}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    connectDelay = 0
+
+    def get_request(self):
+        # Each new connection costs the given delay
+        time.sleep(self.connectDelay)
+        return super().get_request()
+
+
+def timePerRequest(function, url, count):
+    start = time.perf_counter()
+    for i in range(count):
+        function(url, timeout=5).json()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+    initialize_logging_levels()
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.connectDelay = delay / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d/solar_api/v1/GetPowerFlowRealtimeData.fcgi" % (
+        server.server_port
+    )
+
+    pool = HTTPPool()
+    print(
+        "%d requests, %.1f ms per new connection: requests.get %6.2f ms, "
+        "HTTPPool %6.2f ms per request"
+        % (
+            count,
+            delay,
+            timePerRequest(requests.get, url, count) * 1000,
+            timePerRequest(pool.get, url, count) * 1000,
+        )
+    )
+    stats = pool.getStats()
+    print(
+        "HTTPPool: %d requests, %d connections, %d reused"
+        % (stats["requests"], stats["connections"], stats["reused"])
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark for background task lanes.
+
+Queues a vehicle charge command that takes 5 seconds, as one does while a
+car wakes up, and meanwhile queues a checkGreenEnergy task every 100ms as the
+main loop and HTTP API can. Measures how often checkGreenEnergy gets to run,
+the longest gap between runs (how stale the green energy figures get) and
+the deepest each lane's queue gets, with lanes turned on and with every task
+sharing a single thread as before.
+
+Repeated checkGreenEnergy tasks are merged while one is still queued, so
+with a single thread they don't pile up; they just don't run.
+
+Usage:
+    python tests/benchmarks/bench_lanes.py [seconds]
+"""
+
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.TWCMaster import TWCMaster  # noqa: E402
+
+
+def worker(master, runs, lane):
+    while True:
+        task = master.getBackgroundTask(lane)
+        if task["cmd"] == "charge":
+            time.sleep(task["duration"])
+        elif task["cmd"] == "checkGreenEnergy":
+            runs.append(time.perf_counter())
+        master.doneBackgroundTask(task)
+
+
+def run(useLanes, seconds):
+    master = TWCMaster(
+        bytearray(b"\x77\x77"),
+        {
+            "config": {
+                "backgroundTaskLanes": useLanes,
+                "wiringMaxAmpsAllTWCs": 80,
+                "maxAmpsAllowedFromGrid": None,
+            }
+        },
+    )
+    runs = []
+    master.backgroundTasks.start(worker, master, runs)
+
+    master.queue_background_task({"cmd": "charge", "duration": seconds})
+    depths = {}
+    start = time.perf_counter()
+    end = time.time() + seconds
+    while time.time() < end:
+        master.queue_background_task({"cmd": "checkGreenEnergy"})
+        for lane, depth in master.getBackgroundTaskQueues().items():
+            depths[lane] = max(depths.get(lane, 0), depth["queued"])
+        time.sleep(0.1)
+    master.backgroundTasks.join()
+    times = [start] + runs
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    return len(runs), max(gaps), depths
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    initialize_logging_levels()
+
+    for useLanes in (False, True):
+        runs, gap, depths = run(useLanes, seconds)
+        print(
+            "%-11s checkGreenEnergy ran %2d times, longest gap %7.1f ms, "
+            "deepest queue %s"
+            % (
+                "lanes" if useLanes else "single lane",
+                runs,
+                gap * 1000,
+                ", ".join("%s %d" % (lane, depth) for lane, depth in depths.items()),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark for background task priorities.
+
+Keeps every background task command queued, each taking 100ms to run, and
+issues a charge stop every 1.3 seconds. Measures how long each stop waits
+before it starts, with every task at the same priority (first in, first
+out, as before) and with the default priorities. Runs with a single lane,
+where the backlog is deepest, and with lanes.
+
+Usage:
+    python tests/benchmarks/bench_priority.py [seconds]
+"""
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.TaskExecutor import PRIORITY_NORMAL  # noqa: E402
+from TWCManager.TWCMaster import TWCMaster  # noqa: E402
+
+# Every command but charge, which we only use to stop charging
+LOAD = [
+    "applyChargeLimit",
+    "checkArrival",
+    "checkCharge",
+    "checkDeparture",
+    "checkGreenEnergy",
+    "checkVINEntitlement",
+    "getLifetimekWh",
+    "getVehicleVIN",
+    "saveSettings",
+    "snapHistoryData",
+    "sunrise",
+    "updateStatus",
+    "webhook",
+]
+
+
+def worker(master, waits, lane):
+    while True:
+        task = master.getBackgroundTask(lane)
+        if "stopQueued" in task:
+            waits.append(time.perf_counter() - task["stopQueued"])
+        time.sleep(0.1)
+        master.doneBackgroundTask(task)
+
+
+def run(useLanes, usePriorities, seconds):
+    master = TWCMaster(
+        bytearray(b"\x77\x77"),
+        {
+            "config": {
+                "backgroundTaskLanes": useLanes,
+                "wiringMaxAmpsAllTWCs": 80,
+                "maxAmpsAllowedFromGrid": None,
+            }
+        },
+    )
+    waits = []
+    master.backgroundTasks.start(worker, master, waits)
+
+    finished = threading.Event()
+
+    def stops():
+        while not finished.wait(1.3):
+            task = {"cmd": "charge", "charge": False, "stopQueued": time.perf_counter()}
+            if not usePriorities:
+                task["priority"] = PRIORITY_NORMAL
+            master.queue_background_task(task)
+
+    threading.Thread(target=stops, daemon=True).start()
+    random.seed(1)
+    end = time.time() + seconds
+    while time.time() < end:
+        task = {"cmd": random.choice(LOAD)}
+        if not usePriorities:
+            task["priority"] = PRIORITY_NORMAL
+        master.queue_background_task(task)
+        time.sleep(0.01)
+
+    finished.set()
+    waits.sort()
+    return waits
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    initialize_logging_levels()
+
+    for useLanes in (False, True):
+        for usePriorities in (False, True):
+            waits = run(useLanes, usePriorities, seconds)
+            print(
+                "%-11s %-10s %d stops waited median %7.1f ms max %7.1f ms"
+                % (
+                    "lanes" if useLanes else "single lane",
+                    "priorities" if usePriorities else "FIFO",
+                    len(waits),
+                    waits[len(waits) // 2] * 1000,
+                    waits[-1] * 1000,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
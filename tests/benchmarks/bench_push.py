@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark for acting on values pushed by EMS modules.
+
+A meter pushes consumption over MQTT twice a second, each value a little
+different from the last, as DSMR-reader and most MQTT publishers do. Part
+way through, an oven switches on. Compares how long it takes for the amps
+offered to be worked out again from a reading which includes the oven, and
+how many times they are worked out:
+
+  * as before, at the next green energy check, every policyCheckInterval
+    (30 seconds), whenever in that interval the oven switched on
+  * with TWCMaster.markEMSValuesChanged(), which queues a check of the
+    module's values held for emsPushWindow seconds, so that the values
+    pushed meanwhile are taken together
+
+Usage:
+    python tests/benchmarks/bench_push.py [seconds] [window]
+"""
+
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.TWCMaster import TWCMaster  # noqa: E402
+
+pushInterval = 0.5
+policyCheckInterval = 30
+ovenW = 2000
+
+
+def before():
+    # The oven switches on at a random point between two checks, and is
+    # seen at the next one
+    random.seed(1)
+    delays = []
+    for i in range(1000):
+        delays.append(policyCheckInterval - random.uniform(0, policyCheckInterval))
+    return sum(delays) / len(delays), 60 / policyCheckInterval
+
+
+def after(seconds, window, directory):
+    master = TWCMaster(
+        bytearray(b"\x77\x77"),
+        {
+            "config": {
+                "wiringMaxAmpsAllTWCs": 80,
+                "settingsPath": directory,
+                "emsPushWindow": window,
+            }
+        },
+    )
+    meter = {"consumedW": 500.0, "ovenOn": None}
+    checks = []
+
+    def checkPushedEnergy(task):
+        checks.append((time.monotonic(), meter["consumedW"]))
+
+    def worker():
+        while True:
+            task = master.getBackgroundTask("ems")
+            master.backgroundTasks.run(task)
+            master.doneBackgroundTask(task)
+
+    master.registerBackgroundTask(
+        "checkPushedEnergy",
+        checkPushedEnergy,
+        coalesce=master.configSnapshot.emsPushWindow,
+    )
+    threading.Thread(target=worker, daemon=True).start()
+
+    random.seed(1)
+    pushes = int(seconds / pushInterval)
+    for push in range(pushes):
+        watts = 500 + random.uniform(-20, 20)
+        if push >= pushes // 2:
+            if meter["ovenOn"] is None:
+                meter["ovenOn"] = time.monotonic()
+            watts += ovenW
+        meter["consumedW"] = watts
+        master.markEMSValuesChanged("MQTT")
+        time.sleep(pushInterval)
+    time.sleep(window * 2)
+
+    seen = [when for when, watts in checks if watts > ovenW]
+    return seen[0] - meter["ovenOn"], len(checks) * 60 / (pushes * pushInterval)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    window = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    initialize_logging_levels()
+
+    print("Values pushed every %gs for %gs" % (pushInterval, seconds))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (delay, checks) in (
+            ("before", before()),
+            ("%gs window" % (window), after(seconds, window, directory)),
+        ):
+            print(
+                "%-10s oven seen after %5.2f s, %5.1f checks per minute"
+                % (name, delay, checks)
+            )
+
+
+if __name__ == "__main__":
+    main()
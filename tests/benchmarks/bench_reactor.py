@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the main loop wait.
+
+Opens a pseudo terminal in place of the RS485 adapter and has a second thread
+write a TWC message to it at random intervals. Measures how long it takes the
+main loop to notice each message, and how many times it woke up in total, for
+the default 25ms polling loop and for reactor mode.
+
+Usage:
+    python tests/benchmarks/bench_reactor.py [messages]
+"""
+
+import fcntl
+import logging
+import os
+import pty
+import random
+import struct
+import sys
+import termios
+import threading
+import time
+import tty
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.Reactor import Reactor  # noqa: E402
+
+MESSAGE = bytes.fromhex("c0fde077771234010c800c8000000000f1c0fe")
+
+
+class PtyInterface:
+    # Stands in for the RS485 interface module
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.timeLastTx = 0
+
+    def fileno(self):
+        return self.fd
+
+    def getBufferLen(self):
+        return struct.unpack(
+            "I", fcntl.ioctl(self.fd, termios.FIONREAD, b"\x00" * 4)
+        )[0]
+
+    def read(self, n):
+        return os.read(self.fd, n)
+
+
+class BenchMaster:
+    def __init__(self, interface, reactorMode):
+        self.interface = interface
+        self.config = {"config": {"reactorMode": reactorMode}}
+
+    def getInterfaceModule(self):
+        return self.interface
+
+    def getModuleByName(self, name):
+        return None
+
+
+def writer(fd, count, sent):
+    for _ in range(count):
+        time.sleep(random.uniform(0.05, 0.15))
+        sent.append(time.perf_counter())
+        os.write(fd, MESSAGE)
+
+
+def run(reactorMode, count):
+    ours, theirs = pty.openpty()
+    tty.setraw(ours)
+    tty.setraw(theirs)
+    interface = PtyInterface(ours)
+    reactor = Reactor(BenchMaster(interface, reactorMode))
+
+    sent = []
+    received = []
+    wakeups = 0
+    thread = threading.Thread(target=writer, args=(theirs, count, sent))
+    thread.start()
+
+    cpuStart = time.process_time()
+    while len(received) < count:
+        wakeups += 1
+        if reactorMode:
+            reactor.wait(1.0)
+        else:
+            time.sleep(0.025)
+        waiting = interface.getBufferLen()
+        if waiting:
+            interface.read(waiting)
+            received.append(time.perf_counter())
+    cpu = time.process_time() - cpuStart
+    thread.join()
+    reactor.close()
+    os.close(ours)
+    os.close(theirs)
+
+    latency = sorted((r - s) * 1000 for s, r in zip(sent, received))
+    print(
+        "%-8s median %6.2fms  p95 %6.2fms  wakeups/msg %6.2f  cpu %.3fs"
+        % (
+            "reactor" if reactorMode else "poll",
+            latency[len(latency) // 2],
+            latency[int(len(latency) * 0.95)],
+            wakeups / count,
+            cpu,
+        )
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    run(False, count)
+    run(True, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark for background task dispatch.
+
+Compares finding the handler for each background task command through the
+old chain of string comparisons in background_tasks_thread with looking it
+up in the TaskExecutor registry. Handlers do nothing, so only the cost of
+dispatch is measured, for the first and last command in the chain and for
+an even mix of every command.
+
+Usage:
+    python tests/benchmarks/bench_registry.py [tasks]
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.TaskExecutor import TaskExecutor  # noqa: E402
+
+# In the order the old chain compared them
+CMDS = [
+    "applyChargeLimit",
+    "charge",
+    "checkArrival",
+    "checkCharge",
+    "checkDeparture",
+    "checkGreenEnergy",
+    "checkVINEntitlement",
+    "getLifetimekWh",
+    "getVehicleVIN",
+    "snapHistoryData",
+    "updateStatus",
+    "webhook",
+    "saveSettings",
+    "sunrise",
+]
+
+
+def handler(task):
+    pass
+
+
+def chain(task):
+    # The old background_tasks_thread dispatch
+    if "cmd" in task:
+        if task["cmd"] == "applyChargeLimit":
+            handler(task)
+        elif task["cmd"] == "charge":
+            handler(task)
+        elif task["cmd"] == "checkArrival":
+            handler(task)
+        elif task["cmd"] == "checkCharge":
+            handler(task)
+        elif task["cmd"] == "checkDeparture":
+            handler(task)
+        elif task["cmd"] == "checkGreenEnergy":
+            handler(task)
+        elif task["cmd"] == "checkVINEntitlement":
+            handler(task)
+        elif task["cmd"] == "getLifetimekWh":
+            handler(task)
+        elif task["cmd"] == "getVehicleVIN":
+            handler(task)
+        elif task["cmd"] == "snapHistoryData":
+            handler(task)
+        elif task["cmd"] == "updateStatus":
+            handler(task)
+        elif task["cmd"] == "webhook":
+            handler(task)
+        elif task["cmd"] == "saveSettings":
+            handler(task)
+        elif task["cmd"] == "sunrise":
+            handler(task)
+
+
+def timePerTask(dispatch, tasks):
+    # Warm up first
+    for task in tasks[:10000]:
+        dispatch(task)
+    start = time.perf_counter()
+    for task in tasks:
+        dispatch(task)
+    return (time.perf_counter() - start) / len(tasks)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    initialize_logging_levels()
+
+    executor = TaskExecutor()
+    for cmd in CMDS:
+        executor.register(cmd, handler)
+
+    random.seed(1)
+    for name, tasks in (
+        ("first", [{"cmd": CMDS[0]}] * count),
+        ("last", [{"cmd": CMDS[-1]}] * count),
+        ("mix", [{"cmd": random.choice(CMDS)} for i in range(count)]),
+    ):
+        old = timePerTask(chain, tasks)
+        new = timePerTask(executor.run, tasks)
+        print(
+            "%-5s command: if/elif chain %6.0f ns, registry %6.0f ns"
+            % (name, old * 1e9, new * 1e9)
+        )
+
+    print("%d task types registered" % (len(executor.getTaskTypes())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark for capturing and replaying TWC messages.
+
+Builds an hour of traffic for three slave TWCs (one heartbeat each way per
+second, shared between the slaves, plus the occasional kWh/voltage
+response) and times:
+
+  * writing it to a capture file, compared with formatting the Rx@ and Tx@
+    hex lines the main loop logs at INFO9
+  * replaying the capture through TWCReplay, reported as a multiple of real
+    time
+
+Usage:
+    python tests/benchmarks/bench_replay.py [minutes]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.Protocol.TWCCodec import hex_str  # noqa: E402
+from TWCManager.Protocol.TWCJournal import (  # noqa: E402
+    JOURNAL_RX,
+    JOURNAL_TX,
+    TWCJournalWriter,
+)
+from TWCManager.Protocol.TWCReplay import TWCReplay, offline_master  # noqa: E402
+
+SLAVES = (b"\x11\x11", b"\x22\x22", b"\x33\x33")
+
+
+def with_checksum(body):
+    return bytes(body) + bytes([sum(body[1:]) & 0xFF])
+
+
+def traffic(minutes):
+    # Returns (timestamp, direction, msg) for the given minutes of traffic
+    records = []
+    now = 1700000000.0
+    for slave in SLAVES:
+        records.append(
+            (
+                now,
+                JOURNAL_RX,
+                with_checksum(b"\xfd\xe2" + slave + b"\x77\x1f\x40" + b"\x00" * 8),
+            )
+        )
+    for second in range(int(minutes * 60)):
+        slave = SLAVES[second % len(SLAVES)]
+        now += 1
+        records.append(
+            (
+                now,
+                JOURNAL_TX,
+                with_checksum(
+                    b"\xfb\xe0\x77\x77" + slave + b"\x05\x0c\x80" + b"\x00" * 6
+                ),
+            )
+        )
+        records.append(
+            (
+                now + 0.02,
+                JOURNAL_RX,
+                with_checksum(
+                    b"\xfd\xe0" + slave + b"\x77\x77\x01\x0c\x80\x0c\x80" + b"\x00" * 4
+                ),
+            )
+        )
+        if second % 30 == 0:
+            records.append(
+                (
+                    now + 0.5,
+                    JOURNAL_RX,
+                    with_checksum(
+                        b"\xfd\xeb"
+                        + slave
+                        + b"\x00\x00\x00\x38\x00\xe6\x00\xf1\x00\xe8\x00"
+                    ),
+                )
+            )
+    return records
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    records = traffic(minutes)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "capture.twcj")
+
+        start = time.perf_counter()
+        for timestamp, direction, msg in records:
+            "Rx@: " + hex_str(msg)
+        elapsed = time.perf_counter() - start
+        print("hex log lines  %6.2f us/msg" % (elapsed / len(records) * 1000000))
+
+        writer = TWCJournalWriter(path)
+        start = time.perf_counter()
+        for timestamp, direction, msg in records:
+            writer.write(direction, msg, now=timestamp)
+        writer.close()
+        elapsed = time.perf_counter() - start
+        print(
+            "capture        %6.2f us/msg  %d bytes"
+            % (elapsed / len(records) * 1000000, os.path.getsize(path))
+        )
+
+        master = offline_master(
+            {
+                "config": {
+                    "fakeMaster": 1,
+                    "minAmpsPerTWC": 6,
+                    "settingsPath": tmp,
+                    "wiringMaxAmpsAllTWCs": 32,
+                    "wiringMaxAmpsPerTWC": 32,
+                },
+                "policy": {},
+                "vehicle": {},
+            }
+        )
+        stats = TWCReplay(master).replay(path)
+        print(
+            "replay         %6.2f us/msg  %.0fx real time"
+            % (
+                stats["elapsed"] / stats["frames"] * 1000000,
+                minutes * 60 / stats["elapsed"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for recording vehicle charging sessions.
+
+With many vehicles, each with a history of sessions, compares counting
+sessions in settings["Vehicles"], as recordVehicleVIN and
+recordVehicleSessionEnd did, with recording them in SessionStore:
+
+  * starting and ending a session, including writing the change out:
+    settings.json rewritten whole for each, vs a row of sessions.db
+  * reading every vehicle's totals, for the Vehicles page
+  * reading one vehicle's monthly totals and recent sessions, which the
+    settings dict has no record of
+
+Usage:
+    python tests/benchmarks/bench_sessions.py [vehicles] [sessions] [repeats]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.SessionStore import SessionStore  # noqa: E402
+from TWCManager.SettingsPersister import SettingsPersister  # noqa: E402
+
+
+def oldSession(settings, persister, fileName, vin, i):
+    # What recordVehicleVIN and recordVehicleSessionEnd did, each followed
+    # by a save of settings.json
+    vehicle = settings["Vehicles"][vin]
+    vehicle["chargeSessions"] += 1
+    vehicle["startkWh"] = 1000 + i
+    persister.markDirty()
+    persister.save(settings, fileName)
+    vehicle["totalkWh"] += 1000 + i + 10 - vehicle["startkWh"]
+    vehicle["startkWh"] = 0
+    persister.markDirty()
+    persister.save(settings, fileName)
+
+
+def newSession(store, vin, i):
+    store.startSession(vin, "ABCD", 1000 + i)
+    store.endSession(vin, 1000 + i + 10)
+
+
+def oldTotals(settings):
+    # What vehicles.html.j2 read
+    return {
+        vin: (vehicle["chargeSessions"], vehicle["totalkWh"])
+        for vin, vehicle in sorted(settings["Vehicles"].items())
+    }
+
+
+def timePerCall(function, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        function(i)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    vehicles = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    initialize_logging_levels()
+
+    vins = ["5YJ3E1EA%09d" % (i) for i in range(vehicles)]
+    settings = {
+        "chargeNowAmps": 0,
+        "carApiBearerToken": "x" * 600,
+        "carApiRefreshToken": "y" * 600,
+        "Vehicles": {
+            vin: {"chargeSessions": sessions, "startkWh": 0, "totalkWh": sessions * 10}
+            for vin in vins
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        jsonFile = os.path.join(directory, "settings.json")
+        persister = SettingsPersister()
+        store = SessionStore(os.path.join(directory, "sessions.db"))
+        start = time.time() - sessions * 86400
+        for vin in vins:
+            for i in range(sessions):
+                store.startSession(vin, "ABCD", 1000.0 * i, start + i * 86400)
+                store.endSession(vin, 1000.0 * i + 10, start + i * 86400 + 3600)
+
+        oldTime = timePerCall(
+            lambda i: oldSession(settings, persister, jsonFile, vins[i % vehicles], i),
+            repeats,
+        )
+        oldBytes = persister.getStats()["bytesWritten"] / repeats
+        newTime = timePerCall(
+            lambda i: newSession(store, vins[i % vehicles], i), repeats
+        )
+        print(
+            "%d vehicles with %d sessions each (%d sessions in sessions.db, %d kB)"
+            % (
+                vehicles,
+                sessions,
+                vehicles * sessions,
+                os.path.getsize(os.path.join(directory, "sessions.db")) // 1024,
+            )
+        )
+        print(
+            "start and end a session: settings.json %6.2f ms, %6d bytes written; "
+            "SessionStore %6.2f ms" % (oldTime * 1000, oldBytes, newTime * 1000)
+        )
+        print(
+            "all vehicles' totals:    settings dict %6.3f ms; SessionStore %6.3f ms"
+            % (
+                timePerCall(lambda i: oldTotals(settings), repeats) * 1000,
+                timePerCall(lambda i: store.getTotals(), repeats) * 1000,
+            )
+        )
+        print(
+            "one vehicle's months and last 20 sessions: SessionStore %6.3f ms"
+            % (
+                timePerCall(
+                    lambda i: (
+                        store.getMonths(vins[0]),
+                        store.getSessions(vins[0]),
+                    ),
+                    repeats,
+                )
+                * 1000
+            )
+        )
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
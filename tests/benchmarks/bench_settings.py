@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for saving settings.
+
+Replays an hour of requests to save settings, as TWCManager makes them: a
+history snapshot every 5 minutes, bursts of changes from web forms and MQTT
+commands, charging sessions starting and ending, and token refreshes that
+don't change anything. Settings hold two days of history, as they do on a
+running system. Compares the number of writes, bytes written and time spent
+writing:
+
+  * as before, writing settings.json every time a save is requested
+  * with SettingsPersister, which skips writes of unchanged settings, and
+    requests coalesced within the save window
+
+Usage:
+    python tests/benchmarks/bench_settings.py [window]
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.SettingsPersister import SettingsPersister  # noqa: E402
+
+
+def getSettings():
+    settings = {
+        "chargeNowAmps": 0,
+        "chargeStopMode": "1",
+        "kWhDelivered": 119,
+        "carApiBearerToken": "x" * 600,
+        "carApiRefreshToken": "y" * 600,
+        "history": [],
+    }
+    for i in range(576):
+        settings["history"].append(
+            ["2026-10-18T%02d:%02d:00+0000" % (i // 12 % 24, i % 12 * 5), 1234.5]
+        )
+    return settings
+
+
+def getRequests():
+    # Returns (seconds, change) for each request to save settings in an
+    # hour, where change is a setting to change first, or None
+    random.seed(1)
+    requests = []
+    for start in range(0, 3600, 300):
+        # History snapshot, then kWh delivered
+        requests.append((start, "history"))
+        requests.append((start + 1, "kWhDelivered"))
+    for start in (600, 2400):
+        # A web form saves several settings, one request each
+        for i in range(6):
+            requests.append((start + i * 0.1, "chargeStopMode"))
+    for i in range(20):
+        # MQTT commands arrive in pairs
+        start = random.uniform(0, 3600)
+        requests.append((start, "chargeNowAmps"))
+        requests.append((start + 0.5, "chargeNowAmps"))
+    for start in (900, 3000):
+        # Charging session starts and ends
+        for i in range(3):
+            requests.append((start + i, "kWhDelivered"))
+    for i in range(6):
+        # Token refreshes that found the token still valid
+        requests.append((random.uniform(0, 3600), None))
+    return sorted(requests, key=lambda request: request[0])
+
+
+def change(settings, name, when):
+    if name == "history":
+        settings["history"].append(["2026-10-19T00:%02d:00+0000" % (when % 60), 1.0])
+        settings["history"].pop(0)
+    elif name is not None:
+        settings[name] = when
+
+
+def before(requests, fileName):
+    settings = getSettings()
+    persister = SettingsPersister()
+    writes = 0
+    written = 0
+    start = time.perf_counter()
+    for when, name in requests:
+        change(settings, name, when)
+        content = json.dumps(settings).encode("utf-8")
+        persister.write(content, fileName)
+        writes += 1
+        written += len(content)
+    return writes, written, time.perf_counter() - start
+
+
+def after(requests, fileName, window):
+    settings = getSettings()
+    persister = SettingsPersister(window)
+    persister.loaded(settings)
+    due = None
+    start = time.perf_counter()
+    for when, name in requests:
+        if due is not None and when >= due:
+            persister.save(settings, fileName)
+            due = None
+        change(settings, name, when)
+        if due is None:
+            due = when + window
+    persister.save(settings, fileName)
+    stats = persister.getStats()
+    return stats["writes"], stats["bytesWritten"], time.perf_counter() - start
+
+
+def main():
+    window = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    initialize_logging_levels()
+    requests = getRequests()
+
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = os.path.join(directory, "settings.json")
+        print("%d requests to save settings in an hour" % (len(requests)))
+        for name, (writes, written, seconds) in (
+            ("before", before(requests, fileName)),
+            ("%gs window" % (window), after(requests, fileName, window)),
+        ):
+            print(
+                "%-12s %3d writes, %7.1f kB per hour, %7.1f ms writing"
+                % (name, writes, written / 1000, seconds * 1000)
+            )
+
+
+if __name__ == "__main__":
+    main()
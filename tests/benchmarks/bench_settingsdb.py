@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the settings backends.
+
+With settings holding many vehicles and charge limits, compares keeping
+them in settings.json with keeping them in the SQLite settings database:
+
+  * saving after one setting changes, through setSetting()
+  * saving after one vehicle's details change
+  * loading the settings at startup
+
+Usage:
+    python tests/benchmarks/bench_settingsdb.py [vehicles] [repeats]
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.SettingsDatabase import SettingsDatabase  # noqa: E402
+from TWCManager.SettingsPersister import SettingsPersister  # noqa: E402
+
+
+def getSettings(vehicles):
+    settings = {
+        "chargeNowAmps": 0,
+        "chargeStopMode": "1",
+        "kWhDelivered": 119,
+        "carApiBearerToken": "x" * 600,
+        "carApiRefreshToken": "y" * 600,
+        "VehicleGroups": {
+            "Allow Charging": {"Description": "Built-in Group", "Members": []}
+        },
+        "Vehicles": {},
+        "chargeLimits": {},
+        "consumptionOffset": {
+            "Offset%d" % i: {"value": i, "unit": "W"} for i in range(10)
+        },
+    }
+    for i in range(vehicles):
+        vin = "5YJ3E1EA%09d" % (i)
+        settings["Vehicles"][vin] = {
+            "chargeSessions": i,
+            "startkWh": 0,
+            "totalkWh": i * 12.5,
+            "batteryLevel": 50,
+            "name": "Vehicle %d" % (i),
+        }
+        settings["chargeLimits"][str(i)] = [80, 90]
+    settings["VehicleGroups"]["Allow Charging"]["Members"] = list(settings["Vehicles"])
+    return settings
+
+
+def timeSaves(persister, settings, change, repeats, fileName):
+    # Returns the time per save, and bytes written per save
+    persister.markDirty()
+    persister.save(settings, fileName)
+    written = persister.getStats()["bytesWritten"]
+    start = time.perf_counter()
+    for i in range(repeats):
+        change(settings, persister, i)
+        persister.save(settings, fileName)
+    seconds = (time.perf_counter() - start) / repeats
+    return seconds, (persister.getStats()["bytesWritten"] - written) / repeats
+
+
+def setSetting(settings, persister, i):
+    settings["chargeNowAmps"] = i
+    persister.markDirty("chargeNowAmps")
+
+
+def changeVehicle(settings, persister, i):
+    vin = next(iter(settings["Vehicles"]))
+    settings["Vehicles"][vin]["totalkWh"] = i
+    persister.markDirty("Vehicles")
+
+
+def main():
+    vehicles = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    initialize_logging_levels()
+
+    with tempfile.TemporaryDirectory() as directory:
+        jsonFile = os.path.join(directory, "settings.json")
+        dbFile = os.path.join(directory, "settings.db")
+        print(
+            "%d vehicles, %d bytes of settings"
+            % (vehicles, len(json.dumps(getSettings(vehicles))))
+        )
+        for name, change in (
+            ("setSetting", setSetting),
+            ("vehicle", changeVehicle),
+        ):
+            results = []
+            for persister in (SettingsPersister(), SettingsDatabase(dbFile)):
+                results.append(
+                    timeSaves(
+                        persister, getSettings(vehicles), change, repeats, jsonFile
+                    )
+                )
+                persister.close()
+            print(
+                "%-10s save: settings.json %6.2f ms %7d bytes, "
+                "SQLite %6.2f ms %5d bytes"
+                % (
+                    name,
+                    results[0][0] * 1000,
+                    results[0][1],
+                    results[1][0] * 1000,
+                    results[1][1],
+                )
+            )
+
+        start = time.perf_counter()
+        for i in range(repeats):
+            with open(jsonFile) as infile:
+                json.load(infile)
+        jsonLoad = (time.perf_counter() - start) / repeats
+        database = SettingsDatabase(dbFile)
+        start = time.perf_counter()
+        for i in range(repeats):
+            database.load()
+        dbLoad = (time.perf_counter() - start) / repeats
+        database.close()
+        print(
+            "load:           settings.json %6.2f ms, SQLite %6.2f ms"
+            % (jsonLoad * 1000, dbLoad * 1000)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark for importing modules at startup.
+
+Compares the time taken in a new interpreter to import the modules
+TWCManager.py imported, which was every module not explicitly disabled, vs
+the modules ModuleRegistry says are enabled. This is done for the sample
+config.json, which disables most modules, and for a minimal config which
+only has the config and interface sections. Each run first imports
+TWCMaster, as TWCManager.py does, so that only the time taken by the
+modules themselves is counted.
+
+Modules which can't be imported here, as their libraries aren't installed,
+are counted for as long as they took to fail.
+
+Usage:
+    python tests/benchmarks/bench_startup.py [repeats]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+libPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+sys.path.insert(0, libPath)
+
+from TWCManager.ConfigLoader import loadConfig  # noqa: E402
+from TWCManager.ModuleRegistry import registry  # noqa: E402
+
+sampleConfig = os.path.join(libPath, "..", "etc", "twcmanager", "config.json")
+
+importScript = """
+import sys, time
+sys.path.insert(0, %r)
+import TWCManager.TWCMaster
+start = time.perf_counter()
+for module in %r:
+    try:
+        __import__("TWCManager." + module)
+    except Exception:
+        pass
+print(time.perf_counter() - start)
+"""
+
+
+def oldModules(config):
+    # The modules TWCManager.py imported, which were those not explicitly
+    # disabled in the config section translateModuleNameToConfig() gave
+    modules = []
+    for entry in registry:
+        section, key = entry.type, entry.className
+        if entry.type in ("Control", "Logging", "Status"):
+            section = entry.type.lower()
+            key = entry.className.replace(entry.type, "")
+        elif entry.type == "EMS":
+            section = "sources"
+        elif entry.type == "Interface":
+            section = "interface"
+        if config.get(section, {}).get(key, {}).get("enabled", 1):
+            modules.append(entry.name)
+    return modules
+
+
+def timeImports(modules, repeats):
+    times = []
+    for i in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, "-c", importScript % (libPath, modules)]
+        )
+        times.append(float(output))
+    return statistics.median(times)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sample = loadConfig(sampleConfig)
+    minimal = {"config": sample["config"], "interface": {"RS485": {}}}
+
+    for name, config in (("sample", sample), ("minimal", minimal)):
+        old = oldModules(config)
+        new = [entry.name for entry in registry if entry.isEnabled(config)]
+        oldTime = timeImports(old, repeats)
+        newTime = timeImports(new, repeats)
+        print(
+            "%-7s config: %2d not disabled %7.1f ms, %2d enabled %7.1f ms (%.0f%%)"
+            % (
+                name,
+                len(old),
+                oldTime * 1000,
+                len(new),
+                newTime * 1000,
+                newTime / oldTime * 100,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
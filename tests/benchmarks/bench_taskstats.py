@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark for background task telemetry.
+
+Measures what TaskStats adds to each background task (recording it being
+queued, taken from the queue and finished), the cost of a task through
+TaskExecutor for comparison, and how long building the /api/getTaskStats
+response takes with every command's histograms full.
+
+Usage:
+    python tests/benchmarks/bench_taskstats.py [tasks]
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+from TWCManager.TaskExecutor import TaskExecutor  # noqa: E402
+from TWCManager.TaskStats import TaskStats  # noqa: E402
+
+CMDS = [
+    "applyChargeLimit",
+    "charge",
+    "checkArrival",
+    "checkCharge",
+    "checkDeparture",
+    "checkGreenEnergy",
+    "checkVINEntitlement",
+    "getLifetimekWh",
+    "getVehicleVIN",
+    "saveSettings",
+    "snapHistoryData",
+    "sunrise",
+    "updateStatus",
+    "webhook",
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    initialize_logging_levels()
+    random.seed(1)
+    cmds = [random.choice(CMDS) for i in range(count)]
+
+    stats = TaskStats()
+    start = time.perf_counter()
+    for cmd in cmds:
+        stats.queued(cmd)
+        stats.waited(cmd, 0.003)
+        stats.ran(cmd, 0.15)
+    recorded = (time.perf_counter() - start) / count
+
+    executor = TaskExecutor(False)
+    start = time.perf_counter()
+    for cmd in cmds:
+        executor.put({"cmd": cmd})
+        executor.done(executor.get("general"))
+    executed = (time.perf_counter() - start) / count
+
+    start = time.perf_counter()
+    for i in range(100):
+        stats.getStats()
+    report = (time.perf_counter() - start) / 100
+
+    print("TaskStats per task:        %6.2f us" % (recorded * 1e6))
+    print(
+        "TaskExecutor per task:     %6.2f us (including TaskStats)" % (executed * 1e6)
+    )
+    print("getStats for %d commands:  %6.2f ms" % (len(CMDS), report * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the TCP interface talking to an RS485 gateway.
+
+Starts a stand-in gateway on loopback that answers every frame it receives
+with a slave heartbeat, as a TWC on the other side of a real gateway would,
+and times:
+
+  * round trips from sending a master heartbeat followed straight away by a
+    second message (as the master does when it asks for a TWC's serial
+    number or kWh) to both replies being in the receive buffer, with
+    TCP_NODELAY on and off
+  * getBufferLen() calls that try to reconnect while the gateway is down,
+    which is how long a reconnect attempt can hold up the main loop
+
+Usage:
+    python tests/benchmarks/bench_tcp.py [round trips]
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.Interface.TCP import TCP  # noqa: E402
+from TWCManager.LoggingLevels import initialize_logging_levels  # noqa: E402
+
+MASTER_HEARTBEAT = b"\xfb\xe0\x77\x77\x12\x34\x05\x0c\x80" + b"\x00" * 6
+KWH_REQUEST = b"\xfb\xeb\x77\x77\x12\x34" + b"\x00" * 9
+SLAVE_HEARTBEAT = (
+    b"\xc0\xfd\xe0\x12\x34\x77\x77\x01\x0c\x80\x0c\x80\x00\x00\x00\x00\x58\xc0"
+)
+
+
+class Master:
+    def __init__(self, port):
+        self.config = {
+            "interface": {
+                "TCP": {
+                    "enabled": True,
+                    "server": "127.0.0.1",
+                    "port": port,
+                    "reconnectMin": 0.1,
+                }
+            }
+        }
+        self.journal = None
+
+    def getSlaveTWCs(self):
+        return []
+
+    def releaseModule(self, path, module):
+        pass
+
+
+def gateway(server):
+    # Reply to each complete frame with a slave heartbeat. Like a real
+    # gateway, the reply is written in two pieces.
+    conn, addr = server.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    buffer = b""
+    try:
+        while True:
+            data = conn.recv(256)
+            if not data:
+                break
+            buffer += data
+            while buffer.count(b"\xc0") >= 2:
+                end = buffer.index(b"\xc0", 1) + 1
+                buffer = buffer[end:]
+                conn.send(SLAVE_HEARTBEAT[:9])
+                conn.send(SLAVE_HEARTBEAT[9:])
+    except OSError:
+        pass
+    conn.close()
+
+
+def round_trips(count, nodelay):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    thread = threading.Thread(target=gateway, args=(server,), daemon=True)
+    thread.start()
+
+    tcp = TCP(Master(server.getsockname()[1]))
+    while not tcp.fileno():
+        tcp.getBufferLen()
+    tcp.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay))
+
+    times = []
+    for i in range(count):
+        start = time.perf_counter()
+        # Without TCP_NODELAY, the second message is held back until the
+        # gateway acknowledges the first.
+        tcp.send(MASTER_HEARTBEAT)
+        tcp.send(KWH_REQUEST)
+        while tcp.getBufferLen() < len(SLAVE_HEARTBEAT) * 2:
+            pass
+        times.append(time.perf_counter() - start)
+        tcp.read(len(SLAVE_HEARTBEAT) * 2)
+
+    tcp.close()
+    thread.join()
+    server.close()
+    times.sort()
+    return times
+
+
+def reconnect_stall(seconds):
+    # Point at a port nobody is listening on, and keep polling
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    tcp = TCP(Master(port))
+    tcp.reconnectMax = 0.1
+    attempts = []
+    calls = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        failures = tcp.stats["failures"]
+        start = time.perf_counter()
+        tcp.getBufferLen()
+        elapsed = time.perf_counter() - start
+        if tcp.stats["failures"] != failures:
+            attempts.append(elapsed)
+        calls += 1
+    tcp.close()
+    return calls, attempts
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    initialize_logging_levels()
+
+    for nodelay in (True, False):
+        times = round_trips(count, nodelay)
+        print(
+            "round trip, TCP_NODELAY %-3s  median %8.1f us  p99 %8.1f us"
+            % (
+                "on" if nodelay else "off",
+                times[len(times) // 2] * 1000000,
+                times[int(len(times) * 0.99)] * 1000000,
+            )
+        )
+
+    calls, attempts = reconnect_stall(2)
+    print(
+        "gateway down: %d polls, %d connect attempts taking up to %.1f us"
+        % (calls, len(attempts), max(attempts) * 1000000)
+    )
+
+
+if __name__ == "__main__":
+    main()
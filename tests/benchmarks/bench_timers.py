@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark for delayed background tasks.
+
+Schedules delayed tasks at random delays of up to 2 seconds while other
+tasks are queued once a second (as checkGreenEnergy and updateStatus are),
+and measures how late each delayed task is queued:
+
+  * the old way, where delayed tasks were kept in a sorted list and only
+    moved to the queue when the background thread went to fetch its next
+    task (which could block for up to 30 seconds)
+  * with TimerHeap, whose thread wakes when the next timer is due
+
+Also times scheduling and cancelling timers.
+
+Usage:
+    python tests/benchmarks/bench_timers.py [delayed tasks]
+"""
+
+import bisect
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib")
+)
+
+logging.disable(logging.CRITICAL)
+
+from TWCManager.TimerHeap import TimerHeap  # noqa: E402
+
+
+class SortedListDelays:
+    # The old implementation, from TWCMaster.getBackgroundTask()
+
+    def __init__(self, lateness):
+        self.delayed = []
+        self.lateness = lateness
+        self.queue = queue.Queue()
+        self.seq = 0
+
+    def schedule(self, delay, task):
+        # The old code compared (datetime, dict) tuples, which raises if two
+        # are due at the same time; add a sequence number so it doesn't here.
+        self.seq += 1
+        bisect.insort(self.delayed, (time.monotonic() + delay, self.seq, task))
+
+    def worker(self):
+        while True:
+            while self.delayed and self.delayed[0][0] <= time.monotonic():
+                due, seq, task = self.delayed.pop(0)
+                self.lateness.append(time.monotonic() - due)
+            try:
+                self.queue.get(timeout=30)
+            except queue.Empty:
+                continue
+
+    def queueTask(self):
+        self.queue.put({"cmd": "checkGreenEnergy"})
+
+
+class TimerHeapDelays:
+    def __init__(self, lateness):
+        self.lateness = lateness
+        self.timers = TimerHeap()
+
+    def schedule(self, delay, task):
+        due = time.monotonic() + delay
+        self.timers.schedule(delay, self.fired, due)
+
+    def fired(self, due):
+        self.lateness.append(time.monotonic() - due)
+
+    def worker(self):
+        pass
+
+    def queueTask(self):
+        pass
+
+
+def run(cls, count):
+    lateness = []
+    delays = cls(lateness)
+    threading.Thread(target=delays.worker, daemon=True).start()
+    random.seed(1)
+    for i in range(count):
+        delays.schedule(random.uniform(0.1, 2.0), {"cmd": "checkDeparture"})
+
+    end = time.monotonic() + 3
+    while time.monotonic() < end:
+        delays.queueTask()
+        time.sleep(1)
+    lateness.sort()
+    return lateness
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    for name, cls in (
+        ("sorted list", SortedListDelays),
+        ("TimerHeap", TimerHeapDelays),
+    ):
+        lateness = run(cls, count)
+        print(
+            "%-11s %d of %d delayed tasks queued, late by median %7.1f ms max %7.1f ms"
+            % (
+                name,
+                len(lateness),
+                count,
+                lateness[len(lateness) // 2] * 1000,
+                lateness[-1] * 1000,
+            )
+        )
+
+    timers = TimerHeap()
+    start = time.perf_counter()
+    for i in range(100000):
+        timers.schedule(3600 + i, print).cancel()
+    elapsed = time.perf_counter() - start
+    print("schedule and cancel: %.2f us per timer" % (elapsed * 10))
+
+
+if __name__ == "__main__":
+    main()
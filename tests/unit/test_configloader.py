@@ -0,0 +1,158 @@
+"""
+Unit tests for TWCManager ConfigLoader module.
+
+Tests parsing and validating config.json, caching the result, and the
+read-only config snapshot.
+"""
+
+import json
+import os
+
+import pytest
+
+
+class TestConfigLoader:
+    """Test loading config.json."""
+
+    def writeConfig(self, path, text):
+        with open(str(path), "w") as outfile:
+            outfile.write(text)
+        return str(path)
+
+    def test_sample_config(self):
+        """Test the sample config.json parses and is valid."""
+        from TWCManager.ConfigLoader import loadConfig
+
+        config = loadConfig(
+            os.path.join(
+                os.path.dirname(__file__),
+                "..",
+                "..",
+                "etc",
+                "twcmanager",
+                "config.json",
+            )
+        )
+        assert config["config"]["settingsPath"] == "/etc/twcmanager"
+        assert "vehicle" in config
+
+    def test_comments_and_trailing_commas(self, tmp_path):
+        """Test comments are removed, and trailing commas accepted."""
+        from TWCManager.ConfigLoader import loadConfig
+
+        fileName = self.writeConfig(
+            tmp_path / "config.json",
+            """{
+    # A comment
+    "config": {
+        "settingsPath": "/tmp", # Another
+        // And another
+        "wiringMaxAmpsAllTWCs": 32,
+        "wiringMaxAmpsPerTWC": 32,
+        "minAmpsPerTWC": 6,
+        "fakeMaster": 1,
+    },
+}
+""",
+        )
+        assert loadConfig(fileName)["config"]["wiringMaxAmpsAllTWCs"] == 32
+
+    def test_invalid(self, tmp_path):
+        """Test every problem with the config is reported at once."""
+        from TWCManager.ConfigLoader import ConfigError, loadConfig
+
+        fileName = self.writeConfig(
+            tmp_path / "config.json",
+            json.dumps(
+                {
+                    "config": {
+                        "settingsPath": "/tmp",
+                        "wiringMaxAmpsAllTWCs": "32",
+                        "wiringMaxAmpsPerTWC": True,
+                        "fakeMaster": 3,
+                    }
+                }
+            ),
+        )
+        with pytest.raises(ConfigError) as error:
+            loadConfig(fileName)
+        message = str(error.value)
+        assert '"wiringMaxAmpsAllTWCs" should be int/float' in message
+        assert '"wiringMaxAmpsPerTWC" should be int/float' in message
+        assert '"minAmpsPerTWC" must be set' in message
+        assert '"fakeMaster" should be one of 0, 1, 2' in message
+
+        self.writeConfig(tmp_path / "config.json", '{"config": {')
+        with pytest.raises(ConfigError):
+            loadConfig(fileName)
+
+    def test_cache(self, tmp_path):
+        """Test the parsed config is cached until config.json changes."""
+        from TWCManager.ConfigLoader import loadConfig
+
+        config = {
+            "config": {
+                "settingsPath": "/tmp",
+                "wiringMaxAmpsAllTWCs": 32,
+                "wiringMaxAmpsPerTWC": 32,
+                "minAmpsPerTWC": 6,
+                "fakeMaster": 1,
+            }
+        }
+        fileName = self.writeConfig(tmp_path / "config.json", json.dumps(config))
+        cacheFile = str(tmp_path / "config.json.cache")
+        assert loadConfig(fileName, cacheFile) == config
+        assert os.path.exists(cacheFile)
+
+        # Only we may read it, as it has config.json's passwords in it
+        assert os.stat(cacheFile).st_mode & 0o777 == 0o600
+
+        # The cache is used while config.json hasn't changed
+        with open(cacheFile) as infile:
+            cached = json.load(infile)
+        cached["config"]["config"]["minAmpsPerTWC"] = 8
+        with open(cacheFile, "w") as outfile:
+            json.dump(cached, outfile)
+        assert loadConfig(fileName, cacheFile)["config"]["minAmpsPerTWC"] == 8
+
+        # but not once it has
+        config["config"]["minAmpsPerTWC"] = 10
+        self.writeConfig(tmp_path / "config.json", json.dumps(config))
+        os.utime(fileName, ns=(0, os.stat(fileName).st_mtime_ns + 1000))
+        assert loadConfig(fileName, cacheFile)["config"]["minAmpsPerTWC"] == 10
+
+        # A cache that can't be written or read is ignored
+        assert loadConfig(fileName, str(tmp_path / "missing" / "cache")) == config
+        self.writeConfig(cacheFile, "not json")
+        assert loadConfig(fileName, cacheFile) == config
+
+
+class TestConfigSnapshot:
+    """Test the read-only config snapshot."""
+
+    def test_snapshot(self):
+        """Test options are attributes, with defaults, and can't be changed."""
+        from TWCManager.ConfigLoader import ConfigSnapshot
+
+        snapshot = ConfigSnapshot(
+            {
+                "fakeMaster": True,
+                "wiringMaxAmpsAllTWCs": 40,
+                "displayMilliseconds": 1,
+                "maxAmpsAllowedFromGrid": None,
+                "unknownOption": 1,
+            }
+        )
+        assert snapshot.fakeMaster == 1 and type(snapshot.fakeMaster) is int
+        assert snapshot.wiringMaxAmpsAllTWCs == 40
+        assert snapshot.displayMilliseconds is True
+        assert snapshot.maxAmpsAllowedFromGrid is None
+        assert snapshot.defaultVoltage == 240
+        assert not hasattr(snapshot, "unknownOption")
+
+        with pytest.raises(AttributeError):
+            snapshot.fakeMaster = 0
+        with pytest.raises(AttributeError):
+            snapshot.otherOption = 0
+        with pytest.raises(AttributeError):
+            del snapshot.fakeMaster
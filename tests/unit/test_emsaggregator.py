@@ -0,0 +1,136 @@
+"""
+Unit tests for TWCManager EMSAggregator module.
+
+Tests polling EMS modules at once within a deadline, and falling back to
+their last values.
+"""
+
+import threading
+import time
+
+
+class FakeEMS:
+    """An EMS module which answers once it is allowed to."""
+
+    def __init__(self, consumption, generation, delay=0):
+        self.allowed = threading.Event()
+        self.allowed.set()
+        self.consumption = consumption
+        self.delay = delay
+        self.error = None
+        self.fetches = 0
+        self.generation = generation
+
+    def getConsumption(self):
+        self.fetches += 1
+        self.allowed.wait(5)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.consumption
+
+    def getGeneration(self):
+        return self.generation
+
+
+class FakeEMSAmps(FakeEMS):
+    """An EMS module which also reports consumption in amps."""
+
+    def getConsumptionAmps(self):
+        return self.consumption / 240
+
+
+def getModules(**refs):
+    return [{"name": name, "ref": ref, "priority": 0} for name, ref in refs.items()]
+
+
+class TestEMSAggregator:
+    """Test polling EMS modules."""
+
+    def test_concurrent(self):
+        """Test modules are polled at once, not one after another."""
+        from TWCManager.EMSAggregator import EMSAggregator
+
+        aggregator = EMSAggregator(deadline=5)
+        modules = getModules(
+            Fronius=FakeEMS(1000, 3000, 0.2),
+            SolarEdge=FakeEMSAmps(480, 0, 0.2),
+            Powerwall2=FakeEMS(0, 500, 0.2),
+        )
+
+        started = time.monotonic()
+        readings = aggregator.poll(modules)
+        assert time.monotonic() - started < 0.5
+
+        assert readings["Fronius"]["consumption"] == 1000
+        assert readings["Fronius"]["consumptionAmps"] is None
+        assert readings["Fronius"]["generation"] == 3000
+        assert readings["SolarEdge"]["consumptionAmps"] == 2
+        assert readings["Powerwall2"]["age"] < 1
+
+    def test_deadline(self):
+        """Test a module that doesn't answer in time keeps its last values."""
+        from TWCManager.EMSAggregator import EMSAggregator
+
+        aggregator = EMSAggregator(deadline=0.2)
+        slow = FakeEMS(1000, 3000)
+        modules = getModules(Slow=slow, Fast=FakeEMS(200, 0))
+
+        # With no values yet, it counts as 0
+        slow.allowed.clear()
+        readings = aggregator.poll(modules)
+        assert readings["Slow"] == {
+            "consumption": 0,
+            "consumptionAmps": None,
+            "generation": 0,
+            "age": None,
+        }
+        assert readings["Fast"]["consumption"] == 200
+
+        # Its fetch carries on, and isn't started again meanwhile
+        aggregator.poll(modules)
+        assert slow.fetches == 1
+        slow.allowed.set()
+        readings = aggregator.poll(modules)
+        assert readings["Slow"]["generation"] == 3000
+        assert slow.fetches == 1
+
+        # Its last values are used, with their age, when it is late again
+        slow.allowed.clear()
+        time.sleep(0.1)
+        readings = aggregator.poll(modules)
+        assert readings["Slow"]["generation"] == 3000
+        assert readings["Slow"]["age"] >= 0.2
+
+        stats = aggregator.getStats()
+        assert stats["sources"]["Slow"]["late"] == 3
+        assert stats["sources"]["Slow"]["running"]
+        assert stats["sources"]["Fast"]["late"] == 0
+        assert stats["sources"]["Fast"]["latency"]["count"] == 4
+        assert stats["cycle"]["count"] == 4
+        slow.allowed.set()
+
+    def test_failure(self):
+        """Test a module that fails keeps its last values until maxAge."""
+        from TWCManager.EMSAggregator import EMSAggregator
+
+        aggregator = EMSAggregator(deadline=1, maxAge=0.2)
+        failing = FakeEMSAmps(2400, 5000)
+        modules = getModules(Failing=failing)
+        assert aggregator.poll(modules)["Failing"]["consumption"] == 2400
+
+        failing.error = OSError("Connection refused")
+        readings = aggregator.poll(modules)
+        assert readings["Failing"]["consumption"] == 2400
+        stats = aggregator.getStats()["sources"]["Failing"]
+        assert stats["failures"] == 1
+        assert stats["error"] == "OSError: Connection refused"
+        assert not stats["expired"]
+
+        # Once they are too old, it counts as 0
+        time.sleep(0.25)
+        readings = aggregator.poll(modules)
+        assert readings["Failing"]["consumption"] == 0
+        assert readings["Failing"]["consumptionAmps"] == 0
+        assert readings["Failing"]["age"] is None
+        assert aggregator.getStats()["sources"]["Failing"]["expired"]
@@ -0,0 +1,118 @@
+"""
+Unit tests for EMS modules which are pushed their values.
+
+Tests MQTT and DSMRreader asking for the amps offered to be worked out
+again when they are sent new values, and TWCMaster holding those requests
+for emsPushWindow so that a burst of values is acted on once.
+"""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+
+def message(topic, payload):
+    """Create an MQTT message as paho passes it to on_message."""
+    return Mock(topic=topic, payload=payload.encode("utf-8"))
+
+
+class TestPushedValues:
+    """Test TWCMaster coalescing checkPushedEnergy tasks."""
+
+    @pytest.fixture
+    def master(self, tmp_path):
+        """Create a TWCMaster with a short emsPushWindow."""
+        from TWCManager.TWCMaster import TWCMaster
+
+        return TWCMaster(
+            bytearray(b"\x77\x77"),
+            {
+                "config": {
+                    "wiringMaxAmpsAllTWCs": 80,
+                    "maxAmpsAllowedFromGrid": None,
+                    "settingsPath": str(tmp_path),
+                    "emsPushWindow": 0.2,
+                }
+            },
+        )
+
+    def test_pushes_coalesced(self, master):
+        """Test a burst of values from each module is acted on once."""
+        checked = []
+        master.registerBackgroundTask(
+            "checkPushedEnergy",
+            checked.append,
+            coalesce=master.configSnapshot.emsPushWindow,
+        )
+
+        for i in range(3):
+            master.markEMSValuesChanged("MQTT")
+        master.markEMSValuesChanged("DSMRreader")
+
+        # Nothing is queued until the window has passed, and then there is
+        # one task for each module, in the ems lane
+        assert master.getBackgroundTaskQueues()["ems"]["queued"] == 0
+        for i in range(2):
+            task = master.getBackgroundTask("ems")
+            master.backgroundTasks.run(task)
+            master.doneBackgroundTask(task)
+        assert sorted(task["module"] for task in checked) == ["DSMRreader", "MQTT"]
+        assert master.getBackgroundTaskQueues()["ems"]["queued"] == 0
+
+
+class TestMQTTPush:
+    """Test the MQTT EMS module asking for a check when values change."""
+
+    def test_changed_values(self):
+        """Test only values that differ from the last ones are acted on."""
+        from TWCManager.EMS.MQTT import MQTT
+
+        master = Mock()
+        master.config = {"config": {}, "sources": {}}
+        mqtt = MQTT(master)
+        mqtt._MQTT__topicConsumption = "house/consumption"
+        mqtt._MQTT__topicGeneration = "house/generation"
+
+        mqtt.mqttMessage(None, None, message("house/consumption", "1500"))
+        mqtt.mqttMessage(None, None, message("house/consumption", "1500"))
+        assert master.markEMSValuesChanged.call_count == 1
+        master.markEMSValuesChanged.assert_called_with("MQTT")
+
+        mqtt.mqttMessage(None, None, message("house/generation", "3200"))
+        assert master.markEMSValuesChanged.call_count == 2
+        assert (mqtt.consumedW, mqtt.generatedW) == (1500, 3200)
+
+        # Payloads that aren't values don't change anything
+        mqtt.mqttMessage(None, None, message("house/generation", "offline"))
+        assert master.markEMSValuesChanged.call_count == 2
+
+
+class TestDSMRreaderPush:
+    """Test the DSMRreader EMS module asking for a check when values change."""
+
+    def test_changed_values(self):
+        """Test only readings that differ from the last one are acted on."""
+        from TWCManager.EMS.DSMRreader import DSMRreader
+
+        master = Mock()
+        master.config = {"config": {}, "sources": {}}
+        dsmr = DSMRreader(master)
+        dsmr._DSMRreader__topic = "dsmr/json"
+        reading = {
+            "electricity_currently_delivered": 1.2,
+            "electricity_currently_returned": 0,
+            "phase_currently_delivered_l1": 1.2,
+            "phase_currently_returned_l1": 0,
+            "phase_power_current_l1": 5,
+        }
+
+        dsmr.mqttMessage(None, None, message("dsmr/json", json.dumps(reading)))
+        dsmr.mqttMessage(None, None, message("dsmr/json", json.dumps(reading)))
+        assert master.markEMSValuesChanged.call_count == 1
+        master.markEMSValuesChanged.assert_called_with("DSMRreader")
+
+        reading["phase_power_current_l1"] = 7
+        dsmr.mqttMessage(None, None, message("dsmr/json", json.dumps(reading)))
+        assert master.markEMSValuesChanged.call_count == 2
+        assert dsmr.consumedA == 7
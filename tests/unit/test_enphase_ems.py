@@ -12,7 +12,6 @@ Tests cover:
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import logging
-import time
 
 
 class TestEnphaseInitialization:
@@ -241,9 +240,7 @@ class TestEnphaseDataParsing:
             from TWCManager.EMS.Enphase import Enphase
             enphase = Enphase(master)
             enphase.requests = mock_requests
-            enphase.lastFetch = 0  # Force update
-            
-            enphase.update()
+            enphase.fetch()
             
             assert enphase.generatedW == 5000
     
@@ -274,9 +271,7 @@ class TestEnphaseDataParsing:
             from TWCManager.EMS.Enphase import Enphase
             enphase = Enphase(master)
             enphase.requests = mock_requests
-            enphase.lastFetch = 0  # Force update
-            
-            enphase.update()
+            enphase.fetch()
             
             assert enphase.generatedW == 5000
             assert enphase.consumedW == 3000
@@ -305,7 +300,7 @@ class TestEnphaseDataParsing:
             
             # Simulate malformed response that returns None (not valid JSON)
             with patch.object(enphase, 'getPortalData', return_value=None):
-                enphase.update()
+                assert enphase.fetch() is False
                 
                 # Should handle None gracefully and set fetchFailed
                 assert enphase.fetchFailed is True
@@ -336,10 +331,12 @@ class TestEnphaseCaching:
         
         with patch('TWCManager.EMS.Enphase.logger'):
             from TWCManager.EMS.Enphase import Enphase
+            from TWCManager.ReadingCache import ReadingCache
+            from TWCManager.TimerHeap import TimerHeap
+            master.readingCache = ReadingCache(TimerHeap())
             enphase = Enphase(master)
             enphase.requests = mock_requests
-            enphase.cacheTime = 1
-            enphase.lastFetch = 0
+            enphase.cache.cacheTime = 1
             
             # First update should fetch
             result1 = enphase.update()
@@ -350,9 +347,11 @@ class TestEnphaseCaching:
             assert result2 is False
             
             # After cache expires, should fetch again
-            enphase.lastFetch = int(time.time()) - 2
+            enphase.cache.cancel()
+            enphase.cache.updated -= 2
             result3 = enphase.update()
             assert result3 is True
+            assert mock_requests.get.call_count == 2
 
 
 class TestEnphaseGetters:
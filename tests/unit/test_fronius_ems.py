@@ -458,3 +458,57 @@ class TestFroniusStatus:
         fronius.lastFetch = current_time
         
         assert fronius.lastFetch == current_time
+
+
+class TestFroniusFetch:
+    """Test fetching values from Fronius inverters."""
+    
+    @pytest.fixture
+    def fronius(self):
+        """Create a Fronius instance with two inverters."""
+        from TWCManager.EMS.Fronius import Fronius
+        master = Mock()
+        master.config = {
+            "config": {},
+            "sources": {
+                "Fronius": {
+                    "enabled": True,
+                    "serverIP": ["192.168.1.100", "192.168.1.101"],
+                }
+            }
+        }
+        return Fronius(master)
+    
+    def meterData(self, generation, consumption):
+        return {"Body": {"Data": {"Site": {"P_PV": generation, "P_Load": consumption}}}}
+    
+    def test_fetch_totals(self, fronius):
+        """Test values are summed over each inverter."""
+        fronius.getInverterData = Mock(return_value=False)
+        fronius.getMeterData = Mock(
+            side_effect=[self.meterData(1000, -300), self.meterData(500, -200)]
+        )
+        
+        assert fronius.fetch() is True
+        assert fronius.getGeneration() == 1500.0
+        assert fronius.lastFetch > 0
+    
+    def test_fetch_failure_keeps_values(self, fronius):
+        """Test an inverter that doesn't answer fails the fetch, keeping the last values."""
+        import requests
+        fronius.generatedW = 1500
+        fronius.consumedW = -500
+        fronius.requests = Mock()
+        fronius.requests.exceptions = requests.exceptions
+        response = Mock()
+        response.json.return_value = self.meterData(1000, -300)
+        fronius.requests.get.side_effect = [
+            requests.exceptions.ConnectionError(), response, response, response
+        ]
+        
+        # The first inverter failing isn't masked by the others answering
+        assert fronius.fetch() is False
+        assert fronius.fetchFailed is True
+        assert fronius.generatedW == 1500
+        assert fronius.consumedW == -500
+        assert fronius.lastFetch == 0
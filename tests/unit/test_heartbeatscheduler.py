@@ -0,0 +1,120 @@
+"""
+Unit tests for TWCManager HeartbeatScheduler module.
+
+Tests choosing which slave TWC to send a heartbeat to, and when.
+"""
+
+import pytest
+from unittest.mock import Mock
+
+
+class TestHeartbeatScheduler:
+    """Test heartbeat scheduling for slave TWCs."""
+
+    @pytest.fixture
+    def slaves(self):
+        """Create two mock slave TWCs."""
+        return [Mock(TWCID=bytearray(b"\x77\x77")), Mock(TWCID=bytearray(b"\x88\x88"))]
+
+    @pytest.fixture
+    def mock_master(self, slaves):
+        """Create a mock master with two slaves."""
+        master = Mock()
+        master.getSlaveTWCs = Mock(return_value=slaves)
+        master.getTimeLastTx = Mock(return_value=0)
+        return master
+
+    @pytest.fixture
+    def scheduler(self, mock_master):
+        """Create a HeartbeatScheduler instance."""
+        from TWCManager.HeartbeatScheduler import HeartbeatScheduler
+
+        return HeartbeatScheduler(mock_master)
+
+    def send(self, scheduler, mock_master, slave, now):
+        """Send a heartbeat, recording the transmit time on the interface."""
+        mock_master.getTimeLastTx = Mock(return_value=now)
+        scheduler.sendHeartbeat(slave, now)
+
+    def test_no_slaves(self, scheduler, mock_master):
+        """Test nothing is due when there are no slaves."""
+        mock_master.getSlaveTWCs = Mock(return_value=[])
+
+        assert scheduler.nextDue(100) is None
+        assert scheduler.timeToNext(100) is None
+
+    def test_new_slaves_due_immediately(self, scheduler, slaves):
+        """Test slaves we haven't sent to yet are due straight away."""
+        assert scheduler.nextDue(100) is slaves[0]
+        assert scheduler.timeToNext(100) == 0
+
+    def test_takes_turns(self, scheduler, mock_master, slaves):
+        """Test heartbeats alternate between slaves, one per interval."""
+        self.send(scheduler, mock_master, slaves[0], 100)
+        slaves[0].send_master_heartbeat.assert_called_once()
+
+        # Nothing more is sent until the interval has passed
+        assert scheduler.nextDue(100.5) is None
+        assert scheduler.timeToNext(100.5) == pytest.approx(0.5)
+
+        assert scheduler.nextDue(101) is slaves[1]
+        self.send(scheduler, mock_master, slaves[1], 101)
+
+        # Each slave is due once per interval times the number of slaves
+        assert scheduler.nextDue(101.5) is None
+        assert scheduler.nextDue(102) is slaves[0]
+
+    def test_response_window(self, scheduler, mock_master, slaves):
+        """Test the bus is left quiet until the slave replies."""
+        mock_master.getSlaveTWCs = Mock(return_value=slaves[:1])
+        scheduler.interval = 0.01
+        self.send(scheduler, mock_master, slaves[0], 100)
+
+        # Still waiting on the reply
+        assert scheduler.nextDue(100.05) is None
+
+        # The reply frees up the bus straight away
+        scheduler.responseReceived(slaves[0].TWCID, 100.02)
+        assert scheduler.nextDue(100.05) is slaves[0]
+        assert scheduler.getStats()["7777"]["responseTime"] == pytest.approx(0.02)
+
+        # Without a reply, we wait for the full window and count it as missed
+        self.send(scheduler, mock_master, slaves[0], 100.05)
+        assert scheduler.nextDue(100.1) is None
+        assert scheduler.nextDue(100.05 + scheduler.responseWindow) is slaves[0]
+        assert scheduler.getStats()["7777"]["missed"] == 1
+
+    def test_waits_after_other_messages(self, scheduler, mock_master, slaves):
+        """Test other messages on the bus also get time for a reply."""
+        mock_master.getTimeLastTx = Mock(return_value=100)
+
+        assert scheduler.nextDue(100.05) is None
+        assert scheduler.nextDue(100.2) is slaves[0]
+
+    def test_jitter(self, scheduler, mock_master, slaves):
+        """Test jitter records how late each heartbeat was sent."""
+        self.send(scheduler, mock_master, slaves[0], 100)
+        self.send(scheduler, mock_master, slaves[1], 101)
+        self.send(scheduler, mock_master, slaves[0], 102.25)
+
+        stats = scheduler.getStats()
+        assert stats["7777"]["sent"] == 2
+        assert stats["7777"]["jitterLast"] == pytest.approx(0.25)
+        assert stats["7777"]["jitterMax"] == pytest.approx(0.25)
+
+        # The first heartbeat to a slave isn't counted
+        assert stats["8888"]["jitterMax"] == 0
+
+    def test_cycle_due(self, scheduler):
+        """Test cycleDue fires once per full cycle of heartbeats."""
+        assert scheduler.cycleDue(100) is True
+        assert scheduler.cycleDue(101) is False
+        assert scheduler.cycleDue(102) is True
+
+    def test_remove_slave(self, scheduler, mock_master, slaves):
+        """Test removing a slave forgets its schedule."""
+        self.send(scheduler, mock_master, slaves[0], 100)
+        scheduler.removeSlave(slaves[0].TWCID)
+
+        assert "7777" not in scheduler.getStats()
+        assert scheduler.waitingFor is None
@@ -0,0 +1,135 @@
+"""
+Unit tests for TWCManager HistoryStore module.
+
+Tests the ring of history slots, keeping it in a file, and moving history
+out of the settings dict.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+
+
+class TestHistoryStore:
+    """Test the charger power history ring."""
+
+    def test_append_and_get(self):
+        """Test intervals are read back in order, skipping missing ones."""
+        from TWCManager.HistoryStore import HistoryStore
+
+        history = HistoryStore(interval=300, slots=12)
+        assert history.append(3000, 100.0)
+        assert history.append(3600, 200.0)
+
+        assert history.get(3000, 3900) == [(3000, 100.0), (3600, 200.0)]
+        # The end isn't included, and a start part way through an interval
+        # begins at the next one
+        assert history.get(3000, 3600) == [(3000, 100.0)]
+        assert history.get(3001, 3900) == [(3600, 200.0)]
+        # A timestamp part way through an interval is stored as its start
+        history.append(3950, 300.0)
+        assert history.get(3900, 4200) == [(3900, 300.0)]
+
+    def test_ring_wraps(self):
+        """Test old intervals are overwritten, and not mistaken for new."""
+        from TWCManager.HistoryStore import HistoryStore
+
+        history = HistoryStore(interval=300, slots=12)
+        history.append(0, 1.0)
+        history.append(300, 2.0)
+
+        # 12 intervals later, the first slot is reused
+        history.append(12 * 300, 3.0)
+        assert history.get(0, 13 * 300) == [(300, 2.0), (3600, 3.0)]
+
+        # Nothing is stored for the interval after the one reused, so the
+        # second interval's value isn't returned for it
+        assert history.get(12 * 300, 14 * 300) == [(3600, 3.0)]
+
+        # An interval older than the one in its slot is ignored
+        assert not history.append(0, 4.0)
+        assert history.get(12 * 300, 13 * 300) == [(3600, 3.0)]
+
+    def test_file(self, tmp_path):
+        """Test history is kept in a file, and read back when reopened."""
+        from TWCManager.HistoryStore import HistoryStore
+
+        fileName = str(tmp_path / "history.bin")
+        history = HistoryStore(fileName, interval=300, slots=12)
+        history.append(3000, 100.0)
+        history.close()
+        assert os.path.getsize(fileName) == 16 + 16 * 12
+
+        history = HistoryStore(fileName, interval=300, slots=12)
+        assert history.get(0, 3600) == [(3000, 100.0)]
+        history.close()
+
+        # A file written with a different layout is started again
+        history = HistoryStore(fileName, interval=300, slots=24)
+        assert history.get(0, 3600) == []
+        history.close()
+        history = HistoryStore(fileName, interval=60, slots=24)
+        assert history.get(0, 3600) == []
+        history.close()
+
+
+class TestHistoryMigration:
+    """Test moving history out of the settings dict."""
+
+    @pytest.fixture
+    def master(self, tmp_path):
+        """Create a TWCMaster that loads settings from a temporary directory."""
+        from TWCManager.TWCMaster import TWCMaster
+
+        master = TWCMaster(
+            bytearray(b"\x77\x77"),
+            {
+                "config": {
+                    "wiringMaxAmpsAllTWCs": 80,
+                    "maxAmpsAllowedFromGrid": None,
+                    "settingsPath": str(tmp_path),
+                }
+            },
+        )
+        master.getModuleByName = Mock(return_value=Mock())
+        master.getModulesByType = Mock(return_value=[])
+        return master
+
+    def test_migrate(self, master, tmp_path):
+        """Test history in the settings file is moved to the history file."""
+        now = datetime.now().astimezone().replace(second=0, microsecond=0)
+        now = now.replace(minute=now.minute // 5 * 5)
+        history = [
+            [(now - timedelta(minutes=10)).isoformat(timespec="seconds"), 1500.0],
+            [(now - timedelta(minutes=5)).isoformat(timespec="seconds"), 2500.0],
+            ["not a timestamp", 1.0],
+        ]
+        with open(str(tmp_path / "settings.json"), "w") as outfile:
+            json.dump({"chargeNowAmps": 0, "history": history}, outfile)
+
+        master.loadSettings()
+        assert "history" not in master.settings
+        assert master.getHistory(now - timedelta(hours=1), now) == [
+            ((now - timedelta(minutes=10)).timestamp(), 1500.0),
+            ((now - timedelta(minutes=5)).timestamp(), 2500.0),
+        ]
+        assert os.path.exists(str(tmp_path / "history.bin"))
+
+    def test_snap(self, master):
+        """Test a history snapshot is stored for the period just ended."""
+        slave = Mock(historyAvgAmps=10)
+        master.getSlaveTWCs = Mock(return_value=[slave])
+        master.convertAmpsToWatts = Mock(return_value=2300.0)
+        master.getRealPowerFactor = Mock(return_value=1)
+        snap = datetime.now().astimezone().replace(second=0, microsecond=0)
+        snap = snap.replace(minute=snap.minute // 5 * 5)
+        master.nextHistorySnap = snap
+
+        master.snapHistoryData()
+        assert master.getHistory(snap - timedelta(hours=1), snap) == [
+            ((snap - timedelta(minutes=5)).timestamp(), 2300.0)
+        ]
+        assert slave.historyAvgAmps == 0
@@ -0,0 +1,89 @@
+"""
+Unit tests for TWCManager HTTPPool module.
+
+Tests reusing connections to each host, retrying, and counting requests
+and connections.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answers with a small JSON document, on a connection kept alive."""
+
+    disable_nagle_algorithm = True
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = 0
+    httpd.statuses = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHTTPPool:
+    """Test the shared HTTP connections."""
+
+    def test_reuse(self, server):
+        """Test requests to a host reuse one connection."""
+        from TWCManager.HTTPPool import HTTPPool
+
+        pool = HTTPPool()
+        url = "http://127.0.0.1:%d/api" % (server.server_port)
+        for i in range(5):
+            assert pool.get(url, timeout=5).json() == {"ok": True}
+        assert pool.post(url, json={}).status_code == 200
+
+        stats = pool.getStats()
+        host = stats["hosts"]["http://127.0.0.1:%d" % (server.server_port)]
+        assert host == {"requests": 6, "connections": 1, "reused": 5}
+        assert stats["requests"] == 6 and stats["reused"] == 5
+        pool.close()
+
+    def test_retry(self, server):
+        """Test a GET is retried when the server is briefly unavailable."""
+        from TWCManager.HTTPPool import HTTPPool
+
+        pool = HTTPPool(backoff=0)
+        url = "http://127.0.0.1:%d/api" % (server.server_port)
+        server.statuses = [503, 503]
+        assert pool.get(url).status_code == 200
+        assert server.requests == 3
+
+        # but not once the retries run out, when the last response is
+        # returned for the module to handle
+        server.statuses = [503, 503, 503]
+        assert pool.get(url).status_code == 503
+
+    def test_connection_error(self):
+        """Test requests' exceptions are raised, and available from the pool."""
+        from TWCManager.HTTPPool import HTTPPool
+
+        pool = HTTPPool(retries=0)
+        with pytest.raises(pool.exceptions.ConnectionError):
+            pool.get("http://127.0.0.1:1/")
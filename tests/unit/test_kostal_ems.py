@@ -78,3 +78,66 @@ class TestKostalInitialization:
 
             master.releaseModule.assert_not_called()
             assert kostal.host == "192.168.1.100"
+
+
+class TestKostalConnect:
+    """Test connecting to the inverter in the background."""
+
+    def getMaster(self):
+        master = Mock()
+        master.config = {
+            "config": {},
+            "sources": {
+                "Kostal": {
+                    "enabled": True,
+                    "serverIP": "192.168.1.100"
+                }
+            }
+        }
+        return master
+
+    def test_no_values_until_connected(self):
+        """Test the module reports no power until it has connected."""
+        from unittest.mock import MagicMock
+        master = self.getMaster()
+
+        with patch('TWCManager.EMS.Kostal.logger'), \
+             patch('TWCManager.EMS.Kostal.ModbusClient') as mock_modbus_cls:
+            mock_client = MagicMock()
+            mock_client.open.return_value = True
+            mock_client.is_open.return_value = True
+            mock_client.read_holding_registers.return_value = [0] * 32
+            mock_modbus_cls.return_value = mock_client
+
+            from TWCManager.EMS.Kostal import Kostal
+            kostal = Kostal(master)
+
+            # Nothing is read from the inverter when the module is loaded
+            mock_modbus_cls.assert_not_called()
+            assert kostal.getGeneration() == 0
+            assert kostal.getConsumption() == 0
+
+            assert kostal.connectModule() is True
+            assert kostal.connected is True
+            mock_client.open.assert_called_once()
+            master.releaseModule.assert_not_called()
+
+    def test_connect_failure(self):
+        """Test the module unloads if the inverter can't be reached."""
+        from unittest.mock import MagicMock
+        master = self.getMaster()
+
+        with patch('TWCManager.EMS.Kostal.logger'), \
+             patch('TWCManager.EMS.Kostal.ModbusClient') as mock_modbus_cls:
+            mock_client = MagicMock()
+            mock_client.open.return_value = False
+            mock_modbus_cls.return_value = mock_client
+
+            from TWCManager.EMS.Kostal import Kostal
+            kostal = Kostal(master)
+
+            assert kostal.connectModule() is False
+            assert kostal.connected is False
+            master.releaseModule.assert_called_once_with(
+                "lib.TWCManager.EMS", "Kostal"
+            )
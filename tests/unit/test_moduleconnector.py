@@ -0,0 +1,85 @@
+"""
+Unit tests for TWCManager ModuleConnector module.
+
+Tests connecting modules in the background at startup, and waiting for
+them until their deadline.
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+
+class FakeModule:
+    """A module which connects once it is allowed to."""
+
+    def __init__(self, result=True):
+        self.allowed = threading.Event()
+        self.result = result
+
+    def connectModule(self):
+        self.allowed.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class TestModuleConnector:
+    """Test connecting modules in the background."""
+
+    def test_connected(self):
+        """Test modules are connected at once, and waited for."""
+        from TWCManager.ModuleConnector import ModuleConnector
+
+        release = Mock()
+        connector = ModuleConnector(release)
+        modules = [FakeModule(), FakeModule(False)]
+        connector.connect("First", "EMS", modules[0], 5)
+        connector.connect("Second", "EMS", modules[1], 5)
+        assert connector.getConnecting() == ["First", "Second"]
+
+        for module in modules:
+            module.allowed.set()
+        assert connector.wait() == []
+        assert connector.getState("First") == "connected"
+        assert connector.getState("Second") == "failed"
+        assert connector.getState("Other") is None
+        release.assert_not_called()
+
+    def test_exception(self):
+        """Test a module which raises an exception is released."""
+        from TWCManager.ModuleConnector import ModuleConnector
+
+        release = Mock()
+        connector = ModuleConnector(release)
+        module = FakeModule(OSError("No route to host"))
+        module.allowed.set()
+        connector.connect("Kostal", "EMS", module, 5)
+
+        assert connector.wait() == []
+        assert connector.getState("Kostal") == "failed"
+        release.assert_called_once_with("lib.TWCManager.EMS", "Kostal")
+
+    def test_deadline(self):
+        """Test startup only waits for a module until its deadline."""
+        from TWCManager.ModuleConnector import ModuleConnector
+
+        connector = ModuleConnector(Mock())
+        slow = FakeModule()
+        fast = FakeModule()
+        fast.allowed.set()
+        connector.connect("Slow", "EMS", slow, 0.1)
+        connector.connect("Fast", "EMS", fast, 0.1)
+
+        started = time.monotonic()
+        assert connector.wait() == ["Slow"]
+        assert time.monotonic() - started < 1
+        assert connector.getState("Fast") == "connected"
+
+        # The slow module carries on connecting in the background
+        slow.allowed.set()
+        for i in range(100):
+            if connector.getState("Slow") != "connecting":
+                break
+            time.sleep(0.01)
+        assert connector.getState("Slow") == "connected"
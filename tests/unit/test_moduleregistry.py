@@ -0,0 +1,97 @@
+"""
+Unit tests for TWCManager ModuleRegistry module.
+
+Tests which modules config.json enables, and loading them from their entry
+points.
+"""
+
+import importlib.util
+import os
+
+
+class TestModuleRegistry:
+    """Test the registry of the modules TWCManager can load."""
+
+    def test_entry_points_exist(self):
+        """Test every entry point names a module in the tree."""
+        from TWCManager.ModuleRegistry import registry
+
+        names = [entry.name for entry in registry]
+        assert len(names) == len(set(names))
+        assert names[0] == "Logging.ConsoleLogging"
+        for entry in registry:
+            moduleName, className = entry.entryPoint.split(":")
+            assert importlib.util.find_spec(moduleName) is not None, moduleName
+            assert className == entry.className
+
+    def test_always_loaded(self):
+        """Test modules without a config section are always loaded."""
+        from TWCManager.ModuleRegistry import getEntry
+
+        for name in ("Protocol.TWCProtocol", "Policy.Policy", "Vehicle.TeslaAPI"):
+            assert getEntry(name).isEnabled({})
+        assert getEntry("EMS.Missing") is None
+
+    def test_enabled(self):
+        """Test modules are loaded if enabled, or by default if unset."""
+        from TWCManager.ModuleRegistry import getEntry
+
+        fronius = getEntry("EMS.Fronius")
+        assert not fronius.isEnabled({})
+        assert not fronius.isEnabled({"sources": {"Fronius": {"serverIP": "x"}}})
+        assert not fronius.isEnabled({"sources": {"Fronius": {"enabled": False}}})
+        assert fronius.isEnabled({"sources": {"Fronius": {"enabled": True}}})
+
+        console = getEntry("Logging.ConsoleLogging")
+        assert console.isEnabled({})
+        assert console.isEnabled({"logging": {"Console": {}}})
+        assert not console.isEnabled({"logging": {"Console": {"enabled": False}}})
+
+        # The config key isn't always the module's name
+        assert getEntry("EMS.TeslaPowerwall2").isEnabled(
+            {"sources": {"Powerwall2": {"enabled": True}}}
+        )
+        assert getEntry("Control.HTTPControl").isEnabled(
+            {"control": {"HTTP": {"enabled": True}}}
+        )
+
+    def test_enabled_by_section(self):
+        """Test modules enabled by their section existing."""
+        from TWCManager.ModuleRegistry import getEntry
+
+        dummy = getEntry("Interface.Dummy")
+        assert not dummy.isEnabled({"interface": {"RS485": {}}})
+        assert dummy.isEnabled({"interface": {"Dummy": {}}})
+        assert not dummy.isEnabled({"interface": {"Dummy": {"enabled": False}}})
+
+        assert getEntry("EMS.P1Monitor").isEnabled(
+            {"sources": {"P1Monitor": {"serverIP": "x"}}}
+        )
+
+    def test_sample_config(self):
+        """Test the sample config.json enables the expected modules."""
+        from TWCManager.ConfigLoader import loadConfig
+        from TWCManager.ModuleRegistry import registry
+
+        config = loadConfig(
+            os.path.join(
+                os.path.dirname(__file__),
+                "..",
+                "..",
+                "etc",
+                "twcmanager",
+                "config.json",
+            )
+        )
+        enabled = [entry.name for entry in registry if entry.isEnabled(config)]
+        assert "Interface.RS485" in enabled
+        assert "Vehicle.TeslaAPI" in enabled
+        assert "EMS.Fronius" not in enabled
+        assert len(enabled) < len(registry) / 2
+
+    def test_load(self):
+        """Test loading a module returns its class."""
+        from TWCManager.ModuleRegistry import getEntry
+        from TWCManager.Policy.Policy import Policy
+
+        assert getEntry("Policy.Policy").load() is Policy
@@ -0,0 +1,119 @@
+"""
+Unit tests for TWCManager Reactor module.
+
+Tests waiting on the interface file descriptor in reactor mode.
+"""
+
+import os
+import time
+
+import pytest
+from unittest.mock import Mock
+
+
+class PipeInterface:
+    """Interface stand-in backed by a pipe."""
+
+    def __init__(self):
+        self.readFD, self.writeFD = os.pipe()
+
+    def fileno(self):
+        return self.readFD
+
+    def getBufferLen(self):
+        return 0
+
+    def close(self):
+        os.close(self.readFD)
+        os.close(self.writeFD)
+
+
+class TestReactor:
+    """Test the Reactor wait logic."""
+
+    @pytest.fixture
+    def interface(self):
+        """Create a pipe backed interface."""
+        interface = PipeInterface()
+        yield interface
+        interface.close()
+
+    @pytest.fixture
+    def mock_master(self, interface):
+        """Create a mock master with reactor mode enabled."""
+        master = Mock()
+        master.config = {"config": {"reactorMode": True}}
+        master.getInterfaceModule = Mock(return_value=interface)
+        master.getModuleByName = Mock(return_value=None)
+        return master
+
+    @pytest.fixture
+    def reactor(self, mock_master):
+        """Create a Reactor instance."""
+        from TWCManager.Reactor import Reactor
+
+        reactor = Reactor(mock_master)
+        yield reactor
+        reactor.close()
+
+    def test_disabled_by_default(self):
+        """Test reactor mode is off unless configured."""
+        from TWCManager.Reactor import Reactor
+
+        master = Mock()
+        master.config = {"config": {}}
+
+        reactor = Reactor(master)
+
+        assert reactor.enabled is False
+        assert reactor.selector is None
+
+    def test_wait_returns_when_data_arrives(self, reactor, interface):
+        """Test wait returns as soon as the interface is readable."""
+        os.write(interface.writeFD, b"\xc0")
+
+        start = time.time()
+        assert reactor.wait(5) is True
+        assert time.time() - start < 1
+        assert reactor.stats["wakeups"] == 1
+
+    def test_wait_times_out(self, reactor):
+        """Test wait returns False when nothing arrives."""
+        start = time.time()
+        assert reactor.wait(0.05) is False
+        assert time.time() - start >= 0.04
+        assert reactor.stats["timeouts"] == 1
+
+    def test_poll_interval_with_webipc(self, reactor, mock_master):
+        """Test the wait is capped while WebIPC needs polling."""
+        mock_master.getModuleByName = Mock(return_value=Mock())
+        reactor.pollInterval = 0.05
+
+        start = time.time()
+        reactor.wait(5)
+        assert time.time() - start < 1
+        assert reactor.stats["polls"] == 1
+
+    def test_interface_without_fileno(self, reactor, mock_master):
+        """Test interfaces with no file descriptor are polled."""
+        interface = Mock(spec=["getBufferLen"])
+        interface.getBufferLen = Mock(return_value=3)
+        mock_master.getInterfaceModule = Mock(return_value=interface)
+
+        assert reactor.wait(5) is True
+        assert reactor.interfaceFD is None
+
+    def test_reregisters_on_reconnect(self, reactor, mock_master, interface):
+        """Test a new interface file descriptor is picked up."""
+        reactor.wait(0)
+        assert reactor.interfaceFD == interface.readFD
+
+        replacement = PipeInterface()
+        try:
+            mock_master.getInterfaceModule = Mock(return_value=replacement)
+            os.write(replacement.writeFD, b"\xc0")
+            assert reactor.wait(5) is True
+            assert reactor.interfaceFD == replacement.readFD
+        finally:
+            reactor.close()
+            replacement.close()
@@ -0,0 +1,138 @@
+"""
+Unit tests for TWCManager ReadingCache module.
+
+Tests serving cached values, refreshing them in the background before
+they expire, and backing off after failed fetches.
+"""
+
+import time
+from unittest.mock import Mock
+
+
+class FakeTimers:
+    """Records timers scheduled, rather than firing them."""
+
+    def __init__(self):
+        self.delays = []
+
+    def schedule(self, delay, callback, *args):
+        self.delays.append(delay)
+        return Mock()
+
+
+class FakeModule:
+    """A module whose fetch() counts calls, and fails when told to."""
+
+    def __init__(self):
+        self.error = None
+        self.fetches = 0
+        self.result = True
+
+    def fetch(self):
+        self.fetches += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestReadingCache:
+    """Test the reading cache."""
+
+    def test_hit_miss(self):
+        """Test values are fetched when first read, then served from the cache."""
+        from TWCManager.ReadingCache import ReadingCache
+
+        timers = FakeTimers()
+        cache = ReadingCache(timers)
+        module = FakeModule()
+        reading = cache.register("Fronius", module.fetch, 10)
+
+        assert reading.update() is True
+        assert reading.update() is False
+        assert module.fetches == 1
+
+        # The next fetch is scheduled for as the values expire
+        assert 9.9 < timers.delays[-1] <= 10
+
+        # Values read every 30 seconds are fetched just before the next read
+        reading.interval = 30
+        reading.accessed = time.monotonic()
+        reading.run()
+        assert module.fetches == 2
+        assert 26.5 < timers.delays[-1] <= 27
+
+        # Or, if read more often than that, before the first read after the
+        # values expire
+        reading.interval = 4
+        reading.accessed = time.monotonic()
+        reading.run()
+        assert 11.1 < timers.delays[-1] <= 11.6
+
+        stats = cache.getStats()["Fronius"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["failures"] == 0
+        assert stats["age"] < 1
+        assert stats["retryIn"] is None
+
+    def test_backoff(self):
+        """Test failed fetches are retried after a growing backoff."""
+        from TWCManager.ReadingCache import ReadingCache
+
+        timers = FakeTimers()
+        cache = ReadingCache(timers, maxBackoff=40)
+        module = FakeModule()
+        reading = cache.register("SolarEdge", module.fetch, 10)
+        assert reading.update() is True
+
+        # Fetches that fail, or raise an exception, are retried later
+        module.result = False
+        reading.run()
+        assert 5 <= timers.delays[-1] <= 10
+        module.error = OSError("Connection refused")
+        reading.run()
+        assert 10 <= timers.delays[-1] <= 20
+        for i in range(3):
+            reading.run()
+        assert 20 <= timers.delays[-1] <= 40
+
+        # Meanwhile, the last values are used without fetching again
+        reading.updated -= 20
+        assert reading.update() is False
+        assert module.fetches == 6
+
+        stats = cache.getStats()["SolarEdge"]
+        assert stats["failures"] == 5
+        assert stats["stale"] == 1
+        assert stats["error"] == "OSError: Connection refused"
+        assert 0 < stats["retryIn"] <= 40
+
+        # Until a fetch succeeds
+        module.error = None
+        module.result = True
+        reading.run()
+        assert cache.getStats()["SolarEdge"]["error"] is None
+        assert 9.9 < timers.delays[-1] <= 10
+
+    def test_background_refresh(self):
+        """Test values are refreshed in the background, until they aren't read."""
+        from TWCManager.ReadingCache import ReadingCache
+        from TWCManager.TimerHeap import TimerHeap
+
+        cache = ReadingCache(TimerHeap(), idleTime=1)
+        module = FakeModule()
+        reading = cache.register("HASS", module.fetch, 0.3)
+        assert reading.update() is True
+
+        # Reading them is never held up by a fetch
+        time.sleep(0.45)
+        assert module.fetches >= 2
+        assert reading.update() is False
+        assert cache.getStats()["HASS"]["refreshes"] >= 1
+
+        # Once they haven't been read for idleTime, they aren't fetched
+        time.sleep(2)
+        fetches = module.fetches
+        time.sleep(0.5)
+        assert module.fetches == fetches
+        assert reading.update() is True
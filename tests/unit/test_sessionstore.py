@@ -0,0 +1,160 @@
+"""
+Unit tests for TWCManager SessionStore module.
+
+Tests recording charging sessions, monthly rollups, retention, and moving
+session counters out of settings["Vehicles"].
+"""
+
+import json
+import os
+import time
+from unittest.mock import Mock
+
+import pytest
+
+
+class TestSessionStore:
+    """Test the charging session store."""
+
+    def test_sessions(self):
+        """Test sessions are counted when they start, and kWh when they end."""
+        from TWCManager.SessionStore import SessionStore
+
+        store = SessionStore()
+        start = time.mktime((2026, 3, 10, 12, 0, 0, 0, 0, -1))
+        assert store.startSession("VIN1", "ABCD", 100.0, start)
+        assert store.getTotals() == {"VIN1": (1, 0)}
+        assert store.endSession("VIN1", 112.5, start + 3600) == 12.5
+        # There's no session open any more
+        assert store.endSession("VIN1", 120.0) is None
+
+        # A session never closed off is ended with nothing delivered
+        store.startSession("VIN1", "ABCD", 120.0, start + 7200)
+        store.startSession("VIN1", "ABCD", 125.0, start + 9000)
+        store.endSession("VIN1", 130.0, start + 10800)
+        assert store.getTotals() == {"VIN1": (3, 17.5)}
+        assert [session["kWh"] for session in store.getSessions("VIN1")] == [
+            5.0,
+            0,
+            12.5,
+        ]
+        assert store.getMonths("VIN1") == [
+            {"month": "2026-03", "sessions": 3, "kWh": 17.5}
+        ]
+        assert store.getSessions("VIN2") == []
+        store.close()
+
+    def test_compact(self, tmp_path):
+        """Test old sessions are deleted, but monthly totals are kept."""
+        from TWCManager.SessionStore import SessionStore
+
+        fileName = str(tmp_path / "sessions.db")
+        store = SessionStore(fileName, retentionDays=30)
+        now = time.time()
+        for day in (60, 45, 10):
+            store.startSession("VIN1", "ABCD", 100.0, now - day * 86400)
+            store.endSession("VIN1", 110.0, now - day * 86400 + 3600)
+        # A session still open is kept, however old
+        store.startSession("VIN2", "ABCD", 100.0, now - 90 * 86400)
+
+        assert store.compact(now) == 2
+        assert len(store.getSessions("VIN1")) == 1
+        assert len(store.getSessions("VIN2")) == 1
+        assert store.getTotals()["VIN1"] == (3, 30.0)
+        store.close()
+
+        # Nothing is deleted with no retention period
+        store = SessionStore(fileName, retentionDays=0)
+        assert store.compact(now + 365 * 86400) == 0
+        assert len(store.getSessions("VIN1")) == 1
+        store.close()
+
+    def test_import(self):
+        """Test importing counters can be repeated, and resumes a session."""
+        from TWCManager.SessionStore import SessionStore
+
+        store = SessionStore()
+        assert store.importVehicle("VIN1", 10, 150.0, 500.0)
+        assert store.importVehicle("VIN1", 10, 150.0, 500.0)
+        assert store.getTotals() == {"VIN1": (10, 150.0)}
+        assert len(store.getSessions("VIN1")) == 1
+
+        # The session in progress is added to the imported counters
+        assert store.endSession("VIN1", 510.0) == 10.0
+        assert store.getMonths("VIN1") == [{"month": "", "sessions": 10, "kWh": 160.0}]
+        store.close()
+
+
+class TestVehicleSessions:
+    """Test TWCMaster recording sessions in the session store."""
+
+    @pytest.fixture
+    def master(self, tmp_path):
+        """Create a TWCMaster that loads settings from a temporary directory."""
+        from TWCManager.TWCMaster import TWCMaster
+
+        master = TWCMaster(
+            bytearray(b"\x77\x77"),
+            {
+                "config": {
+                    "wiringMaxAmpsAllTWCs": 80,
+                    "maxAmpsAllowedFromGrid": None,
+                    "settingsPath": str(tmp_path),
+                }
+            },
+        )
+        master.getModuleByName = Mock(return_value=Mock())
+        master.getModulesByType = Mock(return_value=[])
+        return master
+
+    def test_migrate(self, master, tmp_path):
+        """Test session counters are moved out of settings["Vehicles"]."""
+        with open(str(tmp_path / "settings.json"), "w") as outfile:
+            json.dump(
+                {
+                    "Vehicles": {
+                        "VIN1": {"chargeSessions": 4, "startkWh": 0, "totalkWh": 52},
+                        "VIN2": {"BLEPeeringStatus": "peered"},
+                    }
+                },
+                outfile,
+            )
+
+        master.loadSettings()
+        assert master.settings["Vehicles"] == {
+            "VIN1": {},
+            "VIN2": {"BLEPeeringStatus": "peered"},
+        }
+        assert master.getVehicleTotals() == {
+            "VIN1": {"chargeSessions": 4, "totalkWh": 52},
+            "VIN2": {"chargeSessions": 0, "totalkWh": 0},
+        }
+        assert os.path.exists(str(tmp_path / "sessions.db"))
+        master.sessionStore.close()
+
+    def test_record(self, master):
+        """Test a VIN starts a session, which ends when charging stops."""
+        slave = Mock(TWCID=b"\xab\xcd", currentVIN="VIN1", lifetimekWh=100)
+        master.recordVehicleVIN(slave)
+        assert master.settings["Vehicles"] == {"VIN1": {}}
+        assert master.getSettingsStats()["dirty"]
+
+        # A vehicle we know doesn't change settings
+        carapi = master.getModuleByName.return_value
+        carapi.getCarApiBearerToken.return_value = ""
+        carapi.getCarApiRefreshToken.return_value = ""
+        carapi.getCarApiTokenExpireTime.return_value = 0
+        master.saveSettings()
+        assert not master.lastSaveFailed
+        master.recordVehicleVIN(slave)
+        assert not master.getSettingsStats()["dirty"]
+
+        slave.lastVIN = "VIN1"
+        slave.lifetimekWh = 108
+        master.recordVehicleSessionEnd(slave)
+        details = master.getVehicleSessions("VIN1")
+        assert details["chargeSessions"] == 2
+        assert details["totalkWh"] == 8
+        assert details["recent"][0]["twcid"] == "ABCD"
+        assert details["recent"][0]["kWh"] == 8
+        assert details["recent"][0]["endFormat"]
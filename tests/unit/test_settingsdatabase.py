@@ -0,0 +1,199 @@
+"""
+Unit tests for TWCManager SettingsDatabase module.
+
+Tests keeping settings in SQLite, writing only what changed, moving
+settings.json into the database and exporting it again.
+"""
+
+import json
+import os
+import sqlite3
+from unittest.mock import Mock
+
+import pytest
+
+
+class TestSettingsDatabase:
+    """Test keeping settings in an SQLite database."""
+
+    @pytest.fixture
+    def settings(self):
+        """Settings with vehicles and charge limits."""
+        return {
+            "chargeNowAmps": 0,
+            "homeLat": 10000,
+            "Vehicles": {
+                "VIN1": {"chargeSessions": 1, "totalkWh": 10},
+                "VIN2": {"chargeSessions": 4, "totalkWh": 52},
+            },
+            "chargeLimits": {"1": [80, 90]},
+        }
+
+    def test_round_trip(self, tmp_path, settings):
+        """Test settings saved are loaded back, with WAL turned on."""
+        from TWCManager.SettingsDatabase import SettingsDatabase
+
+        fileName = str(tmp_path / "settings.db")
+        database = SettingsDatabase(fileName)
+        assert database.load() is None
+        database.markDirty()
+        assert database.save(settings)
+        database.close()
+
+        database = SettingsDatabase(fileName)
+        assert database.load() == settings
+        assert (
+            sqlite3.connect(fileName).execute("PRAGMA journal_mode").fetchone()[0]
+            == "wal"
+        )
+
+        # Nothing has changed since it was loaded
+        database.markDirty()
+        assert database.save(settings)
+        assert database.getStats()["skipped"] == 1
+        assert database.getStats()["writes"] == 0
+        database.close()
+
+    def test_only_changes_written(self, tmp_path, settings):
+        """Test a save writes only the rows that changed."""
+        from TWCManager.SettingsDatabase import SettingsDatabase
+
+        database = SettingsDatabase(str(tmp_path / "settings.db"))
+        database.markDirty()
+        database.save(settings)
+        written = database.getStats()["bytesWritten"]
+
+        settings["Vehicles"]["VIN2"]["totalkWh"] = 60
+        database.markDirty("Vehicles")
+        database.save(settings)
+        vehicle = json.dumps(settings["Vehicles"]["VIN2"])
+        assert database.getStats()["bytesWritten"] == written + 4 + len(vehicle)
+
+        # Only the key marked dirty is compared
+        settings["homeLat"] = 1
+        settings["chargeNowAmps"] = 16
+        database.markDirty("chargeNowAmps")
+        database.save(settings)
+        assert database.getStats()["writes"] == 3
+        assert database.load()["homeLat"] == 10000
+
+        # Without a key, everything is compared
+        database.markDirty()
+        database.save(settings)
+        assert database.load() == settings
+        database.close()
+
+    def test_deletes(self, tmp_path, settings):
+        """Test settings, vehicles and charge limits removed are deleted."""
+        from TWCManager.SettingsDatabase import SettingsDatabase
+
+        database = SettingsDatabase(str(tmp_path / "settings.db"))
+        database.markDirty()
+        database.save(settings)
+
+        del settings["homeLat"]
+        del settings["Vehicles"]["VIN1"]
+        del settings["chargeLimits"]["1"]
+        database.markDirty()
+        database.save(settings)
+
+        loaded = database.load()
+        assert "homeLat" not in loaded
+        assert list(loaded["Vehicles"]) == ["VIN2"]
+        assert "chargeLimits" not in loaded
+        database.close()
+
+    def test_failed_save_kept_dirty(self, tmp_path, settings):
+        """Test a change isn't forgotten when saving it fails."""
+        from TWCManager.SettingsDatabase import SettingsDatabase
+
+        database = SettingsDatabase(str(tmp_path / "settings.db"))
+        database.markDirty()
+        database.save(settings)
+
+        # Another lane changes the vehicles while they are gone through
+        getChanges = database.getChanges
+        database.getChanges = Mock(
+            side_effect=RuntimeError("dictionary changed size during iteration")
+        )
+        settings["Vehicles"]["VIN3"] = {"chargeSessions": 1, "totalkWh": 5}
+        database.markDirty("Vehicles")
+        assert not database.save(settings)
+        assert database.getStats()["dirty"]
+
+        # The next save still writes it
+        database.getChanges = getChanges
+        assert database.save(settings)
+        assert not database.getStats()["dirty"]
+        assert database.load()["Vehicles"]["VIN3"]["totalkWh"] == 5
+        database.close()
+
+    def test_export(self, tmp_path, settings):
+        """Test settings can be exported to JSON."""
+        from TWCManager.SettingsDatabase import SettingsDatabase, main
+
+        fileName = str(tmp_path / "settings.db")
+        database = SettingsDatabase(fileName)
+        database.markDirty()
+        database.save(settings)
+        database.close()
+
+        output = str(tmp_path / "export.json")
+        assert main([fileName, output]) == 0
+        with open(output) as infile:
+            assert json.load(infile) == settings
+
+
+class TestSettingsBackend:
+    """Test TWCMaster with the sqlite settings backend."""
+
+    def getMaster(self, tmp_path):
+        from TWCManager.TWCMaster import TWCMaster
+
+        master = TWCMaster(
+            bytearray(b"\x77\x77"),
+            {
+                "config": {
+                    "wiringMaxAmpsAllTWCs": 80,
+                    "maxAmpsAllowedFromGrid": None,
+                    "settingsPath": str(tmp_path),
+                    "settingsBackend": "sqlite",
+                }
+            },
+        )
+        carapi = Mock()
+        carapi.getCarApiBearerToken.return_value = "token"
+        carapi.getCarApiRefreshToken.return_value = "refresh"
+        carapi.getCarApiTokenExpireTime.return_value = 0
+        master.getModuleByName = Mock(return_value=carapi)
+        master.getModulesByType = Mock(return_value=[])
+        return master
+
+    def test_import_settings_json(self, tmp_path):
+        """Test settings.json is moved into the database on first start."""
+        with open(str(tmp_path / "settings.json"), "w") as outfile:
+            json.dump({"chargeNowAmps": 12, "Vehicles": {"VIN1": {}}}, outfile)
+
+        master = self.getMaster(tmp_path)
+        master.loadSettings()
+        assert master.getSettingsStats()["dirty"]
+        master.saveSettings()
+        assert master.lastSaveFailed == 0
+        master.settingsPersister.close()
+        assert os.path.exists(str(tmp_path / "settings.db"))
+
+        # From now on, settings come from the database
+        os.remove(str(tmp_path / "settings.json"))
+        master = self.getMaster(tmp_path)
+        master.loadSettings()
+        assert master.settings["chargeNowAmps"] == 12
+        assert master.settings["Vehicles"] == {"VIN1": {}}
+        assert master.settings["carApiBearerToken"] == "token"
+
+        master.setSetting("chargeNowAmps", 20)
+        master.saveSettings()
+        master.settingsPersister.close()
+        master = self.getMaster(tmp_path)
+        master.loadSettings()
+        assert master.settings["chargeNowAmps"] == 20
+        master.settingsPersister.close()
@@ -0,0 +1,161 @@
+"""
+Unit tests for TWCManager SettingsPersister module.
+
+Tests skipping unchanged writes, counting bytes written, and coalescing
+saveSettings tasks through TWCMaster.
+"""
+
+import json
+import os
+import time
+
+from unittest.mock import Mock
+
+import pytest
+
+
+class TestSettingsPersister:
+    """Test writing settings to settings.json."""
+
+    @pytest.fixture
+    def master(self, tmp_path):
+        """Create a TWCMaster that saves settings to a temporary directory."""
+        from TWCManager.TWCMaster import TWCMaster
+
+        return TWCMaster(
+            bytearray(b"\x77\x77"),
+            {
+                "config": {
+                    "wiringMaxAmpsAllTWCs": 80,
+                    "maxAmpsAllowedFromGrid": None,
+                    "settingsPath": str(tmp_path),
+                    "settingsSaveWindow": 0.2,
+                }
+            },
+        )
+
+    def test_skip_unchanged(self, tmp_path):
+        """Test settings are only written when they change."""
+        from TWCManager.SettingsPersister import SettingsPersister
+
+        fileName = str(tmp_path / "settings.json")
+        persister = SettingsPersister()
+        settings = {"chargeNowAmps": 0}
+
+        assert persister.save(settings, fileName)
+        assert persister.save(settings, fileName)
+        settings["chargeNowAmps"] = 16
+        assert persister.save(settings, fileName)
+
+        with open(fileName) as infile:
+            assert json.load(infile) == {"chargeNowAmps": 16}
+        with open(fileName + ".backup") as infile:
+            assert json.load(infile) == {"chargeNowAmps": 0}
+        assert not os.path.exists(fileName + ".tmp")
+
+        stats = persister.getStats()
+        assert stats["writes"] == 2
+        assert stats["skipped"] == 1
+        size = len(json.dumps({"chargeNowAmps": 0}))
+        total = size + len(json.dumps(settings))
+        assert stats["bytesWritten"] == total
+        assert stats["bytesLastHour"] == total
+        assert stats["bytesPerHour"] == total
+        assert stats["lastWrite"] is not None
+
+        # Writes more than an hour old no longer count towards the last hour
+        persister.recent[0] = (persister.recent[0][0] - 3601, size)
+        assert persister.getStats()["bytesLastHour"] == total - size
+
+    def test_loaded_not_rewritten(self, tmp_path):
+        """Test settings just loaded aren't written back unchanged."""
+        from TWCManager.SettingsPersister import SettingsPersister
+
+        fileName = str(tmp_path / "settings.json")
+        persister = SettingsPersister()
+        persister.loaded({"chargeNowAmps": 0})
+
+        assert persister.save({"chargeNowAmps": 0}, fileName)
+        assert not os.path.exists(fileName)
+        assert persister.getStats()["skipped"] == 1
+
+    def test_failed_write(self, tmp_path):
+        """Test a failed write is reported, and tried again next time."""
+        from TWCManager.SettingsPersister import SettingsPersister
+
+        fileName = str(tmp_path / "missing" / "settings.json")
+        persister = SettingsPersister()
+
+        persister.markDirty()
+        assert not persister.save({"chargeNowAmps": 0}, fileName)
+        assert persister.getStats()["dirty"]
+        os.mkdir(str(tmp_path / "missing"))
+        assert persister.save({"chargeNowAmps": 0}, fileName)
+        assert persister.getStats()["writes"] == 1
+        assert not persister.getStats()["dirty"]
+
+    def test_changed_while_serialising(self, tmp_path):
+        """Test settings changed by another lane as they're saved stay dirty."""
+        from TWCManager.SettingsPersister import SettingsPersister
+
+        class Changing(dict):
+            def items(self):
+                raise RuntimeError("dictionary changed size during iteration")
+
+        persister = SettingsPersister()
+        persister.markDirty()
+        settings = {"Vehicles": Changing(VIN1={"totalkWh": 10})}
+        assert not persister.save(settings, str(tmp_path / "settings.json"))
+        assert persister.getStats()["dirty"]
+
+    def test_failed_save_retried(self, master, tmp_path):
+        """Test a save that fails is queued again."""
+        carapi = Mock()
+        carapi.getCarApiBearerToken.return_value = ""
+        carapi.getCarApiRefreshToken.return_value = ""
+        carapi.getCarApiTokenExpireTime.return_value = 0
+        master.getModuleByName = Mock(return_value=carapi)
+        master.config["config"]["settingsPath"] = str(tmp_path / "missing")
+        master.markSettingsDirty()
+        task = master.getBackgroundTask("persistence")
+        master.doneBackgroundTask(task)
+
+        master.saveSettings()
+        assert master.lastSaveFailed
+        assert master.getBackgroundTask("persistence")["cmd"] == "saveSettings"
+
+    def test_saves_coalesced(self, master):
+        """Test a burst of changes is saved once, after the window."""
+        saved = []
+        master.registerBackgroundTask(
+            "saveSettings", saved.append, coalesce=master.settingsPersister.window
+        )
+
+        master.setSetting("chargeNowAmps", 16)
+        master.markSettingsDirty()
+        master.setSetting("chargeNowAmps", 32)
+        assert master.getSettingsStats()["dirty"]
+
+        # Nothing is queued until the window has passed
+        assert master.getBackgroundTaskQueues()["persistence"]["queued"] == 0
+        task = master.getBackgroundTask("persistence")
+        assert master.getBackgroundTaskQueues()["persistence"]["queued"] == 0
+        master.backgroundTasks.run(task)
+        master.doneBackgroundTask(task)
+        assert saved == [{"cmd": "saveSettings"}]
+
+    def test_change_while_saving(self, master):
+        """Test a change made while settings are being saved isn't lost."""
+        master.registerBackgroundTask(
+            "saveSettings", print, coalesce=master.settingsPersister.window
+        )
+        master.markSettingsDirty()
+        task = master.getBackgroundTask("persistence")
+
+        # The running save may already have written the settings, so this
+        # is queued again once it is done rather than merged into it
+        master.markSettingsDirty()
+        time.sleep(0.3)
+        master.doneBackgroundTask(task)
+        assert master.getBackgroundTaskQueues()["persistence"]["queued"] == 0
+        assert master.getBackgroundTask("persistence")["cmd"] == "saveSettings"
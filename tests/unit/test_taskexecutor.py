@@ -0,0 +1,343 @@
+"""
+Unit tests for TWCManager TaskExecutor module.
+
+Tests running background tasks in lanes, and queuing them through TWCMaster.
+"""
+
+import queue
+import threading
+import time
+
+import pytest
+
+
+class TestTaskExecutor:
+    """Test background task lanes."""
+
+    @pytest.fixture
+    def master(self):
+        """Create a TWCMaster with background task lanes."""
+        from TWCManager.TWCMaster import TWCMaster
+
+        return TWCMaster(
+            bytearray(b"\x77\x77"),
+            {"config": {"wiringMaxAmpsAllTWCs": 80, "maxAmpsAllowedFromGrid": None}},
+        )
+
+    def test_lanes(self):
+        """Test tasks are queued in the lane for their command."""
+        from TWCManager.TaskExecutor import TaskExecutor
+
+        executor = TaskExecutor()
+        executor.put({"cmd": "charge"})
+        executor.put({"cmd": "checkGreenEnergy"})
+        executor.put({"cmd": "getLifetimekWh"})
+
+        depths = executor.getQueueDepths()
+        assert depths["vehicle"]["queued"] == 1
+        assert depths["vehicle"]["running"] is None
+        assert depths["ems"]["queued"] == 1
+        assert depths["general"]["queued"] == 1
+        assert depths["persistence"]["queued"] == 0
+
+        task = executor.get("ems", timeout=0)
+        assert task == {"cmd": "checkGreenEnergy"}
+        assert executor.getQueueDepths()["ems"]["queued"] == 0
+        assert executor.getQueueDepths()["ems"]["running"] == "checkGreenEnergy"
+        executor.done(task)
+        assert executor.getQueueDepths()["ems"]["running"] is None
+
+        with pytest.raises(queue.Empty):
+            executor.get("ems", timeout=0)
+
+    def test_priorities(self):
+        """Test stop and safety tasks run before routine and housekeeping ones."""
+        from TWCManager.TaskExecutor import TaskExecutor
+
+        executor = TaskExecutor(False)
+        executor.put({"cmd": "sunrise"})
+        executor.put({"cmd": "checkCharge"})
+        executor.put({"cmd": "charge", "charge": True})
+        executor.put({"cmd": "checkVINEntitlement"})
+        executor.put({"cmd": "charge", "charge": False})
+
+        priorities = executor.getQueueDepths()["general"]["priorities"]
+        assert priorities["high"]["queued"] == 2
+        assert priorities["normal"]["queued"] == 2
+        assert priorities["low"]["queued"] == 1
+
+        order = [executor.get("general", timeout=0) for i in range(5)]
+        assert order == [
+            {"cmd": "checkVINEntitlement"},
+            {"cmd": "charge", "charge": False},
+            {"cmd": "checkCharge"},
+            {"cmd": "charge", "charge": True},
+            {"cmd": "sunrise"},
+        ]
+
+        priorities = executor.getQueueDepths()["general"]["priorities"]
+        assert priorities["high"]["waits"] == 2
+        assert priorities["high"]["maxWait"] < 1
+
+    def test_aging(self):
+        """Test a low priority task isn't held back forever."""
+        from TWCManager.TaskExecutor import PRIORITY_HIGH, PRIORITY_LOW, TaskQueue
+
+        taskQueue = TaskQueue()
+        taskQueue.agingInterval = 0.02
+        taskQueue.put({"cmd": "sunrise"}, PRIORITY_LOW)
+        time.sleep(0.05)
+        taskQueue.put({"cmd": "checkVINEntitlement"}, PRIORITY_HIGH)
+
+        assert taskQueue.get(0) == {"cmd": "sunrise"}
+
+    def test_stop_promoted(self, master):
+        """Test a queued charge start that becomes a stop runs sooner."""
+        master.queue_background_task({"cmd": "checkCharge"})
+        master.queue_background_task({"cmd": "charge", "charge": True})
+        master.queue_background_task({"cmd": "charge", "charge": False})
+
+        assert master.getBackgroundTask("vehicle") == {"cmd": "charge", "charge": False}
+
+    def test_single_lane(self):
+        """Test every task uses the general lane when lanes are turned off."""
+        from TWCManager.TaskExecutor import TaskExecutor
+
+        executor = TaskExecutor(False)
+        executor.put({"cmd": "charge"})
+        executor.put({"cmd": "saveSettings"})
+
+        assert executor.getLanes() == ("general",)
+        assert executor.getQueueDepths()["general"]["queued"] == 2
+
+    def test_dedup(self, master):
+        """Test a command isn't queued again until the last one is done."""
+        master.queue_background_task({"cmd": "charge", "charge": True})
+        master.queue_background_task({"cmd": "charge", "charge": False})
+
+        assert master.getBackgroundTaskQueues()["vehicle"]["queued"] == 1
+        task = master.getBackgroundTask("vehicle")
+        assert task["charge"] is False
+
+        master.doneBackgroundTask(task)
+        master.queue_background_task({"cmd": "charge", "charge": True})
+        assert master.getBackgroundTaskQueues()["vehicle"]["queued"] == 1
+
+    def test_slow_lane_does_not_block(self, master):
+        """Test a slow vehicle command doesn't hold up green energy tracking."""
+        release = threading.Event()
+        ran = []
+
+        def worker(master, lane):
+            while True:
+                task = master.getBackgroundTask(lane)
+                if task["cmd"] == "charge":
+                    release.wait(5)
+                ran.append(task["cmd"])
+                master.doneBackgroundTask(task)
+
+        master.backgroundTasks.start(worker, master)
+        master.queue_background_task({"cmd": "charge"})
+        master.queue_background_task({"cmd": "checkGreenEnergy"})
+
+        end = time.time() + 2
+        while "checkGreenEnergy" not in ran and time.time() < end:
+            time.sleep(0.01)
+        assert ran == ["checkGreenEnergy"]
+        assert master.getBackgroundTaskQueues()["vehicle"]["running"] == "charge"
+
+        release.set()
+        master.backgroundTasks.join()
+        assert ran == ["checkGreenEnergy", "charge"]
+
+    def test_expired_while_queued(self, master):
+        """Test a task past its deadline is dropped or rescheduled unrun."""
+        master.backgroundTasks.rescheduleDelay = 0.05
+        master.queue_background_task({"cmd": "checkGreenEnergy", "timeout": 0})
+        master.queue_background_task({"cmd": "sunrise", "timeout": 0})
+
+        # Neither runs, but the sunrise task is queued again later. It keeps
+        # its timeout of 0, so we only check that it's back in the queue.
+        start = time.monotonic()
+        with pytest.raises(queue.Empty):
+            master.backgroundTasks.get("ems", timeout=0.02)
+        time.sleep(0.1)
+        assert master.backgroundTasks.queues["ems"].qsize() == 1
+        assert time.monotonic() - start < 1
+
+        counters = master.backgroundTasks.getCounters()
+        assert counters["checkGreenEnergy"] == {
+            "expired": 1,
+            "timeouts": 0,
+            "cancelled": 0,
+            "rescheduled": 0,
+        }
+        assert counters["sunrise"]["expired"] == 1
+        assert counters["sunrise"]["rescheduled"] == 1
+        deadlines = master.getBackgroundTaskQueues()["ems"]["deadlines"]
+        assert deadlines["sunrise"]["rescheduled"] == 1
+
+    def test_rescheduled_task_not_merged(self, master):
+        """Test a rescheduled task doesn't overwrite a newer queued one."""
+        master.backgroundTasks.rescheduleDelay = 0.05
+        master.queue_background_task({"cmd": "charge", "charge": True, "timeout": 0})
+        with pytest.raises(queue.Empty):
+            master.backgroundTasks.get("vehicle", timeout=0)
+
+        master.queue_background_task({"cmd": "charge", "charge": False})
+        time.sleep(0.1)
+        assert master.getBackgroundTaskQueues()["vehicle"]["queued"] == 1
+        assert master.getBackgroundTask("vehicle") == {"cmd": "charge", "charge": False}
+
+    def test_timeout_cancels(self, master):
+        """Test a task running past its deadline is cancelled."""
+        from TWCManager.TaskExecutor import TaskCancelled, cancellableSleep
+
+        ran = []
+
+        def worker(master, lane):
+            while master.backgroundTasks.isWorker(lane):
+                task = master.getBackgroundTask(lane)
+                try:
+                    cancellableSleep(task.get("sleep", 0))
+                    ran.append(task["cmd"])
+                except TaskCancelled:
+                    master.backgroundTasks.taskCancelled(task)
+                master.doneBackgroundTask(task)
+
+        master.backgroundTasks.start(worker, master)
+        start = time.monotonic()
+        master.queue_background_task({"cmd": "webhook", "sleep": 5, "timeout": 0.1})
+        master.backgroundTasks.join()
+        assert time.monotonic() - start < 2
+
+        assert master.backgroundTasks.getCounters()["webhook"]["timeouts"] == 1
+
+        # The worker notices it has been cancelled as soon as it's woken
+        end = time.time() + 2
+        while time.time() < end:
+            if master.backgroundTasks.getCounters()["webhook"]["cancelled"]:
+                break
+            time.sleep(0.01)
+        assert master.backgroundTasks.getCounters()["webhook"]["cancelled"] == 1
+
+        # The lane carries on
+        master.queue_background_task({"cmd": "webhook"})
+        master.backgroundTasks.join()
+        assert ran == ["webhook"]
+
+    def test_hung_worker_replaced(self, master):
+        """Test a lane gets a new worker when a task won't return."""
+        release = threading.Event()
+        ran = []
+
+        def worker(master, lane):
+            while master.backgroundTasks.isWorker(lane):
+                task = master.getBackgroundTask(lane)
+                if task.get("hang", False):
+                    # Doesn't check for cancellation
+                    release.wait(5)
+                ran.append((threading.current_thread(), task["cmd"]))
+                master.doneBackgroundTask(task)
+
+        master.backgroundTasks.start(worker, master)
+        hung = master.backgroundTasks.workers["notify"]
+        master.queue_background_task(
+            {"cmd": "updateStatus", "hang": True, "timeout": 0.1}
+        )
+        master.queue_background_task({"cmd": "webhook"})
+        master.backgroundTasks.join()
+
+        replacement = master.backgroundTasks.workers["notify"]
+        assert replacement is not hung
+        assert ran == [(replacement, "webhook")]
+        assert master.getBackgroundTaskQueues()["notify"]["running"] is None
+
+        # A new updateStatus can be queued while the old one is still stuck,
+        # and isn't forgotten when the old one returns
+        master.queue_background_task({"cmd": "updateStatus", "sleep": 0})
+        release.set()
+        hung.join(2)
+        assert not hung.is_alive()
+        master.backgroundTasks.join()
+        # Either may finish first
+        assert len(ran) == 3
+        assert set(ran[1:]) == {(hung, "updateStatus"), (replacement, "updateStatus")}
+
+    def test_registry(self, master):
+        """Test a module can register a task type and it is run by cmd."""
+        from TWCManager.TaskExecutor import PRIORITY_LOW
+
+        ran = []
+        master.registerBackgroundTask(
+            "refreshTariffs",
+            ran.append,
+            lane="ems",
+            priority=PRIORITY_LOW,
+            deadline=30,
+            dedup=("tariff",),
+        )
+
+        types = master.backgroundTasks.getTaskTypes()
+        assert types["refreshTariffs"] == {
+            "handler": "append",
+            "lane": "ems",
+            "priority": "low",
+            "deadline": 30,
+            "expiry": "drop",
+            "dedup": ["tariff"],
+            "coalesce": 0,
+        }
+
+        # Tasks are merged only when their dedup keys match
+        master.queue_background_task({"cmd": "refreshTariffs", "tariff": "peak"})
+        master.queue_background_task({"cmd": "refreshTariffs", "tariff": "peak"})
+        master.queue_background_task({"cmd": "refreshTariffs", "tariff": "offpeak"})
+        assert master.getBackgroundTaskQueues()["ems"]["queued"] == 2
+
+        for i in range(2):
+            task = master.getBackgroundTask("ems")
+            assert master.backgroundTasks.run(task)
+            master.doneBackgroundTask(task)
+        assert ran == [
+            {"cmd": "refreshTariffs", "tariff": "peak"},
+            {"cmd": "refreshTariffs", "tariff": "offpeak"},
+        ]
+        assert master.backgroundTasksCmds == {}
+
+        # Nothing is registered for this command
+        assert not master.backgroundTasks.run({"cmd": "unregistered"})
+
+        with pytest.raises(ValueError):
+            master.registerBackgroundTask("refreshTariffs", ran.append, lane="nowhere")
+
+    def test_registry_builtin_defaults(self, master):
+        """Test TWCManager's own commands keep their lanes when registered."""
+        master.registerBackgroundTask("charge", print)
+        master.registerBackgroundTask("saveSettings", print, deadline=10)
+
+        types = master.backgroundTasks.getTaskTypes()
+        assert types["charge"]["lane"] == "vehicle"
+        assert types["charge"]["expiry"] == "reschedule"
+        assert types["saveSettings"]["lane"] == "persistence"
+        assert types["saveSettings"]["deadline"] == 10
+
+        # A charge stop is still high priority
+        master.queue_background_task({"cmd": "checkCharge"})
+        master.queue_background_task({"cmd": "charge", "charge": False})
+        assert master.getBackgroundTask("vehicle")["cmd"] == "charge"
+
+    def test_vin_queries_per_twc(self, master):
+        """Test VIN queries for different TWCs aren't merged."""
+        master.queue_background_task(
+            {"cmd": "getVehicleVIN", "slaveTWC": bytearray(b"\x11\x11"), "vinPart": 0}
+        )
+        master.queue_background_task(
+            {"cmd": "getVehicleVIN", "slaveTWC": b"\x11\x11", "vinPart": 1}
+        )
+        master.queue_background_task(
+            {"cmd": "getVehicleVIN", "slaveTWC": b"\x22\x22", "vinPart": 0}
+        )
+
+        assert master.getBackgroundTaskQueues()["general"]["queued"] == 2
+        assert master.getBackgroundTask("general")["vinPart"] == 1
@@ -0,0 +1,110 @@
+"""
+Unit tests for TWCManager TaskStats module.
+
+Tests rolling histograms, and recording background task telemetry through
+TaskExecutor.
+"""
+
+import time
+
+
+class TestRollingHistogram:
+    """Test rolling histograms."""
+
+    def test_buckets_and_percentiles(self):
+        """Test values are counted in their bucket and percentiles found."""
+        from TWCManager.TaskStats import RollingHistogram
+
+        histogram = RollingHistogram()
+        for i in range(90):
+            histogram.add(0.003, 100)
+        for i in range(9):
+            histogram.add(0.15, 100)
+        histogram.add(400, 100)
+
+        stats = histogram.getStats(100)
+        assert stats["count"] == 100
+        assert stats["max"] == 400
+        # 0.003 is in the bucket up to 0.005, 0.15 in the one up to 0.2, and
+        # 400 in the last bucket, after the last bound
+        assert stats["buckets"][2] == 90
+        assert stats["buckets"][7] == 9
+        assert stats["buckets"][-1] == 1
+        assert stats["p50"] == 0.005
+        assert stats["p95"] == 0.2
+        assert stats["p99"] == 0.2
+        assert abs(stats["mean"] - (90 * 0.003 + 9 * 0.15 + 400) / 100) < 1e-9
+
+        # A percentile is never more than the largest value seen
+        histogram = RollingHistogram()
+        histogram.add(0.0031, 100)
+        assert histogram.getStats(100)["p50"] == 0.0031
+
+    def test_windows_age_out(self):
+        """Test old values drop out, and their windows are reused."""
+        from TWCManager.TaskStats import RollingHistogram
+
+        histogram = RollingHistogram(windows=3, windowLength=10)
+        histogram.add(1, 0)
+        histogram.add(1, 15)
+        histogram.add(1, 25)
+        assert histogram.getStats(25)["count"] == 3
+
+        # At 30 the window from 0 to 10 has aged out, and at 35 it is reused
+        assert histogram.getStats(30)["count"] == 2
+        histogram.add(2, 35)
+        stats = histogram.getStats(35)
+        assert stats["count"] == 3
+        assert stats["max"] == 2
+        assert len(histogram.counts) == 3 * histogram.buckets
+
+        # Long after everything, nothing is left
+        assert histogram.getStats(1000)["count"] == 0
+        assert histogram.getStats(1000)["p95"] == 0.0
+
+
+class TestTaskStats:
+    """Test background task telemetry."""
+
+    def test_executor_records_tasks(self):
+        """Test a task is followed from being queued until it's done."""
+        from TWCManager.TaskExecutor import TaskExecutor
+
+        executor = TaskExecutor()
+        executor.put({"cmd": "checkGreenEnergy"})
+        executor.put({"cmd": "saveSettings"})
+        time.sleep(0.02)
+
+        task = executor.get("ems", timeout=0)
+        time.sleep(0.03)
+        executor.done(task)
+
+        stats = executor.getStats()
+        assert stats["bounds"][0] == 0.001
+        green = stats["cmds"]["checkGreenEnergy"]
+        assert green["queued"] == 1
+        assert green["dequeued"] == 1
+        assert green["finished"] == 1
+        assert green["wait"]["count"] == 1
+        assert 0.02 <= green["wait"]["max"] < 1
+        assert 0.03 <= green["run"]["max"] < 1
+        assert green["perMinute"] > 0
+
+        settings = stats["cmds"]["saveSettings"]
+        assert settings["queued"] == 1
+        assert settings["dequeued"] == 0
+        assert settings["run"]["count"] == 0
+
+    def test_expired_task_not_finished(self):
+        """Test a task that missed its deadline waits but doesn't run."""
+        from TWCManager.TaskExecutor import TaskExecutor
+
+        executor = TaskExecutor()
+        executor.put({"cmd": "checkGreenEnergy", "timeout": 0})
+        executor.put({"cmd": "checkGreenEnergy"})
+
+        executor.done(executor.get("ems", timeout=0))
+        green = executor.getStats()["cmds"]["checkGreenEnergy"]
+        assert green["queued"] == 2
+        assert green["dequeued"] == 2
+        assert green["finished"] == 1
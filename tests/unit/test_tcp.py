@@ -0,0 +1,253 @@
+"""
+Unit tests for TWCManager TCP interface module.
+
+Tests connecting to, and accepting connections from, an RS485 gateway over
+real loopback sockets.
+"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+
+class FakeMaster:
+    """Just enough of TWCMaster for the TCP interface."""
+
+    def __init__(self, tcpConfig):
+        self.config = {"interface": {"TCP": tcpConfig}}
+        self.journal = None
+        self.released = False
+
+    def getSlaveTWCs(self):
+        return []
+
+    def releaseModule(self, path, module):
+        self.released = True
+
+
+def wait_for(condition, timeout=2.0):
+    """Call condition until it returns true or timeout passes."""
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestTCP:
+    """Test the TCP interface."""
+
+    @pytest.fixture
+    def gateway(self):
+        """A listening socket standing in for an RS485 gateway."""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        server.settimeout(2)
+        yield server
+        server.close()
+
+    def test_disabled(self):
+        """Test the module is released when not enabled."""
+        from TWCManager.Interface.TCP import TCP
+
+        master = FakeMaster({"enabled": False})
+        TCP(master)
+        assert master.released
+
+    def test_no_server(self):
+        """Test the module is released when there's nothing to connect to."""
+        from TWCManager.Interface.TCP import TCP
+
+        master = FakeMaster({"enabled": True})
+        TCP(master)
+        assert master.released
+
+    def test_send_and_receive(self, gateway):
+        """Test frames are sent to and read from the gateway."""
+        from TWCManager.Interface.TCP import TCP
+
+        port = gateway.getsockname()[1]
+        tcp = TCP(FakeMaster({"enabled": True, "server": "127.0.0.1", "port": port}))
+        peer, addr = gateway.accept()
+        peer.settimeout(2)
+        try:
+            assert wait_for(lambda: tcp.getBufferLen() == 0 and tcp.fileno())
+            assert tcp.sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) != 0
+
+            tcp.send(b"\xfb\xe0\x77\x77")
+            assert peer.recv(16) == b"\xc0\xfb\xe0\x77\x77\xce\xc0"
+
+            peer.sendall(b"\xc0\x01\x02\x03")
+            assert wait_for(lambda: tcp.getBufferLen() == 4)
+            assert tcp.read(1) == b"\xc0"
+            assert tcp.read(10) == b"\x01\x02\x03"
+            assert tcp.getBufferLen() == 0
+        finally:
+            peer.close()
+            tcp.close()
+
+    def test_send_from_two_threads(self, gateway):
+        """Test frames sent from another thread while polling arrive once each."""
+        from TWCManager.Interface.TCP import TCP
+
+        port = gateway.getsockname()[1]
+        tcp = TCP(FakeMaster({"enabled": True, "server": "127.0.0.1", "port": port}))
+        tcp.maxTxBuffer = 1 << 24
+        peer, addr = gateway.accept()
+        peer.settimeout(2)
+        frame = b"\xc0" + b"\x01" * 2000 + b"\xc0"
+        count = 500
+        errors = []
+        received = bytearray()
+
+        def sender():
+            try:
+                for i in range(count):
+                    tcp.sendFrame(frame)
+            except Exception as e:
+                errors.append(e)
+
+        def receiver():
+            while len(received) < count * len(frame):
+                try:
+                    data = peer.recv(65536)
+                except socket.timeout:
+                    return
+                if not data:
+                    return
+                received.extend(data)
+
+        try:
+            assert wait_for(lambda: tcp.getBufferLen() == 0 and tcp.fileno())
+            threads = [
+                threading.Thread(target=sender),
+                threading.Thread(target=receiver),
+            ]
+            for thread in threads:
+                thread.start()
+
+            # Meanwhile the main loop polls, which sends what is buffered
+            while threads[0].is_alive() or tcp.txBuffer:
+                try:
+                    tcp.getBufferLen()
+                except Exception as e:
+                    errors.append(e)
+                    break
+            for thread in threads:
+                thread.join(5)
+
+            assert errors == []
+            assert bytes(received) == frame * count
+        finally:
+            peer.close()
+            tcp.close()
+
+    def test_reconnect_backoff(self):
+        """Test reconnecting to a gateway that is down doesn't block."""
+        from TWCManager.Interface.TCP import TCP
+
+        # Find a port with nothing listening on it
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+
+        tcp = TCP(
+            FakeMaster(
+                {
+                    "enabled": True,
+                    "server": "127.0.0.1",
+                    "port": port,
+                    "reconnectMin": 1,
+                    "reconnectMax": 4,
+                }
+            )
+        )
+        try:
+            start = time.time()
+            assert wait_for(lambda: tcp.getBufferLen() == 0 and tcp.stats["failures"])
+            assert time.time() - start < 1
+            assert tcp.fileno() is None
+            assert tcp.reconnectDelay == 2
+
+            # No further attempt is made until the delay has passed
+            tcp.getBufferLen()
+            assert tcp.stats["failures"] == 1
+            assert tcp.connecting is None
+
+            for i in range(3):
+                tcp.nextAttempt = 0
+                assert wait_for(
+                    lambda: tcp.getBufferLen() == 0 and tcp.stats["failures"] == i + 2
+                )
+            assert tcp.reconnectDelay == 4
+
+            # Messages sent while disconnected are dropped
+            tcp.send(b"\xfb\xe0\x77\x77")
+            assert tcp.txBuffer == b""
+        finally:
+            tcp.close()
+
+    def test_reconnect_after_close(self, gateway):
+        """Test the interface reconnects when the gateway drops the connection."""
+        from TWCManager.Interface.TCP import TCP
+
+        port = gateway.getsockname()[1]
+        tcp = TCP(
+            FakeMaster(
+                {
+                    "enabled": True,
+                    "server": "127.0.0.1",
+                    "port": port,
+                    "reconnectMin": 0.1,
+                }
+            )
+        )
+        try:
+            peer, addr = gateway.accept()
+            assert wait_for(lambda: tcp.getBufferLen() == 0 and tcp.fileno())
+            peer.close()
+
+            assert wait_for(lambda: tcp.getBufferLen() == 0 and tcp.fileno() is None)
+            assert tcp.stats["disconnects"] == 1
+
+            # Once the reconnect delay has passed, the next poll connects again
+            assert tcp.reconnectDelay == 0.2
+            tcp.nextAttempt = 0
+            tcp.getBufferLen()
+            peer, addr = gateway.accept()
+            assert wait_for(lambda: tcp.getBufferLen() == 0 and tcp.fileno())
+            assert tcp.stats["connects"] == 2
+            peer.close()
+        finally:
+            tcp.close()
+
+    def test_listen(self):
+        """Test accepting a connection from the gateway."""
+        from TWCManager.Interface.TCP import TCP
+
+        tcp = TCP(
+            FakeMaster(
+                {
+                    "enabled": True,
+                    "listen": True,
+                    "listenAddress": "127.0.0.1",
+                    "port": 0,
+                }
+            )
+        )
+        try:
+            assert tcp.getBufferLen() == 0
+            assert tcp.fileno() is None
+
+            client = socket.create_connection(tcp.listenSock.getsockname(), 2)
+            client.sendall(b"\xc0\xfd\xe0")
+            assert wait_for(lambda: tcp.getBufferLen() == 3)
+            assert tcp.read(3) == b"\xc0\xfd\xe0"
+            client.close()
+        finally:
+            tcp.close()
@@ -0,0 +1,91 @@
+"""
+Unit tests for TWCManager TimerHeap module.
+
+Tests firing, ordering and cancelling timers, and delayed background tasks.
+"""
+
+import threading
+import time
+
+import pytest
+
+
+class TestTimerHeap:
+    """Test the timer heap."""
+
+    @pytest.fixture
+    def timers(self):
+        """Create a TimerHeap instance."""
+        from TWCManager.TimerHeap import TimerHeap
+
+        return TimerHeap()
+
+    def test_fires_in_order(self, timers):
+        """Test timers fire in due order, and in schedule order when tied."""
+        fired = []
+        done = threading.Event()
+
+        # Spaced widely enough that a busy test machine doesn't reorder them
+        # by delaying one schedule() call
+        timers.schedule(0.3, fired.append, "c")
+        timers.schedule(0.1, fired.append, "a")
+        # Tasks are dicts, which can't be compared, so ties must not need to
+        timers.schedule(0.2, fired.append, {"cmd": "b1"})
+        timers.schedule(0.2, fired.append, {"cmd": "b2"})
+        timers.schedule(0.4, done.set)
+
+        assert done.wait(2)
+        assert fired == ["a", {"cmd": "b1"}, {"cmd": "b2"}, "c"]
+        assert timers.stats["fired"] == 5
+
+    def test_earlier_timer_wakes(self, timers):
+        """Test a timer due before the one being waited for isn't held up."""
+        done = threading.Event()
+
+        timers.schedule(60, done.set)
+        time.sleep(0.02)
+        start = time.monotonic()
+        timers.schedule(0.01, done.set)
+
+        assert done.wait(2)
+        assert time.monotonic() - start < 0.5
+
+    def test_cancel(self, timers):
+        """Test a cancelled timer doesn't fire."""
+        fired = []
+        done = threading.Event()
+
+        timer = timers.schedule(0.02, fired.append, "cancelled")
+        timers.schedule(0.04, done.set)
+        assert timer.cancel()
+
+        assert done.wait(2)
+        assert fired == []
+        assert timers.stats["cancelled"] == 1
+
+        # A timer that has already fired can't be cancelled
+        done.clear()
+        timer = timers.schedule(0, done.set)
+        assert done.wait(2)
+        assert not timer.cancel()
+
+    def test_delayed_background_task(self):
+        """Test a delayed task is queued in its lane once due."""
+        from TWCManager.TWCMaster import TWCMaster
+
+        master = TWCMaster(
+            bytearray(b"\x77\x77"),
+            {"config": {"wiringMaxAmpsAllTWCs": 80, "maxAmpsAllowedFromGrid": None}},
+        )
+
+        timer = master.queue_background_task({"cmd": "checkDeparture"}, 0.05)
+        cancelled = master.queue_background_task({"cmd": "sunrise"}, 0.05)
+        cancelled.cancel()
+        assert master.getBackgroundTaskQueues()["vehicle"]["queued"] == 0
+        assert 0 < timer.timeLeft() <= 0.05
+
+        start = time.monotonic()
+        task = master.getBackgroundTask("vehicle")
+        assert task == {"cmd": "checkDeparture"}
+        assert time.monotonic() - start < 0.5
+        assert master.getBackgroundTaskQueues()["ems"]["queued"] == 0
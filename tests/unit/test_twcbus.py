@@ -0,0 +1,144 @@
+"""
+Unit tests for TWCManager TWCBus module.
+
+Tests running several RS485 buses of slave TWCs from one TWCMaster.
+"""
+
+import pytest
+from unittest.mock import Mock
+
+
+class TestTWCBus:
+    """Test slave TWCs spread across more than one bus."""
+
+    @pytest.fixture
+    def mock_config(self):
+        """Create a mock configuration."""
+        return {
+            "config": {
+                "debugOutputToFile": False,
+                "subtractChargerLoad": False,
+                "treatGenerationAsGridDelivery": False,
+                "wiringMaxAmpsAllTWCs": 80,
+                "wiringMaxAmpsPerTWC": 32,
+                "maxAmpsAllowedFromGrid": None,
+            }
+        }
+
+    @pytest.fixture
+    def master(self, mock_config):
+        """Create a TWCMaster with two buses, each on its own interface."""
+        from TWCManager.TWCBus import TWCBus
+        from TWCManager.TWCMaster import TWCMaster
+
+        master = TWCMaster(bytearray(b"\x77\x77"), mock_config)
+        for name, TWCID in (("bus1", b"\x77\x77"), ("bus2", b"\x77\x78")):
+            interface = Mock(timeLastTx=0)
+            master.addBus(TWCBus(master, name, interface, bytearray(TWCID)))
+        return master
+
+    def test_separate_slave_tables(self, master):
+        """Test each bus only knows about its own slaves."""
+        bus1, bus2 = master.getBuses()
+
+        slave1 = master.newSlave(b"\x01\x01", 32, bus1)
+        slave2 = master.newSlave(b"\x02\x02", 32, bus2)
+
+        assert slave1.bus is bus1
+        assert slave2.bus is bus2
+        assert bus1.getSlaveTWCs() == [slave1]
+        assert bus2.getSlaveTWCs() == [slave2]
+        assert bus2.getSlaveByID(b"\x02\x02") is slave2
+        with pytest.raises(KeyError):
+            bus1.getSlaveByID(b"\x02\x02")
+
+        # The master shares power between the slaves on every bus
+        assert master.getSlaveTWCs() == [slave1, slave2]
+        assert master.newSlave(b"\x01\x01", 32, bus1) is slave1
+
+    def test_default_bus(self, master):
+        """Test slaves are added to the first bus if none is given."""
+        slaveTWC = master.newSlave(b"\x01\x01", 32)
+
+        assert slaveTWC.bus is master.getBuses()[0]
+
+    def test_conflicting_ids(self, master):
+        """Test a slave with the same TWCID as one on another bus is ignored."""
+        bus1, bus2 = master.getBuses()
+
+        slave1 = master.newSlave(b"\x01\x01", 32, bus1)
+
+        assert master.newSlave(b"\x01\x01", 32, bus2) is None
+        assert bus2.getSlaveTWCs() == []
+        assert master.getSlaveTWCs() == [slave1]
+
+    def test_max_slaves_per_bus(self, master):
+        """Test the oldest slave is dropped when a bus has too many."""
+        bus1, bus2 = master.getBuses()
+        other = master.newSlave(b"\x09\x09", 32, bus2)
+
+        for i in range(1, 5):
+            master.newSlave(bytes([i, i]), 32, bus1)
+
+        assert [bytes(s.TWCID) for s in bus1.getSlaveTWCs()] == [
+            b"\x02\x02",
+            b"\x03\x03",
+            b"\x04\x04",
+        ]
+        assert bus2.getSlaveTWCs() == [other]
+        assert b"\x01\x01" not in master.slaveTWCs
+
+    def test_commands_sent_on_slave_bus(self, master):
+        """Test messages to a slave go out on its bus, from that bus's TWCID."""
+        bus1, bus2 = master.getBuses()
+        slaveTWC = master.newSlave(b"\x02\x02", 32, bus2)
+
+        slaveTWC.send_master_command(b"\xfb\xeb", b"")
+
+        bus1.interface.send.assert_not_called()
+        sent = bus2.interface.send.call_args[0][0]
+        assert bytes(sent[0:6]) == b"\xfb\xeb\x77\x78\x02\x02"
+
+    def test_delete_slave(self, master):
+        """Test deleting a slave removes it from its bus and schedule."""
+        bus1, bus2 = master.getBuses()
+        slaveTWC = master.newSlave(b"\x02\x02", 32, bus2)
+        bus2.heartbeatScheduler.sendHeartbeat(slaveTWC, 100)
+
+        master.deleteSlaveTWC(b"\x02\x02")
+
+        assert bus2.getSlaveTWCs() == []
+        assert bus2.slaveTWCs == {}
+        assert master.getSlaveTWCs() == []
+        assert bus2.heartbeatScheduler.nextDue(200) is None
+
+    def test_distribute_skipped_while_running(self, master):
+        """Test power is only shared out by one bus at a time."""
+        master.allocateEVSEPower = Mock()
+
+        with master.distributeLock:
+            master.distributeEVSEPower()
+        master.allocateEVSEPower.assert_not_called()
+
+        master.distributeEVSEPower()
+        master.allocateEVSEPower.assert_called_once()
+
+    def test_init_messages(self, master):
+        """Test linkready messages are sent 100ms apart on each bus."""
+        bus1, bus2 = master.getBuses()
+        master.send_master_linkready1 = Mock()
+        master.send_master_linkready2 = Mock()
+
+        bus2.sendPeriodicMessages(100)
+        master.send_master_linkready1.assert_called_once_with(bus2)
+        assert bus2.numInitMsgsToSend == 9
+
+        # Nothing is sent until 100ms after the last message
+        bus2.interface.timeLastTx = 100
+        bus2.sendPeriodicMessages(100.05)
+        assert bus2.numInitMsgsToSend == 9
+        assert bus2.timeToNext(100.05) == pytest.approx(0.05)
+
+        bus2.numInitMsgsToSend = 5
+        bus2.sendPeriodicMessages(100.2)
+        master.send_master_linkready2.assert_called_once_with(bus2)
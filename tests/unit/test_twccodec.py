@@ -0,0 +1,192 @@
+"""
+Unit tests for TWCManager TWCCodec module.
+
+Tests the streaming deframer used to split received RS485 data into messages,
+and the encoder used to frame messages we send.
+"""
+
+import pytest
+
+
+def frame(payload):
+    """Build an escaped, C0-delimited frame for the given unescaped payload."""
+    out = bytearray(b"\xc0")
+    for byte in payload:
+        if byte == 0xC0:
+            out += b"\xdb\xdc"
+        elif byte == 0xDB:
+            out += b"\xdb\xdd"
+        else:
+            out.append(byte)
+    out += b"\xc0\xfe"
+    return bytes(out)
+
+
+def with_checksum(body):
+    """Append the TWC checksum byte to an unescaped message body."""
+    return bytes(body) + bytes([sum(body[1:]) & 0xFF])
+
+
+# Slave linkready from TWC 7777, 14 bytes unescaped
+LINKREADY = with_checksum(b"\xfd\xe2\x77\x77\x01\x1f\x40\x00\x00\x00\x00\x00\x00")
+# Slave heartbeat with 16 byte protocol 2 framing
+HEARTBEAT = with_checksum(
+    b"\xfd\xe0\x77\x77\x12\x34\x01\x0c\x80\x0c\x80\x00\x00\x00\x00"
+)
+
+
+class TestTWCDeframer:
+    """Test the TWCDeframer message splitting."""
+
+    @pytest.fixture
+    def deframer(self):
+        """Create a TWCDeframer instance."""
+        from TWCManager.Protocol.TWCCodec import TWCDeframer
+
+        return TWCDeframer()
+
+    def test_single_frame(self, deframer):
+        """Test a complete frame fed in one call."""
+        frames = deframer.feed(frame(LINKREADY), 0)
+
+        assert len(frames) == 1
+        assert frames[0][0] == LINKREADY
+        assert frames[0][1] == b""
+        assert deframer.stats["frames"] == 1
+
+    def test_multiple_frames_in_one_read(self, deframer):
+        """Test several back to back frames returned from a single read."""
+        data = frame(LINKREADY) + frame(HEARTBEAT) + frame(LINKREADY)
+
+        frames = deframer.feed(data, 0)
+
+        assert [f[0] for f in frames] == [LINKREADY, HEARTBEAT, LINKREADY]
+        # The trailing FE of each frame is noise before the next frame
+        assert frames[1][1] == b"\xfe"
+        assert deframer.ignoredData == b"\xfe"
+
+    def test_frame_split_across_reads(self):
+        """Test frames are reassembled when split at every possible byte."""
+        from TWCManager.Protocol.TWCCodec import TWCDeframer
+
+        data = frame(HEARTBEAT)
+        for split in range(1, len(data)):
+            deframer = TWCDeframer()
+            frames = deframer.feed(data[:split], 0)
+            frames += deframer.feed(data[split:], 0)
+            assert [f[0] for f in frames] == [HEARTBEAT]
+
+    def test_escaped_bytes(self, deframer):
+        """Test C0 and DB bytes within a message are unescaped."""
+        msg = with_checksum(b"\xfd\xe2\xc0\xdb\x01\x1f\x40\x00\x00\x00\x00\x00\x00")
+
+        frames = deframer.feed(frame(msg), 0)
+
+        assert len(frames) == 1
+        assert frames[0][0] == msg
+
+    def test_bad_checksum_rejected(self, deframer):
+        """Test a frame with an invalid checksum is dropped."""
+        msg = bytearray(LINKREADY)
+        msg[-1] = (msg[-1] + 1) & 0xFF
+
+        frames = deframer.feed(frame(msg) + frame(LINKREADY), 0)
+
+        assert [f[0] for f in frames] == [LINKREADY]
+        assert deframer.stats["badChecksum"] == 1
+
+    def test_bad_length_rejected(self, deframer):
+        """Test a frame of an unknown length is dropped."""
+        msg = with_checksum(b"\xfd\xe2" + b"\x00" * 15)
+
+        frames = deframer.feed(frame(msg), 0)
+
+        assert frames == []
+        assert deframer.stats["badLength"] == 1
+
+    def test_noise_before_frame(self, deframer):
+        """Test bytes between frames are reported as ignored data."""
+        frames = deframer.feed(b"\x01\x02" + frame(LINKREADY), 0)
+
+        assert len(frames) == 1
+        assert frames[0][1] == b"\x01\x02"
+
+    def test_short_frame_restarts(self, deframer):
+        """Test a C0 seen early in a message starts a new message."""
+        frames = deframer.feed(b"\xc0\xfd\xe2\x77" + frame(LINKREADY), 0)
+
+        assert [f[0] for f in frames] == [LINKREADY]
+        assert deframer.stats["discarded"] == 1
+
+    def test_partial_frame_expires(self, deframer):
+        """Test a partial frame is discarded after the timeout."""
+        deframer.feed(frame(LINKREADY)[:8], 100.0)
+
+        assert deframer.pending
+        assert not deframer.expire(101.0)
+        assert deframer.expire(102.5)
+        assert not deframer.pending
+        assert deframer.stats["timeouts"] == 1
+
+        frames = deframer.feed(frame(HEARTBEAT), 103.0)
+        assert [f[0] for f in frames] == [HEARTBEAT]
+
+    def test_empty_feed(self, deframer):
+        """Test feeding no data returns no frames."""
+        assert deframer.feed(b"", 0) == []
+        assert not deframer.pending
+
+
+class TestTWCEncoder:
+    """Test the TWCEncoder message framing."""
+
+    @pytest.fixture
+    def encoder(self):
+        """Create a TWCEncoder instance."""
+        from TWCManager.Protocol.TWCCodec import TWCEncoder
+
+        return TWCEncoder()
+
+    def test_encode(self, encoder):
+        """Test a message gets a checksum and C0 delimiters."""
+        body = LINKREADY[:-1]
+
+        assert bytes(encoder.encode(body)) == frame(LINKREADY)[:-1]
+
+    def test_encode_escapes(self, encoder):
+        """Test C0 and DB bytes in the message are escaped."""
+        body = b"\xfb\xe0\x77\x77\xc0\xdb\x00\x00\x00\x00\x00\x00\x00"
+
+        assert bytes(encoder.encode(body)) == frame(with_checksum(body))[:-1]
+
+    def test_encode_escapes_checksum(self, encoder):
+        """Test a checksum of C0 is escaped."""
+        body = b"\xfb\x60\x60\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+
+        assert bytes(encoder.encode(body)).endswith(b"\xdb\xdc\xc0")
+
+    def test_encode_grows_buffer(self, encoder):
+        """Test messages longer than the buffer are encoded."""
+        body = b"\xfb" + b"\xc0" * 100
+
+        assert bytes(encoder.encode(body)) == frame(with_checksum(body))[:-1]
+
+    def test_round_trip(self, encoder):
+        """Test encoded messages are decoded by the deframer."""
+        from TWCManager.Protocol.TWCCodec import TWCDeframer
+
+        deframer = TWCDeframer()
+        body = b"\xfb\xe0\x77\x77\xdb\xc0\x05\x0f\xa0\x00\x00\x00\x00\x00\x00"
+
+        frames = deframer.feed(bytes(encoder.encode(body)), 0)
+
+        assert [f[0] for f in frames] == [with_checksum(body)]
+
+    def test_encode_frame_copy(self):
+        """Test encode_frame returns a copy that outlives the next encode."""
+        from TWCManager.Protocol.TWCCodec import encode_frame, get_encoder
+
+        first = encode_frame(LINKREADY[:-1])
+        get_encoder().encode(HEARTBEAT[:-1])
+
+        assert first == frame(LINKREADY)[:-1]
@@ -0,0 +1,175 @@
+"""
+Unit tests for TWCManager TWCJournal and TWCReplay modules.
+
+Tests writing and reading capture files, and replaying them through slave TWC
+handling.
+"""
+
+import logging
+
+import pytest
+
+
+def with_checksum(body):
+    """Append the TWC checksum byte to an unescaped message body."""
+    return bytes(body) + bytes([sum(body[1:]) & 0xFF])
+
+
+# Slave linkready from TWC 1234 offering 80A
+LINKREADY = with_checksum(
+    b"\xfd\xe2\x12\x34\x77\x1f\x40\x00\x00\x00\x00\x00\x00\x00\x00"
+)
+# Slave heartbeat reporting 32A actual
+HEARTBEAT = with_checksum(
+    b"\xfd\xe0\x12\x34\x77\x77\x01\x0c\x80\x0c\x80\x00\x00\x00\x00"
+)
+# Master heartbeat, escaped as it would be passed to sendFrame()
+MASTER_HEARTBEAT_FRAME = (
+    b"\xc0\xfb\xe0\x77\x77\x12\x34\xdb\xdc\xdb\xdd\x00\x00\x00\x00\x00\x00\x00\xaf\xc0"
+)
+
+
+class TestTWCJournal:
+    """Test writing and reading capture files."""
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        """Path for a capture file."""
+        return str(tmp_path / "capture.twcj")
+
+    def test_round_trip(self, path):
+        """Test records are read back as they were written."""
+        from TWCManager.Protocol.TWCJournal import (
+            JOURNAL_RX,
+            JOURNAL_TX,
+            TWCJournalReader,
+            TWCJournalWriter,
+        )
+
+        writer = TWCJournalWriter(path)
+        writer.write(JOURNAL_RX, LINKREADY, b"\xfe", now=100.0)
+        writer.writeFrame(JOURNAL_TX, MASTER_HEARTBEAT_FRAME, now=100.5)
+        writer.close()
+
+        with TWCJournalReader(path) as reader:
+            records = [
+                (t, d, bytes(msg), bytes(ignored)) for t, d, msg, ignored in reader
+            ]
+
+        assert records == [
+            (100.0, JOURNAL_RX, LINKREADY, b"\xfe"),
+            (
+                100.5,
+                JOURNAL_TX,
+                b"\xfb\xe0\x77\x77\x12\x34\xc0\xdb\x00\x00\x00\x00\x00\x00\x00\xaf",
+                b"",
+            ),
+        ]
+
+    def test_append(self, path):
+        """Test a second writer appends to an existing capture."""
+        from TWCManager.Protocol.TWCJournal import (
+            JOURNAL_RX,
+            TWCJournalReader,
+            TWCJournalWriter,
+        )
+
+        for now in (1.0, 2.0):
+            writer = TWCJournalWriter(path)
+            writer.write(JOURNAL_RX, HEARTBEAT, now=now)
+            writer.close()
+
+        with TWCJournalReader(path) as reader:
+            assert [r[0] for r in reader] == [1.0, 2.0]
+
+    def test_empty_capture(self, path):
+        """Test a capture with no records can be read."""
+        from TWCManager.Protocol.TWCJournal import TWCJournalReader, TWCJournalWriter
+
+        TWCJournalWriter(path).close()
+
+        with TWCJournalReader(path) as reader:
+            assert list(reader) == []
+
+    def test_truncated_record(self, path):
+        """Test a record cut short ends the capture."""
+        from TWCManager.Protocol.TWCJournal import (
+            JOURNAL_RX,
+            TWCJournalReader,
+            TWCJournalWriter,
+        )
+
+        writer = TWCJournalWriter(path)
+        writer.write(JOURNAL_RX, LINKREADY, now=1.0)
+        writer.write(JOURNAL_RX, HEARTBEAT, now=2.0)
+        writer.close()
+        with open(path, "r+b") as f:
+            f.truncate(f.seek(0, 2) - 4)
+
+        with TWCJournalReader(path) as reader:
+            assert [r[0] for r in reader] == [1.0]
+
+    def test_not_a_capture(self, path):
+        """Test other files are rejected."""
+        from TWCManager.Protocol.TWCJournal import TWCJournalReader, TWCJournalWriter
+
+        with open(path, "wb") as f:
+            f.write(b'{"json": true}')
+
+        with pytest.raises(ValueError):
+            TWCJournalReader(path)
+        with pytest.raises(ValueError):
+            TWCJournalWriter(path)
+
+
+class TestTWCReplay:
+    """Test replaying captures through slave TWC handling."""
+
+    @pytest.fixture
+    def master(self, tmp_path):
+        """Create an offline master to replay into."""
+        from TWCManager.Protocol.TWCReplay import offline_master
+
+        logging.disable(logging.CRITICAL)
+        master = offline_master(
+            {
+                "config": {
+                    "fakeMaster": 1,
+                    "minAmpsPerTWC": 6,
+                    "settingsPath": str(tmp_path),
+                    "wiringMaxAmpsAllTWCs": 32,
+                    "wiringMaxAmpsPerTWC": 32,
+                },
+                "policy": {},
+                "vehicle": {},
+            }
+        )
+        yield master
+        logging.disable(logging.NOTSET)
+
+    def test_replay(self, master, tmp_path):
+        """Test received messages create slaves and update their state."""
+        from TWCManager.Protocol.TWCJournal import (
+            JOURNAL_RX,
+            JOURNAL_TX,
+            TWCJournalWriter,
+        )
+        from TWCManager.Protocol.TWCReplay import TWCReplay
+
+        path = str(tmp_path / "capture.twcj")
+        writer = TWCJournalWriter(path)
+        writer.write(JOURNAL_RX, LINKREADY, now=1.0)
+        writer.writeFrame(JOURNAL_TX, MASTER_HEARTBEAT_FRAME, now=1.1)
+        writer.write(JOURNAL_RX, HEARTBEAT, now=1.2)
+        writer.write(JOURNAL_RX, b"\xfd\x99" + b"\x00" * 13, now=1.3)
+        writer.close()
+
+        stats = TWCReplay(master).replay(path)
+
+        assert stats["frames"] == 3
+        assert stats["skipped"] == 1
+        assert stats["unknown"] == 1
+        assert stats["commands"] == {"SlaveLinkready": 1, "SlaveHeartbeat": 1}
+
+        slaveTWC = master.getSlaveByID(b"\x12\x34")
+        assert slaveTWC.reportedAmpsActual == 32.0
@@ -0,0 +1,125 @@
+"""
+Unit tests for TWCManager TWCMessages module.
+
+Tests the opcode and length keyed message table used to decode received
+TWC messages.
+"""
+
+import pytest
+
+
+def with_checksum(body):
+    """Append the TWC checksum byte to an unescaped message body."""
+    return bytearray(body) + bytearray([sum(body[1:]) & 0xFF])
+
+
+class TestTWCMessageTable:
+    """Test decoding of received messages."""
+
+    @pytest.fixture
+    def table(self):
+        """Return the shared message table."""
+        from TWCManager.Protocol.TWCMessages import messageTable
+
+        return messageTable
+
+    def test_slave_linkready(self, table):
+        """Test decoding a slave linkready message."""
+        msg = with_checksum(b"\xfd\xe2\x77\x77\x01\x1f\x40" + b"\x00" * 8)
+
+        packet = table.decode(msg)
+
+        assert packet["Command"] == "SlaveLinkready"
+        assert packet["Match"] is True
+        assert packet["SenderID"] == b"\x77\x77"
+        assert packet["Sign"] == b"\x01"
+        assert packet["MaxAmps"] == 80.0
+        # IDs are bytes so they can be used as dict keys
+        assert isinstance(packet["SenderID"], bytes)
+
+    def test_slave_heartbeat(self, table):
+        """Test decoding a slave heartbeat message."""
+        msg = with_checksum(
+            b"\xfd\xe0\x77\x77\x12\x34\x01\x0c\x80\x0c\x80\x00\x00\x00\x00"
+        )
+
+        packet = table.decode(msg)
+
+        assert packet["Command"] == "SlaveHeartbeat"
+        assert packet["SenderID"] == b"\x77\x77"
+        assert packet["RecieverID"] == b"\x12\x34"
+        assert packet["HeartbeatData"] == b"\x01\x0c\x80\x0c\x80\x00\x00\x00\x00"
+
+    def test_voltage_response(self, table):
+        """Test decoding a kWh and voltage response."""
+        msg = with_checksum(
+            b"\xfd\xeb\x77\x77\x00\x00\x00\x38\x00\xe6\x00\xf1\x00\xe8\x00"
+        )
+
+        packet = table.decode(msg)
+
+        assert packet["Command"] == "VoltageResponse"
+        assert packet["LifetimekWh"] == 56
+        assert packet["VoltsPhaseA"] == 230
+        assert packet["VoltsPhaseB"] == 241
+        assert packet["VoltsPhaseC"] == 232
+
+    @pytest.mark.parametrize("opcode,part", [(0xEE, 0), (0xEF, 1), (0xF1, 2)])
+    def test_vin(self, table, opcode, part):
+        """Test decoding each of the VIN response messages."""
+        msg = with_checksum(bytes([0xFD, opcode]) + b"\x77\x77" + b"5YJ3E1E" + b"\x00" * 4)
+
+        packet = table.decode(msg)
+
+        assert packet["Command"] == "VIN"
+        assert packet["VINPart"] == part
+        assert packet["VINData"] == b"5YJ3E1E\x00\x00\x00\x00"
+
+    def test_master_linkready(self, table):
+        """Test decoding master linkready messages."""
+        for opcode, command in (
+            (b"\xfc\xe1", "MasterLinkready1"),
+            (b"\xfb\xe2", "MasterLinkready2"),
+        ):
+            packet = table.decode(with_checksum(opcode + b"\x77\x77\x77" + b"\x00" * 10))
+            assert packet["Command"] == command
+            assert packet["SenderID"] == b"\x77\x77"
+
+    def test_nonzero_padding_not_matched(self, table):
+        """Test a message with unexpected data in its padding is unknown."""
+        msg = with_checksum(b"\xfd\xe2\x77\x77\x01\x1f\x40\x00\x00\x01" + b"\x00" * 5)
+
+        packet = table.decode(msg)
+
+        assert packet["Command"] is None
+        assert packet["Match"] is False
+
+    def test_unexpected_length_not_matched(self, table):
+        """Test a known opcode at a length it isn't registered for."""
+        msg = with_checksum(b"\xfd\xeb\x77\x77" + b"\x00" * 9)
+
+        assert table.decode(msg)["Command"] is None
+
+    def test_unknown_opcode(self, table):
+        """Test an unknown opcode returns an empty packet."""
+        packet = table.decode(bytearray(b"\xfd\x99" + b"\x00" * 14))
+
+        assert packet["Command"] is None
+        assert packet["SenderID"] is None
+        assert packet["Errors"] == []
+
+    def test_short_message(self, table):
+        """Test messages too short to hold an opcode are unknown."""
+        assert table.decode(bytearray(b"\xfd"))["Command"] is None
+
+    def test_register_new_message(self):
+        """Test registering a new message type."""
+        from TWCManager.Protocol.TWCMessages import TWCMessageTable
+
+        table = TWCMessageTable()
+        table.register(b"\xfd\x1b", (14,), "FirmwareVersion", lambda m: {"Major": m[4]})
+
+        packet = table.decode(bytearray(b"\xfd\x1b\x77\x77\x04" + b"\x00" * 9))
+
+        assert packet["Command"] == "FirmwareVersion"
+        assert packet["Major"] == 4
@@ -190,6 +190,26 @@ class TestTWCSlaveHeartbeat:
         
         assert slave.lastHeartbeatDebugOutput == "Test output"
 
+    def test_send_master_heartbeat_reuses_frame(self, slave, mock_master):
+        """Test the encoded heartbeat is reused until its data changes."""
+        interface = Mock()
+        mock_master.getModulesByType = Mock(return_value=[{"ref": interface}])
+        mock_master.getFakeTWCID = Mock(return_value=bytearray(b"\x77\x77"))
+        mock_master.getMasterHeartbeatOverride = Mock(return_value=b"")
+        mock_master.settings = {}
+
+        slave.send_master_heartbeat()
+        frame = interface.sendFrame.call_args[0][0]
+        assert frame.startswith(b"\xc0\xfb\xe0\x77\x77AB")
+
+        slave.send_master_heartbeat()
+        assert interface.sendFrame.call_args[0][0] is frame
+
+        slave.masterHeartbeatData = bytearray(b"\x05\x0f\xa0\x00\x00\x00\x00")
+        slave.send_master_heartbeat()
+        assert interface.sendFrame.call_args[0][0] is not frame
+        assert interface.sendFrame.call_args[0][0][7:10] == b"\x05\x0f\xa0"
+
 
 class TestTWCSlaveVehicleModule:
     """Test TWCSlave vehicle module selection."""